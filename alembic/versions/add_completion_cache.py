@@ -0,0 +1,37 @@
+"""Add completion_cache table
+
+Revision ID: add_completion_cache
+Revises: add_phrase_daily_counts
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_completion_cache'
+down_revision: Union[str, None] = 'add_phrase_daily_counts'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Постоянная копия кэша ответов YandexGPT (переживает перезапуск)
+    op.create_table('completion_cache',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('key', sa.String(length=32), nullable=False),
+        sa.Column('variants', sa.Text(), nullable=False),
+        sa.Column('expires_at', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ux_completion_cache_key', 'completion_cache', ['key'], unique=True)
+    op.create_index('ix_completion_cache_expires_at', 'completion_cache', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_completion_cache_expires_at', table_name='completion_cache')
+    op.drop_index('ux_completion_cache_key', table_name='completion_cache')
+    op.drop_table('completion_cache')
@@ -0,0 +1,51 @@
+"""Add phrase_daily_counts and phrase_daily_users tables
+
+Revision ID: add_phrase_daily_counts
+Revises: add_quota_usage_table
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_phrase_daily_counts'
+down_revision: Union[str, None] = 'add_quota_usage_table'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Суточные счетчики фраз для популярных фраз без GROUP BY по messages
+    op.create_table('phrase_daily_counts',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('phrase_hash', sa.String(length=16), nullable=False),
+        sa.Column('day', sa.Integer(), nullable=False),
+        sa.Column('text', sa.String(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ux_phrase_daily_counts_hash_day', 'phrase_daily_counts', ['phrase_hash', 'day'], unique=True)
+    op.create_index('ix_phrase_daily_counts_day', 'phrase_daily_counts', ['day'], unique=False)
+
+    op.create_table('phrase_daily_users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('phrase_hash', sa.String(length=16), nullable=False),
+        sa.Column('day', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ux_phrase_daily_users_hash_day_user', 'phrase_daily_users', ['phrase_hash', 'day', 'user_id'], unique=True)
+    op.create_index('ix_phrase_daily_users_day', 'phrase_daily_users', ['day'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_phrase_daily_users_day', table_name='phrase_daily_users')
+    op.drop_index('ux_phrase_daily_users_hash_day_user', table_name='phrase_daily_users')
+    op.drop_table('phrase_daily_users')
+    op.drop_index('ix_phrase_daily_counts_day', table_name='phrase_daily_counts')
+    op.drop_index('ux_phrase_daily_counts_hash_day', table_name='phrase_daily_counts')
+    op.drop_table('phrase_daily_counts')
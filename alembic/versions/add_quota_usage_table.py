@@ -0,0 +1,39 @@
+"""Add quota_usage table
+
+Revision ID: add_quota_usage_table
+Revises: add_trigger_stats_tables
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_quota_usage_table'
+down_revision: Union[str, None] = 'add_trigger_stats_tables'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Счетчики квот: одна строка на (пользователь, вид квоты, период, окно)
+    op.create_table('quota_usage',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('period', sa.String(), nullable=False),
+        sa.Column('bucket', sa.Integer(), nullable=False),
+        sa.Column('used', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ux_quota_usage_user_kind_period_bucket', 'quota_usage', ['user_id', 'kind', 'period', 'bucket'], unique=True)
+    op.create_index('ix_quota_usage_period_bucket', 'quota_usage', ['period', 'bucket'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_quota_usage_period_bucket', table_name='quota_usage')
+    op.drop_index('ux_quota_usage_user_kind_period_bucket', table_name='quota_usage')
+    op.drop_table('quota_usage')
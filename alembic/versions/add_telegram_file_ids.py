@@ -0,0 +1,36 @@
+"""Add telegram_file_ids table
+
+Revision ID: add_telegram_file_ids
+Revises: add_completion_cache
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_telegram_file_ids'
+down_revision: Union[str, None] = 'add_completion_cache'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # file_id уже загруженных голосовых и медиа: повторная отправка без загрузки байтов
+    op.create_table('telegram_file_ids',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('bot_id', sa.BigInteger(), nullable=False),
+        sa.Column('content_hash', sa.String(length=32), nullable=False),
+        sa.Column('file_id', sa.String(length=255), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ux_telegram_file_ids_bot_hash', 'telegram_file_ids', ['bot_id', 'content_hash'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ux_telegram_file_ids_bot_hash', table_name='telegram_file_ids')
+    op.drop_table('telegram_file_ids')
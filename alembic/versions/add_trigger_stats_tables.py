@@ -0,0 +1,55 @@
+"""Add trigger_stats and trigger_answer_stats tables
+
+Revision ID: add_trigger_stats_tables
+Revises: cfdbcb98726a
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_trigger_stats_tables'
+down_revision: Union[str, None] = 'cfdbcb98726a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Использование триггеров: одна строка на (триггер, пользователь, чат)
+    op.create_table('trigger_stats',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('trigger_name', sa.String(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('chat_id', sa.Integer(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=True),
+        sa.Column('last_used', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_trigger_stats_trigger_name'), 'trigger_stats', ['trigger_name'], unique=False)
+    op.create_index('ux_trigger_stats_trigger_user_chat', 'trigger_stats', ['trigger_name', 'user_id', 'chat_id'], unique=True)
+
+    # Веса ответов: использования, лайки и дизлайки
+    op.create_table('trigger_answer_stats',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('trigger_name', sa.String(), nullable=False),
+        sa.Column('answer', sa.String(), nullable=False),
+        sa.Column('uses', sa.Integer(), nullable=True),
+        sa.Column('likes', sa.Integer(), nullable=True),
+        sa.Column('dislikes', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ux_trigger_answer_stats_trigger_answer', 'trigger_answer_stats', ['trigger_name', 'answer'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ux_trigger_answer_stats_trigger_answer', table_name='trigger_answer_stats')
+    op.drop_table('trigger_answer_stats')
+    op.drop_index('ux_trigger_stats_trigger_user_chat', table_name='trigger_stats')
+    op.drop_index(op.f('ix_trigger_stats_trigger_name'), table_name='trigger_stats')
+    op.drop_table('trigger_stats')
@@ -10,6 +10,7 @@ import logging
 from app.infrastructure.db.session import get_async_session
 from app.infrastructure.ai.providers.yandex_gpt import YandexGPTService
 from app.infrastructure.ai.providers.yandex_speechkit_tts import YandexSpeechKitTTS
+from app.infrastructure.http.client import http_client as shared_http_client
 from app.infrastructure.system.adminlog_service import AdminLogService
 from app.infrastructure.system.allowed_chats import AllowedChatsService
 
@@ -20,7 +21,7 @@ from app.domain.services.gamification.top import TopService
 from app.domain.services.games import GamesService
 from app.domain.services.motivation import MotivationService
 from app.domain.services.triggers.core import TriggerService
-from app.domain.services.triggers.stats import TriggerStatsService
+from app.domain.services.triggers.stats import trigger_stats_store
 
 # Shared imports
 from app.shared.config.settings import Settings
@@ -41,13 +42,20 @@ class Container(containers.DeclarativeContainer):
         database_url=config.provided.database_url,
     )
     
+    # Общий HTTP-клиент (пул keep-alive соединений к API Яндекса)
+    http_client = providers.Object(shared_http_client)
+    
     # AI Services
     yandex_gpt_service = providers.Singleton(
         YandexGPTService,
+        http_client=http_client,
         base_url=config.provided.yandex_base_url,
     )
 
-    tts_service = providers.Singleton(YandexSpeechKitTTS)
+    tts_service = providers.Singleton(
+        YandexSpeechKitTTS,
+        http_client=http_client,
+    )
     
     # System Services
     adminlog_service = providers.Singleton(
@@ -96,11 +104,8 @@ class Container(containers.DeclarativeContainer):
         config=config,
     )
     
-    trigger_stats_service = providers.Singleton(
-        TriggerStatsService,
-        session=db_session,
-        config=config,
-    )
+    # Общий экземпляр: буфер приращений должен быть один на процесс
+    trigger_stats_service = providers.Object(trigger_stats_store)
     
     # User Service
     user_service = providers.Singleton(
@@ -1,9 +1,10 @@
 import json
 from pathlib import Path
 from app.shared.config import DB_PATH, DATA_DIR
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from app.infrastructure.db.engine import get_engine, get_sessionmaker, get_async_sessionmaker
 from app.infrastructure.db.models import User, ChatPoints
+from app.infrastructure.db.repositories.users import UserRepository
+from app.infrastructure.cache.quota import quota_ledger
 from app.shared.interfaces import AbstractPointsService
 
 if isinstance(DATA_DIR, str):
@@ -13,8 +14,10 @@ RANKS_PATH = DATA_DIR / 'ranks.json'
 with open(RANKS_PATH, encoding='utf-8') as f:
     RANKS = json.load(f)
 
-engine = create_engine(f'sqlite:///{DB_PATH}')
-Session = sessionmaker(bind=engine)
+engine = get_engine(f'sqlite:///{DB_PATH}')
+Session = get_sessionmaker(f'sqlite:///{DB_PATH}')
+# Асинхронный доступ для обработчиков: не блокирует event loop
+user_repository = UserRepository(get_async_sessionmaker(f'sqlite:///{DB_PATH}'))
 
 
 class PointsService(AbstractPointsService):
@@ -27,24 +30,16 @@ class PointsService(AbstractPointsService):
     
     async def add_points(self, user_id, points, reason="general"):
         """Добавить баллы пользователю"""
-        with Session() as session:
-            user = session.query(User).filter(User.id == user_id).first()
-            if not user:
-                user = User(id=user_id, points=points, rank='novice', active_days=0, referrals=0, is_supporter=False)
-                session.add(user)
-            else:
-                user.points += points
-                ranks = self.get_rank_by_points(user.points, user.referrals)
-                user.rank = ranks["main_rank"]
-            
-            session.commit()
-            return True
+        await user_repository.add_points(
+            user_id, points,
+            rank_func=lambda p, r: self.get_rank_by_points(p, r)["main_rank"],
+        )
+        return True
     
     async def get_points(self, user_id):
         """Получить баллы пользователя"""
-        with Session() as session:
-            user = session.query(User).filter(User.id == user_id).first()
-            return user.points if user else 0
+        user = await user_repository.get(user_id)
+        return user.points if user else 0
     
     def get_user_points(self, user_id):
         """Получить баллы пользователя (синхронная версия)"""
@@ -54,8 +49,7 @@ class PointsService(AbstractPointsService):
     
     async def get_top_users(self, limit=10):
         """Получить топ пользователей по баллам"""
-        with Session() as session:
-            return session.query(User).order_by(User.points.desc()).limit(limit).all()
+        return await user_repository.get_top_by_points(limit)
 
     def get_rank_by_points(self, points, referrals=0):
         """Получить ранг по количеству баллов"""
@@ -72,8 +66,7 @@ class PointsService(AbstractPointsService):
 
     async def get_user(self, user_id):
         """Получить пользователя по ID"""
-        with Session() as session:
-            return session.query(User).filter(User.id == user_id).first()
+        return await user_repository.get(user_id)
     
     def create_user(self, user_id, username=None, first_name=None):
         """Создать нового пользователя"""
@@ -140,6 +133,21 @@ def add_points(user_id, points, username=None, is_checkin=False, is_supporter=No
         session.commit()
         return user
 
+async def get_user_async(user_id):
+    """Асинхронная версия get_user"""
+    return await user_repository.get(user_id)
+
+async def add_points_async(user_id, points, username=None, is_checkin=False, is_supporter=None, chat_id=None):
+    """Асинхронная версия add_points для обработчиков"""
+    return await user_repository.add_points(
+        user_id, points,
+        chat_id=chat_id,
+        rank_func=lambda p, r: get_rank_by_points(p, r)["main_rank"],
+        active_days_delta=1 if is_checkin else 0,
+        username=username,
+        is_supporter=is_supporter,
+    )
+
 def get_rank_by_points(points, referrals=0):
     """Получить ранг по количеству баллов (функция для обратной совместимости)"""
     if points >= 10000:
@@ -174,7 +182,8 @@ def set_supporter(user_id, username=None):
             if username:
                 user.username = username
         session.commit()
-        return user
+    quota_ledger.invalidate_tier(user_id)
+    return user
 
 def is_supporter(user_id):
     user = get_user(user_id)
@@ -1,10 +1,11 @@
 from app.shared.config import DB_PATH
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from app.infrastructure.db.engine import get_engine, get_sessionmaker, get_async_sessionmaker
 from app.infrastructure.db.models import User, ChatPoints
+from app.infrastructure.db.repositories.users import UserRepository
 
-engine = create_engine(f'sqlite:///{DB_PATH}')
-Session = sessionmaker(bind=engine)
+engine = get_engine(f'sqlite:///{DB_PATH}')
+Session = get_sessionmaker(f'sqlite:///{DB_PATH}')
+user_repository = UserRepository(get_async_sessionmaker(f'sqlite:///{DB_PATH}'))
 
 class TopService:
     def __init__(self, *args, **kwargs):
@@ -48,4 +49,23 @@ def get_top_referrals(limit=10):
     """
     with Session() as session:
         top = session.query(User).order_by(User.referrals.desc()).limit(limit).all()
-        return top 
\ No newline at end of file
+        return top
+
+async def get_top_users_async(limit=15, chat_id=None):
+    """Асинхронная версия get_top_users"""
+    if chat_id:
+        result = []
+        for cp, user in await user_repository.get_top_by_chat(chat_id, limit):
+            # Только для отображения: объект отсоединен от сессии и не сохраняется
+            user.points = cp.points
+            result.append(user)
+        return result
+    return await user_repository.get_top_by_points(limit)
+
+async def sync_user_data_async(user_id, username=None, first_name=None):
+    """Асинхронная версия sync_user_data"""
+    await user_repository.sync_info(user_id, username=username or None, first_name=first_name or None)
+
+async def get_top_referrals_async(limit=10):
+    """Асинхронная версия get_top_referrals"""
+    return await user_repository.get_top_by_referrals(limit)
@@ -5,7 +5,9 @@ from typing import Dict, List, Optional, Any
 import logging
 from collections import defaultdict
 import hashlib
+import threading
 from app.shared.config.settings import Settings
+from app.shared.utils.trigger_matcher import TriggerEntry, TriggerMatcher
 DATA_DIR = Settings().data_dir
 if isinstance(DATA_DIR, str):
     DATA_DIR = Path(DATA_DIR)
@@ -65,6 +67,55 @@ for trig in PRIORITY_TRIGGERS:
     except Exception as e:
         logger.error(f"Failed to load triggers from {trig['file']}: {e}")
 
+# Выученные триггеры (learning_data.json) уступают всем категориям
+LEARNED_TRIGGER_NAME = "learned"
+LEARNED_TRIGGER_PRIORITY = 0
+
+_matcher_lock = threading.Lock()
+_matcher: Optional[TriggerMatcher] = None
+_matcher_signature = None
+
+
+def _trigger_signature():
+    """Дешевый отпечаток TRIGGER_MAP и выученных триггеров: O(число категорий)"""
+    learned = LEARNING_DATA.get("triggers", {})
+    return (
+        tuple((name, id(data), len(data["triggers"]), data["priority"]) for name, data in TRIGGER_MAP.items()),
+        id(learned),
+        len(learned),
+    )
+
+
+def build_trigger_matcher() -> TriggerMatcher:
+    """Компилирует приоритетные и выученные триггеры в один автомат"""
+    entries = []
+    for name, data in TRIGGER_MAP.items():
+        for trigger in data["triggers"]:
+            entries.append(TriggerEntry(trigger, data["priority"], (name, data["responses"])))
+    for trigger, responses in LEARNING_DATA.get("triggers", {}).items():
+        # Выученный триггер — это целая фраза, поэтому только по границам слов
+        entries.append(TriggerEntry(trigger.lower(), LEARNED_TRIGGER_PRIORITY, (LEARNED_TRIGGER_NAME, responses), True))
+    return TriggerMatcher(entries)
+
+
+def rebuild_trigger_matcher() -> TriggerMatcher:
+    """Собирает новый автомат и атомарно подменяет текущий"""
+    global _matcher, _matcher_signature
+    with _matcher_lock:
+        signature = _trigger_signature()
+        matcher = build_trigger_matcher()
+        _matcher, _matcher_signature = matcher, signature
+    logger.debug(f"Trigger matcher rebuilt: {len(matcher)} triggers")
+    return matcher
+
+
+def get_trigger_matcher() -> TriggerMatcher:
+    """Текущий автомат; пересобирается, если триггеры изменились"""
+    matcher = _matcher
+    if matcher is None or _matcher_signature != _trigger_signature():
+        matcher = rebuild_trigger_matcher()
+    return matcher
+
 class TriggerService:
     def __init__(self, *args, **kwargs):
         pass
@@ -89,6 +140,7 @@ def learn_response(trigger: str, response: str):
     """Learn a new response for a trigger"""
     if trigger not in LEARNING_DATA["triggers"]:
         LEARNING_DATA["triggers"][trigger] = []
+        rebuild_trigger_matcher()
     if response not in LEARNING_DATA["triggers"][trigger]:
         LEARNING_DATA["triggers"][trigger].append(response)
         save_learning_data()
@@ -104,15 +156,18 @@ def get_smart_answer(text: str, responses: List[str], last_answer: Optional[str]
     if user_id and user_id in LEARNING_DATA.get("user_preferences", {}):
         user_prefs = LEARNING_DATA["user_preferences"][user_id]
         # Add some weight to responses that match user's favorite topics
-        weighted = []
+        favorite_topics = user_prefs.get("favorite_topics", {})
+        weights = []
         for response in filtered:
+            response_lower = response.lower()
             weight = 1
-            for topic in user_prefs.get("favorite_topics", {}):
-                if topic in response.lower():
-                    weight += user_prefs["favorite_topics"][topic]
-            weighted.extend([response] * weight)
-        if weighted:
-            return random.choice(weighted)
+            for topic, count in favorite_topics.items():
+                if topic in response_lower:
+                    weight += count
+            weights.append(weight)
+        # Weighted choice without expanding [response] * weight
+        if weights:
+            return random.choices(filtered, weights=weights, k=1)[0]
     
     return random.choice(filtered)
 
@@ -123,20 +178,13 @@ def make_hash_id(trigger: str, answer: str) -> str:
 
 def check_trigger(text: str) -> Optional[Dict[str, Any]]:
     """Check if text matches any triggers and return the best match"""
-    text = text.lower()
-    best_match = None
-    highest_priority = -1
-    
-    for name, data in TRIGGER_MAP.items():
-        for trigger in data["triggers"]:
-            if trigger in text:
-                if data["priority"] > highest_priority:
-                    highest_priority = data["priority"]
-                    best_match = {
-                        "name": name,
-                        "trigger": trigger,
-                        "responses": data["responses"],
-                        "priority": data["priority"]
-                    }
-    
-    return best_match 
\ No newline at end of file
+    hit = get_trigger_matcher().search(text.lower())
+    if hit is None:
+        return None
+    name, responses = hit.entry.payload
+    return {
+        "name": name,
+        "trigger": hit.entry.pattern,
+        "responses": responses,
+        "priority": hit.entry.priority
+    }
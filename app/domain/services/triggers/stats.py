@@ -1,17 +1,27 @@
 import json
 import os
 import datetime
-import random
+import threading
+import atexit
+import logging
+from typing import Any, Dict, List, Optional, Tuple
 from app.shared.config.settings import Settings
+from app.infrastructure.cache.write_behind import WriteBehind
+from app.infrastructure.db.repositories.trigger_stats import TriggerStatsRepository
+from app.shared.utils.weighted_sampler import AliasSampler, SamplerCache
 DATA_DIR = Settings().data_dir
 if isinstance(DATA_DIR, str):
     from pathlib import Path
     DATA_DIR = Path(DATA_DIR)
 
+logger = logging.getLogger(__name__)
+
+# Устаревшее JSON-хранилище: импортируется в БД при первом обращении
 TRIGGER_STATS_FILE = DATA_DIR / 'trigger_stats.json'
 
 
 def load_stats():
+    """Читает устаревший trigger_stats.json (используется только для импорта в БД)"""
     if not TRIGGER_STATS_FILE.exists():
         return {}
     with open(TRIGGER_STATS_FILE, 'r', encoding='utf-8') as f:
@@ -20,113 +30,298 @@ def load_stats():
         except Exception:
             return {}
 
-def save_stats(stats):
-    with open(TRIGGER_STATS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(stats, f, ensure_ascii=False, indent=2)
+
+class TriggerStatsService:
+    """
+    Статистика триггеров в таблицах trigger_stats / trigger_answer_stats.
+
+    Приращения копятся в памяти и сбрасываются пакетом через
+    INSERT ... ON CONFLICT DO UPDATE в пуле потоков БД: фоновой записью,
+    когда буфер набрал max_pending приращений, и по таймеру раз в
+    flush_interval секунд (start/stop — при запуске и остановке бота).
+    Веса ответов для get_smart_answer читаются из кэша, который
+    сбрасывается для затронутых триггеров после каждой записи; таблицы
+    выбора (answer_samplers) сбрасываются при каждом изменении триггера.
+    """
+
+    def __init__(self, session=None, config=None, repository: Optional[TriggerStatsRepository] = None,
+                 flush_interval: Optional[float] = None, max_pending: Optional[int] = None):
+        settings = config if isinstance(config, Settings) else Settings()
+        if repository is None:
+            from app.infrastructure.db.session import Session
+            repository = TriggerStatsRepository(Session)
+        self.repository = repository
+        self.flush_interval = flush_interval if flush_interval is not None else settings.trigger_stats_flush_interval
+        self.max_pending = max_pending if max_pending is not None else settings.trigger_stats_max_pending
+
+        self._lock = threading.RLock()
+        self._usage_deltas: Dict[Tuple[str, int, int], List[Any]] = {}
+        self._answer_deltas: Dict[str, Dict[str, List[int]]] = {}
+        self._pending_ops = 0
+        # Приращения ответов, которые пишутся прямо сейчас (учитываются при чтении)
+        self._inflight_answers: Dict[str, Dict[str, List[int]]] = {}
+        self._answer_cache: Dict[str, Dict[str, List[int]]] = {}
+        # Таблицы выбора ответов get_smart_answer по (триггер, ответы), тег — триггер
+        self.answer_samplers = SamplerCache()
+        self._ready = False
+        self._ready_lock = threading.Lock()
+        self._writer = WriteBehind("Trigger stats", self.flush, lambda: self._pending_ops > 0,
+                                   interval=self.flush_interval)
+
+    # --- Служебное ---
+
+    def _ensure_ready(self):
+        if self._ready:
+            return
+        with self._ready_lock:
+            if self._ready:
+                return
+            self.repository.ensure_schema()
+            self._import_legacy_json()
+            self._ready = True
+
+    def _import_legacy_json(self):
+        """Однократно переносит trigger_stats.json в БД"""
+        legacy = load_stats()
+        if not legacy:
+            return
+        now = datetime.datetime.utcnow()
+        usage = {}
+        answers = {}
+        for trigger, data in legacy.items():
+            # В JSON не было разбивки пользователь×чат, поэтому чат неизвестен (0)
+            for user_id, count in data.get("users", {}).items():
+                usage[(trigger, int(user_id), 0)] = (int(count), now)
+            per_answer = answers.setdefault(trigger, {})
+            for answer, count in data.get("answers", {}).items():
+                # В JSON счетчик стартовал с 1
+                per_answer.setdefault(answer, [0, 0, 0])[0] += max(int(count) - 1, 0)
+            for answer, count in data.get("likes", {}).items():
+                per_answer.setdefault(answer, [0, 0, 0])[1] += int(count)
+            for answer, count in data.get("dislikes", {}).items():
+                per_answer.setdefault(answer, [0, 0, 0])[2] += int(count)
+        self.repository.apply_deltas(usage, answers)
+        os.replace(TRIGGER_STATS_FILE, TRIGGER_STATS_FILE.with_name(TRIGGER_STATS_FILE.name + '.migrated'))
+        logger.info(f"Imported {len(legacy)} triggers from {TRIGGER_STATS_FILE} into the database")
+
+    def _answer_delta(self, trigger: str, answer: str) -> List[int]:
+        return self._answer_deltas.setdefault(trigger, {}).setdefault(answer, [0, 0, 0])
+
+    def _after_write(self):
+        with self._lock:
+            self._pending_ops += 1
+            full = self._pending_ops >= self.max_pending
+        if full:
+            # Запись идет в пуле потоков БД, обработчик ее не ждет
+            self._writer.schedule()
+
+    # --- Запись ---
+
+    def log_usage(self, trigger: str, answer: str, user_id: int, chat_id: int):
+        with self._lock:
+            key = (trigger, int(user_id), int(chat_id))
+            delta = self._usage_deltas.setdefault(key, [0, None])
+            delta[0] += 1
+            delta[1] = datetime.datetime.utcnow()
+            self._answer_delta(trigger, answer)[0] += 1
+            self.answer_samplers.invalidate(trigger)
+        self._after_write()
+
+    def add_like(self, trigger: str, answer: str):
+        with self._lock:
+            self._answer_delta(trigger, answer)[1] += 1
+            self.answer_samplers.invalidate(trigger)
+        self._after_write()
+
+    def add_dislike(self, trigger: str, answer: str):
+        with self._lock:
+            self._answer_delta(trigger, answer)[2] += 1
+            self.answer_samplers.invalidate(trigger)
+        self._after_write()
+
+    def flush(self) -> bool:
+        """Сбрасывает буфер приращений в БД одной транзакцией; False — ошибка записи"""
+        with self._lock:
+            if not self._pending_ops:
+                return True
+            usage = {key: (count, last_used) for key, (count, last_used) in self._usage_deltas.items()}
+            answers, ops = self._answer_deltas, self._pending_ops
+            self._usage_deltas, self._answer_deltas, self._pending_ops = {}, {}, 0
+            self._inflight_answers = answers
+        # Транзакция — без блокировки: обработчики продолжают копить приращения
+        try:
+            self._ensure_ready()
+            self.repository.apply_deltas(usage, answers)
+        except Exception as e:
+            # Возвращаем приращения в буфер, попробуем при следующем сбросе
+            logger.error(f"Error flushing trigger stats: {e}")
+            with self._lock:
+                self._inflight_answers = {}
+                for key, (count, last_used) in usage.items():
+                    delta = self._usage_deltas.setdefault(key, [0, None])
+                    delta[0] += count
+                    if delta[1] is None or (last_used is not None and last_used > delta[1]):
+                        delta[1] = last_used
+                for trigger, per_answer in answers.items():
+                    for answer, values in per_answer.items():
+                        row = self._answer_delta(trigger, answer)
+                        for i in range(3):
+                            row[i] += values[i]
+                self._pending_ops += ops
+            return False
+        with self._lock:
+            for trigger in set(answers) | {key[0] for key in usage}:
+                self._answer_cache.pop(trigger, None)
+            self._inflight_answers = {}
+        return True
+
+    async def start(self):
+        """Запускает запись буфера по таймеру"""
+        await self._writer.start()
+
+    async def stop(self):
+        """Останавливает таймер и дописывает буфер"""
+        await self._writer.stop()
+
+    # --- Чтение ---
+
+    def get_answer_stats(self, trigger: str) -> Dict[str, List[int]]:
+        """Возвращает {answer: [uses, likes, dislikes]} с учетом несброшенного буфера"""
+        with self._lock:
+            cached = self._answer_cache.get(trigger)
+            if cached is None:
+                try:
+                    self._ensure_ready()
+                    cached = self.repository.get_answer_stats(trigger)
+                except Exception as e:
+                    logger.error(f"Error loading trigger stats for {trigger}: {e}")
+                    cached = {}
+                self._answer_cache[trigger] = cached
+            buffered = [d[trigger] for d in (self._inflight_answers, self._answer_deltas) if trigger in d]
+            if not buffered:
+                return cached
+            merged = {answer: list(values) for answer, values in cached.items()}
+            for pending in buffered:
+                for answer, values in pending.items():
+                    row = merged.setdefault(answer, [0, 0, 0])
+                    for i in range(3):
+                        row[i] += values[i]
+            return merged
+
+    def get_trigger_stats(self, trigger: str) -> Optional[Dict[str, Any]]:
+        """Собирает статистику триггера в прежнем формате trigger_stats.json"""
+        self.flush()
+        self._ensure_ready()
+        rows = self.repository.get_usage_rows(trigger)
+        answer_stats = self.get_answer_stats(trigger)
+        if not rows and not answer_stats:
+            return None
+        return self._build_stats(rows, answer_stats)
+
+    def get_all_trigger_stats(self) -> Dict[str, Dict[str, Any]]:
+        self.flush()
+        self._ensure_ready()
+        usage_by_trigger: Dict[str, list] = {}
+        for row in self.repository.get_usage_rows():
+            usage_by_trigger.setdefault(row.trigger_name, []).append(row)
+        answers_by_trigger: Dict[str, Dict[str, List[int]]] = {}
+        for row in self.repository.get_all_answer_rows():
+            answers_by_trigger.setdefault(row.trigger_name, {})[row.answer] = [row.uses or 0, row.likes or 0, row.dislikes or 0]
+        return {
+            trigger: self._build_stats(usage_by_trigger.get(trigger, []), answers_by_trigger.get(trigger, {}))
+            for trigger in set(usage_by_trigger) | set(answers_by_trigger)
+        }
+
+    def get_trigger_totals(self) -> Dict[str, int]:
+        """Возвращает {trigger: количество срабатываний}"""
+        self.flush()
+        self._ensure_ready()
+        return {row.trigger_name: int(row.total or 0) for row in self.repository.get_trigger_summaries()}
+
+    def suggest_new_triggers(self, min_count: int = 5, limit: int = 10) -> List[Tuple[str, int, int, List[str]]]:
+        """Триггеры с большим числом разных пользователей, но 1-2 ответами"""
+        self.flush()
+        self._ensure_ready()
+        candidates = [row for row in self.repository.get_trigger_summaries(min_count=min_count) if row.unique_users >= 3]
+        used_answers = self.repository.get_used_answers(row.trigger_name for row in candidates)
+        suggestions = []
+        for row in candidates:
+            answers = used_answers.get(row.trigger_name, [])
+            if len(answers) <= 2:
+                suggestions.append((row.trigger_name, int(row.total), row.unique_users, answers))
+        suggestions.sort(key=lambda x: (-x[1], -x[2]))
+        return suggestions[:limit]
+
+    @staticmethod
+    def _build_stats(rows, answer_stats: Dict[str, List[int]]) -> Dict[str, Any]:
+        users: Dict[str, int] = {}
+        chats: Dict[str, int] = {}
+        last_used = None
+        for row in rows:
+            users[str(row.user_id)] = users.get(str(row.user_id), 0) + row.count
+            chats[str(row.chat_id)] = chats.get(str(row.chat_id), 0) + row.count
+            if row.last_used and (last_used is None or row.last_used > last_used):
+                last_used = row.last_used
+        return {
+            "count": sum(users.values()),
+            "answers": {a: uses + 1 for a, (uses, _, _) in answer_stats.items() if uses},
+            "last_used": last_used.strftime("%Y-%m-%d %H:%M:%S") if last_used else None,
+            "users": users,
+            "chats": chats,
+            "likes": {a: likes for a, (_, likes, _) in answer_stats.items()},
+            "dislikes": {a: dislikes for a, (_, _, dislikes) in answer_stats.items()},
+        }
+
+
+# Глобальный экземпляр (его же отдает DI-контейнер)
+trigger_stats_store = TriggerStatsService()
+atexit.register(trigger_stats_store.flush)
+
 
 def log_trigger_usage(trigger, answer, user_id, chat_id):
-    stats = load_stats()
-    t = stats.setdefault(trigger, {
-        "count": 0,
-        "answers": {},
-        "last_used": None,
-        "users": {},
-        "chats": {},
-        "likes": {},
-        "dislikes": {}
-    })
-    t["count"] += 1
-    t["last_used"] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    t["answers"].setdefault(answer, 1)
-    t["answers"][answer] += 1
-    t["users"].setdefault(str(user_id), 0)
-    t["users"][str(user_id)] += 1
-    t["chats"].setdefault(str(chat_id), 0)
-    t["chats"][str(chat_id)] += 1
-    t["likes"].setdefault(answer, 0)
-    t["dislikes"].setdefault(answer, 0)
-    stats[trigger] = t
-    save_stats(stats)
+    trigger_stats_store.log_usage(trigger, answer, user_id, chat_id)
 
 def add_like(trigger, answer):
-    stats = load_stats()
-    t = stats.setdefault(trigger, {
-        "count": 0,
-        "answers": {},
-        "last_used": None,
-        "users": {},
-        "chats": {},
-        "likes": {},
-        "dislikes": {}
-    })
-    t["likes"].setdefault(answer, 0)
-    t["likes"][answer] += 1
-    stats[trigger] = t
-    save_stats(stats)
+    trigger_stats_store.add_like(trigger, answer)
 
 def add_dislike(trigger, answer):
-    stats = load_stats()
-    t = stats.setdefault(trigger, {
-        "count": 0,
-        "answers": {},
-        "last_used": None,
-        "users": {},
-        "chats": {},
-        "likes": {},
-        "dislikes": {}
-    })
-    t["dislikes"].setdefault(answer, 0)
-    t["dislikes"][answer] += 1
-    stats[trigger] = t
-    save_stats(stats)
+    trigger_stats_store.add_dislike(trigger, answer)
 
 def get_likes_dislikes(trigger, answer):
-    stats = load_stats()
-    t = stats.get(trigger, {})
-    likes = t.get("likes", {}).get(answer, 0)
-    dislikes = t.get("dislikes", {}).get(answer, 0)
+    _, likes, dislikes = trigger_stats_store.get_answer_stats(trigger).get(answer, [0, 0, 0])
     return likes, dislikes
 
-def get_trigger_stats(trigger):
-    stats = load_stats()
-    return stats.get(trigger, None)
+def get_trigger_stats(trigger=None):
+    if trigger is None:
+        return trigger_stats_store.get_trigger_totals()
+    return trigger_stats_store.get_trigger_stats(trigger)
 
 def get_all_trigger_stats():
-    return load_stats()
+    return trigger_stats_store.get_all_trigger_stats()
+
+def _build_answer_sampler(trigger, answers):
+    answer_stats = trigger_stats_store.get_answer_stats(trigger)
+    if not any(uses for uses, _, _ in answer_stats.values()):
+        # Статистики нет — равные веса
+        return AliasSampler(answers, [1.0] * len(answers))
+    weights = []
+    for a in answers:
+        uses, likes, dislikes = answer_stats.get(a, (0, 0, 0))
+        weights.append((uses + 1) + 2*likes - dislikes + 1)
+    return AliasSampler(answers, weights)
 
 def get_smart_answer(trigger, answers, last_answer=None):
-    stats = get_trigger_stats(trigger)
-    if not stats or not stats.get("answers"):
-        # Исключаем повтор, если есть альтернатива
-        filtered = [a for a in answers if a != last_answer]
-        if filtered:
-            return random.choice(filtered)
-        return random.choice(answers)
-    answer_counts = stats["answers"]
-    likes = stats.get("likes", {})
-    dislikes = stats.get("dislikes", {})
-    weights = [answer_counts.get(a, 1) + 2*likes.get(a, 0) - dislikes.get(a, 0) + 1 for a in answers]
+    # Таблица триггера пересобирается только после изменения его статистики
+    sampler = trigger_stats_store.answer_samplers.get(
+        (trigger, tuple(answers)), lambda: _build_answer_sampler(trigger, answers), tags=(trigger,)
+    )
     # Исключаем повтор, если есть альтернатива
-    filtered = [(a, w) for a, w in zip(answers, weights) if a != last_answer]
-    if filtered:
-        answers, weights = zip(*filtered)
-    # Если все веса равны, всё равно используем random.choice
-    if len(set(weights)) == 1:
-        return random.choice(answers)
-    return random.choices(answers, weights=weights, k=1)[0]
+    return sampler.sample(exclude=last_answer)
 
 def suggest_new_triggers(min_count=5, limit=10):
     # MVP: ищем фразы, которые часто встречаются как текст сообщений, но не в базе триггеров
-    # Для этого нужен отдельный сбор всех входящих сообщений (или анализировать users/chats)
     # Здесь просто возвращаем триггеры с большим количеством разных пользователей, но малым количеством ответов
-    stats = load_stats()
-    suggestions = []
-    for trig, data in stats.items():
-        # Если у триггера только 1-2 ответа, но много разных пользователей — возможно, это новый паттерн
-        if data["count"] >= min_count and len(data["answers"]) <= 2 and len(data["users"]) >= 3:
-            suggestions.append((trig, data["count"], len(data["users"]), list(data["answers"].keys())))
-    suggestions.sort(key=lambda x: (-x[1], -x[2]))
-    return suggestions[:limit]
+    return trigger_stats_store.suggest_new_triggers(min_count=min_count, limit=limit)
 
 def auto_add_suggested_triggers(min_count=5, min_users=3):
     # Загружаем предложения
@@ -149,7 +344,3 @@ def auto_add_suggested_triggers(min_count=5, min_users=3):
         with open(LEARNING_PATH, 'w', encoding='utf-8') as f:
             json.dump(learning_data, f, ensure_ascii=False, indent=2)
     return added
-
-class TriggerStatsService:
-    def __init__(self, *args, **kwargs):
-        pass 
\ No newline at end of file
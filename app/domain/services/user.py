@@ -2,16 +2,17 @@ import json
 from app.shared.config import DB_PATH
 import shutil
 from datetime import datetime
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from app.infrastructure.db.engine import get_engine, get_sessionmaker, get_async_sessionmaker
+from app.infrastructure.db.repositories.users import UserRepository
 # Импорт модели через функцию для соблюдения архитектуры
 def get_user_model():
     from app.infrastructure.db.models import User
     return User
 from app.shared.interfaces import AbstractUserService
 
-engine = create_engine(f'sqlite:///{DB_PATH}')
-Session = sessionmaker(bind=engine)
+engine = get_engine(f'sqlite:///{DB_PATH}')
+Session = get_sessionmaker(f'sqlite:///{DB_PATH}')
+user_repository = UserRepository(get_async_sessionmaker(f'sqlite:///{DB_PATH}'))
 
 
 class UserService(AbstractUserService):
@@ -19,75 +20,54 @@ class UserService(AbstractUserService):
     
     async def get_user(self, user_id):
         """Получить пользователя"""
-        with Session() as session:
-            user = session.query(get_user_model()).filter(get_user_model().id == user_id).first()
-            return user
+        return await user_repository.get(user_id)
     
     async def create_user(self, user_id, username=None):
         """Создать пользователя"""
-        with Session() as session:
-            user = get_user_model()(id=user_id, username=username)
-            session.add(user)
-            session.commit()
-            return user
+        return await user_repository.update_fields(user_id, username=username)
     
     async def update_user(self, user_id, **kwargs):
         """Обновить пользователя"""
-        with Session() as session:
-            user = session.query(get_user_model()).filter(get_user_model().id == user_id).first()
-            if not user:
-                user = get_user_model()(id=user_id)
-                session.add(user)
-            
-            for key, value in kwargs.items():
-                if hasattr(user, key):
-                    setattr(user, key, value)
-            
-            session.commit()
-            return user
+        return await user_repository.update_fields(user_id, **kwargs)
     
     async def checkin_user(self, user_id):
         """Чек-ин пользователя"""
-        with Session() as session:
-            user = session.query(get_user_model()).filter(get_user_model().id == user_id).first()
-            
-            if not user:
-                user = get_user_model()(id=user_id)
-                session.add(user)
-            
-            now = datetime.now()
-            
-            # Проверяем можно ли делать чек-ин
-            if user.last_checkin:
-                time_diff = now - user.last_checkin
-                if time_diff.days < 1:
-                    # Чек-ин уже был сегодня
-                    hours_until_next = 24 - time_diff.seconds // 3600
-                    minutes_until_next = (time_diff.seconds % 3600) // 60
-                    time_until_next = f"{hours_until_next}ч {minutes_until_next}м"
-                    
-                    return {
-                        "success": False,
-                        "time_until_next": time_until_next
-                    }
-            
-            # Делаем чек-ин
-            user.last_checkin = now
-            
-            # Определяем количество баллов
-            if not user.last_checkin or (now - user.last_checkin).days >= 1:
-                points_awarded = 50 if user.message_count == 0 else 10
-            else:
-                points_awarded = 10
-            
-            user.points += points_awarded
-            session.commit()
-            
-            return {
-                "success": True,
-                "points_awarded": points_awarded,
-                "total_points": user.points
-            }
+        return await user_repository.modify(user_id, self._apply_checkin)
+    
+    @staticmethod
+    def _apply_checkin(user):
+        now = datetime.now()
+        
+        # Проверяем можно ли делать чек-ин
+        if user.last_checkin:
+            time_diff = now - user.last_checkin
+            if time_diff.days < 1:
+                # Чек-ин уже был сегодня
+                hours_until_next = 24 - time_diff.seconds // 3600
+                minutes_until_next = (time_diff.seconds % 3600) // 60
+                time_until_next = f"{hours_until_next}ч {minutes_until_next}м"
+                
+                return {
+                    "success": False,
+                    "time_until_next": time_until_next
+                }
+        
+        # Делаем чек-ин
+        user.last_checkin = now
+        
+        # Определяем количество баллов
+        if not user.last_checkin or (now - user.last_checkin).days >= 1:
+            points_awarded = 50 if user.message_count == 0 else 10
+        else:
+            points_awarded = 10
+        
+        user.points += points_awarded
+        
+        return {
+            "success": True,
+            "points_awarded": points_awarded,
+            "total_points": user.points
+        }
 
 
 # Оставляем существующие функции для обратной совместимости
@@ -155,4 +135,29 @@ def get_referral_stats(user_id):
             'pending_referrals': len(pending_referrals),
             'active_referrals_list': active_referrals,
             'pending_referrals_list': pending_referrals
-        } 
\ No newline at end of file
+        }
+
+
+# Асинхронные версии для обработчиков и middleware
+async def get_user_async(user_id):
+    return await user_repository.get(user_id)
+
+async def update_user_info_async(user_id, username=None, first_name=None):
+    await user_repository.sync_info(user_id, username=username or None, first_name=first_name or None)
+
+async def increment_message_count_async(user_id):
+    return await user_repository.increment_message_count(user_id)
+
+async def get_referral_stats_async(user_id):
+    """Асинхронная версия get_referral_stats"""
+    user = await user_repository.get(user_id)
+    if not user:
+        return None
+    active_referrals, pending_referrals = await user_repository.get_referrals(user_id)
+    return {
+        'total_referrals': user.referrals,
+        'active_referrals': len(active_referrals),
+        'pending_referrals': len(pending_referrals),
+        'active_referrals_list': active_referrals,
+        'pending_referrals_list': pending_referrals
+    }
@@ -3,16 +3,17 @@ User Service - сервис для работы с пользователями
 """
 
 from typing import Optional
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from app.infrastructure.db.engine import get_engine, get_sessionmaker, get_async_sessionmaker
+from app.infrastructure.db.repositories.users import UserRepository
 # Импорт модели через функцию для соблюдения архитектуры
 def get_user_model():
     from app.infrastructure.db.models import User
     return User
 from app.shared.config import DB_PATH
 
-engine = create_engine(f'sqlite:///{DB_PATH}')
-Session = sessionmaker(bind=engine)
+engine = get_engine(f'sqlite:///{DB_PATH}')
+Session = get_sessionmaker(f'sqlite:///{DB_PATH}')
+user_repository = UserRepository(get_async_sessionmaker(f'sqlite:///{DB_PATH}'))
 
 
 class UserService:
@@ -21,18 +22,6 @@ class UserService:
     def __init__(self):
         pass
     
-    def update_user_info(self, user_id: int, username: Optional[str] = None, first_name: Optional[str] = None):
-        """Обновить информацию о пользователе в базе данных."""
-        with Session() as session:
-            user = session.query(get_user_model()).filter(get_user_model().id == user_id).first()
-            if not user:
-                # Создаем нового пользователя если его нет
-                user = get_user_model()(id=user_id, username=username, first_name=first_name, points=0)
-                session.add(user)
-            else:
-                # Обновляем существующего пользователя
-                if username is not None:
-                    user.username = username
-                if first_name is not None:
-                    user.first_name = first_name
-            session.commit()
\ No newline at end of file
+    async def update_user_info(self, user_id: int, username: Optional[str] = None, first_name: Optional[str] = None):
+        """Обновить информацию о пользователе в базе данных (создает пользователя, если его нет)."""
+        await user_repository.sync_info(user_id, username=username, first_name=first_name)
@@ -0,0 +1,172 @@
+"""
+Очередь допуска исходящих запросов к YandexGPT.
+
+Одновременно выполняется не больше llm_max_in_flight запросов; остальные
+ждут в очереди по классам приоритета: суперадмин > явное обращение к Сису >
+диалог в личке > случайная реплика в группе. Освободившийся слот получает
+самый приоритетный (а внутри класса — самый ранний) ожидающий.
+
+У каждого запроса есть дедлайн ожидания в очереди (по умолчанию свой для
+класса). Не дождавшийся слота запрос снимается с очереди с AdmissionRejected,
+и обработчик отвечает локальной фразой вместо ответа модели — так случайные
+реплики в группах не отнимают пропускную способность у команд и обращений
+при троттлинге со стороны провайдера.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+
+from app.shared.config.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+# Классы приоритета (меньше — важнее)
+PRIORITY_SUPERADMIN = 0
+PRIORITY_MENTION = 1
+PRIORITY_PRIVATE = 2
+PRIORITY_RANDOM = 3
+
+PRIORITY_NAMES = {
+    PRIORITY_SUPERADMIN: "superadmin",
+    PRIORITY_MENTION: "mention",
+    PRIORITY_PRIVATE: "private",
+    PRIORITY_RANDOM: "random",
+}
+
+
+class AdmissionRejected(Exception):
+    """Запрос не дождался слота до дедлайна"""
+
+
+def llm_priority(superadmin: bool, explicit: bool = False, private: bool = False) -> int:
+    """Класс приоритета запроса по тому, кто и как обратился к Сису"""
+    if superadmin:
+        return PRIORITY_SUPERADMIN
+    if explicit:
+        return PRIORITY_MENTION
+    if private:
+        return PRIORITY_PRIVATE
+    return PRIORITY_RANDOM
+
+
+class PriorityAdmission:
+    """Ограничение числа одновременных запросов с приоритетной очередью и дедлайнами"""
+
+    def __init__(self, max_in_flight: int, deadlines: Optional[Dict[int, float]] = None,
+                 clock: Callable[[], float] = time.monotonic, window: int = 500):
+        self.max_in_flight = max(1, max_in_flight)
+        self.deadlines = dict(deadlines or {})
+        self.clock = clock
+        self.in_flight = 0
+        self._queue: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._waits: Dict[int, Deque[float]] = {}
+        self._window = window
+        self._stats: Dict[int, Dict[str, int]] = {}
+
+    def _class_stats(self, priority: int) -> Dict[str, int]:
+        stats = self._stats.get(priority)
+        if stats is None:
+            stats = self._stats[priority] = {"admitted": 0, "queued": 0, "dropped": 0, "cancelled": 0}
+        return stats
+
+    def _record_wait(self, priority: int, wait: float) -> None:
+        waits = self._waits.get(priority)
+        if waits is None:
+            waits = self._waits[priority] = deque(maxlen=self._window)
+        waits.append(wait)
+
+    def _release(self) -> None:
+        """Отдает слот следующему ожидающему или возвращает его в пул"""
+        while self._queue:
+            _, _, future = heapq.heappop(self._queue)
+            if not future.done():
+                future.set_result(None)  # слот переходит к ожидающему, in_flight не меняется
+                return
+        self.in_flight -= 1
+
+    async def acquire(self, priority: int = PRIORITY_MENTION, deadline: Optional[float] = None) -> None:
+        """Ждет слот не дольше deadline секунд (по умолчанию — дедлайн класса)"""
+        stats = self._class_stats(priority)
+        if self.in_flight < self.max_in_flight and not self._queue:
+            self.in_flight += 1
+            stats["admitted"] += 1
+            self._record_wait(priority, 0.0)
+            return
+
+        if deadline is None:
+            deadline = self.deadlines.get(priority)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        heapq.heappush(self._queue, (priority, next(self._seq), future))
+        stats["queued"] += 1
+        started = self.clock()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=deadline)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                # Слот пришел одновременно с дедлайном — возвращаем его
+                self._release()
+            future.cancel()
+            stats["dropped"] += 1
+            self._record_wait(priority, self.clock() - started)
+            logger.info(f"LLM admission: dropped {PRIORITY_NAMES.get(priority, priority)} request after {deadline}s")
+            raise AdmissionRejected(f"LLM queue deadline {deadline}s exceeded")
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release()
+            future.cancel()
+            stats["cancelled"] += 1
+            raise
+        stats["admitted"] += 1
+        self._record_wait(priority, self.clock() - started)
+
+    def release(self) -> None:
+        self._release()
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_MENTION, deadline: Optional[float] = None) -> AsyncIterator[None]:
+        await self.acquire(priority, deadline)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def get_stats(self) -> Dict[str, Any]:
+        classes = {}
+        for priority in sorted(set(self._stats) | set(self._waits)):
+            stats = dict(self._class_stats(priority))
+            finished = stats["admitted"] + stats["dropped"]
+            stats["drop_rate"] = round(stats["dropped"] / finished, 3) if finished else 0.0
+            waits = sorted(self._waits.get(priority, ()))
+            stats["wait_avg"] = round(sum(waits) / len(waits), 3) if waits else 0.0
+            stats["wait_p95"] = round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else 0.0
+            classes[PRIORITY_NAMES.get(priority, str(priority))] = stats
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "queue_depth": sum(1 for _, _, future in self._queue if not future.done()),
+            "classes": classes,
+        }
+
+
+def build_llm_admission(settings: Optional[Settings] = None) -> PriorityAdmission:
+    settings = settings or Settings()
+    return PriorityAdmission(
+        settings.llm_max_in_flight,
+        deadlines={
+            PRIORITY_SUPERADMIN: settings.llm_queue_deadline_superadmin,
+            PRIORITY_MENTION: settings.llm_queue_deadline_mention,
+            PRIORITY_PRIVATE: settings.llm_queue_deadline_private,
+            PRIORITY_RANDOM: settings.llm_queue_deadline_random,
+        },
+    )
+
+
+# Глобальный экземпляр
+llm_admission = build_llm_admission()
@@ -1,17 +1,27 @@
 import os
 from app.domain.services.ai.llm_service import LLMService
-import aiohttp
 from dotenv import load_dotenv
 import logging
-from typing import List
+import time
+from typing import AsyncIterator, List, Optional, Tuple
+from app.infrastructure.ai.admission import PRIORITY_MENTION, llm_admission
+from app.infrastructure.ai.resilience import yandexgpt_guard
+from app.infrastructure.ai.streaming import completion_latency, read_completion_stream
+from app.infrastructure.cache.completions import completion_cache, completion_key
+from app.infrastructure.http.client import HttpClient, http_client as shared_http_client
+from app.shared.utils.single_flight import SingleFlight
 from app.shared.config import YANDEXGPT_FOLDER_ID
 
 # Загрузка переменных окружения
 load_dotenv()
 YANDEXGPT_API_KEY = os.getenv("YANDEXGPT_API_KEY")
-YANDEXGPT_API_URL = "https://llm.api.cloud.yandex.net/foundationModels/v1/completion"
+# Можно переопределить, например, на локальный mock-сервер (scripts/mock_yandexgpt_server.py)
+YANDEXGPT_API_URL = os.getenv("YANDEXGPT_API_URL", "https://llm.api.cloud.yandex.net/foundationModels/v1/completion")
 # FOLDER_ID = "b1g84sva7hgoe0s7tehp"  # Замените на ваш folder-id
 
+# Схлопывание одновременных одинаковых запросов к API
+completion_flights = SingleFlight("yandexgpt")
+
 # Проверка наличия API ключа
 if not YANDEXGPT_API_KEY:
     logging.error("YANDEXGPT_API_KEY не найден в .env файле!")
@@ -30,21 +40,17 @@ SISU_SYSTEM_PROMPT = (
     "Не упоминай, что ты ИИ или бот. Просто веди себя как свободная, настоящая Сису!"
 )
 
-async def generate_sisu_reply(prompt: str, recent_messages: List[str] = None, user_style: str = "neutral", system_prompt: str = None) -> str:
-    """
-    Генерация ответа через YandexGPT API.
-    """
-    if not YANDEXGPT_API_KEY or not YANDEXGPT_FOLDER_ID:
-        logging.error("Отсутствует API ключ или ID папки для YandexGPT!")
-        raise Exception("Ой, Сису не может найти свои ключи от магии. Проверь настройки!")
-
-    logging.warning("YandexGPT: generate_sisu_reply вызвана!")
-    headers = {
+def _build_headers() -> dict:
+    return {
         "Authorization": f"Api-Key {YANDEXGPT_API_KEY}",
         "x-folder-id": YANDEXGPT_FOLDER_ID,
         "Content-Type": "application/json"
     }
 
+
+def _build_messages(prompt: str, recent_messages: Optional[List[str]], user_style: str,
+                    system_prompt: Optional[str]) -> Tuple[str, List[dict]]:
+    """Системный промпт со стилем пользователя и список сообщений для API"""
     # Добавляем стиль пользователя в системный промпт
     current_system_prompt = f"{system_prompt or SISU_SYSTEM_PROMPT} Твой текущий стиль общения: {user_style}."
 
@@ -58,60 +64,173 @@ async def generate_sisu_reply(prompt: str, recent_messages: List[str] = None, us
             messages.append({"role": "user", "text": msg_text})
 
     messages.append({"role": "user", "text": prompt})
-    
-    data = {
+    return current_system_prompt, messages
+
+
+def _build_payload(messages: List[dict], stream: bool) -> dict:
+    return {
         "modelUri": f"gpt://{YANDEXGPT_FOLDER_ID}/yandexgpt/latest",
-        "completionOptions": {"stream": False, "temperature": 0.9, "maxTokens": 200},
+        "completionOptions": {"stream": stream, "temperature": 0.9, "maxTokens": 200},
         "messages": messages
     }
+
+
+async def generate_sisu_reply(prompt: str, recent_messages: List[str] = None, user_style: str = "neutral", system_prompt: str = None,
+                              http_client: Optional[HttpClient] = None, api_url: Optional[str] = None,
+                              use_cache: bool = True, priority: int = PRIORITY_MENTION,
+                              deadline: Optional[float] = None) -> str:
+    """
+    Генерация ответа через YandexGPT API.
+    Запрос идет через общий HTTP-клиент с пулом keep-alive соединений;
+    повторяющиеся запросы обслуживаются из completion_cache (use_cache=False — мимо кэша).
+    В API запрос уходит через очередь допуска llm_admission: priority — класс приоритета,
+    deadline — сколько ждать слот (по умолчанию дедлайн класса), иначе AdmissionRejected.
+    """
+    if not YANDEXGPT_API_KEY or not YANDEXGPT_FOLDER_ID:
+        logging.error("Отсутствует API ключ или ID папки для YandexGPT!")
+        raise Exception("Ой, Сису не может найти свои ключи от магии. Проверь настройки!")
+
+    logging.warning("YandexGPT: generate_sisu_reply вызвана!")
+    headers = _build_headers()
+    current_system_prompt, messages = _build_messages(prompt, recent_messages, user_style, system_prompt)
+    
+    cache_key = completion_key(current_system_prompt, user_style, [m["text"] for m in messages[1:-1]], prompt)
+    if use_cache:
+        cached = completion_cache.get(cache_key)
+        if cached is not None:
+            logging.info("YandexGPT: ответ из кэша")
+            return cached
     
-    logging.info(f"Отправка запроса в YandexGPT: {data}")
+    data = _build_payload(messages, stream=False)
+    client = http_client or shared_http_client
+    url = api_url or YANDEXGPT_API_URL
+
+    async def request_completion() -> str:
+        logging.info(f"Отправка запроса в YandexGPT: {data}")
     
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(YANDEXGPT_API_URL, headers=headers, json=data) as resp:
+        try:
+            async with client.post(url, headers=headers, json=data) as resp:
                 logging.info(f"YandexGPT API HTTP статус: {resp.status}")
-                
+            
                 if resp.status != 200:
                     error_text = await resp.text()
                     logging.error(f"Ошибка YandexGPT API {resp.status}: {error_text}")
                     raise Exception("Ой, у Сису технические проблемы!")
-                
+            
                 result = await resp.json()
                 logging.info(f"Ответ YandexGPT API: {result}")
-                
+            
                 if "error" in result:
                     logging.error(f"Ошибка YandexGPT API: {result['error']}")
                     raise Exception("Ой, Сису запуталась в магии. Проверь, всё ли в порядке с ключом!")
-                
+            
                 if not result or "result" not in result:
                     logging.error(f"Неожиданный ответ YandexGPT API: {result}")
                     raise Exception("Сису задумалась... Попробуй ещё раз!")
-                
+            
                 if not result["result"].get("alternatives"):
                     logging.error("Нет 'alternatives' в ответе")
                     raise Exception("Сису ничего не придумала...")
-                
+            
                 text = result["result"]["alternatives"][0]["message"].get("text")
                 if not text or not isinstance(text, str):
                     logging.error(f"Пустой или некорректный текст в ответе YandexGPT API: {result}")
                     raise Exception("Сису задумалась... Попробуй ещё раз!")
-                
+            
+                if use_cache:
+                    completion_cache.put(cache_key, text)
                 return text
-                
-    except Exception as e:
-        logging.error(f"Исключение YandexGPT API: {str(e)}")
-        raise
+            
+        except Exception as e:
+            logging.error(f"Исключение YandexGPT API: {str(e)}")
+            raise
+
+    async def admitted_completion() -> str:
+        # Разомкнутая цепь — сразу в fallback, не занимая место в очереди
+        yandexgpt_guard.raise_if_open()
+        # Не дождались слота — AdmissionRejected, обработчик ответит локальной фразой
+        async with llm_admission.slot(priority, deadline):
+            # Бюджет времени, второй запрос после p95 и предохранитель
+            return await yandexgpt_guard.call(request_completion)
+
+    # Одинаковые одновременные запросы (спам одной фразой в чате) ждут один ответ API.
+    # Класс приоритета и дедлайн — часть ключа: обращение не ждет в очереди с приоритетом
+    # и дедлайном случайной реплики, к запросу которой присоединилось бы
+    return await completion_flights.do((url, cache_key, priority, deadline), admitted_completion)
+
+
+async def stream_sisu_reply(prompt: str, recent_messages: List[str] = None, user_style: str = "neutral", system_prompt: str = None,
+                            http_client: Optional[HttpClient] = None, api_url: Optional[str] = None,
+                            use_cache: bool = True, priority: int = PRIORITY_MENTION,
+                            deadline: Optional[float] = None) -> AsyncIterator[str]:
+    """
+    Потоковая генерация ответа через YandexGPT API ("stream": true).
+    Отдает снимки накопленного текста по мере генерации; ответ из кэша отдается одним снимком.
+    Слот llm_admission занят, пока читается поток (priority/deadline — как в generate_sisu_reply).
+    """
+    if not YANDEXGPT_API_KEY or not YANDEXGPT_FOLDER_ID:
+        logging.error("Отсутствует API ключ или ID папки для YandexGPT!")
+        raise Exception("Ой, Сису не может найти свои ключи от магии. Проверь настройки!")
+
+    headers = _build_headers()
+    current_system_prompt, messages = _build_messages(prompt, recent_messages, user_style, system_prompt)
+
+    cache_key = completion_key(current_system_prompt, user_style, [m["text"] for m in messages[1:-1]], prompt)
+    if use_cache:
+        cached = completion_cache.get(cache_key)
+        if cached is not None:
+            logging.info("YandexGPT: ответ из кэша")
+            yield cached
+            return
+
+    data = _build_payload(messages, stream=True)
+    logging.info(f"Отправка потокового запроса в YandexGPT: {data}")
+
+    client = http_client or shared_http_client
+
+    async def open_stream() -> AsyncIterator[str]:
+        started = time.monotonic()
+        async with client.post(api_url or YANDEXGPT_API_URL, headers=headers, json=data) as resp:
+            logging.info(f"YandexGPT API HTTP статус: {resp.status}")
+
+            if resp.status != 200:
+                error_text = await resp.text()
+                logging.error(f"Ошибка YandexGPT API {resp.status}: {error_text}")
+                raise Exception("Ой, у Сису технические проблемы!")
+
+            async for chunk in read_completion_stream(resp, started):
+                yield chunk
+
+    text = ""
+    yandexgpt_guard.raise_if_open()
+    async with llm_admission.slot(priority, deadline):
+        try:
+            # Бюджет времени — до первого фрагмента; предохранитель общий с generate_sisu_reply
+            async for text in yandexgpt_guard.stream(open_stream):
+                yield text
+        except Exception as e:
+            completion_latency.record_failure()
+            logging.error(f"Исключение YandexGPT API (stream): {str(e)}")
+            raise
+
+    if not text.strip():
+        logging.error("Пустой потоковый ответ YandexGPT API")
+        raise Exception("Сису задумалась... Попробуй ещё раз!")
+    if use_cache:
+        completion_cache.put(cache_key, text)
+
 
 
 class YandexGPTService(LLMService):
     """Сервис для работы с YandexGPT API"""
     
-    def __init__(self):
+    def __init__(self, http_client: Optional[HttpClient] = None, base_url: Optional[str] = None):
         self.api_key = YANDEXGPT_API_KEY
         self.folder_id = YANDEXGPT_FOLDER_ID
-        self.api_url = YANDEXGPT_API_URL
+        self.api_url = base_url or YANDEXGPT_API_URL
+        self.http_client = http_client or shared_http_client
     
     async def generate_reply(self, prompt: str, recent_messages: List[str] = None, user_style: str = "neutral", system_prompt: str = None) -> str:
         """Генерация ответа через YandexGPT API"""
-        return await generate_sisu_reply(prompt, recent_messages, user_style, system_prompt)
\ No newline at end of file
+        return await generate_sisu_reply(prompt, recent_messages, user_style, system_prompt,
+                                         http_client=self.http_client, api_url=self.api_url)
\ No newline at end of file
@@ -1,9 +1,17 @@
 import os
+import asyncio
 from app.domain.services.ai.tts_service import TTSService
 import aiohttp
 import logging
+from typing import List, Optional
 from dotenv import load_dotenv
 from app.shared.config.bot_config import YANDEX_SPEECHKIT_FOLDER_ID
+from app.infrastructure.ai.resilience import speechkit_guard
+from app.infrastructure.cache.tts import tts_audio_cache, tts_cache_key
+from app.infrastructure.http.client import HttpClient, http_client as shared_http_client
+from app.shared.config.settings import Settings
+from app.shared.utils.ogg_opus import split_for_tts, stitch_opus
+from app.shared.utils.single_flight import SingleFlight
 
 # Загружаем переменные окружения
 load_dotenv()
@@ -19,9 +27,25 @@ if not API_KEY or not YANDEX_SPEECHKIT_FOLDER_ID:
 
 YANDEX_SPEECHKIT_TTS_URL = "https://tts.api.cloud.yandex.net/speech/v1/tts:synthesize"
 
-async def synthesize_sisu_voice(text: str, *, voice: str = "marina", emotion: str = "good", speed: float = 1.0, pitch: float = None) -> bytes:
+# Схлопывание одновременных одинаковых запросов синтеза (например, /send_motivation all)
+synthesis_flights = SingleFlight("speechkit")
+
+# Длинные тексты (стихи, песни) синтезируются параллельно по предложениям и склеиваются
+_settings = Settings()
+TTS_CHUNK_CHARS = _settings.tts_chunk_chars
+TTS_CHUNK_CONCURRENCY = _settings.tts_chunk_concurrency
+
+async def synthesize_sisu_voice(text: str, *, voice: str = "marina", emotion: str = "good", speed: float = 1.0, pitch: float = None,
+                                http_client: Optional[HttpClient] = None, use_cache: bool = True,
+                                chunked: Optional[bool] = None) -> bytes:
     """
     Генерирует голосовое сообщение через Yandex SpeechKit TTS (возвращает ogg-opus для Telegram voice).
+    Запрос идет через общий HTTP-клиент с пулом keep-alive соединений и speechkit_guard;
+    при разомкнутой цепи или превышении бюджета — ProviderUnavailable.
+    Уже синтезированное аудио отдается из дискового tts_audio_cache без запроса к API
+    (use_cache=False — мимо кэша).
+    Текст длиннее TTS_CHUNK_CHARS синтезируется по частям (chunked=False — одним запросом):
+    каждая часть кэшируется отдельно, общие начала фраз переиспользуются.
     """
     # Validate input
     if not text or not isinstance(text, str):
@@ -43,6 +67,19 @@ async def synthesize_sisu_voice(text: str, *, voice: str = "marina", emotion: st
     if pitch is not None and (not isinstance(pitch, (int, float)) or pitch < -20 or pitch > 20):
         raise ValueError("Pitch must be between -20 and 20")
 
+    if chunked is not False:
+        chunks = split_for_tts(text, TTS_CHUNK_CHARS)
+        if len(chunks) > 1:
+            return await _synthesize_chunked(text, chunks, voice=voice, emotion=emotion, speed=speed, pitch=pitch,
+                                             http_client=http_client, use_cache=use_cache)
+
+    cache_key = tts_cache_key(text, voice, emotion, speed, pitch)
+    if use_cache:
+        cached = await tts_audio_cache.aget(cache_key)
+        if cached is not None:
+            logging.info("[SpeechKit] Голос из кэша")
+            return cached
+
     headers = {
         "Authorization": f"Api-Key {API_KEY}",
     }
@@ -60,23 +97,57 @@ async def synthesize_sisu_voice(text: str, *, voice: str = "marina", emotion: st
     if pitch is not None:
         data["pitch"] = str(pitch)
     
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(YANDEX_SPEECHKIT_TTS_URL, headers=headers, data=data) as resp:
+    client = http_client or shared_http_client
+    
+    async def request_synthesis() -> bytes:
+        try:
+            async with client.post(YANDEX_SPEECHKIT_TTS_URL, headers=headers, data=data) as resp:
                 if resp.status != 200:
                     error_text = await resp.text()
                     logging.error(f"SpeechKit TTS error {resp.status}: {error_text}")
                     raise Exception(f"SpeechKit TTS error: {error_text}")
-                return await resp.read()
-    except aiohttp.ClientError as e:
-        logging.error(f"Network error during TTS synthesis: {e}")
-        raise Exception("Network error during voice synthesis")
-    except Exception as e:
-        logging.error(f"Unexpected error during TTS synthesis: {e}")
-        raise 
+                audio = await resp.read()
+            if use_cache:
+                await tts_audio_cache.aput(cache_key, audio)
+            return audio
+        except aiohttp.ClientError as e:
+            logging.error(f"Network error during TTS synthesis: {e}")
+            raise Exception("Network error during voice synthesis")
+        except Exception as e:
+            logging.error(f"Unexpected error during TTS synthesis: {e}")
+            raise
+    
+    async def guarded_synthesis() -> bytes:
+        # Бюджет времени, второй запрос после p95 и предохранитель: при сбое SpeechKit
+        # обработчик сразу отправляет запасной голос (send_tts_fallback_voice)
+        return await speechkit_guard.call(request_synthesis)
+
+    # Одинаковый текст с одинаковым голосом синтезируется один раз на всех одновременных вызывающих
+    return await synthesis_flights.do(cache_key, guarded_synthesis)
+
+async def _synthesize_chunked(text: str, chunks: List[str], **params) -> bytes:
+    """Синтезирует части параллельно (не больше TTS_CHUNK_CONCURRENCY сразу) и склеивает ogg-opus"""
+    semaphore = asyncio.Semaphore(TTS_CHUNK_CONCURRENCY)
+
+    async def synthesize_part(chunk: str) -> bytes:
+        async with semaphore:
+            return await synthesize_sisu_voice(chunk, chunked=False, **params)
+
+    logging.info(f"[SpeechKit] Синтез по частям: {len(chunks)} частей, {len(text)} символов")
+    parts = await asyncio.gather(*(synthesize_part(chunk) for chunk in chunks))
+    try:
+        # Разбор страниц и CRC на чистом Python — вне event loop
+        return await asyncio.to_thread(stitch_opus, parts)
+    except ValueError as e:
+        logging.warning(f"[SpeechKit] Не удалось склеить части ({e}), синтезирую текст целиком")
+        return await synthesize_sisu_voice(text, chunked=False, **params)
+
 class YandexSpeechKitTTS(TTSService):
     """Реализация TTSService для Yandex SpeechKit"""
     
+    def __init__(self, http_client: Optional[HttpClient] = None):
+        self.http_client = http_client or shared_http_client
+    
     async def generate_speech(self, text: str, voice: str = "alena") -> bytes:
         """Генерирует речь из текста"""
-        return await synthesize_sisu_voice(text, voice=voice)
+        return await synthesize_sisu_voice(text, voice=voice, http_client=self.http_client)
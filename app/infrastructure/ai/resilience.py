@@ -0,0 +1,294 @@
+"""
+Устойчивость вызовов YandexGPT и SpeechKit: бюджет времени, хеджирование и
+предохранитель (circuit breaker).
+
+- Бюджет: вызов, не уложившийся в отведенное время, прерывается с
+  BudgetExceeded, и обработчик сразу отвечает локальной фразой/голосом,
+  не дожидаясь таймаута aiohttp.
+- Хеджирование: если ответа нет дольше p95 последних успешных вызовов (или
+  первая попытка быстро упала), отправляется второй такой же запрос; берется
+  первый успешный ответ, вторая попытка отменяется.
+- Предохранитель: после failure_threshold неудач подряд цепь размыкается, и
+  вызовы до recovery_timeout сразу получают CircuitOpenError. Затем
+  пропускается один пробный вызов (half-open): успех замыкает цепь, неудача
+  снова размыкает.
+
+Переходы состояний пишутся в лог, состояние видно в /status (/bot_status).
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional, Set, TypeVar
+
+from app.shared.config.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class ProviderUnavailable(Exception):
+    """Провайдер не ответил вовремя или отключен предохранителем"""
+
+
+class CircuitOpenError(ProviderUnavailable):
+    """Цепь разомкнута — запрос к провайдеру не отправляется"""
+
+
+class BudgetExceeded(ProviderUnavailable):
+    """Вызов не уложился в бюджет времени"""
+
+
+class CircuitBreaker:
+    """Предохранитель: closed -> open после серии неудач -> half_open -> closed"""
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_timeout = recovery_timeout
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._stats = {"opened": 0, "rejected": 0}
+
+    def _transition(self, state: str) -> None:
+        if state == self.state:
+            return
+        log = logger.info if state == CLOSED else logger.warning
+        log(f"Circuit {self.name}: {self.state} -> {state} (failures={self.failures})")
+        self.state = state
+        if state == OPEN:
+            self.opened_at = self.clock()
+            self._stats["opened"] += 1
+
+    def rejects(self) -> bool:
+        """Будет ли вызов отклонен прямо сейчас (без изменения состояния)"""
+        if self.state == OPEN:
+            return self.clock() - self.opened_at < self.recovery_timeout
+        return self.state == HALF_OPEN and self._probe_in_flight
+
+    def acquire(self) -> None:
+        """Разрешение на вызов; CircuitOpenError, если цепь разомкнута или проба уже идет"""
+        if self.state == OPEN and self.clock() - self.opened_at >= self.recovery_timeout:
+            self._transition(HALF_OPEN)
+        if self.state == OPEN or (self.state == HALF_OPEN and self._probe_in_flight):
+            self._stats["rejected"] += 1
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        if self.state == HALF_OPEN:
+            self._probe_in_flight = True
+
+    def record_success(self) -> None:
+        self._probe_in_flight = False
+        self.failures = 0
+        self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        self._probe_in_flight = False
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state == OPEN:
+                self.opened_at = self.clock()
+            self._transition(OPEN)
+
+    def release(self) -> None:
+        """Вызов отменен вызывающим — результат пробы неизвестен, пробуем снова"""
+        self._probe_in_flight = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["state"] = self.state
+        stats["failures"] = self.failures
+        if self.state == OPEN:
+            stats["retry_in"] = round(max(0.0, self.recovery_timeout - (self.clock() - self.opened_at)), 1)
+        return stats
+
+
+class ResilientCall:
+    """Вызов провайдера с бюджетом времени, хеджированием после p95 и предохранителем"""
+
+    def __init__(self, name: str, budget: float, breaker: Optional[CircuitBreaker] = None,
+                 hedge: bool = True, hedge_min_samples: int = 20, hedge_min_delay: float = 0.5,
+                 window: int = 200):
+        self.name = name
+        self.budget = budget
+        self.breaker = breaker or CircuitBreaker(name)
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay = hedge_min_delay
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._stats = {
+            "calls": 0,
+            "successes": 0,
+            "failures": 0,
+            "timeouts": 0,
+            "hedged": 0,
+            "hedge_wins": 0,
+        }
+
+    def _percentile(self, q: float) -> Optional[float]:
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+    def hedge_delay(self) -> Optional[float]:
+        """Через сколько секунд без ответа отправлять второй запрос (None — не хеджировать)"""
+        if not self.hedge or len(self._latencies) < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_delay, self._percentile(0.95))
+
+    def raise_if_open(self) -> None:
+        """Быстрая проверка до постановки в очередь: разомкнутая цепь сразу уходит в fallback"""
+        if self.breaker.rejects():
+            self.breaker.acquire()
+
+    def _success(self, latency: float) -> None:
+        self._latencies.append(latency)
+        self._stats["successes"] += 1
+        self.breaker.record_success()
+
+    def _failure(self) -> None:
+        self._stats["failures"] += 1
+        self.breaker.record_failure()
+
+    async def call(self, fn: Callable[[], Awaitable[T]], budget: Optional[float] = None) -> T:
+        """Результат fn() не позже чем через budget секунд; не больше двух попыток"""
+        self._stats["calls"] += 1
+        self.breaker.acquire()
+        budget = budget or self.budget
+        # Пробный вызов в half-open не дублируем
+        hedge_delay = self.hedge_delay() if self.breaker.state == CLOSED else None
+        can_hedge = self.hedge and self.breaker.state == CLOSED
+
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        deadline = started + budget
+        first = loop.create_task(fn())
+        pending: Set[asyncio.Task] = {first}
+        last_error: Optional[BaseException] = None
+        try:
+            while pending:
+                now = time.monotonic()
+                wait_until = deadline
+                if can_hedge and hedge_delay is not None:
+                    wait_until = min(deadline, started + hedge_delay)
+                done, _ = await asyncio.wait(pending, timeout=max(0.0, wait_until - now),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    pending.discard(task)
+                    if task.cancelled():
+                        last_error = ProviderUnavailable(f"{self.name} attempt was cancelled")
+                    elif task.exception() is not None:
+                        last_error = task.exception()
+                    else:
+                        if task is not first:
+                            self._stats["hedge_wins"] += 1
+                        self._success(time.monotonic() - started)
+                        return task.result()
+
+                if time.monotonic() >= deadline:
+                    break
+                # Вторая попытка: ответа нет дольше p95 или первая быстро упала
+                if can_hedge and (hedge_delay is not None or not pending):
+                    can_hedge = False
+                    self._stats["hedged"] += 1
+                    pending.add(loop.create_task(fn()))
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        finally:
+            for task in pending:
+                task.cancel()
+                task.add_done_callback(_consume_result)
+
+        self._failure()
+        if last_error is not None and not pending:
+            raise last_error
+        self._stats["timeouts"] += 1
+        logger.warning(f"{self.name}: budget {budget}s exceeded")
+        raise BudgetExceeded(f"{self.name} did not answer within {budget}s")
+
+    async def stream(self, open_stream: Callable[[], AsyncIterator[T]],
+                     budget: Optional[float] = None) -> AsyncIterator[T]:
+        """
+        Потоковый вызов: бюджет ограничивает время до первого фрагмента, дальше
+        поток читается без ограничения. Потоковые запросы не хеджируются.
+        """
+        self._stats["calls"] += 1
+        self.breaker.acquire()
+        budget = budget or self.budget
+        started = time.monotonic()
+        chunks = open_stream()
+        try:
+            try:
+                first = await asyncio.wait_for(chunks.__anext__(), timeout=budget)
+            except StopAsyncIteration:
+                self._success(time.monotonic() - started)
+                return
+            except asyncio.TimeoutError:
+                self._stats["timeouts"] += 1
+                self._failure()
+                logger.warning(f"{self.name}: stream budget {budget}s exceeded")
+                raise BudgetExceeded(f"{self.name} did not start streaming within {budget}s")
+            self._latencies.append(time.monotonic() - started)
+            yield first
+            async for chunk in chunks:
+                yield chunk
+        except (asyncio.CancelledError, GeneratorExit):
+            self.breaker.release()
+            raise
+        except BudgetExceeded:
+            raise
+        except Exception:
+            self._failure()
+            raise
+        finally:
+            await chunks.aclose()
+        self._stats["successes"] += 1
+        self.breaker.record_success()
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["budget"] = self.budget
+        p50, p95 = self._percentile(0.5), self._percentile(0.95)
+        stats["latency_p50"] = round(p50, 3) if p50 is not None else None
+        stats["latency_p95"] = round(p95, 3) if p95 is not None else None
+        stats["breaker"] = self.breaker.get_stats()
+        return stats
+
+
+def _consume_result(task: asyncio.Task) -> None:
+    """Забирает исключение отмененной попытки, чтобы asyncio не ругался в лог"""
+    if not task.cancelled():
+        task.exception()
+
+
+def build_resilient_call(name: str, budget: float, settings: Optional[Settings] = None) -> ResilientCall:
+    settings = settings or Settings()
+    return ResilientCall(
+        name,
+        budget,
+        breaker=CircuitBreaker(
+            name,
+            failure_threshold=settings.ai_breaker_failure_threshold,
+            recovery_timeout=settings.ai_breaker_recovery_timeout,
+        ),
+        hedge=settings.ai_hedge_enabled,
+        hedge_min_samples=settings.ai_hedge_min_samples,
+        hedge_min_delay=settings.ai_hedge_min_delay,
+    )
+
+
+_settings = Settings()
+
+# Глобальные экземпляры
+yandexgpt_guard = build_resilient_call("yandexgpt", _settings.ai_llm_budget, _settings)
+speechkit_guard = build_resilient_call("speechkit", _settings.ai_tts_budget, _settings)
@@ -0,0 +1,204 @@
+"""
+Потоковые ответы YandexGPT и постепенная отправка их в Telegram.
+
+С "stream": true API completion присылает по JSON-объекту на строку, и в
+каждом — весь накопленный текст альтернативы (а не только приращение).
+read_completion_stream превращает такой ответ в поток снимков текста.
+
+ProgressiveReply отправляет сообщение, как только в тексте появилась
+граница предложения, и дальше редактирует его по мере поступления текста,
+не чаще одного раза в llm_stream_edit_interval секунд (лимиты Telegram на
+редактирование). Последняя правка с полным текстом делается всегда.
+
+completion_latency считает отдельно время до первого текста (TTFB) и
+полное время ответа.
+"""
+import asyncio
+import json
+import logging
+import re
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Optional
+
+from app.shared.config.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+settings = Settings()
+
+# Конец предложения: знак препинания с пробелом или концом текста, либо перевод строки
+SENTENCE_BOUNDARY = re.compile(r"[.!?…](?:\s|$)|\n")
+
+
+def parse_stream_line(line: bytes) -> Optional[str]:
+    """Текст альтернативы из одной строки потока или None (пустая/служебная строка)"""
+    line = line.strip()
+    if not line:
+        return None
+    if line.startswith(b"data:"):
+        line = line[5:].strip()
+    try:
+        chunk = json.loads(line)
+    except ValueError:
+        logger.warning(f"Skipping malformed stream line: {line[:200]!r}")
+        return None
+    if "error" in chunk:
+        raise Exception(f"YandexGPT stream error: {chunk['error']}")
+    alternatives = (chunk.get("result") or {}).get("alternatives") or []
+    if not alternatives:
+        return None
+    return (alternatives[0].get("message") or {}).get("text")
+
+
+def merge_stream_text(current: str, chunk: str) -> str:
+    """Накопленный текст: YandexGPT присылает весь текст целиком, другие провайдеры — приращения"""
+    if chunk.startswith(current):
+        return chunk
+    return current + chunk
+
+
+class LatencyTracker:
+    """Скользящее окно TTFB и полного времени ответа"""
+
+    def __init__(self, window: int = 500):
+        self._ttfb: Deque[float] = deque(maxlen=window)
+        self._total: Deque[float] = deque(maxlen=window)
+        self.count = 0
+        self.failures = 0
+
+    def record(self, ttfb: Optional[float], total: float) -> None:
+        self.count += 1
+        if ttfb is not None:
+            self._ttfb.append(ttfb)
+        self._total.append(total)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+
+    @staticmethod
+    def _summary(values: Deque[float]) -> Dict[str, float]:
+        if not values:
+            return {"avg": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+        ordered = sorted(values)
+        return {
+            "avg": round(sum(ordered) / len(ordered), 3),
+            "p50": round(ordered[len(ordered) // 2], 3),
+            "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+            "max": round(ordered[-1], 3),
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "failures": self.failures,
+            "ttfb": self._summary(self._ttfb),
+            "total": self._summary(self._total),
+        }
+
+
+# Глобальный экземпляр
+completion_latency = LatencyTracker()
+
+
+async def read_completion_stream(response, started: float, tracker: Optional[LatencyTracker] = None,
+                                 clock: Callable[[], float] = time.monotonic) -> AsyncIterator[str]:
+    """Снимки накопленного текста из потокового ответа API (aiohttp.ClientResponse)"""
+    tracker = tracker or completion_latency
+    text = ""
+    ttfb = None
+    buffer = b""
+    async for data in response.content.iter_any():
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            chunk = parse_stream_line(line)
+            if not chunk:
+                continue
+            merged = merge_stream_text(text, chunk)
+            if merged == text:
+                continue
+            if ttfb is None:
+                ttfb = clock() - started
+            text = merged
+            yield text
+    chunk = parse_stream_line(buffer)
+    if chunk:
+        merged = merge_stream_text(text, chunk)
+        if merged != text:
+            if ttfb is None:
+                ttfb = clock() - started
+            text = merged
+            yield text
+    tracker.record(ttfb, clock() - started)
+
+
+class ProgressiveReply:
+    """Сообщение Telegram, которое дописывается по мере генерации ответа"""
+
+    def __init__(self, msg, edit_interval: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.msg = msg
+        self.edit_interval = settings.llm_stream_edit_interval if edit_interval is None else edit_interval
+        self.clock = clock
+        self.sent = None
+        self.shown = ""
+        self.edits = 0
+        self._last_edit = 0.0
+
+    async def update(self, text: str) -> None:
+        text = text.strip()
+        if not text or text == self.shown:
+            return
+        if self.sent is None:
+            if SENTENCE_BOUNDARY.search(text):
+                await self._send(text)
+            return
+        if self.clock() - self._last_edit >= self.edit_interval:
+            await self._edit(text)
+
+    async def finish(self, text: str) -> None:
+        """Финальный текст: отправка, если еще ничего не ушло, иначе последняя правка"""
+        text = text.strip()
+        if not text:
+            return
+        if self.sent is None:
+            await self._send(text)
+            return
+        if text != self.shown:
+            wait = self.edit_interval - (self.clock() - self._last_edit)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await self._edit(text)
+
+    async def _send(self, text: str) -> None:
+        self.sent = await self.msg.answer(text)
+        self.shown = text
+        self._last_edit = self.clock()
+
+    async def _edit(self, text: str) -> None:
+        try:
+            await self.sent.edit_text(text)
+        except Exception as e:
+            # "message is not modified", RetryAfter и т.п. — пропускаем правку, финальная догонит
+            logger.warning(f"Progressive reply edit skipped: {e}")
+        else:
+            self.shown = text
+            self.edits += 1
+        self._last_edit = self.clock()
+
+
+async def stream_reply(msg, chunks: AsyncIterator[str], edit_interval: Optional[float] = None) -> str:
+    """Отправляет потоковый ответ в чат с постепенными правками, возвращает итоговый текст"""
+    reply = ProgressiveReply(msg, edit_interval)
+    text = ""
+    try:
+        async for text in chunks:
+            await reply.update(text)
+    except Exception as e:
+        if reply.sent is None:
+            raise
+        # Часть ответа уже в чате — оставляем то, что успели получить
+        logger.error(f"Completion stream broke after partial reply: {e}")
+    await reply.finish(text)
+    return text
@@ -2,10 +2,9 @@ from aiogram.types import Message, BufferedInputFile
 from pathlib import Path
 import json
 import random
-from typing import Dict
 import logging
-# Импорт перенесен в функцию для избежания циклического импорта
 from app.shared.config.bot_config import is_superadmin, FALLBACK_VOICES
+from app.infrastructure.cache.quota import DEFAULT_TIER, quota_ledger
 
 logger = logging.getLogger(__name__)
 
@@ -22,31 +21,30 @@ try:
 except Exception:
     MOTIVATION_PHRASES = []
 
-# TTS usage tracking
-tts_usage: Dict[int, int] = {}  # user_id -> usage_count
+# Учет TTS: дневные счетчики в журнале квот (таблица quota_usage)
+TTS_QUOTA = "tts"
 
 def get_tts_limit(user):
-    if getattr(user, 'supporter_tier', None) == 'gold':
-        return 100  # Gold: 100 сообщений/день
-    elif getattr(user, 'supporter_tier', None) == 'silver':
-        return 10   # Silver: 10 сообщений/день  
-    elif getattr(user, 'supporter_tier', None) == 'bronze':
-        return 5    # Bronze: 5 сообщений/день
-    else:
-        return 3    # Обычные пользователи: 3 сообщения/день
+    """Дневной лимит TTS по уровню саппортера пользователя"""
+    tier = getattr(user, 'supporter_tier', None) or DEFAULT_TIER
+    return quota_ledger.get_limits(TTS_QUOTA, tier)["day"]
 
 def can_use_tts(user_id: int) -> bool:
-    from app.domain.services.user import get_user
-    user = get_user(user_id)
-    tts_limit = get_tts_limit(user)
     if is_superadmin(user_id):
         return True
-    return tts_usage.get(user_id, 0) < tts_limit
+    allowed, _ = quota_ledger.check(user_id, TTS_QUOTA)
+    return allowed
+
+async def can_use_tts_async(user_id: int) -> bool:
+    if is_superadmin(user_id):
+        return True
+    allowed, _ = await quota_ledger.check_async(user_id, TTS_QUOTA)
+    return allowed
 
 def register_tts_usage(user_id: int):
     if is_superadmin(user_id):
         return
-    tts_usage[user_id] = tts_usage.get(user_id, 0) + 1
+    quota_ledger.record(user_id, TTS_QUOTA)
 
 async def send_tts_fallback_voice(msg: Message):
     """Send a fallback voice message when TTS fails"""
@@ -85,7 +83,7 @@ async def handle_tts_request(msg: Message, text: str):
         await msg.answer("Извини, текст для озвучки какой-то не вайбовый 😏")
         return
 
-    if not can_use_tts(msg.from_user.id):
+    if not await can_use_tts_async(msg.from_user.id):
         await msg.answer("Ой, кажется, ты уже наговорился на сегодня! Завтра лимит обновится, а если не терпится — поддержи проект и получи суперсилу голосовых! Ну а пока — пиши, не ленись! 😏")
         return
 
@@ -123,6 +121,9 @@ class TTSService:
     def can_use_tts(self, user_id: int) -> bool:
         return can_use_tts(user_id)
 
+    async def can_use_tts_async(self, user_id: int) -> bool:
+        return await can_use_tts_async(user_id)
+
     def register_tts_usage(self, user_id: int):
         return register_tts_usage(user_id)
 
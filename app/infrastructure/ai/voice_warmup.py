@@ -0,0 +1,157 @@
+"""
+Фоновый предсинтез голосовых пулов в дисковый кэш TTS.
+
+При старте бота (и после того как суперадмин добавил мотивацию или
+голосовую отмазку) фразы из пулов мотиваций (motivation_tts_phrases.json,
+motivation_tts.json), голосовых отмазок (voice_excuses.json) и запасных
+фраз синтезируются заранее с теми же параметрами голоса, с которыми их
+потом озвучивают обработчики. Рассылка /send_motivation all после этого —
+чтение из tts_audio_cache и отправка по file_id, без запросов к SpeechKit.
+
+Одновременно синтезируется не больше concurrency фраз; уже лежащие в кэше
+пропускаются. Фразы длиннее tts_chunk_chars SpeechKit-провайдер кэширует
+по частям (split_for_tts), поэтому такая фраза считается готовой, когда в
+кэше есть все ее части. Если SpeechKit недоступен (разомкнут предохранитель или
+превышен бюджет), прогрев останавливается до следующего запуска.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+from app.infrastructure.ai.resilience import ProviderUnavailable
+from app.infrastructure.cache.tts import TtsAudioCache, tts_audio_cache, tts_cache_key
+from app.shared.config.settings import Settings
+from app.shared.utils.ogg_opus import split_for_tts
+
+logger = logging.getLogger(__name__)
+
+# Параметры, с которыми озвучиваются мотивации и отмазки (send_voice_motivation, send_voice_excuse)
+POOL_VOICE = {"voice": "marina", "emotion": "good", "speed": 1.0}
+
+
+def default_voice_pools() -> List[str]:
+    """Все фразы голосовых пулов без повторов"""
+    # Импорты внутри функции: модули пулов тянут провайдер SpeechKit
+    from app.domain.services.excuse import load_voice_excuses
+    from app.domain.services.motivation import FALLBACK_PHRASES, load_motivation_pool
+    from app.infrastructure.ai.tts import MOTIVATION_PHRASES
+
+    phrases = [*load_motivation_pool(), *MOTIVATION_PHRASES, *load_voice_excuses(), *FALLBACK_PHRASES]
+    return list(dict.fromkeys(p for p in phrases if isinstance(p, str) and p.strip()))
+
+
+async def _synthesize(text: str, **params) -> bytes:
+    from app.infrastructure.ai.providers.yandex_speechkit_tts import synthesize_sisu_voice
+    return await synthesize_sisu_voice(text, **params)
+
+
+class VoiceWarmup:
+    """Предсинтез фраз в tts_audio_cache с ограниченной параллельностью"""
+
+    def __init__(self, settings: Optional[Settings] = None, *, concurrency: Optional[int] = None,
+                 enabled: Optional[bool] = None, cache: Optional[TtsAudioCache] = None,
+                 chunk_chars: Optional[int] = None,
+                 synthesize: Callable[..., Awaitable[bytes]] = _synthesize,
+                 pools: Callable[[], List[str]] = default_voice_pools):
+        settings = settings or Settings()
+        self.concurrency = max(1, settings.tts_warmup_concurrency if concurrency is None else concurrency)
+        self.enabled = settings.tts_warmup_enabled if enabled is None else enabled
+        self.cache = cache or tts_audio_cache
+        self.chunk_chars = settings.tts_chunk_chars if chunk_chars is None else chunk_chars
+        self.synthesize = synthesize
+        self.pools = pools
+        self._tasks: Set[asyncio.Task] = set()
+        self._stats = {
+            "runs": 0,
+            "rendered": 0,
+            "cached": 0,
+            "failed": 0,
+            "aborted": 0,
+        }
+
+    def _is_cached(self, phrase: str) -> bool:
+        """Есть ли в кэше фраза (длинная — все ее части, как их кэширует synthesize_sisu_voice)"""
+        chunks = split_for_tts(phrase, self.chunk_chars)
+        texts = chunks if len(chunks) > 1 else [phrase]
+        return all(self.cache.contains(tts_cache_key(text, **POOL_VOICE)) for text in texts)
+
+    async def warm(self, phrases: Iterable[str]) -> Dict[str, int]:
+        """Синтезирует фразы, которых еще нет в кэше; возвращает счетчики этого прогона"""
+        result = {"rendered": 0, "cached": 0, "failed": 0}
+        if not self.enabled or not self.cache.enabled:
+            return result
+        self._stats["runs"] += 1
+        missing = []
+        for phrase in dict.fromkeys(phrases):
+            if await asyncio.to_thread(self._is_cached, phrase):
+                result["cached"] += 1
+            else:
+                missing.append(phrase)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        unavailable = asyncio.Event()
+
+        async def render(phrase: str) -> None:
+            async with semaphore:
+                if unavailable.is_set():
+                    return
+                try:
+                    await self.synthesize(phrase, **POOL_VOICE)
+                    result["rendered"] += 1
+                except ProviderUnavailable as e:
+                    # SpeechKit лежит — не добиваем его остатком пула
+                    if not unavailable.is_set():
+                        logger.warning(f"Voice warm-up stopped: {e}")
+                        self._stats["aborted"] += 1
+                    unavailable.set()
+                    result["failed"] += 1
+                except Exception as e:
+                    logger.error(f"Voice warm-up failed for {phrase!r}: {e}")
+                    result["failed"] += 1
+
+        await asyncio.gather(*(render(phrase) for phrase in missing))
+        for name, value in result.items():
+            self._stats[name] += value
+        if missing:
+            logger.info(f"Voice warm-up: {result}")
+        return result
+
+    async def warm_pools(self) -> Dict[str, int]:
+        try:
+            phrases = await asyncio.to_thread(self.pools)
+        except Exception as e:
+            logger.error(f"Voice warm-up: failed to load voice pools: {e}")
+            return {"rendered": 0, "cached": 0, "failed": 0}
+        return await self.warm(phrases)
+
+    def _track(self, coro: Awaitable[Any]) -> Optional[asyncio.Task]:
+        if not self.enabled:
+            coro.close()
+            return None
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def schedule(self, phrases: Iterable[str]) -> Optional[asyncio.Task]:
+        """Прогрев новых фраз в фоне (после добавления суперадмином)"""
+        return self._track(self.warm(list(phrases)))
+
+    async def start(self) -> None:
+        """Запускает прогрев всех пулов в фоне, не задерживая старт бота"""
+        self._track(self.warm_pools())
+
+    async def stop(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["running"] = len(self._tasks)
+        return stats
+
+
+# Глобальный экземпляр
+voice_warmup = VoiceWarmup()
@@ -0,0 +1,263 @@
+"""
+Кэш ответов YandexGPT перед generate_sisu_reply.
+
+Ключ — blake2b от нормализованных (нижний регистр, одиночные пробелы)
+частей запроса: системный промпт, стиль пользователя, окно последних
+сообщений и сам промпт (в него обработчики уже дописывают добавку
+настроения). Одинаковые приветствия, /voice_motivation и ответ на
+голосовое сообщение перестают стоить запрос к API и квоту.
+
+Чтобы ответы не повторялись, запись хранит до variants вариантов и отдает
+их по кругу; после serves_per_refresh попаданий следующий запрос считается
+промахом («обновлением»): ответ модели добавляется новым вариантом, самый
+старый вытесняется. Записи живут ttl секунд, общий объем ограничен числом
+записей и байтами текста (LRU). При persist=True записи дублируются в
+таблицу completion_cache и поднимаются из нее при старте.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set
+
+from app.infrastructure.cache.write_behind import WriteBehind
+from app.infrastructure.db.engine import get_sessionmaker, run_in_db_thread
+from app.infrastructure.db.repositories.completion_cache import CompletionCacheRepository
+from app.shared.config.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(text: Optional[str]) -> str:
+    return " ".join((text or "").lower().split())
+
+
+def completion_key(system_prompt: Optional[str], user_style: Optional[str],
+                   recent_messages: Optional[Sequence[str]], prompt: str) -> str:
+    """Ключ кэша по нормализованным частям запроса"""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (system_prompt, user_style, *(recent_messages or ()), prompt):
+        digest.update(_normalize(part).encode("utf-8"))
+        digest.update(b"\x1f")
+    digest.update(str(len(recent_messages or ())).encode())
+    return digest.hexdigest()
+
+
+@dataclass
+class _Entry:
+    variants: List[str]
+    expires_at: float
+    size: int
+    serves: int = 0
+    cursor: int = 0
+
+
+class CompletionCache:
+    """LRU+TTL кэш ответов модели с несколькими вариантами на ключ"""
+
+    def __init__(self, settings: Optional[Settings] = None, *, ttl: Optional[float] = None,
+                 max_entries: Optional[int] = None, max_bytes: Optional[int] = None,
+                 variants: Optional[int] = None, serves_per_refresh: Optional[int] = None,
+                 enabled: Optional[bool] = None, persist: Optional[bool] = None,
+                 repository: Optional[CompletionCacheRepository] = None,
+                 clock: Callable[[], float] = time.time):
+        settings = settings or Settings()
+        self.ttl = settings.llm_cache_ttl if ttl is None else ttl
+        self.max_entries = settings.llm_cache_max_entries if max_entries is None else max_entries
+        self.max_bytes = settings.llm_cache_max_bytes if max_bytes is None else max_bytes
+        self.variants = max(1, settings.llm_cache_variants if variants is None else variants)
+        self.serves_per_refresh = (
+            settings.llm_cache_serves_per_refresh if serves_per_refresh is None else serves_per_refresh
+        )
+        self.enabled = settings.llm_cache_enabled if enabled is None else enabled
+        self.persist = settings.llm_cache_persist if persist is None else persist
+        self._repository = repository
+        self.clock = clock
+
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._pending_upserts: Set[str] = set()
+        self._pending_deletes: Set[str] = set()
+        self._loaded = False
+        self._writer = WriteBehind("Completion cache", self.flush,
+                                   lambda: bool(self._pending_upserts or self._pending_deletes))
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "refreshes": 0,
+            "stores": 0,
+            "expired": 0,
+            "evictions": 0,
+            "rows_written": 0,
+            "write_errors": 0,
+        }
+
+    @property
+    def repository(self) -> CompletionCacheRepository:
+        if self._repository is None:
+            self._repository = CompletionCacheRepository(get_sessionmaker())
+        return self._repository
+
+    # --- Память ---
+
+    def _drop(self, key: str, reason: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= entry.size
+        self._stats[reason] += 1
+        if self.persist:
+            with self._lock:
+                self._pending_upserts.discard(key)
+                self._pending_deletes.add(key)
+
+    def _evict(self) -> None:
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._drop(next(iter(self._entries)), "evictions")
+
+    def _put(self, key: str, variants: List[str], expires_at: float) -> _Entry:
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old.size
+        entry = _Entry(variants=variants, expires_at=expires_at,
+                       size=len(key) + sum(len(v.encode("utf-8")) for v in variants))
+        self._entries[key] = entry
+        self._bytes += entry.size
+        self._evict()
+        return entry
+
+    # --- Чтение и запись ---
+
+    def get(self, key: str) -> Optional[str]:
+        """Вариант ответа из кэша или None (промах, истекшая запись или пора обновить)"""
+        if not self.enabled:
+            return None
+        entry = self._entries.get(key)
+        if entry is None:
+            self._stats["misses"] += 1
+            return None
+        if entry.expires_at <= self.clock():
+            self._drop(key, "expired")
+            self._stats["misses"] += 1
+            return None
+        if entry.serves >= self.serves_per_refresh:
+            # Вариант(ы) отданы достаточно раз — следующий ответ берем у модели
+            self._stats["refreshes"] += 1
+            return None
+        self._entries.move_to_end(key)
+        entry.serves += 1
+        text = entry.variants[entry.cursor % len(entry.variants)]
+        entry.cursor = (entry.cursor + 1) % len(entry.variants)
+        self._stats["hits"] += 1
+        return text
+
+    def put(self, key: str, text: str) -> None:
+        """Добавляет ответ модели как новый вариант и сбрасывает счетчик попаданий"""
+        if not self.enabled or not text or not text.strip():
+            return
+        entry = self._entries.get(key)
+        now = self.clock()
+        if entry is not None and entry.expires_at > now:
+            variants = [v for v in entry.variants if v != text] + [text]
+            variants = variants[-self.variants:]
+        else:
+            variants = [text]
+        # Только что полученный ответ уже отдан — попадания начинаются со старых вариантов
+        self._put(key, variants, now + self.ttl)
+        self._stats["stores"] += 1
+        if self.persist and key in self._entries:
+            with self._lock:
+                self._pending_deletes.discard(key)
+                self._pending_upserts.add(key)
+            self._writer.schedule()
+
+    async def get_or_generate(self, key: str, generate: Callable[[], Any]) -> str:
+        """Ответ из кэша или результат generate() (сохраняется в кэш)"""
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        text = await generate()
+        self.put(key, text)
+        return text
+
+    def clear(self) -> None:
+        if self.persist:
+            with self._lock:
+                self._pending_upserts.clear()
+                self._pending_deletes.update(self._entries)
+            self._writer.schedule()
+        self._entries.clear()
+        self._bytes = 0
+
+    # --- Постоянная копия ---
+
+    def _load(self) -> None:
+        if self._loaded or not self.persist:
+            return
+        self.repository.ensure_schema()
+        now = self.clock()
+        try:
+            pruned = self.repository.prune(now)
+            if pruned:
+                logger.info(f"Pruned {pruned} expired completion cache rows")
+        except Exception as e:
+            logger.error(f"Error pruning completion cache: {e}")
+        rows = self.repository.load(now, self.max_entries)
+        # Самые свежие загружены первыми — в LRU они должны оказаться последними
+        for key, variants, expires_at in reversed(rows):
+            if key not in self._entries and variants:
+                self._put(key, [str(v) for v in variants][-self.variants:], expires_at)
+        self._loaded = True
+
+    def flush(self) -> bool:
+        """Записывает измененные и удаленные записи; False — ошибка записи"""
+        with self._lock:
+            upserts, self._pending_upserts = self._pending_upserts, set()
+            deletes, self._pending_deletes = self._pending_deletes, set()
+        rows = [
+            (key, list(entry.variants), entry.expires_at)
+            for key, entry in ((key, self._entries.get(key)) for key in upserts)
+            if entry is not None
+        ]
+        if not rows and not deletes:
+            return True
+        try:
+            self.repository.delete(deletes)
+            self.repository.upsert(rows)
+        except Exception as e:
+            # Вернем ключи в очередь, попробуем при следующей записи
+            with self._lock:
+                self._pending_upserts |= upserts
+                self._pending_deletes |= deletes
+            self._stats["write_errors"] += 1
+            logger.error(f"Error writing completion cache: {e}")
+            return False
+        self._stats["rows_written"] += len(rows) + len(deletes)
+        return True
+
+    async def start(self) -> None:
+        """Поднимает постоянную копию кэша вне event loop"""
+        if self.persist and self.enabled:
+            try:
+                await run_in_db_thread(self._load)
+            except Exception as e:
+                logger.error(f"Error loading completion cache: {e}")
+
+    async def stop(self) -> None:
+        """Дописывает несохраненные изменения"""
+        await self._writer.stop()
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"] + stats["refreshes"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        stats["entries"] = len(self._entries)
+        stats["bytes"] = self._bytes
+        return stats
+
+
+# Глобальный экземпляр
+completion_cache = CompletionCache()
@@ -0,0 +1,181 @@
+"""
+Реестр file_id для повторной отправки голосовых и медиа.
+
+После первой загрузки файла Telegram возвращает file_id, по которому тот же
+файл можно отправить снова без загрузки байтов. Реестр хранит соответствие
+«хэш вида медиа и содержимого -> file_id» отдельно для каждого бота (file_id
+другого бота недействителен) и дублирует его в таблицу telegram_file_ids,
+чтобы запасные голоса, мотивации и отмазки не загружались заново после
+перезапуска.
+
+Подстановку file_id в отправку делает FileIdReuseMiddleware
+(app/presentation/bot/middlewares/file_id_reuse.py), обработчики по-прежнему
+вызывают answer_voice/send_voice с BufferedInputFile.
+"""
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional, Set, Tuple
+
+from app.infrastructure.cache.write_behind import WriteBehind
+from app.infrastructure.db.engine import get_sessionmaker, run_in_db_thread
+from app.infrastructure.db.repositories.file_ids import FileIdRepository
+from app.shared.config.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+
+def media_hash(kind: str, data: bytes) -> str:
+    """Ключ реестра: вид медиа (voice, audio, ...) и содержимое файла"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(kind.encode("utf-8"))
+    digest.update(b"\x1f")
+    digest.update(data)
+    return digest.hexdigest()
+
+
+class FileIdRegistry:
+    """Хэш содержимого -> file_id по ботам с постоянной копией в БД"""
+
+    def __init__(self, settings: Optional[Settings] = None, *, enabled: Optional[bool] = None,
+                 repository: Optional[FileIdRepository] = None):
+        settings = settings or Settings()
+        self.enabled = settings.telegram_file_id_reuse if enabled is None else enabled
+        self._repository = repository
+        # bot_id -> {хэш: (file_id, размер)}
+        self._ids: Dict[int, Dict[str, Tuple[str, int]]] = {}
+        self._lock = threading.Lock()
+        self._pending_upserts: Dict[int, Set[str]] = {}
+        self._pending_deletes: Dict[int, Set[str]] = {}
+        self._schema_ready = False
+        self._writer = WriteBehind("Telegram file_ids", self.flush, self._has_pending)
+        self._stats = {
+            "hits": 0,
+            "uploads": 0,
+            "rejected": 0,
+            "bytes_saved": 0,
+            "bytes_uploaded": 0,
+            "rows_written": 0,
+            "write_errors": 0,
+        }
+
+    @property
+    def repository(self) -> FileIdRepository:
+        if self._repository is None:
+            self._repository = FileIdRepository(get_sessionmaker())
+        return self._repository
+
+    # --- Загрузка ---
+
+    def _load(self, bot_id: int) -> None:
+        if bot_id in self._ids:
+            return
+        if not self._schema_ready:
+            self.repository.ensure_schema()
+            self._schema_ready = True
+        rows = self.repository.load(bot_id)
+        with self._lock:
+            # Записи, добавленные до окончания загрузки, свежее строк из БД
+            self._ids[bot_id] = {**rows, **self._ids.get(bot_id, {})}
+        if rows:
+            logger.info(f"Loaded {len(rows)} Telegram file_ids for bot {bot_id}")
+
+    async def load(self, bot_id: int) -> None:
+        """Поднимает file_id бота из БД (один раз на бота)"""
+        if not self.enabled or bot_id in self._ids:
+            return
+        try:
+            await run_in_db_thread(self._load, bot_id)
+        except Exception as e:
+            logger.error(f"Error loading Telegram file_ids: {e}")
+            self._ids.setdefault(bot_id, {})
+
+    # --- Реестр ---
+
+    def lookup(self, bot_id: int, content_hash: str) -> Optional[str]:
+        entry = self._ids.get(bot_id, {}).get(content_hash)
+        return entry[0] if entry else None
+
+    def record_hit(self, size: int) -> None:
+        """Файл отправлен по file_id — байты не загружались"""
+        self._stats["hits"] += 1
+        self._stats["bytes_saved"] += size
+
+    def remember(self, bot_id: int, content_hash: str, file_id: Optional[str], size: int) -> None:
+        """Файл загружен; file_id из ответа Telegram используется для следующих отправок"""
+        self._stats["uploads"] += 1
+        self._stats["bytes_uploaded"] += size
+        if not file_id:
+            return
+        with self._lock:
+            self._ids.setdefault(bot_id, {})[content_hash] = (file_id, size)
+            self._pending_deletes.get(bot_id, set()).discard(content_hash)
+            self._pending_upserts.setdefault(bot_id, set()).add(content_hash)
+        self._writer.schedule()
+
+    def forget(self, bot_id: int, content_hash: str) -> None:
+        """Telegram отверг file_id (файл удален, бот сменился) — дальше снова загрузка"""
+        self._stats["rejected"] += 1
+        with self._lock:
+            if self._ids.get(bot_id, {}).pop(content_hash, None) is None:
+                return
+            self._pending_upserts.get(bot_id, set()).discard(content_hash)
+            self._pending_deletes.setdefault(bot_id, set()).add(content_hash)
+        self._writer.schedule()
+
+    # --- Постоянная копия ---
+
+    def flush(self) -> bool:
+        """Записывает новые и отвергнутые file_id; False — ошибка записи"""
+        with self._lock:
+            upserts, self._pending_upserts = self._pending_upserts, {}
+            deletes, self._pending_deletes = self._pending_deletes, {}
+            rows = {
+                bot_id: [(h, *self._ids[bot_id][h]) for h in hashes if h in self._ids.get(bot_id, {})]
+                for bot_id, hashes in upserts.items()
+            }
+        if not any(rows.values()) and not any(deletes.values()):
+            return True
+        try:
+            if not self._schema_ready:
+                self.repository.ensure_schema()
+                self._schema_ready = True
+            written = 0
+            for bot_id, hashes in deletes.items():
+                written += self.repository.delete(bot_id, hashes)
+            for bot_id, bot_rows in rows.items():
+                written += self.repository.upsert(bot_id, bot_rows)
+        except Exception as e:
+            # Вернем ключи в очередь, попробуем при следующей записи
+            with self._lock:
+                for bot_id, hashes in upserts.items():
+                    self._pending_upserts.setdefault(bot_id, set()).update(hashes)
+                for bot_id, hashes in deletes.items():
+                    self._pending_deletes.setdefault(bot_id, set()).update(hashes)
+            self._stats["write_errors"] += 1
+            logger.error(f"Error writing Telegram file_ids: {e}")
+            return False
+        self._stats["rows_written"] += written
+        return True
+
+    def _has_pending(self) -> bool:
+        return any(self._pending_upserts.values()) or any(self._pending_deletes.values())
+
+    async def start(self, bot_id: int) -> None:
+        """Поднимает file_id бота при старте"""
+        await self.load(bot_id)
+
+    async def stop(self) -> None:
+        """Дописывает несохраненные изменения"""
+        await self._writer.stop()
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        sends = stats["hits"] + stats["uploads"]
+        stats["reuse_ratio"] = round(stats["hits"] / sends, 3) if sends else 0.0
+        stats["file_ids"] = sum(len(ids) for ids in self._ids.values())
+        return stats
+
+
+# Глобальный экземпляр
+file_id_registry = FileIdRegistry()
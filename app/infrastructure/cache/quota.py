@@ -0,0 +1,283 @@
+"""
+Журнал квот: AI-запросы, TTS и текстовые запросы пользователей.
+
+Счетчики хранятся в памяти по ключу (пользователь, вид квоты, период) вместе
+с номером текущего окна (сутки/час от эпохи), поэтому проверка лимита — это
+один поиск в словаре. Каждое использование пишется в таблицу quota_usage
+построчным атомарным приращением (INSERT ... ON CONFLICT DO UPDATE
+used = used + n) в пуле потоков БД. Уровень саппортера кэшируется и
+сбрасывается через invalidate_tier() при подтверждении доната.
+"""
+import datetime
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.infrastructure.cache.write_behind import WriteBehind
+from app.infrastructure.db.engine import get_sessionmaker, run_in_db_thread
+from app.infrastructure.db.repositories.quota import QuotaDeltas, QuotaRepository
+from app.shared.config.settings import DONATION_TIERS, Settings
+
+logger = logging.getLogger(__name__)
+
+PERIOD_SECONDS = {"day": 86400, "hour": 3600}
+DEFAULT_TIER = "default"
+
+# kind -> tier -> period -> limit
+QuotaLimits = Dict[str, Dict[str, Dict[str, int]]]
+Tier = Tuple[Optional[str], Optional[datetime.datetime]]
+
+
+def build_default_limits(settings: Optional[Settings] = None,
+                         tiers: Optional[Dict[str, Dict[str, Any]]] = None) -> QuotaLimits:
+    """Лимиты по умолчанию и по уровням доната (tts_limit, ai_daily_limit, ai_hourly_limit)"""
+    settings = settings or Settings()
+    tiers = DONATION_TIERS if tiers is None else tiers
+    limits: QuotaLimits = {
+        "ai": {DEFAULT_TIER: {"day": 5, "hour": 10}},
+        "tts": {DEFAULT_TIER: {"day": settings.daily_voice_limit}},
+        "text": {DEFAULT_TIER: {"day": settings.daily_text_limit}},
+    }
+    for tier, info in tiers.items():
+        if "tts_limit" in info:
+            limits["tts"][tier] = {"day": info["tts_limit"]}
+        if "ai_daily_limit" in info or "ai_hourly_limit" in info:
+            base = limits["ai"][DEFAULT_TIER]
+            limits["ai"][tier] = {
+                "day": info.get("ai_daily_limit", base["day"]),
+                "hour": info.get("ai_hourly_limit", base["hour"]),
+            }
+    return limits
+
+
+class QuotaLedger:
+    """Счетчики квот в памяти с построчной записью приращений в БД"""
+
+    def __init__(self, repository: Optional[QuotaRepository] = None, limits: Optional[QuotaLimits] = None,
+                 clock: Callable[[], float] = time.time, tier_ttl: float = 600.0):
+        if repository is None:
+            repository = QuotaRepository(get_sessionmaker())
+        self.repository = repository
+        self.limits = limits if limits is not None else build_default_limits()
+        self.clock = clock
+        self.tier_ttl = tier_ttl
+
+        self._lock = threading.RLock()
+        # (user_id, kind, period) -> [bucket, used]
+        self._used: Dict[Tuple[int, str, str], List[int]] = {}
+        # user_id -> (tier, supporter_until, время загрузки)
+        self._tiers: Dict[int, Tuple[Optional[str], Optional[datetime.datetime], float]] = {}
+        self._pending: QuotaDeltas = {}
+        self._loaded = False
+        self._writer = WriteBehind("Quota ledger", self.flush, lambda: bool(self._pending))
+
+        # Периоды, которые нужно считать для вида квоты (объединение по уровням)
+        self._periods: Dict[str, Tuple[str, ...]] = {
+            kind: tuple(sorted({period for tier in per_tier.values() for period in tier}))
+            for kind, per_tier in self.limits.items()
+        }
+
+        self._stats = {
+            "checks": 0,
+            "denied": 0,
+            "records": 0,
+            "tier_lookups": 0,
+            "tier_hits": 0,
+            "flushes": 0,
+            "rows_written": 0,
+            "write_errors": 0,
+        }
+
+    # --- Служебное ---
+
+    def _bucket(self, period: str, now: Optional[float] = None) -> int:
+        return int((self.clock() if now is None else now) // PERIOD_SECONDS[period])
+
+    def _current_buckets(self) -> Dict[str, int]:
+        now = self.clock()
+        return {period: self._bucket(period, now) for period in PERIOD_SECONDS}
+
+    def _ensure_loaded(self) -> None:
+        """Однократно поднимает счетчики текущих окон из БД и чистит устаревшие строки"""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self.repository.ensure_schema()
+            buckets = self._current_buckets()
+            for row in self.repository.load_current(buckets):
+                key = (row.user_id, row.kind, row.period)
+                self._used[key] = [row.bucket, row.used or 0]
+            try:
+                pruned = self.repository.prune(buckets)
+                if pruned:
+                    logger.info(f"Pruned {pruned} expired quota rows")
+            except Exception as e:
+                logger.error(f"Error pruning quota rows: {e}")
+            self._loaded = True
+
+    # --- Уровень саппортера ---
+
+    def _cached_tier(self, user_id: int) -> Optional[Tier]:
+        cached = self._tiers.get(user_id)
+        if cached is None or time.monotonic() - cached[2] >= self.tier_ttl:
+            return None
+        return cached[0], cached[1]
+
+    def _store_tier(self, user_id: int, tier: Tier) -> None:
+        self._tiers[user_id] = (tier[0], tier[1], time.monotonic())
+
+    def _resolve_tier(self, tier: Tier) -> str:
+        name, until = tier
+        if not name or name == "none":
+            return DEFAULT_TIER
+        if until is not None and until < datetime.datetime.utcnow():
+            return DEFAULT_TIER
+        return name
+
+    def get_tier(self, user_id: int) -> str:
+        """Уровень саппортера из кэша (при промахе — один запрос к БД)"""
+        tier = self._cached_tier(user_id)
+        if tier is None:
+            self._stats["tier_lookups"] += 1
+            tier = self.repository.get_supporter(user_id)
+            self._store_tier(user_id, tier)
+        else:
+            self._stats["tier_hits"] += 1
+        return self._resolve_tier(tier)
+
+    async def get_tier_async(self, user_id: int) -> str:
+        tier = self._cached_tier(user_id)
+        if tier is None:
+            self._stats["tier_lookups"] += 1
+            tier = await run_in_db_thread(self.repository.get_supporter, user_id)
+            self._store_tier(user_id, tier)
+        else:
+            self._stats["tier_hits"] += 1
+        return self._resolve_tier(tier)
+
+    def invalidate_tier(self, user_id: Optional[int] = None) -> None:
+        """Сбрасывает кэш уровня (после подтверждения доната или снятия статуса)"""
+        if user_id is None:
+            self._tiers.clear()
+        else:
+            self._tiers.pop(user_id, None)
+
+    # --- Проверка и учет ---
+
+    def get_limits(self, kind: str, tier: str = DEFAULT_TIER) -> Dict[str, int]:
+        per_tier = self.limits[kind]
+        return per_tier.get(tier, per_tier[DEFAULT_TIER])
+
+    def get_used(self, user_id: int, kind: str, period: str) -> int:
+        """Использовано в текущем окне периода"""
+        self._ensure_loaded()
+        entry = self._used.get((user_id, kind, period))
+        if entry is None or entry[0] != self._bucket(period):
+            return 0
+        return entry[1]
+
+    def _check(self, user_id: int, kind: str, tier: str) -> Tuple[bool, Optional[str]]:
+        self._stats["checks"] += 1
+        for period, limit in self.get_limits(kind, tier).items():
+            if self.get_used(user_id, kind, period) >= limit:
+                self._stats["denied"] += 1
+                return False, period
+        return True, None
+
+    def check(self, user_id: int, kind: str) -> Tuple[bool, Optional[str]]:
+        """(можно ли, исчерпанный период или None)"""
+        return self._check(user_id, kind, self.get_tier(user_id))
+
+    async def check_async(self, user_id: int, kind: str) -> Tuple[bool, Optional[str]]:
+        if not self._loaded:
+            await run_in_db_thread(self._ensure_loaded)
+        return self._check(user_id, kind, await self.get_tier_async(user_id))
+
+    def record(self, user_id: int, kind: str, amount: int = 1) -> None:
+        """Учитывает использование во всех периодах вида квоты"""
+        self._ensure_loaded()
+        now = self.clock()
+        with self._lock:
+            for period in self._periods[kind]:
+                bucket = self._bucket(period, now)
+                entry = self._used.get((user_id, kind, period))
+                if entry is None or entry[0] != bucket:
+                    entry = self._used[(user_id, kind, period)] = [bucket, 0]
+                entry[1] += amount
+                key = (user_id, kind, period, bucket)
+                self._pending[key] = self._pending.get(key, 0) + amount
+            self._stats["records"] += 1
+        self._writer.schedule()
+
+    def get_usage(self, user_id: int, kind: str) -> Dict[str, Dict[str, int]]:
+        """{period: {"used": ..., "limit": ...}} для текущих окон"""
+        limits = self.get_limits(kind, self.get_tier(user_id))
+        return {
+            period: {"used": self.get_used(user_id, kind, period), "limit": limit}
+            for period, limit in limits.items()
+        }
+
+    def _forget_user(self, user_id: int, kind: Optional[str]) -> None:
+        for key in [k for k in self._used if k[0] == user_id and (kind is None or k[1] == kind)]:
+            del self._used[key]
+        for key in [k for k in self._pending if k[0] == user_id and (kind is None or k[1] == kind)]:
+            del self._pending[key]
+
+    def reset_user(self, user_id: int, kind: Optional[str] = None) -> None:
+        """Обнуляет счетчики пользователя (для админов; из обработчиков — reset_user_async)"""
+        with self._lock:
+            self._forget_user(user_id, kind)
+            self.repository.reset_user(user_id, kind)
+        self.invalidate_tier(user_id)
+
+    async def reset_user_async(self, user_id: int, kind: Optional[str] = None) -> None:
+        with self._lock:
+            self._forget_user(user_id, kind)
+        # Приращения, уже отданные в запись, могут лечь раньше удаления — удаляем после них
+        await self._writer.drain()
+        await run_in_db_thread(self.repository.reset_user, user_id, kind)
+        self.invalidate_tier(user_id)
+
+    # --- Запись в БД ---
+
+    def flush(self) -> bool:
+        """Записывает накопленные приращения (по строке на пользователя/вид/окно); False — ошибка записи"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return True
+        try:
+            self.repository.increment(pending)
+        except Exception as e:
+            # Возвращаем приращения в буфер, попробуем при следующей записи
+            with self._lock:
+                for key, delta in pending.items():
+                    self._pending[key] = self._pending.get(key, 0) + delta
+            self._stats["write_errors"] += 1
+            logger.error(f"Error writing quota usage: {e}")
+            return False
+        self._stats["flushes"] += 1
+        self._stats["rows_written"] += len(pending)
+        return True
+
+    async def start(self) -> None:
+        """Поднимает счетчики из БД вне event loop"""
+        await run_in_db_thread(self._ensure_loaded)
+
+    async def stop(self) -> None:
+        """Дописывает несохраненные приращения"""
+        await self._writer.stop()
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["tracked_counters"] = len(self._used)
+        stats["cached_tiers"] = len(self._tiers)
+        stats["pending_rows"] = len(self._pending)
+        return stats
+
+
+# Глобальный экземпляр
+quota_ledger = QuotaLedger()
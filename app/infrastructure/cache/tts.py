@@ -0,0 +1,256 @@
+"""
+Дисковый кэш синтезированной речи перед synthesize_sisu_voice.
+
+Файлы адресуются содержимым запроса: ключ — blake2b от (текст, голос,
+эмоция, скорость, высота тона), аудио лежит в <dir>/<ключ[:2]>/<ключ>.ogg
+(готовый ogg-opus для Telegram voice). Мотивации из MOTIVATION_PHRASES,
+голосовые отмазки и повторяющиеся короткие ответы синтезируются один раз,
+дальше отдаются с диска без запроса к SpeechKit.
+
+Запись атомарная (временный файл + os.replace), общий объем ограничен
+max_bytes с вытеснением давно не использованных файлов (LRU). Порядок LRU
+и размеры хранятся в index.json — при старте читается он, а не весь
+каталог; без индекса (первый запуск, поврежденный файл) каталог
+сканируется один раз. Файловые операции выполняются в потоке, чтобы не
+блокировать event loop.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+from app.shared.config.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = "index.json"
+AUDIO_SUFFIX = ".ogg"
+
+
+def tts_cache_key(text: str, voice: str, emotion: str, speed: float, pitch: Optional[float] = None) -> str:
+    """Ключ кэша по параметрам синтеза"""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (text, voice, emotion, repr(float(speed)), "" if pitch is None else repr(float(pitch))):
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+
+def _write_atomic(path: Path, payload: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_name, path)
+    except Exception:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+
+class TtsAudioCache:
+    """Дисковый LRU-кэш ogg-opus по ключу запроса синтеза"""
+
+    def __init__(self, settings: Optional[Settings] = None, *, directory: Optional[Union[str, Path]] = None,
+                 max_bytes: Optional[int] = None, enabled: Optional[bool] = None):
+        settings = settings or Settings()
+        self.directory = Path(directory if directory is not None else settings.tts_cache_dir)
+        self.max_bytes = max_bytes if max_bytes is not None else settings.tts_cache_max_bytes
+        self.enabled = enabled if enabled is not None else settings.tts_cache_enabled
+        # Ключ -> размер файла; порядок — от давно не использованных к свежим
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        self._loaded = False
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "evictions": 0,
+            "errors": 0,
+        }
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}{AUDIO_SUFFIX}"
+
+    @property
+    def index_path(self) -> Path:
+        return self.directory / INDEX_NAME
+
+    def _scan(self) -> None:
+        """Восстанавливает индекс по файлам каталога (порядок LRU — по времени изменения)"""
+        found = []
+        if self.directory.exists():
+            for bucket in os.scandir(self.directory):
+                if not bucket.is_dir():
+                    continue
+                for entry in os.scandir(bucket.path):
+                    if entry.name.endswith(AUDIO_SUFFIX) and entry.is_file():
+                        stat = entry.stat()
+                        found.append((stat.st_mtime, entry.name[:-len(AUDIO_SUFFIX)], stat.st_size))
+        for _, key, size in sorted(found):
+            self._index[key] = size
+        self._dirty = True
+
+    def _ensure_loaded(self) -> None:
+        with self._lock:
+            if self._loaded:
+                return
+            try:
+                with open(self.index_path, encoding="utf-8") as f:
+                    for key, size in json.load(f).get("entries", []):
+                        self._index[key] = int(size)
+            except FileNotFoundError:
+                self._scan()
+            except Exception as e:
+                logger.warning(f"TTS cache: index is unreadable ({e}), rescanning {self.directory}")
+                self._index.clear()
+                self._scan()
+            self._bytes = sum(self._index.values())
+            self._loaded = True
+            self._evict()
+        if self._index:
+            logger.info(f"TTS cache: {len(self._index)} files, {self._bytes} bytes")
+
+    def _evict(self) -> None:
+        """Удаляет самые давние файлы, пока объем больше max_bytes (вызывается под блокировкой)"""
+        while self._bytes > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self._bytes -= size
+            self._stats["evictions"] += 1
+            self._dirty = True
+            try:
+                os.unlink(self._path(key))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"TTS cache: failed to remove {key}: {e}")
+
+    def _forget(self, key: str) -> None:
+        with self._lock:
+            size = self._index.pop(key, None)
+            if size is not None:
+                self._bytes -= size
+                self._dirty = True
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Аудио из кэша или None (синхронно; из корутин — aget)"""
+        if not self.enabled:
+            return None
+        self._ensure_loaded()
+        with self._lock:
+            known = key in self._index
+            if known:
+                self._index.move_to_end(key)
+        if not known:
+            self._stats["misses"] += 1
+            return None
+        try:
+            audio = self._path(key).read_bytes()
+        except FileNotFoundError:
+            # Файл удалили вручную или вытеснили параллельно
+            self._forget(key)
+            self._stats["misses"] += 1
+            return None
+        except OSError as e:
+            logger.warning(f"TTS cache: failed to read {key}: {e}")
+            self._stats["errors"] += 1
+            return None
+        self._stats["hits"] += 1
+        return audio
+
+    def contains(self, key: str) -> bool:
+        """Есть ли аудио в кэше (по индексу, без чтения файла и без учета в статистике)"""
+        if not self.enabled:
+            return False
+        self._ensure_loaded()
+        return key in self._index
+
+    def put(self, key: str, audio: bytes) -> None:
+        """Сохраняет аудио (синхронно; из корутин — aput)"""
+        if not self.enabled or not audio or len(audio) > self.max_bytes:
+            return
+        self._ensure_loaded()
+        try:
+            _write_atomic(self._path(key), audio)
+        except OSError as e:
+            logger.warning(f"TTS cache: failed to write {key}: {e}")
+            self._stats["errors"] += 1
+            return
+        with self._lock:
+            self._bytes += len(audio) - self._index.pop(key, 0)
+            self._index[key] = len(audio)
+            self._stats["writes"] += 1
+            self._dirty = True
+            self._evict()
+        self.save_index()
+
+    async def aget(self, key: str) -> Optional[bytes]:
+        if not self.enabled:
+            return None
+        return await asyncio.to_thread(self.get, key)
+
+    async def aput(self, key: str, audio: bytes) -> None:
+        if not self.enabled:
+            return
+        await asyncio.to_thread(self.put, key, audio)
+
+    def save_index(self) -> None:
+        """Атомарно записывает index.json, если индекс менялся"""
+        with self._lock:
+            if not self._dirty or not self._loaded:
+                return
+            payload = json.dumps({"entries": [[key, size] for key, size in self._index.items()]}).encode("utf-8")
+            self._dirty = False
+        try:
+            _write_atomic(self.index_path, payload)
+        except OSError as e:
+            logger.warning(f"TTS cache: failed to save index: {e}")
+            self._stats["errors"] += 1
+            self._dirty = True
+
+    def clear(self) -> None:
+        self._ensure_loaded()
+        with self._lock:
+            for key in list(self._index):
+                try:
+                    os.unlink(self._path(key))
+                except OSError:
+                    pass
+            self._index.clear()
+            self._bytes = 0
+            self._dirty = True
+        self.save_index()
+
+    async def start(self) -> None:
+        """Загружает индекс при старте бота"""
+        if self.enabled:
+            await asyncio.to_thread(self._ensure_loaded)
+
+    async def stop(self) -> None:
+        """Сохраняет порядок LRU при остановке бота"""
+        if self.enabled and self._loaded:
+            await asyncio.to_thread(self.save_index)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        stats["files"] = len(self._index)
+        stats["bytes"] = self._bytes
+        stats["max_bytes"] = self.max_bytes
+        return stats
+
+
+# Глобальный экземпляр
+tts_audio_cache = TtsAudioCache()
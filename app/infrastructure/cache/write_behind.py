@@ -0,0 +1,92 @@
+"""
+Отложенная запись (write-behind) накопленных изменений в БД.
+
+Журнал квот, кэш ответов YandexGPT, реестр file_id и статистика триггеров
+меняют состояние в памяти, а запись в БД откладывают. WriteBehind
+выполняет flush владельца в пуле потоков БД (run_in_db_thread), чтобы
+транзакция не блокировала event loop:
+
+- schedule() после изменения запускает фоновую задачу, которая пишет, пока
+  есть несохраненные изменения; вне event loop (скрипты, тесты) flush
+  выполняется сразу;
+- при заданном interval start() запускает таймер, который дописывает
+  изменения и тогда, когда новых записей нет;
+- drain() дожидается фоновой записи и дописывает остаток, stop() еще и
+  останавливает таймер.
+
+flush владельца возвращает False, если запись не удалась (изменения он
+возвращает в свой буфер); тогда фоновая задача останавливается до
+следующего schedule() или тика таймера.
+"""
+import asyncio
+import logging
+from typing import Callable, Optional
+
+from app.infrastructure.db.engine import run_in_db_thread
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehind:
+    """Фоновый вызов flush в пуле потоков БД"""
+
+    def __init__(self, name: str, flush: Callable[[], bool], has_pending: Callable[[], bool], *,
+                 interval: Optional[float] = None):
+        self.name = name
+        self.flush = flush
+        self.has_pending = has_pending
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self._timer: Optional[asyncio.Task] = None
+
+    def schedule(self) -> None:
+        """Запускает фоновую запись (если она еще не идет)"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # Вне event loop (скрипты, тесты) пишем сразу
+            self.flush()
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._drain())
+
+    async def _drain(self) -> None:
+        while self.has_pending():
+            if not await run_in_db_thread(self.flush):
+                return
+
+    async def _tick(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            if self.has_pending() and (self._task is None or self._task.done()):
+                try:
+                    await run_in_db_thread(self.flush)
+                except Exception as e:
+                    logger.error(f"{self.name}: periodic flush failed: {e}")
+
+    async def start(self) -> None:
+        """Запускает таймер записи (если задан interval)"""
+        if self.interval and (self._timer is None or self._timer.done()):
+            self._timer = asyncio.create_task(self._tick())
+
+    async def drain(self) -> None:
+        """Дожидается фоновой записи и дописывает остаток"""
+        if self._task is not None:
+            try:
+                await self._task
+            except Exception as e:
+                logger.error(f"{self.name}: flush task failed: {e}")
+            self._task = None
+        if self.has_pending():
+            await run_in_db_thread(self.flush)
+
+    async def stop(self) -> None:
+        """Останавливает таймер и дописывает изменения"""
+        if self._timer is not None:
+            self._timer.cancel()
+            try:
+                await self._timer
+            except asyncio.CancelledError:
+                pass
+            self._timer = None
+        await self.drain()
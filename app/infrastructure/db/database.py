@@ -1,20 +1,13 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import declarative_base
 from app.shared.config.settings import DB_PATH
+from app.infrastructure.db.engine import get_async_engine, get_async_sessionmaker
 
-# Создаем асинхронный движок SQLAlchemy
-engine = create_async_engine(
-    f"sqlite+aiosqlite:///{DB_PATH}",
-    echo=False,
-    future=True
-)
+# Асинхронный движок (aiosqlite) на том же файле, что и синхронный реестр
+engine = get_async_engine(f"sqlite:///{DB_PATH}")
 
-# Создаем фабрику сессий
-async_session = sessionmaker(
-    engine,
-    class_=AsyncSession,
-    expire_on_commit=False
-)
+# Фабрика сессий (expire_on_commit=False)
+async_session = get_async_sessionmaker(f"sqlite:///{DB_PATH}")
 
 # Базовый класс для моделей
 Base = declarative_base()
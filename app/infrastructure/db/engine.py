@@ -0,0 +1,295 @@
+"""
+Единый реестр движков SQLAlchemy на процесс.
+
+Все модули (и app/, и sisu_bot/) получают движок и фабрику сессий отсюда,
+поэтому на один файл БД приходится один пул соединений. Для SQLite каждое
+новое соединение получает профиль PRAGMA: WAL, synchronous=NORMAL, mmap,
+размер кэша и busy_timeout. Размеры пула и сбор статистики настраиваются
+через Settings.
+
+Для обработчиков aiogram есть асинхронный движок на том же файле
+(get_async_engine/get_async_sessionmaker) и мост run_in_db_thread для
+синхронного кода, который пока нельзя перенести на AsyncSession.
+"""
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, TypeVar
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import sessionmaker
+
+if TYPE_CHECKING:
+    # sqlalchemy.ext.asyncio требует greenlet — импортируем лениво, синхронному коду он не нужен
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.shared.config.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.RLock()
+_engines: Dict[str, Engine] = {}
+_sessionmakers: Dict[str, sessionmaker] = {}
+_pool_counters: Dict[str, Dict[str, int]] = {}
+_async_engines: Dict[str, Any] = {}  # sqlalchemy.ext.asyncio.AsyncEngine
+_async_sessionmakers: Dict[str, "async_sessionmaker"] = {}
+_db_executor: Optional[ThreadPoolExecutor] = None
+_settings: Optional[Settings] = None
+
+# Асинхронные драйверы для синхронных URL
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+T = TypeVar("T")
+
+
+def _get_settings() -> Settings:
+    global _settings
+    if _settings is None:
+        _settings = Settings()
+    return _settings
+
+
+def normalize_database_url(database_url: str) -> str:
+    """Приводит URL к каноничному виду (для SQLite — абсолютный путь к файлу)"""
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite" and url.database and url.database != ":memory:":
+        url = url.set(database=str(Path(url.database).resolve()))
+    return url.render_as_string(hide_password=False)
+
+
+def _apply_sqlite_pragmas(dbapi_connection, settings: Settings) -> None:
+    """Настраивает соединение SQLite под нагрузку бота"""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA journal_mode={settings.db_sqlite_journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={settings.db_sqlite_synchronous}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.db_sqlite_mmap_size)}")
+        cursor.execute(f"PRAGMA cache_size={int(settings.db_sqlite_cache_size)}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.db_sqlite_busy_timeout_ms)}")
+    finally:
+        cursor.close()
+
+
+def _install_pool_stats(engine: Engine, key: str) -> None:
+    """Считает подключения и выдачи соединений из пула"""
+    counters = _pool_counters.setdefault(key, {
+        "connects": 0,
+        "checkouts": 0,
+        "checkins": 0,
+        "checked_out": 0,
+        "max_checked_out": 0,
+    })
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        counters["connects"] += 1
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        counters["checkouts"] += 1
+        counters["checked_out"] += 1
+        counters["max_checked_out"] = max(counters["max_checked_out"], counters["checked_out"])
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        counters["checkins"] += 1
+        counters["checked_out"] = max(counters["checked_out"] - 1, 0)
+
+
+def _on_loop_thread() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _install_loop_guard(engine: Engine, key: str) -> None:
+    """Отмечает синхронные запросы, выполненные в потоке event loop"""
+    counters = _pool_counters.setdefault(key, {})
+    counters.setdefault("loop_thread_queries", 0)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _on_execute(conn, cursor, statement, parameters, context, executemany):
+        if _on_loop_thread():
+            counters["loop_thread_queries"] += 1
+            logger.warning(f"Blocking DB call on event loop thread: {statement[:80]}")
+
+
+def _engine_kwargs(url, settings: Settings) -> Dict[str, Any]:
+    is_sqlite = url.get_backend_name() == "sqlite"
+    is_memory = is_sqlite and (not url.database or url.database == ":memory:")
+
+    kwargs: Dict[str, Any] = {}
+    if is_sqlite:
+        # Соединения из пула используются в разных потоках (to_thread, пул исполнителя)
+        kwargs["connect_args"] = {"check_same_thread": False}
+    else:
+        kwargs["pool_pre_ping"] = True
+    if not is_memory:
+        kwargs.update(
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+        )
+    return kwargs
+
+
+def _create_engine(database_url: str, settings: Settings) -> Engine:
+    url = make_url(database_url)
+    engine = create_engine(database_url, **_engine_kwargs(url, settings))
+
+    if url.get_backend_name() == "sqlite":
+        @event.listens_for(engine, "connect")
+        def _on_connect(dbapi_connection, connection_record):
+            _apply_sqlite_pragmas(dbapi_connection, settings)
+
+    return engine
+
+
+def get_engine(database_url: Optional[str] = None) -> Engine:
+    """Возвращает общий движок для URL (по умолчанию Settings.database_url)"""
+    settings = _get_settings()
+    key = normalize_database_url(database_url or settings.database_url)
+    engine = _engines.get(key)
+    if engine is not None:
+        return engine
+
+    with _lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = _create_engine(key, settings)
+            if settings.db_pool_stats:
+                _install_pool_stats(engine, key)
+            if settings.db_loop_guard:
+                _install_loop_guard(engine, key)
+            _engines[key] = engine
+            logger.info(f"Database engine created for {make_url(key).render_as_string(hide_password=True)}")
+    return engine
+
+
+def get_sessionmaker(database_url: Optional[str] = None) -> sessionmaker:
+    """Возвращает общую фабрику сессий для URL"""
+    key = normalize_database_url(database_url or _get_settings().database_url)
+    factory = _sessionmakers.get(key)
+    if factory is None:
+        with _lock:
+            factory = _sessionmakers.get(key)
+            if factory is None:
+                factory = sessionmaker(bind=get_engine(key))
+                _sessionmakers[key] = factory
+    return factory
+
+
+def to_async_url(database_url: str) -> str:
+    """Подменяет драйвер URL на асинхронный (sqlite -> sqlite+aiosqlite)"""
+    url = make_url(database_url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None or url.drivername == driver:
+        return url.render_as_string(hide_password=False)
+    return url.set(drivername=driver).render_as_string(hide_password=False)
+
+
+def get_async_engine(database_url: Optional[str] = None) -> Any:
+    """Возвращает общий асинхронный движок для того же файла/сервера БД"""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    settings = _get_settings()
+    key = normalize_database_url(database_url or settings.database_url)
+    engine = _async_engines.get(key)
+    if engine is not None:
+        return engine
+
+    with _lock:
+        engine = _async_engines.get(key)
+        if engine is None:
+            url = make_url(to_async_url(key))
+            engine = create_async_engine(url, **_engine_kwargs(url, settings))
+            if url.get_backend_name() == "sqlite":
+                @event.listens_for(engine.sync_engine, "connect")
+                def _on_connect(dbapi_connection, connection_record):
+                    _apply_sqlite_pragmas(dbapi_connection, settings)
+            _async_engines[key] = engine
+    return engine
+
+
+def get_async_sessionmaker(database_url: Optional[str] = None) -> "async_sessionmaker":
+    """Возвращает общую фабрику AsyncSession (expire_on_commit=False)"""
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    key = normalize_database_url(database_url or _get_settings().database_url)
+    factory = _async_sessionmakers.get(key)
+    if factory is None:
+        with _lock:
+            factory = _async_sessionmakers.get(key)
+            if factory is None:
+                factory = async_sessionmaker(get_async_engine(key), expire_on_commit=False)
+                _async_sessionmakers[key] = factory
+    return factory
+
+
+def _get_db_executor() -> ThreadPoolExecutor:
+    global _db_executor
+    if _db_executor is None:
+        with _lock:
+            if _db_executor is None:
+                # Потоков не больше, чем соединений в пуле: лишние ждали бы checkout
+                _db_executor = ThreadPoolExecutor(
+                    max_workers=max(1, _get_settings().db_pool_size),
+                    thread_name_prefix="db",
+                )
+    return _db_executor
+
+
+async def run_in_db_thread(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Выполняет синхронный код с сессией БД в пуле потоков, не блокируя event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_db_executor(), functools.partial(func, *args, **kwargs))
+
+
+def get_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Статистика пулов всех движков процесса"""
+    stats = {}
+    for key, engine in _engines.items():
+        name = make_url(key).render_as_string(hide_password=True)
+        pool = engine.pool
+        entry: Dict[str, Any] = {"status": pool.status()}
+        for attr in ("size", "checkedin", "checkedout", "overflow"):
+            method = getattr(pool, attr, None)
+            if callable(method):
+                entry[attr] = method()
+        if key in _pool_counters:
+            entry.update(_pool_counters[key])
+        stats[name] = entry
+    return stats
+
+
+def dispose_engines() -> None:
+    """Закрывает синхронные пулы и пул потоков БД (при остановке процесса)"""
+    global _db_executor
+    with _lock:
+        if _db_executor is not None:
+            _db_executor.shutdown(wait=True)
+            _db_executor = None
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+        _sessionmakers.clear()
+        _pool_counters.clear()
+
+
+async def dispose_async_engines() -> None:
+    """Закрывает асинхронные пулы"""
+    engines = list(_async_engines.values())
+    _async_engines.clear()
+    _async_sessionmakers.clear()
+    for engine in engines:
+        await engine.dispose()
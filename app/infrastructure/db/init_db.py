@@ -1,10 +1,9 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from app.infrastructure.db.engine import get_engine, get_sessionmaker
 from app.infrastructure.db.models import Base
 
 # Простая инициализация для миграции
-engine = create_engine('sqlite:///data/bot_database.db')
-Session = sessionmaker(bind=engine)
+engine = get_engine()
+Session = get_sessionmaker()
 
 def init_database():
     """Инициализация базы данных"""
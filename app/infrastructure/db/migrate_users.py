@@ -1,7 +1,8 @@
 import json
 import os
 import datetime
-from app.infrastructure.db.session import Session, engine
+from app.infrastructure.db.session import Session
+from app.infrastructure.db.init_db import engine
 from app.infrastructure.db.models import User
 from app.shared.config.bot_config import ADMIN_IDS, SUPERADMIN_IDS
 from app.shared.config.settings import Settings
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey
+from sqlalchemy import BigInteger, Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Index, Text
 from sqlalchemy.orm import relationship, declarative_base
 import datetime
 
@@ -100,4 +100,87 @@ class TriggerStat(Base):
     count = Column(Integer, default=1)
     last_used = Column(DateTime, default=datetime.datetime.utcnow)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
-    user = relationship('User') 
\ No newline at end of file
+    user = relationship('User')
+
+    __table_args__ = (
+        # Уникальный составной индекс — цель для INSERT ... ON CONFLICT DO UPDATE
+        Index('ux_trigger_stats_trigger_user_chat', 'trigger_name', 'user_id', 'chat_id', unique=True),
+    )
+
+class TriggerAnswerStat(Base):
+    __tablename__ = 'trigger_answer_stats'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    trigger_name = Column(String, nullable=False)
+    answer = Column(String, nullable=False)
+    uses = Column(Integer, default=0)
+    likes = Column(Integer, default=0)
+    dislikes = Column(Integer, default=0)
+
+    __table_args__ = (
+        Index('ux_trigger_answer_stats_trigger_answer', 'trigger_name', 'answer', unique=True),
+    )
+
+class QuotaUsage(Base):
+    __tablename__ = 'quota_usage'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, nullable=False)
+    kind = Column(String, nullable=False)  # ai / tts / text
+    period = Column(String, nullable=False)  # day / hour
+    bucket = Column(Integer, nullable=False)  # номер суток/часа от эпохи
+    used = Column(Integer, default=0)
+
+    __table_args__ = (
+        # Одна строка на пользователя, вид квоты и временное окно — цель для ON CONFLICT
+        Index('ux_quota_usage_user_kind_period_bucket', 'user_id', 'kind', 'period', 'bucket', unique=True),
+        Index('ix_quota_usage_period_bucket', 'period', 'bucket'),
+    )
+
+class PhraseDailyCount(Base):
+    __tablename__ = 'phrase_daily_counts'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    phrase_hash = Column(String(16), nullable=False)  # blake2b нормализованного текста
+    day = Column(Integer, nullable=False)  # номер суток (UTC) от эпохи
+    text = Column(String, nullable=False)  # исходный текст первого сообщения с фразой за сутки
+    count = Column(Integer, default=0)
+
+    __table_args__ = (
+        Index('ux_phrase_daily_counts_hash_day', 'phrase_hash', 'day', unique=True),
+        Index('ix_phrase_daily_counts_day', 'day'),
+    )
+
+class PhraseDailyUser(Base):
+    __tablename__ = 'phrase_daily_users'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    phrase_hash = Column(String(16), nullable=False)
+    day = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        # Множество авторов фразы за сутки: повторная вставка игнорируется
+        Index('ux_phrase_daily_users_hash_day_user', 'phrase_hash', 'day', 'user_id', unique=True),
+        Index('ix_phrase_daily_users_day', 'day'),
+    )
+
+class CompletionCacheEntry(Base):
+    __tablename__ = 'completion_cache'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    key = Column(String(32), nullable=False)  # blake2b нормализованного запроса к YandexGPT
+    variants = Column(Text, nullable=False)  # JSON-список вариантов ответа
+    expires_at = Column(Float, nullable=False)  # unix-время истечения
+
+    __table_args__ = (
+        Index('ux_completion_cache_key', 'key', unique=True),
+        Index('ix_completion_cache_expires_at', 'expires_at'),
+    )
+
+class TelegramFileId(Base):
+    __tablename__ = 'telegram_file_ids'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    bot_id = Column(BigInteger, nullable=False)  # file_id действителен только для бота, который его получил
+    content_hash = Column(String(32), nullable=False)  # blake2b вида медиа и содержимого файла
+    file_id = Column(String(255), nullable=False)
+    size = Column(Integer, default=0)  # байт, которые не нужно загружать повторно
+
+    __table_args__ = (
+        Index('ux_telegram_file_ids_bot_hash', 'bot_id', 'content_hash', unique=True),
+    )
@@ -1 +1,10 @@
-"""Package initialization."""
+"""Репозитории SQL-хранилищ и общие для них помощники"""
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+def insert_for(session):
+    """Возвращает insert() диалекта с поддержкой ON CONFLICT"""
+    dialect = session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        return postgresql.insert
+    return sqlite.insert
@@ -0,0 +1,85 @@
+"""
+SQL-хранилище кэша ответов YandexGPT (таблица completion_cache)
+"""
+import json
+import logging
+from typing import Iterable, List, Tuple
+
+from sqlalchemy import delete, select
+
+from app.infrastructure.db.models import CompletionCacheEntry
+from app.infrastructure.db.repositories import insert_for
+
+logger = logging.getLogger(__name__)
+
+# (key, варианты ответа, unix-время истечения)
+CompletionRow = Tuple[str, List[str], float]
+
+
+class CompletionCacheRepository:
+    """Репозиторий постоянной копии кэша ответов"""
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+
+    def ensure_schema(self) -> None:
+        """Создает таблицу и индексы, если их еще нет"""
+        with self.session_factory() as session:
+            bind = session.get_bind()
+            CompletionCacheEntry.__table__.create(bind, checkfirst=True)
+            for index in CompletionCacheEntry.__table__.indexes:
+                index.create(bind, checkfirst=True)
+
+    def load(self, now: float, limit: int) -> List[CompletionRow]:
+        """Неистекшие записи, самые свежие первыми"""
+        with self.session_factory() as session:
+            rows = session.execute(
+                select(CompletionCacheEntry.key, CompletionCacheEntry.variants, CompletionCacheEntry.expires_at)
+                .where(CompletionCacheEntry.expires_at > now)
+                .order_by(CompletionCacheEntry.expires_at.desc())
+                .limit(limit)
+            ).all()
+        result = []
+        for row in rows:
+            try:
+                variants = json.loads(row.variants)
+            except ValueError:
+                logger.warning(f"Skipping broken completion cache row {row.key}")
+                continue
+            result.append((row.key, variants, row.expires_at))
+        return result
+
+    def upsert(self, rows: Iterable[CompletionRow]) -> int:
+        """Записывает варианты и срок жизни (INSERT ... ON CONFLICT DO UPDATE)"""
+        values = [
+            {"key": key, "variants": json.dumps(variants, ensure_ascii=False), "expires_at": expires_at}
+            for key, variants, expires_at in rows
+        ]
+        if not values:
+            return 0
+        with self.session_factory() as session:
+            insert = insert_for(session)
+            stmt = insert(CompletionCacheEntry)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["key"],
+                set_={"variants": stmt.excluded.variants, "expires_at": stmt.excluded.expires_at},
+            )
+            session.execute(stmt, values)
+            session.commit()
+        return len(values)
+
+    def delete(self, keys: Iterable[str]) -> int:
+        keys = list(keys)
+        if not keys:
+            return 0
+        with self.session_factory() as session:
+            result = session.execute(delete(CompletionCacheEntry).where(CompletionCacheEntry.key.in_(keys)))
+            session.commit()
+            return result.rowcount or 0
+
+    def prune(self, now: float) -> int:
+        """Удаляет истекшие записи"""
+        with self.session_factory() as session:
+            result = session.execute(delete(CompletionCacheEntry).where(CompletionCacheEntry.expires_at <= now))
+            session.commit()
+            return result.rowcount or 0
@@ -0,0 +1,70 @@
+"""
+SQL-хранилище file_id отправленных ботом файлов (таблица telegram_file_ids)
+"""
+import logging
+from typing import Dict, Iterable, Tuple
+
+from sqlalchemy import delete, select
+
+from app.infrastructure.db.models import TelegramFileId
+from app.infrastructure.db.repositories import insert_for
+
+logger = logging.getLogger(__name__)
+
+# (хэш содержимого, file_id, размер в байтах)
+FileIdRow = Tuple[str, str, int]
+
+
+class FileIdRepository:
+    """Репозиторий реестра file_id"""
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+
+    def ensure_schema(self) -> None:
+        """Создает таблицу и индексы, если их еще нет"""
+        with self.session_factory() as session:
+            bind = session.get_bind()
+            TelegramFileId.__table__.create(bind, checkfirst=True)
+            for index in TelegramFileId.__table__.indexes:
+                index.create(bind, checkfirst=True)
+
+    def load(self, bot_id: int) -> Dict[str, Tuple[str, int]]:
+        """Хэш содержимого -> (file_id, размер) для бота"""
+        with self.session_factory() as session:
+            rows = session.execute(
+                select(TelegramFileId.content_hash, TelegramFileId.file_id, TelegramFileId.size)
+                .where(TelegramFileId.bot_id == bot_id)
+            ).all()
+        return {row.content_hash: (row.file_id, row.size or 0) for row in rows}
+
+    def upsert(self, bot_id: int, rows: Iterable[FileIdRow]) -> int:
+        """Записывает file_id (INSERT ... ON CONFLICT DO UPDATE)"""
+        values = [
+            {"bot_id": bot_id, "content_hash": content_hash, "file_id": file_id, "size": size}
+            for content_hash, file_id, size in rows
+        ]
+        if not values:
+            return 0
+        with self.session_factory() as session:
+            insert = insert_for(session)
+            stmt = insert(TelegramFileId)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["bot_id", "content_hash"],
+                set_={"file_id": stmt.excluded.file_id, "size": stmt.excluded.size},
+            )
+            session.execute(stmt, values)
+            session.commit()
+        return len(values)
+
+    def delete(self, bot_id: int, hashes: Iterable[str]) -> int:
+        hashes = list(hashes)
+        if not hashes:
+            return 0
+        with self.session_factory() as session:
+            result = session.execute(
+                delete(TelegramFileId)
+                .where(TelegramFileId.bot_id == bot_id, TelegramFileId.content_hash.in_(hashes))
+            )
+            session.commit()
+            return result.rowcount or 0
@@ -0,0 +1,162 @@
+"""
+SQL-хранилище суточных счетчиков фраз (таблицы phrase_daily_counts и phrase_daily_users)
+
+Каждое сохраненное сообщение увеличивает счетчик своей нормализованной
+фразы в корзине текущих суток, а автор добавляется во множество авторов
+фразы за эти сутки. Популярные фразы за N дней — сумма последних N
+корзин, без GROUP BY по всей таблице messages. Вместе с ключом хранится
+исходный текст первого сообщения с этой фразой — его и видят потребители.
+"""
+import datetime
+import hashlib
+import logging
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+from sqlalchemy import delete, func, select
+
+from app.infrastructure.db.models import PhraseDailyCount, PhraseDailyUser
+from app.infrastructure.db.repositories import insert_for
+
+logger = logging.getLogger(__name__)
+
+# Минимальная длина фразы, как в прежнем запросе get_popular_phrases
+MIN_PHRASE_LENGTH = 5
+
+# (phrase_hash, day) -> [исходный текст, count]
+CountDeltas = Dict[Tuple[str, int], List[Any]]
+# {(phrase_hash, day, user_id)}
+UserSet = Set[Tuple[str, int, int]]
+
+
+def normalize_phrase(text: str) -> str:
+    """Нижний регистр и одиночные пробелы"""
+    return " ".join(text.lower().split())
+
+
+def phrase_hash(normalized: str) -> str:
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def day_bucket(moment: datetime.datetime) -> int:
+    """Номер суток от эпохи для наивного UTC-времени"""
+    return (moment.date() - datetime.date(1970, 1, 1)).days
+
+
+def aggregate_messages(rows: Iterable[Dict[str, Any]]) -> Tuple[CountDeltas, UserSet]:
+    """Сворачивает строки messages (user_id, message_text, timestamp) в приращения"""
+    counts: CountDeltas = {}
+    users: UserSet = set()
+    for row in rows:
+        text = row.get("message_text")
+        if not text:
+            continue
+        normalized = normalize_phrase(text)
+        if len(normalized) < MIN_PHRASE_LENGTH:
+            continue
+        key = (phrase_hash(normalized), day_bucket(row.get("timestamp") or datetime.datetime.utcnow()))
+        entry = counts.get(key)
+        if entry is None:
+            counts[key] = [text.strip(), 1]
+        else:
+            entry[1] += 1
+        users.add((key[0], key[1], row["user_id"]))
+    return counts, users
+
+
+class PhraseCountRepository:
+    """Репозиторий суточных счетчиков фраз с пакетными UPSERT"""
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+
+    def ensure_schema(self) -> None:
+        """Создает таблицы и индексы, если их еще нет"""
+        with self.session_factory() as session:
+            bind = session.get_bind()
+            for model in (PhraseDailyCount, PhraseDailyUser):
+                model.__table__.create(bind, checkfirst=True)
+                for index in model.__table__.indexes:
+                    index.create(bind, checkfirst=True)
+
+    def add_messages(self, session, rows: Iterable[Dict[str, Any]]) -> int:
+        """Учитывает строки сообщений в открытой сессии (коммит — на вызывающем)"""
+        counts, users = aggregate_messages(rows)
+        if not counts:
+            return 0
+        insert = insert_for(session)
+
+        stmt = insert(PhraseDailyCount)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["phrase_hash", "day"],
+            set_={"count": PhraseDailyCount.count + stmt.excluded.count},
+        )
+        session.execute(stmt, [
+            {"phrase_hash": hash_, "day": day, "text": text, "count": count}
+            for (hash_, day), (text, count) in counts.items()
+        ])
+
+        stmt = insert(PhraseDailyUser).on_conflict_do_nothing(
+            index_elements=["phrase_hash", "day", "user_id"],
+        )
+        session.execute(stmt, [
+            {"phrase_hash": hash_, "day": day, "user_id": user_id}
+            for hash_, day, user_id in users
+        ])
+        return len(counts)
+
+    def top_phrases(self, since_day: int, min_count: int = 3, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Фразы с суммой корзин начиная с since_day не меньше min_count.
+
+        Корзина since_day учитывается целиком: окно «за N дней» с границей
+        внутри суток захватывает до суток больше, чем фильтр по timestamp.
+        text — исходный текст одного из сообщений фразы.
+        """
+        with self.session_factory() as session:
+            total = func.sum(PhraseDailyCount.count).label("count")
+            phrases = session.execute(
+                select(
+                    PhraseDailyCount.phrase_hash,
+                    func.max(PhraseDailyCount.text).label("text"),
+                    total,
+                )
+                .where(PhraseDailyCount.day >= since_day)
+                .group_by(PhraseDailyCount.phrase_hash)
+                .having(total >= min_count)
+                .order_by(total.desc())
+                .limit(limit)
+            ).all()
+            if not phrases:
+                return []
+
+            hashes = [phrase.phrase_hash for phrase in phrases]
+            unique_users = dict(session.execute(
+                select(
+                    PhraseDailyUser.phrase_hash,
+                    func.count(func.distinct(PhraseDailyUser.user_id)),
+                )
+                .where(PhraseDailyUser.day >= since_day, PhraseDailyUser.phrase_hash.in_(hashes))
+                .group_by(PhraseDailyUser.phrase_hash)
+            ).all())
+
+        return [
+            {
+                'text': phrase.text,
+                'count': phrase.count,
+                'unique_users': unique_users.get(phrase.phrase_hash, 0),
+            }
+            for phrase in phrases
+        ]
+
+    def prune(self, before_day: int) -> int:
+        """Удаляет корзины старше before_day"""
+        with self.session_factory() as session:
+            result = session.execute(delete(PhraseDailyCount).where(PhraseDailyCount.day < before_day))
+            session.execute(delete(PhraseDailyUser).where(PhraseDailyUser.day < before_day))
+            session.commit()
+            return result.rowcount or 0
+
+    def clear(self, session) -> None:
+        """Очищает счетчики в открытой сессии (перед полной пересборкой)"""
+        session.execute(delete(PhraseDailyCount))
+        session.execute(delete(PhraseDailyUser))
@@ -0,0 +1,101 @@
+"""
+SQL-хранилище счетчиков квот (таблица quota_usage)
+"""
+import datetime
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, or_, select
+
+from app.infrastructure.db.models import QuotaUsage, User
+from app.infrastructure.db.repositories import insert_for
+
+logger = logging.getLogger(__name__)
+
+# (user_id, kind, period, bucket) -> приращение
+QuotaDeltas = Dict[Tuple[int, str, str, int], int]
+
+
+class QuotaRepository:
+    """Репозиторий счетчиков квот с построчными атомарными приращениями"""
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+
+    def ensure_schema(self) -> None:
+        """Создает таблицу и индексы, если их еще нет"""
+        with self.session_factory() as session:
+            bind = session.get_bind()
+            QuotaUsage.__table__.create(bind, checkfirst=True)
+            for index in QuotaUsage.__table__.indexes:
+                index.create(bind, checkfirst=True)
+
+    def increment(self, deltas: QuotaDeltas) -> None:
+        """used = used + delta для каждой строки (INSERT ... ON CONFLICT DO UPDATE)"""
+        if not deltas:
+            return
+        rows = [
+            {"user_id": user_id, "kind": kind, "period": period, "bucket": bucket, "used": delta}
+            for (user_id, kind, period, bucket), delta in deltas.items()
+        ]
+        with self.session_factory() as session:
+            insert = insert_for(session)
+            stmt = insert(QuotaUsage)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["user_id", "kind", "period", "bucket"],
+                set_={"used": QuotaUsage.used + stmt.excluded.used},
+            )
+            session.execute(stmt, rows)
+            session.commit()
+
+    def load_current(self, buckets: Dict[str, int]) -> List[Any]:
+        """Строки (user_id, kind, period, bucket, used) текущих окон: {period: bucket}"""
+        if not buckets:
+            return []
+        with self.session_factory() as session:
+            return session.execute(
+                select(
+                    QuotaUsage.user_id,
+                    QuotaUsage.kind,
+                    QuotaUsage.period,
+                    QuotaUsage.bucket,
+                    QuotaUsage.used,
+                ).where(or_(*(
+                    and_(QuotaUsage.period == period, QuotaUsage.bucket == bucket)
+                    for period, bucket in buckets.items()
+                )))
+            ).all()
+
+    def reset_user(self, user_id: int, kind: Optional[str] = None) -> None:
+        """Удаляет счетчики пользователя (все или одного вида квоты)"""
+        with self.session_factory() as session:
+            query = delete(QuotaUsage).where(QuotaUsage.user_id == user_id)
+            if kind is not None:
+                query = query.where(QuotaUsage.kind == kind)
+            session.execute(query)
+            session.commit()
+
+    def prune(self, buckets: Dict[str, int]) -> int:
+        """Удаляет строки окон старше указанных: {period: первый сохраняемый bucket}"""
+        if not buckets:
+            return 0
+        with self.session_factory() as session:
+            result = session.execute(
+                delete(QuotaUsage).where(or_(*(
+                    and_(QuotaUsage.period == period, QuotaUsage.bucket < bucket)
+                    for period, bucket in buckets.items()
+                )))
+            )
+            session.commit()
+            return result.rowcount or 0
+
+    def get_supporter(self, user_id: int) -> Tuple[Optional[str], Optional[datetime.datetime]]:
+        """Возвращает (supporter_tier, supporter_until) или (None, None) для не-саппортера"""
+        with self.session_factory() as session:
+            row = session.execute(
+                select(User.is_supporter, User.supporter_tier, User.supporter_until)
+                .where(User.id == user_id)
+            ).first()
+        if row is None or not row.is_supporter or not row.supporter_tier:
+            return None, None
+        return row.supporter_tier, row.supporter_until
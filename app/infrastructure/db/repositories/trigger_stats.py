@@ -0,0 +1,158 @@
+"""
+SQL-хранилище статистики триггеров (таблицы trigger_stats и trigger_answer_stats)
+"""
+import datetime
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select
+
+from app.infrastructure.db.models import TriggerStat, TriggerAnswerStat
+from app.infrastructure.db.repositories import insert_for
+
+logger = logging.getLogger(__name__)
+
+# (trigger_name, user_id, chat_id) -> (count, last_used)
+UsageDeltas = Dict[Tuple[str, int, int], Tuple[int, datetime.datetime]]
+# trigger_name -> answer -> [uses, likes, dislikes]
+AnswerDeltas = Dict[str, Dict[str, List[int]]]
+
+
+class TriggerStatsRepository:
+    """Репозиторий статистики триггеров с пакетными UPSERT"""
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+
+    def ensure_schema(self) -> None:
+        """Создает таблицы и составные индексы, если их еще нет"""
+        with self.session_factory() as session:
+            bind = session.get_bind()
+            for model in (TriggerStat, TriggerAnswerStat):
+                model.__table__.create(bind, checkfirst=True)
+                for index in model.__table__.indexes:
+                    index.create(bind, checkfirst=True)
+
+    def apply_deltas(self, usage: UsageDeltas, answers: AnswerDeltas) -> None:
+        """Применяет накопленные приращения одной транзакцией"""
+        if not usage and not answers:
+            return
+
+        with self.session_factory() as session:
+            insert = insert_for(session)
+
+            if usage:
+                rows = [
+                    {
+                        "trigger_name": trigger,
+                        "user_id": user_id,
+                        "chat_id": chat_id,
+                        "count": count,
+                        "last_used": last_used,
+                        "created_at": last_used,
+                    }
+                    for (trigger, user_id, chat_id), (count, last_used) in usage.items()
+                ]
+                stmt = insert(TriggerStat)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=["trigger_name", "user_id", "chat_id"],
+                    set_={
+                        "count": TriggerStat.count + stmt.excluded.count,
+                        "last_used": stmt.excluded.last_used,
+                    },
+                )
+                session.execute(stmt, rows)
+
+            if answers:
+                rows = [
+                    {
+                        "trigger_name": trigger,
+                        "answer": answer,
+                        "uses": uses,
+                        "likes": likes,
+                        "dislikes": dislikes,
+                    }
+                    for trigger, per_answer in answers.items()
+                    for answer, (uses, likes, dislikes) in per_answer.items()
+                ]
+                stmt = insert(TriggerAnswerStat)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=["trigger_name", "answer"],
+                    set_={
+                        "uses": TriggerAnswerStat.uses + stmt.excluded.uses,
+                        "likes": TriggerAnswerStat.likes + stmt.excluded.likes,
+                        "dislikes": TriggerAnswerStat.dislikes + stmt.excluded.dislikes,
+                    },
+                )
+                session.execute(stmt, rows)
+
+            session.commit()
+
+    def get_answer_stats(self, trigger: str) -> Dict[str, List[int]]:
+        """Возвращает {answer: [uses, likes, dislikes]} для триггера"""
+        with self.session_factory() as session:
+            rows = session.execute(
+                select(
+                    TriggerAnswerStat.answer,
+                    TriggerAnswerStat.uses,
+                    TriggerAnswerStat.likes,
+                    TriggerAnswerStat.dislikes,
+                ).where(TriggerAnswerStat.trigger_name == trigger)
+            ).all()
+        return {row.answer: [row.uses or 0, row.likes or 0, row.dislikes or 0] for row in rows}
+
+    def get_usage_rows(self, trigger: Optional[str] = None) -> List[Any]:
+        """Возвращает строки использования (trigger_name, user_id, chat_id, count, last_used)"""
+        with self.session_factory() as session:
+            query = select(
+                TriggerStat.trigger_name,
+                TriggerStat.user_id,
+                TriggerStat.chat_id,
+                TriggerStat.count,
+                TriggerStat.last_used,
+            )
+            if trigger is not None:
+                query = query.where(TriggerStat.trigger_name == trigger)
+            return session.execute(query).all()
+
+    def get_all_answer_rows(self) -> List[Any]:
+        """Возвращает все строки статистики ответов"""
+        with self.session_factory() as session:
+            return session.execute(
+                select(
+                    TriggerAnswerStat.trigger_name,
+                    TriggerAnswerStat.answer,
+                    TriggerAnswerStat.uses,
+                    TriggerAnswerStat.likes,
+                    TriggerAnswerStat.dislikes,
+                )
+            ).all()
+
+    def get_trigger_summaries(self, min_count: int = 1) -> List[Any]:
+        """Агрегаты по триггерам: общее число использований и уникальных пользователей"""
+        with self.session_factory() as session:
+            return session.execute(
+                select(
+                    TriggerStat.trigger_name,
+                    func.sum(TriggerStat.count).label("total"),
+                    func.count(func.distinct(TriggerStat.user_id)).label("unique_users"),
+                )
+                .group_by(TriggerStat.trigger_name)
+                .having(func.sum(TriggerStat.count) >= min_count)
+            ).all()
+
+    def get_used_answers(self, triggers: Iterable[str]) -> Dict[str, List[str]]:
+        """Возвращает использованные ответы для набора триггеров"""
+        triggers = list(triggers)
+        if not triggers:
+            return {}
+        with self.session_factory() as session:
+            rows = session.execute(
+                select(TriggerAnswerStat.trigger_name, TriggerAnswerStat.answer)
+                .where(TriggerAnswerStat.trigger_name.in_(triggers))
+                .where(TriggerAnswerStat.uses > 0)
+            ).all()
+        result: Dict[str, List[str]] = {}
+        for row in rows:
+            result.setdefault(row.trigger_name, []).append(row.answer)
+        return result
@@ -0,0 +1,152 @@
+"""
+Асинхронный репозиторий пользователей и баллов (таблицы users и chat_points)
+"""
+import logging
+from typing import Any, Callable, List, Optional, Tuple, TypeVar
+
+from sqlalchemy import select, update
+
+from app.infrastructure.db.models import User, ChatPoints
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Значения по умолчанию для новой строки users (ORM-дефолты применяются только при flush)
+USER_DEFAULTS = {
+    "points": 0,
+    "rank": "novice",
+    "active_days": 0,
+    "referrals": 0,
+    "message_count": 0,
+    "is_supporter": False,
+}
+
+
+class UserRepository:
+    """Репозиторий пользователей поверх AsyncSession"""
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+
+    async def get(self, user_id: int) -> Optional[User]:
+        async with self.session_factory() as session:
+            return await session.get(User, user_id)
+
+    async def modify(self, user_id: int, func: Callable[[User], T], **defaults: Any) -> T:
+        """
+        Загружает (или создает) пользователя, применяет func и фиксирует изменения
+        одной транзакцией. Возвращает результат func.
+        """
+        async with self.session_factory() as session:
+            user = await session.get(User, user_id)
+            if user is None:
+                user = User(id=user_id, **{**USER_DEFAULTS, **defaults})
+                session.add(user)
+            result = func(user)
+            await session.commit()
+            return result
+
+    async def sync_info(self, user_id: int, username: Optional[str] = None,
+                        first_name: Optional[str] = None) -> None:
+        """Обновляет username/first_name (None не затирает сохраненные значения)"""
+        def apply(user: User) -> None:
+            if username is not None:
+                user.username = username
+            if first_name is not None:
+                user.first_name = first_name
+
+        await self.modify(user_id, apply, username=username, first_name=first_name)
+
+    async def update_fields(self, user_id: int, **fields: Any) -> User:
+        def apply(user: User) -> User:
+            for key, value in fields.items():
+                if hasattr(user, key):
+                    setattr(user, key, value)
+            return user
+
+        return await self.modify(user_id, apply)
+
+    async def increment_message_count(self, user_id: int) -> int:
+        def apply(user: User) -> int:
+            user.message_count = (user.message_count or 0) + 1
+            return user.message_count
+
+        return await self.modify(user_id, apply, message_count=0)
+
+    async def add_points(self, user_id: int, points: float, chat_id: Optional[int] = None,
+                         rank_func: Optional[Callable[[float, int], str]] = None,
+                         active_days_delta: int = 0, **fields: Any) -> User:
+        """Начисляет баллы (глобально и, если указан chat_id, в чате)"""
+        async with self.session_factory() as session:
+            user = await session.get(User, user_id)
+            if user is None:
+                user = User(id=user_id, **{**USER_DEFAULTS, "points": points})
+                session.add(user)
+            else:
+                user.points = (user.points or 0) + points
+                user.active_days = (user.active_days or 0) + active_days_delta
+                if rank_func is not None:
+                    user.rank = rank_func(user.points, user.referrals or 0)
+                for key, value in fields.items():
+                    if value is not None and hasattr(user, key):
+                        setattr(user, key, value)
+
+            if chat_id:
+                chat_points = await session.get(ChatPoints, (user_id, chat_id))
+                if chat_points is None:
+                    session.add(ChatPoints(user_id=user_id, chat_id=chat_id, points=points))
+                else:
+                    chat_points.points = (chat_points.points or 0) + points
+
+            await session.commit()
+            return user
+
+    async def get_top_by_points(self, limit: int = 10) -> List[User]:
+        async with self.session_factory() as session:
+            result = await session.execute(select(User).order_by(User.points.desc()).limit(limit))
+            return list(result.scalars().all())
+
+    async def get_top_by_chat(self, chat_id: int, limit: int = 15) -> List[Tuple[ChatPoints, User]]:
+        async with self.session_factory() as session:
+            result = await session.execute(
+                select(ChatPoints, User)
+                .join(User, ChatPoints.user_id == User.id)
+                .where(ChatPoints.chat_id == chat_id)
+                .order_by(ChatPoints.points.desc())
+                .limit(limit)
+            )
+            return [(row[0], row[1]) for row in result.all()]
+
+    async def get_top_by_referrals(self, limit: int = 10) -> List[User]:
+        async with self.session_factory() as session:
+            result = await session.execute(select(User).order_by(User.referrals.desc()).limit(limit))
+            return list(result.scalars().all())
+
+    async def get_referrals(self, user_id: int) -> Tuple[List[User], List[User]]:
+        """Возвращает (активные, ожидающие) рефералы пользователя"""
+        async with self.session_factory() as session:
+            active = await session.execute(select(User).where(User.invited_by == user_id))
+            pending = await session.execute(select(User).where(User.pending_referral == user_id))
+            return list(active.scalars().all()), list(pending.scalars().all())
+
+    async def activate_referral(self, user_id: int, ref_id: int) -> Optional[int]:
+        """
+        Переводит ожидающий реферал в активный (invited_by=ref_id, referrals+1).
+        Возвращает новое число рефералов пригласившего или None, если активировать нечего.
+        """
+        async with self.session_factory() as session:
+            ref_user = await session.get(User, ref_id)
+            if ref_user is None:
+                return None
+            result = await session.execute(
+                update(User)
+                .where(User.id == user_id, User.pending_referral == ref_id)
+                .values(invited_by=ref_id, pending_referral=None)
+            )
+            if result.rowcount == 0:
+                await session.rollback()
+                return None
+            ref_user.referrals = (ref_user.referrals or 0) + 1
+            await session.commit()
+            return ref_user.referrals
@@ -1,7 +1,6 @@
-from sqlalchemy.orm import sessionmaker
-from app.infrastructure.db.init_db import engine
+from app.infrastructure.db.engine import get_sessionmaker
 
-Session = sessionmaker(bind=engine)
+Session = get_sessionmaker()
 
 def get_session():
     """Получить сессию базы данных"""
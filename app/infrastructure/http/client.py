@@ -0,0 +1,129 @@
+"""
+Общий HTTP-клиент для внешних API (YandexGPT, SpeechKit).
+
+Раньше каждый запрос открывал свой aiohttp.ClientSession — то есть новое
+TCP-соединение и TLS-рукопожатие с llm.api.cloud.yandex.net на каждый ответ.
+HttpClient держит одну сессию на процесс с пулом keep-alive соединений,
+кэшем DNS, лимитом соединений на хост и раздельными таймаутами на
+подключение и чтение. Сессия создается лениво в текущем event loop и
+закрывается через close() при остановке бота.
+
+Счетчики (через aiohttp TraceConfig): запросы, новые соединения
+(рукопожатия), переиспользованные соединения, попадания/промахи кэша DNS,
+ошибки. Смотри get_stats().
+"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+import aiohttp
+
+from app.shared.config.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+
+class HttpClient:
+    """Долгоживущая aiohttp-сессия с пулом соединений и метриками"""
+
+    def __init__(self, settings: Optional[Settings] = None, *,
+                 connect_timeout: Optional[float] = None, read_timeout: Optional[float] = None,
+                 total_timeout: Optional[float] = None, limit: Optional[int] = None,
+                 limit_per_host: Optional[int] = None, dns_cache_ttl: Optional[int] = None,
+                 keepalive_timeout: Optional[float] = None):
+        settings = settings or Settings()
+        self.connect_timeout = settings.http_connect_timeout if connect_timeout is None else connect_timeout
+        self.read_timeout = settings.http_read_timeout if read_timeout is None else read_timeout
+        self.total_timeout = settings.http_total_timeout if total_timeout is None else total_timeout
+        self.limit = settings.http_pool_limit if limit is None else limit
+        self.limit_per_host = settings.http_pool_limit_per_host if limit_per_host is None else limit_per_host
+        self.dns_cache_ttl = settings.http_dns_cache_ttl if dns_cache_ttl is None else dns_cache_ttl
+        self.keepalive_timeout = (
+            settings.http_keepalive_timeout if keepalive_timeout is None else keepalive_timeout
+        )
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stats = {
+            "sessions_created": 0,
+            "requests": 0,
+            "connections_created": 0,
+            "connections_reused": 0,
+            "dns_cache_hits": 0,
+            "dns_cache_misses": 0,
+            "errors": 0,
+        }
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        trace = aiohttp.TraceConfig()
+
+        def counter(name: str):
+            async def handler(session, context, params) -> None:
+                self._stats[name] += 1
+            return handler
+
+        trace.on_request_start.append(counter("requests"))
+        trace.on_request_exception.append(counter("errors"))
+        trace.on_connection_create_end.append(counter("connections_created"))
+        trace.on_connection_reuseconn.append(counter("connections_reused"))
+        trace.on_dns_cache_hit.append(counter("dns_cache_hits"))
+        trace.on_dns_cache_miss.append(counter("dns_cache_misses"))
+        return trace
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            ttl_dns_cache=self.dns_cache_ttl,
+            use_dns_cache=True,
+            keepalive_timeout=self.keepalive_timeout,
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=self.total_timeout,
+            sock_connect=self.connect_timeout,
+            sock_read=self.read_timeout,
+        )
+        self._stats["sessions_created"] += 1
+        return aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                     trace_configs=[self._trace_config()])
+
+    def session(self) -> aiohttp.ClientSession:
+        """Текущая сессия; вызывается из корутины в работающем event loop"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            if self._session is not None and not self._session.closed:
+                # Сессия осталась от другого (уже завершенного) цикла — закрыть ее отсюда нельзя
+                logger.debug("HTTP session belongs to another event loop, creating a new one")
+            self._session = self._create_session()
+            self._loop = loop
+        return self._session
+
+    @asynccontextmanager
+    async def request(self, method: str, url: str, **kwargs: Any) -> AsyncIterator[aiohttp.ClientResponse]:
+        async with self.session().request(method, url, **kwargs) as response:
+            yield response
+
+    def post(self, url: str, **kwargs: Any):
+        return self.request("POST", url, **kwargs)
+
+    def get(self, url: str, **kwargs: Any):
+        return self.request("GET", url, **kwargs)
+
+    async def close(self) -> None:
+        """Закрывает сессию и пул соединений (при остановке бота)"""
+        session, self._session = self._session, None
+        if session is not None and not session.closed and self._loop is asyncio.get_running_loop():
+            await session.close()
+        self._loop = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        acquired = stats["connections_created"] + stats["connections_reused"]
+        stats["reuse_ratio"] = round(stats["connections_reused"] / acquired, 3) if acquired else 0.0
+        stats["open"] = self._session is not None and not self._session.closed
+        return stats
+
+
+# Глобальный экземпляр (регистрируется в Container как http_client)
+http_client = HttpClient()
@@ -30,7 +30,7 @@ from app.presentation.bot.middlewares.preprocess import PreprocessMiddleware
 from app.presentation.bot.middlewares.antifraud import AntiFraudMiddleware
 from app.presentation.bot.middlewares.allowed_chats import AllowedChatsMiddleware
 from app.presentation.bot.middlewares.user_sync import UserSyncMiddleware
-from app.presentation.bot.middlewares.rate_limiter import RateLimitMiddleware
+from app.presentation.bot.middlewares.rate_limiter import RateLimitMiddleware, message_rate_limiter
 from app.presentation.bot.middlewares.subscription_check import SubscriptionCheckMiddleware
 
 # Сервисы
@@ -38,6 +38,19 @@ from app.domain.services.command_menu import setup_command_menus
 
 # Конфигурация
 from app.shared.config.settings import Settings
+from app.infrastructure.db.engine import dispose_engines, dispose_async_engines
+from app.infrastructure.cache.quota import quota_ledger
+from app.domain.services.triggers.stats import trigger_stats_store
+from app.infrastructure.http.client import http_client
+from app.infrastructure.cache.completions import completion_cache
+from app.infrastructure.cache.tts import tts_audio_cache
+from app.infrastructure.ai.voice_warmup import voice_warmup
+from app.infrastructure.cache.file_ids import file_id_registry
+from app.presentation.bot.middlewares.file_id_reuse import FileIdReuseMiddleware
+from app.infrastructure.ai.admission import llm_admission
+from app.infrastructure.ai.resilience import speechkit_guard, yandexgpt_guard
+from app.infrastructure.ai.streaming import completion_latency
+from app.infrastructure.ai.providers.yandex_gpt import completion_flights
 
 # Настройка логирования
 settings = Settings()
@@ -67,6 +80,8 @@ async def main():
     logger.info("Starting bot...")
     
     bot_instance = Bot(token=TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+    # Повторные голосовые и медиа уходят по file_id без загрузки байтов
+    bot_instance.session.middleware(FileIdReuseMiddleware())
     dp_instance = Dispatcher(storage=MemoryStorage())
 
     # Регистрация middleware
@@ -115,8 +130,44 @@ async def main():
     else:
         logger.warning("Some command menus were not set up successfully")
 
+    # Поднимаем счетчики квот из БД до первого запроса
+    await quota_ledger.start()
+    # Статистика триггеров пишется в БД по таймеру
+    await trigger_stats_store.start()
+    # Поднимаем постоянную копию кэша ответов YandexGPT (если включена)
+    await completion_cache.start()
+    await tts_audio_cache.start()
+    await file_id_registry.start(bot_instance.id)
+    await voice_warmup.start()
+
     logger.info("Bot started successfully! 🚀")
-    await dp_instance.start_polling(bot_instance)
+    try:
+        await dp_instance.start_polling(bot_instance)
+    finally:
+        # Дописываем приращения квот
+        await quota_ledger.stop()
+        await trigger_stats_store.stop()
+        # Дописываем кэш ответов YandexGPT
+        await completion_cache.stop()
+        logger.info(f"Completion cache stats: {completion_cache.get_stats()}")
+        await voice_warmup.stop()
+        logger.info(f"Voice warm-up stats: {voice_warmup.get_stats()}")
+        await tts_audio_cache.stop()
+        logger.info(f"TTS cache stats: {tts_audio_cache.get_stats()}")
+        await file_id_registry.stop()
+        logger.info(f"Telegram file_id reuse stats: {file_id_registry.get_stats()}")
+        logger.info(f"Completion stream latency: {completion_latency.get_stats()}")
+        logger.info(f"Completion single-flight stats: {completion_flights.get_stats()}")
+        logger.info(f"LLM admission stats: {llm_admission.get_stats()}")
+        logger.info(f"YandexGPT resilience stats: {yandexgpt_guard.get_stats()}")
+        logger.info(f"SpeechKit resilience stats: {speechkit_guard.get_stats()}")
+        logger.info(f"Rate limiter stats: {message_rate_limiter.get_stats()}")
+        # Закрываем общий HTTP-клиент к API Яндекса
+        logger.info(f"HTTP client stats: {http_client.get_stats()}")
+        await http_client.close()
+        # Закрываем общие пулы соединений с БД
+        await dispose_async_engines()
+        dispose_engines()
 
 # Обработчик ошибок на уровне модуля
 async def errors_handler(exception):
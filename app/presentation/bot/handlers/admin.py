@@ -8,8 +8,7 @@ from app.domain.services.gamification import points as points_service
 from app.infrastructure.system.adminlog import log_admin_action
 import json
 from app.shared.config.settings import DB_PATH, DATA_DIR
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from app.infrastructure.db.engine import get_engine, get_sessionmaker
 # Импорт модели через функцию для соблюдения архитектуры
 def get_user_model():
     from app.infrastructure.db.models import User
@@ -17,8 +16,8 @@ def get_user_model():
 
 router = Router()
 
-engine = create_engine(f'sqlite:///{DB_PATH}')
-Session = sessionmaker(bind=engine)
+engine = get_engine(f'sqlite:///{DB_PATH}')
+Session = get_sessionmaker(f'sqlite:///{DB_PATH}')
 
 def is_superadmin(user_id):
     return user_id in ADMIN_IDS
@@ -79,7 +78,7 @@ async def addpoints_handler(msg: Message):
     except ValueError:
         await msg.answer("Баллы должны быть числом!")
         return
-    user = points_service.add_points(user_id, points, msg.from_user.username)
+    user = await points_service.add_points_async(user_id, points, msg.from_user.username)
     log_admin_action(msg.from_user.id, msg.from_user.username, "/addpoints", params={"user_id": user_id, "points": points}, result=user)
     await msg.answer(f"✅ Начислено {points} баллов пользователю {user_id}.\nТекущий баланс: {user.points} баллов, ранг: {user.rank}")
 
@@ -98,7 +97,7 @@ async def removepoints_handler(msg: Message):
     except ValueError:
         await msg.answer("Баллы должны быть числом!")
         return
-    user = points_service.add_points(user_id, -points, msg.from_user.username)
+    user = await points_service.add_points_async(user_id, -points, msg.from_user.username)
     log_admin_action(msg.from_user.id, msg.from_user.username, "/removepoints", params={"user_id": user_id, "points": points}, result=user)
     await msg.answer(f"✅ Снято {points} баллов у пользователя {user_id}.\nТекущий баланс: {user.points} баллов, ранг: {user.rank}")
 
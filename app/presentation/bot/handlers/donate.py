@@ -4,6 +4,7 @@ from aiogram.filters import Command
 from app.shared.config.bot_config import ADMIN_IDS
 from app.shared.config.settings import DONATION_TIERS
 from app.domain.services.gamification import points as points_service
+from app.infrastructure.cache.quota import quota_ledger
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from datetime import datetime, timedelta
@@ -193,6 +194,8 @@ async def approve_donate_tier_callback(call: CallbackQuery):
     
     session.commit()
     session.close()
+    # Новый уровень сразу меняет лимиты TTS/AI
+    quota_ledger.invalidate_tier(user_id)
 
     # Уведомляем пользователя
     try:
@@ -86,7 +86,7 @@ async def emoji_answer_callback(call: CallbackQuery):
         if user_answer == correct_answer:
             # Правильный ответ
             points = 10
-            await points_service.add_points(call.from_user.id, points)
+            await points_service.add_points_async(call.from_user.id, points)
             
             await call.message.edit_text(
                 f"🎉 <b>Правильно!</b>\n\n"
@@ -165,7 +165,7 @@ async def trivia_answer_callback(call: CallbackQuery):
         if user_answer == correct_answer:
             # Правильный ответ
             points = 20
-            await points_service.add_points(call.from_user.id, points)
+            await points_service.add_points_async(call.from_user.id, points)
             
             await call.message.edit_text(
                 f"🎉 <b>Правильно!</b>\n\n"
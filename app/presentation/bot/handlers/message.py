@@ -7,7 +7,7 @@ from aiogram.filters import Command
 from pathlib import Path
 from app.infrastructure.system.allowed_chats import list_allowed_chats
 from app.domain.services import top_service
-from app.domain.services import user_service
+from app.domain.services.user import increment_message_count_async
 from app.shared.config.bot_config import SISU_PATTERN
 
 router = Router()
@@ -51,9 +51,9 @@ async def update_user_info_handler(msg: Message):
     # Начислять баллы только в группах
     if msg.chat.type != "private":
         user = msg.from_user
-        top_service.sync_user_data(user.id, user.username, user.first_name)
+        await top_service.sync_user_data_async(user.id, user.username, user.first_name)
         # Увеличиваем счетчик сообщений
-        message_count = user_service.increment_message_count(user.id)
+        message_count = await increment_message_count_async(user.id)
         # Если достигли 5 сообщений, поздравляем
         if message_count == 5:
             await msg.answer("🎉 Поздравляем! Ты достиг 5 сообщений! Теперь ты активный участник!")
@@ -1,7 +1,7 @@
 from aiogram import Router
 from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.filters import Command
-from app.domain.services.user import update_user_info, get_user
+from app.domain.services.user import update_user_info_async, get_user
 from app.domain.services.gamification import points as points_service
 import logging
 from app.shared.config.settings import REQUIRED_SUBSCRIPTIONS, SUBSCRIPTION_GREETING, SUBSCRIPTION_DENY
@@ -43,7 +43,7 @@ async def start_handler(msg: Message):
     user_id = msg.from_user.id
     logging.info(f"[StartHandler] Command: {msg.text}, Args: '{args}'")
     # Получение/создание пользователя через доменный сервис
-    user_service.update_user_info(user_id, msg.from_user.username, msg.from_user.first_name)
+    await user_service.update_user_info(user_id, msg.from_user.username, msg.from_user.first_name)
 
     # Проверка подписки для всех пользователей!
     is_subscribed = await check_user_subs(user_id, bot=msg.bot)
@@ -76,7 +76,7 @@ async def start_handler(msg: Message):
             else:
                 logging.info(f"Пользователь {user_id} уже был приглашён {user.invited_by}")
 
-    update_user_info(user_id, msg.from_user.username, msg.from_user.first_name)
+    await update_user_info_async(user_id, msg.from_user.username, msg.from_user.first_name)
     
     # Обработка специальных аргументов
     logging.info(f"[StartHandler] Processing args: '{args}'")
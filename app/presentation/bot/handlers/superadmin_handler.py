@@ -8,12 +8,12 @@ from sisu_bot.core.config import DB_PATH, DATA_DIR
 from sisu_bot.bot.services.allowed_chats_service import list_allowed_chats, remove_allowed_chat, add_allowed_chat
 from sisu_bot.bot.services import points_service
 from sisu_bot.bot.services.adminlog_service import get_admin_logs
-from sisu_bot.bot.services.trigger_stats_service import get_trigger_stats, suggest_new_triggers, auto_add_suggested_triggers
+from app.domain.services.triggers.stats import get_trigger_stats, suggest_new_triggers, auto_add_suggested_triggers
 from sisu_bot.bot.services.state_service import get_state, update_state, get_mood, set_mood
 from sisu_bot.bot.services.admin_service import add_admin, remove_admin, list_dynamic_admins, get_admin_role
 import logging
-from sqlalchemy import create_engine, func
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import func
+from app.infrastructure.db.engine import get_engine, get_sessionmaker
 from sisu_bot.bot.db.models import User
 from app.shared.config.bot_config import SUPERADMIN_IDS, is_superadmin
 from app.domain.services.motivation import add_motivation, send_voice_motivation, load_motivation_pool
@@ -23,7 +23,9 @@ from app.presentation.bot.handlers.message import SISU_PATTERN
 import asyncio
 from sisu_bot.bot.services.command_menu_service import setup_command_menus
 from sisu_bot.bot.services import persistence_service
-from sisu_bot.bot.services import ai_limits_service
+from app.infrastructure.cache.quota import quota_ledger
+from app.infrastructure.ai.resilience import speechkit_guard, yandexgpt_guard
+from app.infrastructure.ai.voice_warmup import voice_warmup
 from sisu_bot.bot.services import antifraud_service
 
 AI_DIALOG_ENABLED = False
@@ -31,8 +33,8 @@ PRIVATE_ENABLED = False
 
 # Унифицированный путь к БД
 # DB_PATH = Path(__file__).parent.parent.parent.parent / 'data' / 'bot.sqlite3'
-engine = create_engine(f'sqlite:///{DB_PATH}')
-Session = sessionmaker(bind=engine)
+engine = get_engine(f'sqlite:///{DB_PATH}')
+Session = get_sessionmaker(f'sqlite:///{DB_PATH}')
 
 SUPERADMIN_COMMANDS = {
     '/ai_dialog_on': 'Включить AI-диалог',
@@ -187,7 +189,7 @@ async def superadmin_help(msg: Message):
     text += "/list_magic_phrases — показать все магические фразы\n"
     text += "/test_mode [on|off] — включить/выключить тестовый режим\n"
     text += "/reset_user [user_id] — полный сброс пользователя\n"
-    text += "/bot_status — статус бота и всех сервисов\n"
+    text += "/bot_status (/status) — статус бота, сервисов и AI-провайдеров\n"
     text += "/emergency_stop — экстренная остановка бота\n"
     text += "/emergency_resume — возобновление работы бота\n"
     text += "/clear_cache — очистка всех кэшей\n"
@@ -555,6 +557,8 @@ async def superadmin_add_motivation_tts(msg: Message):
         return
 
     if add_motivation(text_to_add):
+        # Озвучиваем заранее, чтобы рассылка взяла голос из кэша
+        voice_warmup.schedule([text_to_add])
         await msg.answer("Запомнила! Теперь буду иногда озвучивать эту мотивацию!")
     else:
         await msg.answer("Ой, я уже знаю эту мотивацию! 🤔")
@@ -581,6 +585,7 @@ async def superadmin_add_voice_excuse(msg: Message):
         await msg.answer("Укажи текст голосовой отмазки: /add_voice_excuse [текст]")
         return
     if add_voice_excuse(text):
+        voice_warmup.schedule([text])
         await msg.answer("Голосовая отмазка добавлена!")
     else:
         await msg.answer("Такая голосовая отмазка уже есть!")
@@ -950,15 +955,15 @@ async def reset_user_handler(msg: Message):
         session.commit()
         session.close()
         
-        # Сбрасываем лимиты
-        ai_limits_service.reset_user_limits(user_id)
+        # Сбрасываем квоты и кэш уровня саппортера
+        await quota_ledger.reset_user_async(user_id)
         
         await msg.answer(f"✅ Пользователь {user_id} полностью сброшен!")
         
     except ValueError:
         await msg.answer("Неверный user_id!")
 
-@router.message(Command("bot_status"))
+@router.message(Command("bot_status", "status"))
 async def bot_status_handler(msg: Message):
     """Статус бота и всех сервисов"""
     if not is_superadmin(msg.from_user.id) or msg.chat.type != "private":
@@ -995,6 +1000,19 @@ async def bot_status_handler(msg: Message):
         total_ai_usage = sum(len(usage.get("daily", 0)) for usage in ai_data.get("usage", {}).values())
         status_text += f"🤖 <b>AI запросов сегодня:</b> {total_ai_usage}\n"
     
+    # Предохранители AI-провайдеров
+    status_text += "\n🛡 <b>AI провайдеры:</b>\n"
+    for title, guard in (("YandexGPT", yandexgpt_guard), ("SpeechKit", speechkit_guard)):
+        stats = guard.get_stats()
+        breaker = stats["breaker"]
+        state_line = {"closed": "✅ работает", "open": "⛔ отключен", "half_open": "🔄 пробный запрос"}.get(breaker["state"], breaker["state"])
+        if "retry_in" in breaker:
+            state_line += f" (проба через {breaker['retry_in']} с)"
+        status_text += f"• {title}: {state_line}\n"
+        status_text += (f"  p95: {stats['latency_p95'] if stats['latency_p95'] is not None else '—'} с, "
+                        f"таймаутов: {stats['timeouts']}, ошибок: {stats['failures']}, "
+                        f"хеджей: {stats['hedged']}, отклонено: {breaker['rejected']}\n")
+    
     await msg.answer(status_text, parse_mode="HTML")
 
 @router.message(Command("emergency_stop"))
@@ -10,10 +10,9 @@ router = Router()
 @router.message(Command("myrank"))
 async def myrank_handler(msg: Message):
     try:
-        user = points_service.get_user(str(msg.from_user.id))
+        user = await points_service.get_user_async(msg.from_user.id)
         if not user:
-            points_service.add_points(str(msg.from_user.id), 0)
-            user = points_service.get_user(str(msg.from_user.id))
+            user = await points_service.add_points_async(msg.from_user.id, 0)
         points = user.points or 0
         referrals = user.referrals or 0
         rank_info = points_service.get_rank_by_points(points, referrals)
@@ -84,10 +83,10 @@ async def top_handler(msg: Message):
     try:
         is_private_chat = (msg.chat.type == "private")
         if is_private_chat:
-            top_list = top_service.get_top_users(limit=15)
+            top_list = await top_service.get_top_users_async(limit=15)
             title_text = "<b>🏆 ГЛОБАЛЬНЫЙ ТОП SISU:</b>\n"
         else:
-            top_list = top_service.get_top_users(limit=15, chat_id=msg.chat.id)
+            top_list = await top_service.get_top_users_async(limit=15, chat_id=msg.chat.id)
             title_text = f"<b>🏆 ТОП В ЧАТЕ {msg.chat.title}:</b>\n"
         text = title_text
         medals = ["🥇", "🥈", "🥉"]
@@ -3,16 +3,14 @@ from aiogram.dispatcher.middlewares.base import BaseMiddleware
 from aiogram.types import Message
 import logging
 from datetime import datetime, timedelta
-from sisu_bot.bot.db.models import User
 from sisu_bot.bot.config import is_superadmin, is_any_admin
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
+from app.infrastructure.db.engine import get_async_sessionmaker
+from app.infrastructure.db.repositories.users import UserRepository
 from app.shared.config.settings import DB_PATH
 
 logger = logging.getLogger(__name__)
 
-engine = create_engine(f'sqlite:///{DB_PATH}')
-Session = sessionmaker(bind=engine)
+user_repository = UserRepository(get_async_sessionmaker(f'sqlite:///{DB_PATH}'))
 
 # Хранение активности пользователей для антифрода
 user_activity: Dict[int, Dict] = {}  # user_id -> {"messages": [], "last_checkin": timestamp, "suspicious_count": 0}
@@ -88,21 +86,17 @@ class AntiFraudMiddleware(BaseMiddleware):
             logger.warning(f"AntiFraud: New user {user_id} with high activity ({len(activity['messages'])} messages in {user_age})")
         
         # 4. Проверка в БД
-        session = Session()
-        try:
-            user = session.query(User).filter(User.id == user_id).first()
-            if user:
-                # Проверка на подозрительные паттерны в БД
-                if user.message_count > 100 and user.active_days < 1:
-                    activity["suspicious_count"] += 1
-                    logger.warning(f"AntiFraud: User {user_id} has high message_count ({user.message_count}) but low active_days ({user.active_days})")
-                
-                # Проверка на множественные рефералы без активности
-                if user.referrals > 5 and user.message_count < 10:
-                    activity["suspicious_count"] += 1
-                    logger.warning(f"AntiFraud: User {user_id} has many referrals ({user.referrals}) but low activity ({user.message_count} messages)")
-        finally:
-            session.close()
+        user = await user_repository.get(user_id)
+        if user:
+            # Проверка на подозрительные паттерны в БД
+            if user.message_count > 100 and user.active_days < 1:
+                activity["suspicious_count"] += 1
+                logger.warning(f"AntiFraud: User {user_id} has high message_count ({user.message_count}) but low active_days ({user.active_days})")
+            
+            # Проверка на множественные рефералы без активности
+            if user.referrals > 5 and user.message_count < 10:
+                activity["suspicious_count"] += 1
+                logger.warning(f"AntiFraud: User {user_id} has many referrals ({user.referrals}) but low activity ({user.message_count} messages)")
         
         # Если накопилось много подозрительных действий
         if activity["suspicious_count"] >= 3:
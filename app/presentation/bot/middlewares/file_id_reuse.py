@@ -0,0 +1,77 @@
+"""
+Повторная отправка файлов по file_id.
+
+Middleware сессии бота: перехватывает sendVoice/sendAudio/sendDocument и
+другие методы отправки медиа. Если файл (BufferedInputFile) уже загружался
+этим ботом, вместо байтов отправляется его file_id из file_id_registry;
+если Telegram отверг file_id — файл загружается как обычно. После загрузки
+file_id из ответа запоминается. Обработчики продолжают вызывать
+answer_voice/send_voice с байтами, ничего не зная о реестре.
+
+Подключение: bot.session.middleware(FileIdReuseMiddleware())
+"""
+import logging
+from typing import Any, Optional
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import (
+    SendAnimation, SendAudio, SendDocument, SendPhoto, SendSticker, SendVideo, SendVideoNote, SendVoice,
+    TelegramMethod,
+)
+from aiogram.types import BufferedInputFile
+
+from app.infrastructure.cache.file_ids import FileIdRegistry, file_id_registry, media_hash
+
+logger = logging.getLogger(__name__)
+
+# Метод отправки -> поле с файлом (оно же поле сообщения в ответе)
+MEDIA_FIELDS = {
+    SendVoice: "voice",
+    SendAudio: "audio",
+    SendDocument: "document",
+    SendPhoto: "photo",
+    SendVideo: "video",
+    SendAnimation: "animation",
+    SendVideoNote: "video_note",
+    SendSticker: "sticker",
+}
+
+
+def _sent_file_id(result: Any, field: str) -> Optional[str]:
+    media = getattr(result, field, None)
+    if isinstance(media, list):
+        # Фото приходят набором размеров; оригинал — последний
+        media = media[-1] if media else None
+    return getattr(media, "file_id", None)
+
+
+class FileIdReuseMiddleware(BaseRequestMiddleware):
+    def __init__(self, registry: Optional[FileIdRegistry] = None):
+        self.registry = registry or file_id_registry
+
+    async def __call__(self, make_request: NextRequestMiddlewareType, bot: Bot, method: TelegramMethod) -> Any:
+        field = MEDIA_FIELDS.get(type(method))
+        media = getattr(method, field, None) if field else None
+        if not self.registry.enabled or not isinstance(media, BufferedInputFile):
+            return await make_request(bot, method)
+
+        content_hash = media_hash(field, media.data)
+        await self.registry.load(bot.id)
+        file_id = self.registry.lookup(bot.id, content_hash)
+        if file_id is not None:
+            try:
+                result = await make_request(bot, method.model_copy(update={field: file_id}))
+                self.registry.record_hit(len(media.data))
+                return result
+            except TelegramBadRequest as e:
+                # Другие ошибки (чат не найден, голосовые запрещены) загрузка не исправит
+                if "file" not in str(e).lower():
+                    raise
+                logger.warning(f"Telegram rejected cached file_id for {field}: {e}; uploading again")
+                self.registry.forget(bot.id, content_hash)
+
+        result = await make_request(bot, method)
+        self.registry.remember(bot.id, content_hash, _sent_file_id(result, field), len(media.data))
+        return result
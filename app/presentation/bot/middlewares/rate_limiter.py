@@ -1,10 +1,9 @@
-from typing import Dict, Tuple, Any
-import time
+from typing import Any, Optional
 from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery
-from collections import defaultdict
 from app.shared.config.settings import Settings
 from app.shared.config.bot_config import is_superadmin, is_any_admin
+from app.shared.utils.rate_limit import SlidingWindowLimiter
 
 settings = Settings()
 RATE_LIMIT_PER_MINUTE = settings.rate_limit_per_minute
@@ -13,10 +12,28 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+LIMIT_MESSAGES = {
+    60: "⏳ Слишком много запросов за минуту. Пожалуйста, подождите немного.",
+    3600: "⏳ Слишком много запросов за час. Пожалуйста, подождите немного.",
+}
+LIMIT_NAMES = {60: "Minute", 3600: "Hour"}
+
+
+def build_message_rate_limiter(settings: Optional[Settings] = None) -> SlidingWindowLimiter:
+    settings = settings or Settings()
+    return SlidingWindowLimiter(
+        [(60, settings.rate_limit_per_minute), (3600, settings.rate_limit_per_hour)],
+        sweep_interval=settings.rate_limit_sweep_interval,
+    )
+
+
+# Глобальный экземпляр: счетчики по пользователям (статистика — в логе при остановке)
+message_rate_limiter = build_message_rate_limiter(settings)
+
+
 class RateLimitMiddleware(BaseMiddleware):
-    def __init__(self):
-        self.minute_limits: Dict[int, list] = defaultdict(list)
-        self.hour_limits: Dict[int, list] = defaultdict(list)
+    def __init__(self, limiter: Optional[SlidingWindowLimiter] = None):
+        self.limiter = limiter or message_rate_limiter
         super().__init__()
 
     async def __call__(
@@ -25,8 +42,8 @@ class RateLimitMiddleware(BaseMiddleware):
         event: Message | CallbackQuery,
         data: dict
     ) -> Any:
-        user_id = event.from_user.id if hasattr(event, 'from_user') else None
-        
+        user_id = event.from_user.id if getattr(event, 'from_user', None) else None
+
         if not user_id:
             return await handler(event, data)
 
@@ -35,33 +52,15 @@ class RateLimitMiddleware(BaseMiddleware):
             logger.info(f"RateLimitMiddleware: Bypassing rate limit for admin user {user_id}")
             return await handler(event, data)
 
-        current_time = time.time()
-        
-        # Очистка старых записей
-        self.minute_limits[user_id] = [t for t in self.minute_limits[user_id] 
-                                     if current_time - t < 60]
-        self.hour_limits[user_id] = [t for t in self.hour_limits[user_id] 
-                                   if current_time - t < 3600]
-
-        # Проверка лимитов
-        if len(self.minute_limits[user_id]) >= RATE_LIMIT_PER_MINUTE:
-            if isinstance(event, Message):
-                await event.answer("⏳ Слишком много запросов за минуту. Пожалуйста, подождите немного.")
-            elif isinstance(event, CallbackQuery):
-                await event.answer("⏳ Слишком много запросов за минуту. Пожалуйста, подождите немного.", show_alert=True)
-            logger.warning(f"RateLimit Exceeded (Minute) for user {user_id}")
-            return # Останавливаем дальнейшую обработку
-        
-        if len(self.hour_limits[user_id]) >= RATE_LIMIT_PER_HOUR:
+        # Проверка лимитов (отклоненные запросы не учитываются)
+        window = self.limiter.hit(user_id)
+        if window is not None:
+            text = LIMIT_MESSAGES.get(window, LIMIT_MESSAGES[60])
             if isinstance(event, Message):
-                await event.answer("⏳ Слишком много запросов за час. Пожалуйста, подождите немного.")
+                await event.answer(text)
             elif isinstance(event, CallbackQuery):
-                await event.answer("⏳ Слишком много запросов за час. Пожалуйста, подождите немного.", show_alert=True)
-            logger.warning(f"RateLimit Exceeded (Hour) for user {user_id}")
+                await event.answer(text, show_alert=True)
+            logger.warning(f"RateLimit Exceeded ({LIMIT_NAMES.get(window, window)}) for user {user_id}")
             return # Останавливаем дальнейшую обработку
 
-        # Добавление новых запросов
-        self.minute_limits[user_id].append(current_time)
-        self.hour_limits[user_id].append(current_time)
-
-        return await handler(event, data) 
\ No newline at end of file
+        return await handler(event, data)
@@ -9,7 +9,7 @@ class UserSyncMiddleware(BaseMiddleware):
     
     async def __call__(self, handler, event: Message, data):
         user = event.from_user
-        self.user_service.update_user_info(
+        await self.user_service.update_user_info(
             user_id=user.id,
             username=user.username,
             first_name=user.first_name
@@ -39,7 +39,22 @@ class Settings(BaseSettings):
     
     # База данных
     database_url: str = Field(default="sqlite:///data/bot_database.db")
-    
+
+    # Пул соединений (один движок на процесс, см. app/infrastructure/db/engine.py)
+    db_pool_size: int = Field(default=5)
+    db_max_overflow: int = Field(default=10)
+    db_pool_timeout: float = Field(default=30.0)  # секунды
+    db_pool_recycle: int = Field(default=1800)  # секунды
+    db_pool_stats: bool = Field(default=False)  # счетчики checkout/checkin
+    db_loop_guard: bool = Field(default=False)  # предупреждать о синхронных запросах в event loop
+
+    # Профиль соединения SQLite (PRAGMA)
+    db_sqlite_journal_mode: str = Field(default="WAL")
+    db_sqlite_synchronous: str = Field(default="NORMAL")
+    db_sqlite_mmap_size: int = Field(default=268435456)  # 256 МБ
+    db_sqlite_cache_size: int = Field(default=-65536)  # отрицательное значение — в КБ (64 МБ)
+    db_sqlite_busy_timeout_ms: int = Field(default=5000)
+
     # Безопасность
     superadmin_ids: List[int] = Field(default_factory=list)
     admin_ids: List[int] = Field(default_factory=list)
@@ -49,6 +64,7 @@ class Settings(BaseSettings):
     # Rate Limiting
     rate_limit_per_minute: int = Field(default=10)
     rate_limit_per_hour: int = Field(default=100)
+    rate_limit_sweep_interval: int = Field(default=300)  # как часто (сек) удалять счетчики молчащих пользователей
     
     # Лимиты для обычных пользователей
     daily_voice_limit: int = Field(default=3)  # 3 голоса в день
@@ -57,6 +73,59 @@ class Settings(BaseSettings):
     # Кэширование
     cache_ttl: int = Field(default=3600)
     
+    # Статистика триггеров: пакетный сброс в БД
+    trigger_stats_flush_interval: float = Field(default=5.0)  # секунды
+    trigger_stats_max_pending: int = Field(default=100)  # приращений в буфере
+    
+    # Общий HTTP-клиент для YandexGPT и SpeechKit (app/infrastructure/http/client.py)
+    http_connect_timeout: float = Field(default=5.0)  # секунды
+    http_read_timeout: float = Field(default=30.0)  # секунды
+    http_total_timeout: float = Field(default=60.0)  # секунды
+    http_pool_limit: int = Field(default=100)  # соединений всего
+    http_pool_limit_per_host: int = Field(default=20)  # соединений на хост
+    http_dns_cache_ttl: int = Field(default=300)  # секунды
+    http_keepalive_timeout: float = Field(default=60.0)  # секунды простоя соединения в пуле
+
+    # Кэш ответов YandexGPT (app/infrastructure/cache/completions.py)
+    llm_cache_enabled: bool = Field(default=True)
+    llm_cache_ttl: float = Field(default=3600.0)  # секунды
+    llm_cache_max_entries: int = Field(default=2000)
+    llm_cache_max_bytes: int = Field(default=4 * 1024 * 1024)  # байт текста ответов
+    llm_cache_variants: int = Field(default=4)  # вариантов ответа на ключ
+    llm_cache_serves_per_refresh: int = Field(default=3)  # попаданий до запроса нового варианта
+    llm_cache_persist: bool = Field(default=False)  # копия в таблице completion_cache
+
+    # Потоковые ответы: не чаще одной правки сообщения за интервал (лимиты Telegram)
+    llm_stream_edit_interval: float = Field(default=1.5)  # секунды
+
+    # Очередь допуска запросов к YandexGPT (app/infrastructure/ai/admission.py)
+    llm_max_in_flight: int = Field(default=4)  # одновременных запросов
+    llm_queue_deadline_superadmin: float = Field(default=30.0)  # секунды ожидания слота
+    llm_queue_deadline_mention: float = Field(default=10.0)
+    llm_queue_deadline_private: float = Field(default=8.0)
+    llm_queue_deadline_random: float = Field(default=2.0)
+
+    # Устойчивость вызовов YandexGPT/SpeechKit (app/infrastructure/ai/resilience.py)
+    ai_llm_budget: float = Field(default=12.0)  # секунды на ответ (для потока — до первого фрагмента)
+    ai_tts_budget: float = Field(default=10.0)  # секунды на синтез
+    ai_hedge_enabled: bool = Field(default=True)  # второй запрос, если нет ответа дольше p95
+    ai_hedge_min_samples: int = Field(default=20)  # успешных вызовов до первого хеджирования
+    ai_hedge_min_delay: float = Field(default=0.5)  # секунды
+    ai_breaker_failure_threshold: int = Field(default=5)  # неудач подряд до размыкания цепи
+    ai_breaker_recovery_timeout: float = Field(default=30.0)  # секунды до пробного вызова
+
+    # Дисковый кэш синтезированной речи (app/infrastructure/cache/tts.py)
+    tts_cache_enabled: bool = Field(default=True)
+    tts_cache_dir: Path = Field(default=Path('data/tts_cache'))
+    tts_cache_max_bytes: int = Field(default=200 * 1024 * 1024)  # байт ogg-файлов
+    tts_warmup_enabled: bool = Field(default=True)  # предсинтез мотиваций и отмазок при старте
+    tts_warmup_concurrency: int = Field(default=3)  # одновременных запросов синтеза при прогреве
+    tts_chunk_chars: int = Field(default=250)  # длиннее — синтез по предложениям с параллельными запросами
+    tts_chunk_concurrency: int = Field(default=3)  # одновременных запросов на один длинный текст
+
+    # Повторная отправка файлов по file_id (app/infrastructure/cache/file_ids.py)
+    telegram_file_id_reuse: bool = Field(default=True)
+
     # Logging
     log_level: str = Field(default='INFO')
     log_file: str = Field(default='bot.log')
@@ -0,0 +1,218 @@
+"""
+Склейка ogg-opus и разбиение текста для синтеза по частям.
+
+SpeechKit синтезирует длинный текст одним медленным запросом. Для стихов и
+песен текст режется по границам предложений на части не длиннее max_chars
+(split_for_tts), части синтезируются параллельно, а полученные ogg-opus
+файлы склеиваются в один логический поток (stitch_opus), который Telegram
+принимает как обычное голосовое сообщение.
+
+Склейка по RFC 7845: заголовки OpusHead/OpusTags берутся из первой части,
+у остальных частей заголовочные страницы отбрасываются; страницы получают
+серийный номер первой части и сквозную нумерацию; флаги BOS/EOS остаются
+только у первой и последней страницы; контрольные суммы пересчитываются.
+
+Granule position пересчитывается по длительности пакетов (байт TOC,
+RFC 6716 3.1): это число отсчетов, декодированных к концу страницы.
+Granule последней страницы части обрезан энкодером (end trimming), а
+pre-skip учтен только в OpusHead первой части, поэтому сдвиг на granule
+предыдущих частей дает сдвинутые метки. Обрезка конца применяется только
+к последней (EOS) странице склейки; разогрев декодера и хвост промежуточных
+частей (единицы миллисекунд) звучат на стыке — в середине потока Ogg Opus
+обрезать их нельзя без перекодирования.
+"""
+import re
+import struct
+from dataclasses import dataclass
+from typing import List, Sequence
+
+CAPTURE_PATTERN = b"OggS"
+HEADER = struct.Struct("<4sBBqIIIB")  # capture, version, type, granule, serial, sequence, crc, segments
+FLAG_BOS = 0x02
+FLAG_EOS = 0x04
+NO_GRANULE = -1  # на странице не заканчивается ни один пакет
+
+# Конец предложения или строки (строки стихов и песен — отдельные фразы)
+SENTENCE_END = re.compile(r"(?<=[.!?…])\s+|\s*\n+\s*")
+SOFT_BREAK = re.compile(r"(?<=[,;:—–-])\s+")
+
+
+def _crc_table() -> List[int]:
+    table = []
+    for byte in range(256):
+        crc = byte << 24
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x04C11DB7) if crc & 0x80000000 else (crc << 1)
+        table.append(crc & 0xFFFFFFFF)
+    return table
+
+
+_CRC_TABLE = _crc_table()
+
+
+def ogg_crc(data: bytes) -> int:
+    """CRC-32 страницы Ogg (полином 0x04C11DB7, без отражения, начальное значение 0)"""
+    crc = 0
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ _CRC_TABLE[(crc >> 24) ^ byte]
+    return crc
+
+
+@dataclass
+class OggPage:
+    header_type: int
+    granule: int
+    serial: int
+    sequence: int
+    lacing: bytes
+    body: bytes
+
+    @property
+    def packets_completed(self) -> int:
+        """Сколько пакетов заканчивается на этой странице"""
+        return sum(1 for value in self.lacing if value < 255)
+
+    def to_bytes(self) -> bytes:
+        header = HEADER.pack(CAPTURE_PATTERN, 0, self.header_type, self.granule,
+                             self.serial, self.sequence, 0, len(self.lacing))
+        page = bytearray(header + self.lacing + self.body)
+        struct.pack_into("<I", page, 22, ogg_crc(page))
+        return bytes(page)
+
+
+def parse_pages(data: bytes) -> List[OggPage]:
+    """Страницы Ogg-потока; ValueError, если данные — не корректный Ogg"""
+    pages = []
+    offset = 0
+    while offset < len(data):
+        if len(data) - offset < HEADER.size:
+            raise ValueError("truncated Ogg page header")
+        capture, version, header_type, granule, serial, sequence, crc, segments = HEADER.unpack_from(data, offset)
+        if capture != CAPTURE_PATTERN or version != 0:
+            raise ValueError(f"not an Ogg page at offset {offset}")
+        lacing_start = offset + HEADER.size
+        lacing = data[lacing_start:lacing_start + segments]
+        body_start = lacing_start + segments
+        body_end = body_start + sum(lacing)
+        if len(lacing) != segments or body_end > len(data):
+            raise ValueError("truncated Ogg page")
+        raw = bytearray(data[offset:body_end])
+        struct.pack_into("<I", raw, 22, 0)
+        if ogg_crc(raw) != crc:
+            raise ValueError(f"Ogg page {sequence} checksum mismatch")
+        pages.append(OggPage(header_type, granule, serial, sequence, lacing, data[body_start:body_end]))
+        offset = body_end
+    return pages
+
+
+def opus_packet_samples(packet: bytes) -> int:
+    """Длительность пакета Opus в отсчетах 48 кГц по байту TOC (RFC 6716 3.1)"""
+    if not packet:
+        raise ValueError("empty Opus packet")
+    config = packet[0] >> 3
+    if config < 12:
+        frame = (480, 960, 1920, 2880)[config & 3]  # SILK: 10, 20, 40, 60 мс
+    elif config < 16:
+        frame = (480, 960)[config & 1]  # Hybrid: 10, 20 мс
+    else:
+        frame = (120, 240, 480, 960)[config & 3]  # CELT: 2.5, 5, 10, 20 мс
+    code = packet[0] & 3
+    if code == 0:
+        frames = 1
+    elif code < 3:
+        frames = 2
+    elif len(packet) < 2:
+        raise ValueError("truncated Opus packet")
+    else:
+        frames = packet[1] & 0x3F
+    return frame * frames
+
+
+def _header_pages(pages: List[OggPage]) -> int:
+    """Число страниц заголовков: OpusHead и OpusTags (он всегда завершает свою страницу)"""
+    headers = 0
+    skip = 0
+    while skip < len(pages) and headers < 2:
+        headers += pages[skip].packets_completed
+        skip += 1
+    return skip
+
+
+def stitch_opus(chunks: Sequence[bytes]) -> bytes:
+    """Склеивает ogg-opus файлы (одинаковые голос и частота) в один поток"""
+    if not chunks:
+        raise ValueError("nothing to stitch")
+    if len(chunks) == 1:
+        return chunks[0]
+
+    output = []
+    serial = None
+    samples = 0  # отсчетов декодировано к концу текущей страницы
+    end_trim = 0
+    for index, chunk in enumerate(chunks):
+        pages = parse_pages(chunk)
+        if not pages or not pages[0].body.startswith(b"OpusHead"):
+            raise ValueError(f"chunk {index} is not an Ogg Opus stream")
+        skip = _header_pages(pages)
+        if serial is None:
+            serial = pages[0].serial
+            output.extend(OggPage(page.header_type & ~FLAG_EOS, page.granule, serial, 0, page.lacing, page.body)
+                          for page in pages[:skip])
+
+        chunk_samples = 0
+        last_granule = NO_GRANULE
+        packet = bytearray()
+        for page in pages[skip:]:
+            offset = 0
+            for value in page.lacing:
+                packet += page.body[offset:offset + value]
+                offset += value
+                if value < 255:
+                    chunk_samples += opus_packet_samples(packet)
+                    packet = bytearray()
+            if page.granule != NO_GRANULE:
+                last_granule = page.granule
+            granule = samples + chunk_samples if page.packets_completed else NO_GRANULE
+            header_type = page.header_type & ~(FLAG_BOS | FLAG_EOS)
+            output.append(OggPage(header_type, granule, serial, 0, page.lacing, page.body))
+        samples += chunk_samples
+        # Сколько отсчетов в конце части энкодер пометил как лишние
+        end_trim = max(0, chunk_samples - last_granule) if last_granule != NO_GRANULE else 0
+
+    for sequence, page in enumerate(output):
+        page.sequence = sequence
+    output[0].header_type |= FLAG_BOS
+    output[-1].header_type |= FLAG_EOS
+    if output[-1].granule != NO_GRANULE:
+        output[-1].granule -= end_trim
+    return b"".join(page.to_bytes() for page in output)
+
+
+def _pack(parts: List[str], max_chars: int, separator: str) -> List[str]:
+    """Жадно собирает части в куски не длиннее max_chars"""
+    chunks: List[str] = []
+    for part in parts:
+        if chunks and len(chunks[-1]) + len(separator) + len(part) <= max_chars:
+            chunks[-1] = f"{chunks[-1]}{separator}{part}"
+        else:
+            chunks.append(part)
+    return chunks
+
+
+def split_for_tts(text: str, max_chars: int) -> List[str]:
+    """Режет текст по предложениям (строкам) на куски не длиннее max_chars"""
+    text = text.strip()
+    if len(text) <= max_chars:
+        return [text] if text else []
+    pieces: List[str] = []
+    for sentence in filter(None, (s.strip() for s in SENTENCE_END.split(text))):
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+            continue
+        # Слишком длинное предложение — по запятым и тире, в крайнем случае по словам
+        for clause in _pack([c for c in SOFT_BREAK.split(sentence) if c], max_chars, " "):
+            if len(clause) <= max_chars:
+                pieces.append(clause)
+            else:
+                pieces.extend(_pack(clause.split(), max_chars, " "))
+    return _pack(pieces, max_chars, " ")
@@ -0,0 +1,233 @@
+"""
+Ограниченная по памяти статистика частых фраз (Space-Saving с затуханием).
+
+Отслеживается не больше capacity фраз. Новая фраза при заполненной
+таблице вытесняет фразу с минимальным счетчиком и наследует его как
+погрешность: оценка count завышает истинное значение не больше чем на
+error, а любая фраза с частотой выше N / capacity гарантированно
+остается в таблице. Минимум ищется через кучу с ленивым удалением
+устаревших записей.
+
+Затухание — прямое (forward decay): вес события растет как
+2 ** ((t - landmark) / half_life), а при чтении счетчики делятся на
+текущий вес. Так старые фразы постепенно уступают место новым без
+обхода всей таблицы на каждое событие; landmark периодически сдвигается.
+"""
+import heapq
+import json
+import os
+import tempfile
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+SNAPSHOT_VERSION = 1
+DEFAULT_CAPACITY = 2000
+DEFAULT_HALF_LIFE = 7 * 24 * 3600
+DEFAULT_CONTEXTS = 5
+# Предел показателя степени до сдвига landmark (2 ** 64 далеко от переполнения float)
+_MAX_EXPONENT = 64
+
+
+class PhraseStat(NamedTuple):
+    phrase: str
+    count: float
+    error: float
+    last_used: float
+    contexts: Tuple[str, ...]
+
+
+class _Counter:
+    __slots__ = ("count", "error", "last_used", "contexts")
+
+    def __init__(self, count: float, error: float, last_used: float, contexts: deque):
+        self.count = count
+        self.error = error
+        self.last_used = last_used
+        self.contexts = contexts
+
+
+class PhraseSketch:
+    """Top-k фраз за фиксированную память с экспоненциальным затуханием"""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, half_life: float = DEFAULT_HALF_LIFE,
+                 max_contexts: int = DEFAULT_CONTEXTS, clock: Callable[[], float] = time.time):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self.half_life = half_life
+        self.max_contexts = max_contexts
+        self._clock = clock
+        self._landmark = clock()
+        self._counters: Dict[str, _Counter] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self.evictions = 0
+
+    # --- Затухание ---
+
+    def _weight(self, now: float) -> float:
+        if not self.half_life:
+            return 1.0
+        return 2.0 ** ((now - self._landmark) / self.half_life)
+
+    def _maybe_shift_landmark(self, now: float) -> None:
+        if not self.half_life or (now - self._landmark) / self.half_life < _MAX_EXPONENT:
+            return
+        scale = self._weight(now)
+        for counter in self._counters.values():
+            counter.count /= scale
+            counter.error /= scale
+        self._landmark = now
+        self._rebuild_heap()
+
+    # --- Куча минимумов ---
+
+    def _rebuild_heap(self) -> None:
+        self._heap = [(counter.count, phrase) for phrase, counter in self._counters.items()]
+        heapq.heapify(self._heap)
+
+    def _pop_min(self) -> Tuple[str, _Counter]:
+        while True:
+            count, phrase = heapq.heappop(self._heap)
+            counter = self._counters.get(phrase)
+            # Запись актуальна, только если счетчик с тех пор не менялся
+            if counter is not None and counter.count == count:
+                return phrase, counter
+
+    # --- Обновление ---
+
+    def add(self, phrase: str, context: Optional[str] = None, now: Optional[float] = None) -> None:
+        """Учитывает одно использование фразы"""
+        now = self._clock() if now is None else now
+        self._maybe_shift_landmark(now)
+        weight = self._weight(now)
+
+        counter = self._counters.get(phrase)
+        if counter is None:
+            if len(self._counters) < self.capacity:
+                counter = _Counter(0.0, 0.0, now, deque(maxlen=self.max_contexts))
+            else:
+                evicted, victim = self._pop_min()
+                del self._counters[evicted]
+                self.evictions += 1
+                counter = _Counter(victim.count, victim.count, now, deque(maxlen=self.max_contexts))
+            self._counters[phrase] = counter
+
+        counter.count += weight
+        counter.last_used = now
+        if context is not None and self.max_contexts:
+            counter.contexts.append(context)
+        heapq.heappush(self._heap, (counter.count, phrase))
+        if len(self._heap) > 4 * self.capacity + 16:
+            self._rebuild_heap()
+
+    def update(self, phrases, context: Optional[str] = None, now: Optional[float] = None) -> None:
+        now = self._clock() if now is None else now
+        for phrase in phrases:
+            self.add(phrase, context, now)
+
+    # --- Чтение ---
+
+    def _stat(self, phrase: str, counter: _Counter, weight: float) -> PhraseStat:
+        return PhraseStat(phrase, counter.count / weight, counter.error / weight,
+                          counter.last_used, tuple(counter.contexts))
+
+    def get(self, phrase: str) -> Optional[PhraseStat]:
+        counter = self._counters.get(phrase)
+        if counter is None:
+            return None
+        return self._stat(phrase, counter, self._weight(self._clock()))
+
+    def top(self, k: int, min_count: float = 0.0) -> List[PhraseStat]:
+        """
+        k фраз с наибольшей гарантированной частотой count - error (не ниже min_count).
+        Оценка count у недавно вытеснившей кого-то фразы почти целиком состоит из
+        унаследованной погрешности, поэтому порог и порядок — по нижней границе.
+        """
+        weight = self._weight(self._clock())
+        threshold = min_count * weight
+        guaranteed = [(phrase, counter) for phrase, counter in self._counters.items()
+                      if counter.count - counter.error >= threshold]
+        best = heapq.nlargest(k, guaranteed, key=lambda item: item[1].count - item[1].error)
+        return [self._stat(phrase, counter, weight) for phrase, counter in best]
+
+    def __len__(self) -> int:
+        return len(self._counters)
+
+    def __contains__(self, phrase: str) -> bool:
+        return phrase in self._counters
+
+    def get_stats(self) -> Dict[str, Union[int, float]]:
+        return {
+            "tracked": len(self._counters),
+            "capacity": self.capacity,
+            "evictions": self.evictions,
+            "heap_size": len(self._heap),
+        }
+
+    # --- Снимок на диск ---
+
+    def to_dict(self) -> Dict:
+        return {
+            "version": SNAPSHOT_VERSION,
+            "landmark": self._landmark,
+            "half_life": self.half_life,
+            "items": [
+                [phrase, counter.count, counter.error, counter.last_used, list(counter.contexts)]
+                for phrase, counter in self._counters.items()
+            ],
+        }
+
+    def load_dict(self, document: Dict) -> bool:
+        """Восстанавливает состояние из снимка; False — формат не подходит"""
+        if not document or document.get("version") != SNAPSHOT_VERSION:
+            return False
+        # Счетчики снимка приводятся к текущему моменту и пересчитываются в шкалу этого скетча
+        now = self._clock()
+        half_life = document.get("half_life")
+        landmark = document.get("landmark", now)
+        present = 2.0 ** ((now - landmark) / half_life) if half_life else 1.0
+        rescale = self._weight(now) / present
+        items = sorted(document.get("items", []), key=lambda item: item[1], reverse=True)
+        self._counters.clear()
+        for phrase, count, error, last_used, contexts in items[:self.capacity]:
+            self._counters[phrase] = _Counter(
+                count * rescale, error * rescale, last_used,
+                deque(contexts, maxlen=self.max_contexts),
+            )
+        self._rebuild_heap()
+        return True
+
+    def save(self, path: Union[str, Path]) -> None:
+        """Атомарно записывает снимок в JSON"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self.to_dict(), f, ensure_ascii=False)
+            os.replace(tmp_name, path)
+        except Exception:
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+            raise
+
+    def load(self, path: Union[str, Path]) -> bool:
+        path = Path(path)
+        if not path.exists():
+            return False
+        with open(path, encoding="utf-8") as f:
+            return self.load_dict(json.load(f))
+
+
+def phrase_ngrams(text: str, min_words: int = 2, max_words: int = 4, min_length: int = 6) -> List[str]:
+    """n-граммы слов из analyze_phrase: 2-4 слова, длиннее 5 символов"""
+    words = text.lower().split()
+    phrases = []
+    for i in range(len(words)):
+        for j in range(min_words, min(max_words + 1, len(words) - i + 1)):
+            phrase = " ".join(words[i:i + j])
+            if len(phrase) >= min_length:
+                phrases.append(phrase)
+    return phrases
@@ -0,0 +1,126 @@
+"""
+Ограничитель частоты со скользящим окном-счетчиком (sliding window counter).
+
+Вместо списка отметок времени на каждого пользователя хранятся несколько
+целых чисел на окно: номер текущего окна, число событий в нем и в
+предыдущем. Число событий за последние window секунд оценивается как
+prev * (доля предыдущего окна, еще попадающая в интервал) + curr — проверка
+и учет события занимают O(1) и не зависят от лимита.
+
+Строки таблицы лежат подряд в одном array('q') (stride целых на ключ),
+словарь хранит только ключ -> номер строки. Раз в sweep_interval секунд
+(попутно с очередной проверкой) удаляются ключи, молчавшие дольше двух
+самых длинных окон: их оценка уже равна нулю. Удаление — перенос последней
+строки на место удаленной, таблица остается плотной и сжимается.
+"""
+import time
+from array import array
+from typing import Any, Callable, Dict, Hashable, Optional, Sequence, Tuple
+
+# Столбцы строки: время последнего события, затем по три на окно
+LAST_SEEN = 0
+WINDOW_COLUMNS = 3  # номер окна, событий в текущем окне, событий в предыдущем
+
+
+class SlidingWindowLimiter:
+    """Несколько лимитов (окно в секундах, событий за окно) на ключ"""
+
+    def __init__(self, limits: Sequence[Tuple[int, int]], *, sweep_interval: float = 300,
+                 clock: Callable[[], float] = time.monotonic):
+        if not limits:
+            raise ValueError("at least one limit is required")
+        # Окна в миллисекундах: вся арифметика целочисленная
+        self.limits = [(int(window * 1000), int(limit)) for window, limit in limits]
+        self.stride = 1 + WINDOW_COLUMNS * len(self.limits)
+        self.idle_ms = 2 * max(window for window, _ in self.limits)
+        self.sweep_ms = int(sweep_interval * 1000)
+        self.clock = clock
+        self._slots: Dict[Hashable, int] = {}
+        self._keys: list = []  # номер строки -> ключ (для переноса строк при удалении)
+        self._table = array("q")
+        self._next_sweep = self._now() + self.sweep_ms
+        self._stats = {
+            "allowed": 0,
+            "limited": 0,
+            "evicted": 0,
+            "sweeps": 0,
+        }
+
+    def _now(self) -> int:
+        return int(self.clock() * 1000)
+
+    def _row(self, key: Hashable, now: int) -> int:
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = len(self._keys)
+            self._slots[key] = slot
+            self._keys.append(key)
+            self._table.extend([0] * self.stride)
+            base = slot * self.stride
+            for i, (window, _) in enumerate(self.limits):
+                self._table[base + 1 + i * WINDOW_COLUMNS] = now // window
+        return slot * self.stride
+
+    def hit(self, key: Hashable) -> Optional[int]:
+        """Учитывает событие; None — разрешено, иначе окно (в секундах), лимит которого исчерпан"""
+        now = self._now()
+        if now >= self._next_sweep:
+            self.sweep(now)
+        table = self._table
+        base = self._row(key, now)
+        offset = base + 1
+        for window, limit in self.limits:
+            index = now // window
+            shift = index - table[offset]
+            if shift:
+                # Окно сдвинулось: текущее становится предыдущим, после паузы — оба пустые
+                table[offset + 2] = table[offset + 1] if shift == 1 else 0
+                table[offset + 1] = 0
+                table[offset] = index
+            elapsed = now - index * window
+            # prev * (window - elapsed) / window + curr >= limit, без деления
+            if table[offset + 2] * (window - elapsed) + table[offset + 1] * window >= limit * window:
+                table[base + LAST_SEEN] = now
+                self._stats["limited"] += 1
+                return window // 1000
+            offset += WINDOW_COLUMNS
+        offset = base + 1
+        for _ in self.limits:
+            table[offset + 1] += 1
+            offset += WINDOW_COLUMNS
+        table[base + LAST_SEEN] = now
+        self._stats["allowed"] += 1
+        return None
+
+    def _remove(self, key: Hashable) -> None:
+        slot = self._slots.pop(key)
+        last = len(self._keys) - 1
+        if slot != last:
+            moved = self._keys[last]
+            self._keys[slot] = moved
+            self._slots[moved] = slot
+            self._table[slot * self.stride:(slot + 1) * self.stride] = \
+                self._table[last * self.stride:(last + 1) * self.stride]
+        self._keys.pop()
+        del self._table[last * self.stride:]
+
+    def sweep(self, now: Optional[int] = None) -> int:
+        """Удаляет ключи без событий дольше двух самых длинных окон; возвращает их число"""
+        now = self._now() if now is None else now
+        self._next_sweep = now + self.sweep_ms
+        table, stride, cutoff = self._table, self.stride, now - self.idle_ms
+        idle = [key for slot, key in enumerate(self._keys) if table[slot * stride + LAST_SEEN] <= cutoff]
+        for key in idle:
+            self._remove(key)
+        self._stats["sweeps"] += 1
+        self._stats["evicted"] += len(idle)
+        return len(idle)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["tracked"] = len(self._keys)
+        stats["table_bytes"] = self._table.buffer_info()[1] * self._table.itemsize
+        return stats
@@ -0,0 +1,78 @@
+"""
+Схлопывание одновременных одинаковых запросов (single-flight).
+
+Когда несколько корутин одновременно запрашивают одно и то же (один и тот же
+промпт к YandexGPT, один и тот же текст для SpeechKit), во внешний API уходит
+один запрос, а остальные ждут его результат. Запрос выполняется в отдельной
+задаче, вызывающие ждут ее через asyncio.shield: отмена одного из них не
+отменяет запрос для остальных. Задача отменяется, только если отменились
+все ожидающие. Ошибку запроса получают все ожидающие.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Один запрос во внешний API на ключ, пока он выполняется"""
+
+    def __init__(self, name: str = "default"):
+        self.name = name
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        # Задача -> число корутин, которые ее ждут
+        self._waiters: Dict[asyncio.Task, int] = {}
+        self._stats = {
+            "calls": 0,
+            "upstream_calls": 0,
+            "coalesced": 0,
+            "cancelled_waiters": 0,
+            "cancelled_upstream": 0,
+        }
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        # Ошибку забирает хотя бы один ожидающий; если все отменились — помечаем ее полученной здесь
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"Single-flight {self.name} call failed: {task.exception()}")
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Результат fn() для ключа; одновременные вызовы с тем же ключом ждут один запрос"""
+        self._stats["calls"] += 1
+        loop = asyncio.get_running_loop()
+        task = self._tasks.get(key)
+        if task is None or task.done() or task.get_loop() is not loop:
+            task = loop.create_task(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda t, key=key: self._forget(key, t))
+            self._stats["upstream_calls"] += 1
+        else:
+            self._stats["coalesced"] += 1
+
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            self._stats["cancelled_waiters"] += 1
+            if self._waiters.get(task, 0) <= 1 and not task.done():
+                # Ждать результат больше некому; новые вызовы начнут запрос заново
+                task.cancel()
+                if self._tasks.get(key) is task:
+                    del self._tasks[key]
+                self._stats["cancelled_upstream"] += 1
+            raise
+        finally:
+            remaining = self._waiters.get(task, 1) - 1
+            if remaining > 0:
+                self._waiters[task] = remaining
+            else:
+                self._waiters.pop(task, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["in_flight"] = len(self._tasks)
+        return stats
@@ -0,0 +1,137 @@
+"""
+Поиск триггеров автоматом Ахо–Корасик.
+
+Все шаблоны компилируются в один автомат, и сообщение проходится один раз
+независимо от числа триггеров. Для каждого состояния заранее вычисляется
+лучший (по приоритету, затем по порядку добавления) шаблон среди самого
+состояния и его суффиксных ссылок, поэтому на каждом символе нужна одна
+проверка. Шаблоны с whole_word=True засчитываются только на границах слов.
+Автомат неизменяем: при добавлении триггеров строится новый и подменяется
+целиком.
+"""
+from collections import deque
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+
+class TriggerEntry(NamedTuple):
+    pattern: str
+    priority: int
+    payload: Any
+    whole_word: bool = False
+
+
+class TriggerHit(NamedTuple):
+    entry: TriggerEntry
+    start: int
+    end: int
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+class TriggerMatcher:
+    """Неизменяемый автомат Ахо–Корасик с выбором лучшего по приоритету совпадения"""
+
+    def __init__(self, entries: Iterable[TriggerEntry]):
+        self.entries: List[TriggerEntry] = []
+        # Порядок добавления разрешает равенство приоритетов (как во вложенном цикле)
+        self._keys: List[Tuple[int, int]] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._best: List[int] = [-1]
+        self._word_outputs: List[Tuple[int, ...]] = [()]
+
+        for entry in entries:
+            if not entry.pattern:
+                continue
+            index = len(self.entries)
+            self.entries.append(entry)
+            self._keys.append((entry.priority, -index))
+            self._insert(entry, index)
+        self._link()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    # --- Построение ---
+
+    def _insert(self, entry: TriggerEntry, index: int) -> None:
+        state = 0
+        for ch in entry.pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._best.append(-1)
+                self._word_outputs.append(())
+            state = nxt
+        if entry.whole_word:
+            self._word_outputs[state] += (index,)
+        elif self._better(index, self._best[state]):
+            self._best[state] = index
+
+    def _better(self, index: int, current: int) -> bool:
+        return index >= 0 and (current < 0 or self._keys[index] > self._keys[current])
+
+    def _link(self) -> None:
+        """Суффиксные ссылки (BFS) и слияние выходов по цепочке ссылок"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            fail = self._fail[state]
+            if self._better(self._best[fail], self._best[state]):
+                self._best[state] = self._best[fail]
+            if self._word_outputs[fail]:
+                self._word_outputs[state] += self._word_outputs[fail]
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = fail
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                candidate = self._goto[f].get(ch, 0)
+                self._fail[nxt] = candidate if candidate != nxt else 0
+
+    # --- Поиск ---
+
+    def search(self, text: str) -> Optional[TriggerHit]:
+        """Лучшее совпадение в тексте за один проход или None"""
+        goto, fail, best, word_outputs, keys = self._goto, self._fail, self._best, self._word_outputs, self._keys
+        state = 0
+        found, found_end = -1, -1
+        length = len(text)
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not state:
+                continue
+            index = best[state]
+            if index >= 0 and (found < 0 or keys[index] > keys[found]):
+                found, found_end = index, i
+            for index in word_outputs[state]:
+                if found >= 0 and keys[index] <= keys[found]:
+                    continue
+                start = i - len(self.entries[index].pattern) + 1
+                if start > 0 and _is_word_char(text[start - 1]):
+                    continue
+                if i + 1 < length and _is_word_char(text[i + 1]):
+                    continue
+                found, found_end = index, i
+        if found < 0:
+            return None
+        entry = self.entries[found]
+        return TriggerHit(entry, found_end - len(entry.pattern) + 1, found_end + 1)
+
+
+def naive_search(entries: Iterable[TriggerEntry], text: str) -> Optional[TriggerEntry]:
+    """Эталонный перебор `pattern in text` (для сравнения в тестах и бенчмарке)"""
+    best, best_key = None, None
+    for index, entry in enumerate(entries):
+        if entry.pattern and entry.pattern in text:
+            key = (entry.priority, -index)
+            if best_key is None or key > best_key:
+                best, best_key = entry, key
+    return best
@@ -0,0 +1,217 @@
+"""
+Взвешенный выбор ответов по таблице псевдонимов (метод Воуза).
+
+AliasSampler строится за O(n) один раз на набор ответов и дальше выбирает
+элемент за O(1): одна ячейка таблицы и одно сравнение. Ограничения,
+которые меняются от вызова к вызову, таблицу не перестраивают:
+
+- exclude (последний ответ) — выбор с отказом: выпавший исключенный
+  элемент просто перевыбирается;
+- corrections (поправки к весам отдельных элементов, например бонус за
+  реакции конкретного пользователя) — смесь: положительные поправки
+  выбираются отдельным маленьким списком, отрицательные — принятием с
+  вероятностью (w + d) / w.
+
+Распределение при этом точно совпадает с random.choices по итоговым весам.
+Если вес зависит от минимума по всем элементам (бонус самому редкому
+ответу), min_bonus_corrections переносит бонус на минимум среди
+неисключенных элементов — как при выборе из списка без исключенного.
+SamplerCache хранит таблицы по ключу и сбрасывает их по тегам (ответ,
+триггер), когда меняется статистика. RecentItems ограничивает список
+элементов, для которых у пользователя есть поправки.
+"""
+import random
+from collections import OrderedDict
+from typing import Callable, Dict, Generic, Hashable, Iterable, List, Optional, Sequence, Set, TypeVar
+
+T = TypeVar("T")
+
+# После стольких отказов подряд выбор делается прямым подсчетом весов
+MAX_ATTEMPTS = 32
+
+
+class AliasSampler(Generic[T]):
+    """Таблица псевдонимов для выбора элемента пропорционально весу"""
+
+    def __init__(self, items: Sequence[T], weights: Sequence[float]):
+        if len(items) != len(weights):
+            raise ValueError("items and weights must have the same length")
+        if not items:
+            raise ValueError("items must not be empty")
+        self.items: List[T] = list(items)
+        self.weights: List[float] = [max(0.0, float(w)) for w in weights]
+        self.total = sum(self.weights)
+        self._positions: Dict[T, List[int]] = {}
+        for i, item in enumerate(self.items):
+            self._positions.setdefault(item, []).append(i)
+        self._prob, self._alias = self._build(self.weights if self.total > 0 else [1.0] * len(self.items))
+
+    @staticmethod
+    def _build(weights: List[float]):
+        n = len(weights)
+        total = sum(weights)
+        scaled = [w * n / total for w in weights]
+        prob = [1.0] * n
+        alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s = small.pop()
+            g = large.pop()
+            prob[s] = scaled[s]
+            alias[s] = g
+            scaled[g] = scaled[g] + scaled[s] - 1.0
+            (small if scaled[g] < 1.0 else large).append(g)
+        # Остатки из-за погрешности округления получают вероятность 1
+        return prob, alias
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def index_of(self, item: T) -> Optional[int]:
+        positions = self._positions.get(item)
+        return positions[0] if positions else None
+
+    def _alias_index(self, rng) -> int:
+        i = int(rng.random() * len(self.items))
+        return i if rng.random() < self._prob[i] else self._alias[i]
+
+    def _direct_index(self, excluded: Set[int], corrections: Dict[int, float], rng) -> int:
+        """Прямой подсчет итоговых весов (запасной путь)"""
+        base = self.weights if self.total > 0 else [1.0] * len(self.items)
+        candidates, weights = [], []
+        for i, w in enumerate(base):
+            if i in excluded:
+                continue
+            candidates.append(i)
+            weights.append(max(0.0, w + corrections.get(i, 0.0)))
+        if sum(weights) <= 0:
+            return rng.choice(candidates)
+        return rng.choices(candidates, weights=weights, k=1)[0]
+
+    def sample_index(self, exclude: Optional[T] = None, corrections: Optional[Dict[int, float]] = None,
+                     rng=random) -> int:
+        corrections = corrections or {}
+        excluded = set(self._positions.get(exclude, ())) if exclude is not None else set()
+        if len(excluded) == len(self.items):
+            excluded = set()  # Альтернативы нет — повтор допустим
+        if self.total <= 0:
+            return self._direct_index(excluded, corrections, rng)
+
+        positive = [(i, d) for i, d in corrections.items() if d > 0 and i not in excluded]
+        extra = sum(d for _, d in positive)
+        for _ in range(MAX_ATTEMPTS):
+            if extra and rng.random() * (self.total + extra) >= self.total:
+                r = rng.random() * extra
+                for i, d in positive:
+                    r -= d
+                    if r < 0:
+                        break
+            else:
+                i = self._alias_index(rng)
+            if i in excluded:
+                continue
+            d = corrections.get(i, 0.0)
+            if d < 0 and rng.random() * self.weights[i] >= self.weights[i] + d:
+                continue
+            return i
+        return self._direct_index(excluded, corrections, rng)
+
+    def sample(self, exclude: Optional[T] = None, corrections: Optional[Dict[int, float]] = None,
+               rng=random) -> T:
+        return self.items[self.sample_index(exclude, corrections, rng)]
+
+
+def min_bonus_corrections(sampler: AliasSampler, keys: Sequence[float], exclude: Optional[T],
+                          bonus: float) -> Dict[int, float]:
+    """
+    Поправки для таблицы, где вес элементов с минимальным ключом умножен на bonus.
+    Если exclude был единственным обладателем минимума, бонус получают элементы
+    с минимальным ключом среди оставшихся.
+    """
+    excluded = set(sampler._positions.get(exclude, ())) if exclude is not None else set()
+    rest = [key for i, key in enumerate(keys) if i not in excluded]
+    if not excluded or not rest or min(rest) <= min(keys[i] for i in excluded):
+        return {}
+    lowest = min(rest)
+    return {i: sampler.weights[i] * (bonus - 1) for i, key in enumerate(keys)
+            if i not in excluded and key == lowest}
+
+
+class SamplerCache:
+    """LRU-кэш таблиц с инвалидацией по тегам"""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._samplers: "OrderedDict[Hashable, AliasSampler]" = OrderedDict()
+        self._keys_by_tag: Dict[Hashable, Set[Hashable]] = {}
+        self._tags_by_key: Dict[Hashable, Iterable[Hashable]] = {}
+        self.builds = 0
+
+    def get(self, key: Hashable, build: Callable[[], AliasSampler],
+            tags: Iterable[Hashable] = ()) -> AliasSampler:
+        sampler = self._samplers.get(key)
+        if sampler is not None:
+            self._samplers.move_to_end(key)
+            return sampler
+        sampler = build()
+        self.builds += 1
+        self._samplers[key] = sampler
+        tags = tuple(tags)
+        self._tags_by_key[key] = tags
+        for tag in tags:
+            self._keys_by_tag.setdefault(tag, set()).add(key)
+        if len(self._samplers) > self.maxsize:
+            self._drop(next(iter(self._samplers)))
+        return sampler
+
+    def _drop(self, key: Hashable) -> None:
+        self._samplers.pop(key, None)
+        for tag in self._tags_by_key.pop(key, ()):
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+    def invalidate(self, tag: Hashable) -> None:
+        """Сбрасывает все таблицы, помеченные тегом"""
+        for key in list(self._keys_by_tag.get(tag, ())):
+            self._drop(key)
+
+    def clear(self) -> None:
+        self._samplers.clear()
+        self._keys_by_tag.clear()
+        self._tags_by_key.clear()
+
+    def __len__(self) -> int:
+        return len(self._samplers)
+
+
+class RecentItems:
+    """Последние элементы по ключам с LRU-ограничением на число ключей и элементов на ключ"""
+
+    def __init__(self, max_keys: int = 10000, max_items: int = 64):
+        self.max_keys = max_keys
+        self.max_items = max_items
+        self._items: "OrderedDict[Hashable, OrderedDict[Hashable, None]]" = OrderedDict()
+
+    def add(self, key: Hashable, item: Hashable) -> None:
+        items = self._items.get(key)
+        if items is None:
+            items = self._items[key] = OrderedDict()
+            if len(self._items) > self.max_keys:
+                self._items.popitem(last=False)
+        else:
+            self._items.move_to_end(key)
+        items[item] = None
+        items.move_to_end(item)
+        if len(items) > self.max_items:
+            items.popitem(last=False)
+
+    def get(self, key: Hashable, default: Iterable[Hashable] = ()) -> Iterable[Hashable]:
+        items = self._items.get(key)
+        return tuple(items) if items is not None else default
+
+    def __len__(self) -> int:
+        return len(self._items)
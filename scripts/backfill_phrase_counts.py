@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Пересборка суточных счетчиков фраз (phrase_daily_counts / phrase_daily_users)
+по уже сохраненным строкам таблицы messages.
+
+Нужна один раз после миграции add_phrase_daily_counts: новые сообщения
+учитываются при записи. Счетчики очищаются и собираются заново, поэтому
+повторный запуск безопасен.
+
+Запуск: python scripts/backfill_phrase_counts.py [--batch-size 5000]
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sisu_bot.bot.services.message_service import message_service
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    result = message_service.backfill_phrase_counts(batch_size=args.batch_size)
+    logger.info(f"Backfill finished: {result['messages']} messages up to id {result['max_id']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Задержка нечеткого поиска триггеров на одно сообщение (p50/p99):
+прежний двойной цикл fuzz.partial_ratio против FuzzyTriggerIndex
+(process.extractOne со score_cutoff).
+
+Триггеры берутся из sisu_bot/data/static/*_triggers.json; --synthetic N
+добавляет N случайных триггеров, чтобы оценить рост словаря.
+
+Запуск: python scripts/benchmark_fuzzy_triggers.py [--messages 2000] [--synthetic 0]
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from rapidfuzz import fuzz
+
+from sisu_bot.bot.services.fuzzy_trigger_index import FuzzyTriggerIndex
+
+STATIC_DIR = ROOT / 'sisu_bot' / 'data' / 'static'
+ALPHABET = "абвгдеёжзийклмнопрстуфхцчшщъыьэюя"
+
+
+def load_trigger_map():
+    trigger_map = {}
+    for path in sorted(STATIC_DIR.glob('*_triggers.json')):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        trigger_map[path.stem.replace('_triggers', '')] = {
+            "triggers": [t.lower() for t in data.get("triggers", [])],
+            "responses": data.get("responses", []),
+        }
+    return trigger_map
+
+
+def random_text(rng, words):
+    return " ".join(
+        "".join(rng.choice(ALPHABET) for _ in range(rng.randint(2, 9)))
+        for _ in range(words)
+    )
+
+
+def loop_match(trigger_map, text_lower, cutoff=75):
+    """Прежняя реализация из trigger_handler.message_handler"""
+    best_score = 0
+    best_name = None
+    for name, trig in trigger_map.items():
+        for t in trig.get("triggers", []):
+            score = fuzz.partial_ratio(text_lower, t)
+            if score > best_score:
+                best_score = score
+                best_name = name
+    return best_name if best_score >= cutoff else None
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    p = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return p(0.50), p(0.99), statistics.mean(ordered)
+
+
+def measure(func, messages):
+    samples, results = [], []
+    for text in messages:
+        started = time.perf_counter()
+        results.append(func(text))
+        samples.append((time.perf_counter() - started) * 1e6)
+    return samples, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--synthetic", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    trigger_map = load_trigger_map()
+    if args.synthetic:
+        trigger_map["synthetic"] = {"triggers": [random_text(rng, rng.randint(1, 3)) for _ in range(args.synthetic)]}
+    all_triggers = [t for trig in trigger_map.values() for t in trig["triggers"]]
+
+    # Сообщения, которые дошли до нечеткого поиска: обычно без триггеров, иногда с опечаткой
+    messages = []
+    for _ in range(args.messages):
+        text = random_text(rng, rng.randint(3, 25))
+        if rng.random() < 0.2:
+            trigger = list(rng.choice(all_triggers))
+            if len(trigger) > 3:
+                trigger[rng.randrange(len(trigger))] = rng.choice(ALPHABET)
+            text += " " + "".join(trigger)
+        messages.append(text)
+
+    index = FuzzyTriggerIndex(trigger_map)
+    index.refresh()
+
+    loop_samples, loop_results = measure(lambda text: loop_match(trigger_map, text), messages)
+    index_samples, index_results = measure(lambda text: (index.match(text) or (None,))[0], messages)
+
+    mismatches = sum(a != b for a, b in zip(loop_results, index_results))
+    print(f"triggers: {len(all_triggers)}, messages: {len(messages)}, category mismatches: {mismatches}")
+    print(f"{'':>18} {'p50 us':>9} {'p99 us':>9} {'mean us':>9}")
+    for label, samples in (("loop partial_ratio", loop_samples), ("extractOne index", index_samples)):
+        p50, p99, mean = percentiles(samples)
+        print(f"{label:>18} {p50:>9.1f} {p99:>9.1f} {mean:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк ограничителя частоты: прежние списки отметок времени на
+пользователя (RateLimitMiddleware до перехода на скользящее окно-счетчик)
+против SlidingWindowLimiter (app/shared/utils/rate_limit.py).
+
+Меряются проверки лимита в секунду и память на отслеживаемого пользователя
+(tracemalloc) при заполненном часовом окне.
+
+Запуск: python scripts/benchmark_rate_limiter.py [--users 10000] [--checks 200000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.shared.utils.rate_limit import SlidingWindowLimiter
+
+PER_MINUTE = 10
+PER_HOUR = 100
+
+
+class ListLimiter:
+    """Прежняя логика RateLimitMiddleware: два списка отметок времени на пользователя"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.minute_limits = defaultdict(list)
+        self.hour_limits = defaultdict(list)
+
+    def hit(self, user_id):
+        current_time = self.clock()
+        self.minute_limits[user_id] = [t for t in self.minute_limits[user_id] if current_time - t < 60]
+        self.hour_limits[user_id] = [t for t in self.hour_limits[user_id] if current_time - t < 3600]
+        if len(self.minute_limits[user_id]) >= PER_MINUTE:
+            return 60
+        if len(self.hour_limits[user_id]) >= PER_HOUR:
+            return 3600
+        self.minute_limits[user_id].append(current_time)
+        self.hour_limits[user_id].append(current_time)
+        return None
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_limiter(kind, clock):
+    if kind == "list":
+        return ListLimiter(clock)
+    return SlidingWindowLimiter([(60, PER_MINUTE), (3600, PER_HOUR)], clock=clock)
+
+
+def fill(limiter, clock, users):
+    """Час активности: каждый пользователь близок к часовому лимиту"""
+    for step in range(PER_HOUR):
+        clock.now = step * 36.0
+        for user_id in range(users):
+            limiter.hit(user_id)
+
+
+def measure_memory(kind, users):
+    clock = Clock()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    limiter = make_limiter(kind, clock)
+    fill(limiter, clock, users)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / users
+
+
+def measure_speed(kind, users, checks, rng):
+    clock = Clock()
+    limiter = make_limiter(kind, clock)
+    fill(limiter, clock, users)
+    stream = [rng.randrange(users) for _ in range(checks)]
+    started = time.perf_counter()
+    for user_id in stream:
+        clock.now += 0.001
+        limiter.hit(user_id)
+    return checks / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--checks", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"users={args.users} checks={args.checks} limits={PER_MINUTE}/min, {PER_HOUR}/hour")
+    print(f"{'limiter':<16}{'checks/s':>14}{'bytes/user':>14}")
+    for kind in ("list", "sliding_window"):
+        rate = measure_speed(kind, args.users, args.checks, random.Random(args.seed))
+        memory = measure_memory(kind, args.users)
+        print(f"{kind:<16}{rate:>14,.0f}{memory:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк поиска триггеров: вложенный цикл `trigger in text` против автомата
+Ахо–Корасик (app/shared/utils/trigger_matcher.py) на 100, 1k и 10k триггерах.
+
+Запуск: python scripts/benchmark_trigger_matcher.py [--messages 2000] [--sizes 100,1000,10000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.shared.utils.trigger_matcher import TriggerEntry, TriggerMatcher, naive_search
+
+ALPHABET = "абвгдеёжзийклмнопрстуфхцчшщъыьэюя"
+CATEGORY_PRIORITIES = [100, 90, 85, 80, 70, 60, 50, 40]
+
+
+def random_word(rng: random.Random, min_len: int = 3, max_len: int = 9) -> str:
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(min_len, max_len)))
+
+
+def make_entries(rng: random.Random, count: int):
+    """Триггеры из 1–3 слов, равномерно по категориям TRIGGER_MAP"""
+    entries = []
+    seen = set()
+    while len(entries) < count:
+        phrase = " ".join(random_word(rng) for _ in range(rng.randint(1, 3)))
+        if phrase in seen:
+            continue
+        seen.add(phrase)
+        priority = CATEGORY_PRIORITIES[len(entries) % len(CATEGORY_PRIORITIES)]
+        entries.append(TriggerEntry(phrase, priority, f"category_{priority}"))
+    return entries
+
+
+def make_messages(rng: random.Random, entries, count: int, hit_ratio: float = 0.3):
+    """Сообщения чата: часть содержит триггер, остальные — случайные слова"""
+    messages = []
+    for _ in range(count):
+        words = [random_word(rng) for _ in range(rng.randint(4, 20))]
+        if rng.random() < hit_ratio:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(entries).pattern)
+        messages.append(" ".join(words))
+    return messages
+
+
+def timed(func, messages):
+    started = time.perf_counter()
+    results = [func(text) for text in messages]
+    return (time.perf_counter() - started) / len(messages) * 1e6, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--sizes", default="100,1000,10000")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{'triggers':>9} {'build ms':>9} {'loop us/msg':>12} {'automaton us/msg':>17} {'speedup':>8}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        rng = random.Random(args.seed)
+        entries = make_entries(rng, size)
+        messages = make_messages(rng, entries, args.messages)
+
+        started = time.perf_counter()
+        matcher = TriggerMatcher(entries)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        loop_us, expected = timed(lambda text: naive_search(entries, text), messages)
+        automaton_us, actual = timed(matcher.search, messages)
+
+        # Автомат обязан выбирать тот же триггер, что и перебор
+        for text, want, got in zip(messages, expected, actual):
+            if (want and want.pattern) != (got and got.entry.pattern):
+                raise SystemExit(f"Mismatch on {text!r}: loop={want}, automaton={got}")
+
+        print(f"{size:>9} {build_ms:>9.1f} {loop_us:>12.1f} {automaton_us:>17.1f} {loop_us / automaton_us:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Локальный mock-сервер YandexGPT completion API.
+
+Отвечает так же, как настоящий API: при "stream": true — по JSON-объекту на
+строку с накопленным текстом альтернативы (chunked transfer encoding), при
+"stream": false — одним JSON. Задержки до первого фрагмента и между
+фрагментами настраиваются, чтобы проверять TTFB и постепенные правки
+сообщений без обращения к Яндексу.
+
+Запуск: python scripts/mock_yandexgpt_server.py [--port 8089] [--first-delay 0.5] [--chunk-delay 0.2]
+Бот: YANDEXGPT_API_URL=http://127.0.0.1:8089/foundationModels/v1/completion
+"""
+import argparse
+import asyncio
+import itertools
+import json
+from typing import Iterable, List, Optional
+
+from aiohttp import web
+
+COMPLETION_PATH = "/foundationModels/v1/completion"
+# Тела полученных запросов (для проверок в тестах)
+REQUESTS = web.AppKey("requests", list)
+DEFAULT_REPLIES = [
+    "Ну привет, смертный. Сису на связи и уже скучает! А ты зачем пришел?",
+    "TON растет, драконы летают. Все идет по плану, не переживай.",
+]
+
+
+def split_chunks(text: str, words_per_chunk: int = 2) -> List[str]:
+    """Накопленные снимки текста, как в потоке YandexGPT"""
+    words = text.split(" ")
+    return [" ".join(words[:i]) for i in range(words_per_chunk, len(words), words_per_chunk)] + [text]
+
+
+def completion_chunk(text: str, final: bool) -> dict:
+    status = "ALTERNATIVE_STATUS_FINAL" if final else "ALTERNATIVE_STATUS_PARTIAL"
+    return {
+        "result": {
+            "alternatives": [{"message": {"role": "assistant", "text": text}, "status": status}],
+            "usage": {"inputTextTokens": "0", "completionTokens": str(len(text.split())), "totalTokens": "0"},
+            "modelVersion": "mock",
+        }
+    }
+
+
+def create_app(replies: Optional[Iterable[str]] = None, first_delay: float = 0.0,
+               chunk_delay: float = 0.0, words_per_chunk: int = 2) -> web.Application:
+    """Приложение aiohttp; ответы выдаются по кругу, тела запросов складываются в app[REQUESTS]"""
+    cycle = itertools.cycle(list(replies or DEFAULT_REPLIES))
+
+    async def completion(request: web.Request) -> web.StreamResponse:
+        payload = await request.json()
+        request.app[REQUESTS].append(payload)
+        text = next(cycle)
+        await asyncio.sleep(first_delay)
+        if not payload.get("completionOptions", {}).get("stream"):
+            return web.json_response(completion_chunk(text, final=True))
+
+        response = web.StreamResponse(headers={"Content-Type": "application/json"})
+        response.enable_chunked_encoding()
+        await response.prepare(request)
+        chunks = split_chunks(text, words_per_chunk)
+        for i, chunk in enumerate(chunks):
+            if i:
+                await asyncio.sleep(chunk_delay)
+            line = json.dumps(completion_chunk(chunk, final=i == len(chunks) - 1), ensure_ascii=False)
+            await response.write(line.encode("utf-8") + b"\n")
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app[REQUESTS] = []
+    app.router.add_post(COMPLETION_PATH, completion)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--first-delay", type=float, default=0.5, help="задержка до первого фрагмента, с")
+    parser.add_argument("--chunk-delay", type=float, default=0.2, help="задержка между фрагментами, с")
+    parser.add_argument("--words-per-chunk", type=int, default=2)
+    args = parser.parse_args()
+
+    app = create_app(first_delay=args.first_delay, chunk_delay=args.chunk_delay,
+                     words_per_chunk=args.words_per_chunk)
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,10 @@
 from contextlib import contextmanager
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.pool import QueuePool
 from sisu_bot.core.config import config
+from app.infrastructure.db.engine import get_engine
 
-# Create engine with appropriate settings
-if config.DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(config.DATABASE_URL)
-else:
-    engine = create_engine(
-        config.DATABASE_URL,
-        pool_pre_ping=True,
-        pool_recycle=300,
-    )
+# Shared process-wide engine (pool and SQLite pragmas are configured in app.infrastructure.db.engine)
+engine = get_engine(config.DATABASE_URL)
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
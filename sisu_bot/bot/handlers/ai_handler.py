@@ -29,7 +29,9 @@ from sisu_bot.bot.services.ai_trigger_service import PHRASES, TROLL_TRIGGERS, TR
 from sisu_bot.bot.services.ai_stats_service import response_stats, user_preferences, update_response_stats, get_user_style
 import logging
 from aiogram.fsm.state import State, StatesGroup
-from sisu_bot.bot.services.yandexgpt_service import generate_sisu_reply
+from sisu_bot.bot.services.yandexgpt_service import generate_sisu_reply, stream_sisu_reply
+from app.infrastructure.ai.admission import PRIORITY_RANDOM, llm_priority
+from app.infrastructure.ai.streaming import stream_reply
 from sisu_bot.bot.config import ADMIN_IDS, is_superadmin, TTS_VOICE_TEMP_DIR, AI_DIALOG_ENABLED, AI_DIALOG_PROBABILITY, SISU_PATTERN
 from sisu_bot.bot.services.yandex_speechkit_tts import synthesize_sisu_voice
 import time
@@ -37,9 +39,12 @@ from sisu_bot.bot.services.motivation_service import send_voice_motivation
 from sisu_bot.bot.services.excuse_service import send_text_excuse, send_voice_excuse
 from sisu_bot.bot.services.persona_service import get_name_joke, get_name_variant, load_micro_legends, load_easter_eggs, load_magic_phrases, list_micro_legends, list_easter_eggs, list_magic_phrases, get_random_micro_legend, get_random_easter_egg, get_random_magic_phrase
 from sisu_bot.bot.services.trigger_service import (
-    check_trigger, get_smart_answer, learn_response,
+    get_smart_answer, learn_response,
     get_learned_response, make_hash_id
 )
+from app.shared.utils.trigger_matcher import TriggerEntry, TriggerMatcher
+from app.shared.utils.phrase_sketch import PhraseSketch, phrase_ngrams
+from app.shared.utils.weighted_sampler import AliasSampler, RecentItems, SamplerCache, min_bonus_corrections
 from sisu_bot.bot.services.mood_service import (
     update_mood, get_mood, update_user_preferences,
     get_user_style, add_to_memory, get_recent_messages
@@ -135,13 +140,20 @@ user_preferences = defaultdict(lambda: {
     "mood_history": deque(maxlen=10)  # история настроений при общении с этим пользователем
 })
 
-# Статистика фраз для обнаружения новых триггеров
-phrase_stats = defaultdict(lambda: {
-    "count": 0,
-    "last_used": None,
-    "context": [],
-    "reactions": 0
-})
+# Таблицы взвешенного выбора ответов (get_smart_answer) и ответы с реакциями пользователя
+RESPONSE_SAMPLERS = SamplerCache()
+# До 10000 пользователей по 64 последних ответа; более старые реакции — только в общей статистике
+user_reacted_responses = RecentItems()
+
+# Статистика фраз для обнаружения новых триггеров: top-k с затуханием в фиксированной памяти
+PHRASE_SKETCH_PATH = DATA_DIR / 'phrase_sketch.json'
+NEW_TRIGGER_MIN_COUNT = 3
+NEW_TRIGGER_CANDIDATES = 100
+phrase_stats = PhraseSketch()
+try:
+    phrase_stats.load(PHRASE_SKETCH_PATH)
+except Exception as e:
+    logger.warning(f"Could not load phrase sketch snapshot: {e}")
 
 # Загрузка персоны Сису
 try:
@@ -179,6 +191,8 @@ def learn_response(trigger: str, response: str):
     
     if trigger not in LEARNING_DATA["triggers"]:
         LEARNING_DATA["triggers"][trigger] = []
+        # Новый триггер должен сразу находиться в check_trigger
+        rebuild_trigger_matcher()
     if response not in LEARNING_DATA["triggers"][trigger]:
         LEARNING_DATA["triggers"][trigger].append(response)
         save_learning_data()
@@ -215,6 +229,42 @@ for trig in PRIORITY_TRIGGERS:
             "priority": trig["priority"]
         }
 
+# Выученные триггеры (learning_data.json) уступают всем категориям
+LEARNED_TRIGGER_NAME = "learned"
+LEARNED_TRIGGER_PRIORITY = 0
+
+def build_trigger_matcher() -> TriggerMatcher:
+    """Компилирует приоритетные и выученные триггеры в один автомат: проверка — один проход по тексту"""
+    entries = []
+    for name, data in TRIGGER_MAP.items():
+        for trigger in data["triggers"]:
+            entries.append(TriggerEntry(trigger, data["priority"], (name, data["responses"])))
+    for trigger, responses in LEARNING_DATA.get("triggers", {}).items():
+        # Выученный триггер — это целая фраза, поэтому только по границам слов
+        entries.append(TriggerEntry(trigger.lower(), LEARNED_TRIGGER_PRIORITY, (LEARNED_TRIGGER_NAME, responses), True))
+    return TriggerMatcher(entries)
+
+TRIGGER_MATCHER = build_trigger_matcher()
+
+def rebuild_trigger_matcher() -> TriggerMatcher:
+    """Собирает новый автомат и подменяет текущий (после появления выученного триггера)"""
+    global TRIGGER_MATCHER
+    TRIGGER_MATCHER = build_trigger_matcher()
+    return TRIGGER_MATCHER
+
+def check_trigger(text: str):
+    """Лучший по приоритету триггер в тексте или None"""
+    hit = TRIGGER_MATCHER.search(text.lower())
+    if hit is None:
+        return None
+    name, responses = hit.entry.payload
+    return {
+        "name": name,
+        "trigger": hit.entry.pattern,
+        "responses": responses,
+        "priority": hit.entry.priority
+    }
+
 def update_mood(chat_id, text):
     text = text.lower()
     # Повышаем настроение за позитив, понижаем за троллинг
@@ -238,6 +288,9 @@ def update_response_stats(chat_id: int, user_id: int, response: str, is_positive
     else:
         stats["negative_reactions"] += 1
         stats["user_reactions"][user_id]["negative"] += 1
+    # Таблицы выбора с этим ответом пересобираются при следующем обращении
+    RESPONSE_SAMPLERS.invalidate(response)
+    user_reacted_responses.add(user_id, response)
 
 def get_user_style(user_id: int) -> str:
     """Определяет предпочтительный стиль общения с пользователем"""
@@ -268,92 +321,78 @@ def update_user_preferences(user_id: int, text: str, mood: int):
         if len(word) > 3:  # игнорируем короткие слова
             prefs["favorite_topics"][word] += 1
 
+RARITY_BONUS = 1.5
+
+def _build_response_sampler(responses: List[str]) -> AliasSampler:
+    """Базовые веса ответов: бонус за редкое использование и за успешность"""
+    usage = [response_stats[resp]["total_uses"] for resp in responses]
+    min_uses = min(usage)
+    weights = []
+    for resp, uses in zip(responses, usage):
+        weight = RARITY_BONUS if uses == min_uses else 1.0
+        if uses > 0:
+            weight *= 1 + response_stats[resp]["positive_reactions"] / uses
+        weights.append(weight)
+    return AliasSampler(responses, weights)
+
+def _user_corrections(sampler: AliasSampler, user_id: int, corrections: Dict[int, float]) -> Dict[int, float]:
+    """Добавляет поправки весов для ответов, на которые пользователь уже реагировал"""
+    for resp in user_reacted_responses.get(user_id, ()):
+        index = sampler.index_of(resp)
+        if index is None:
+            continue
+        stats = response_stats[resp]
+        user_stats = stats["user_reactions"].get(user_id)
+        if not stats["total_uses"] or not user_stats or user_stats["positive"] + user_stats["negative"] == 0:
+            continue
+        success_rate = stats["positive_reactions"] / stats["total_uses"]
+        user_success = user_stats["positive"] / (user_stats["positive"] + user_stats["negative"])
+        # Вес = редкость * (1 + (success + user_success) / 2): отличие от базового веса
+        rarity = (sampler.weights[index] + corrections.get(index, 0.0)) / (1 + success_rate)
+        corrections[index] = corrections.get(index, 0.0) + rarity * (user_success - success_rate) / 2
+    return corrections
+
 def get_smart_answer(text: str, responses: List[str], last_answer: Optional[str] = None, user_id: Optional[int] = None) -> str:
     """Улучшенная версия функции выбора ответа с учетом статистики и предпочтений пользователя"""
     if not responses:
         return random.choice(SISU_PERSONA["fallbacks"])
     
-    # Фильтруем ответы, исключая последний использованный
-    available_responses = [r for r in responses if r != last_answer]
-    if not available_responses:
-        available_responses = responses
-    
-    # Получаем статистику использования
-    usage_stats = {resp: response_stats[resp]["total_uses"] for resp in available_responses}
-    min_uses = min(usage_stats.values()) if usage_stats else 0
-    
-    # Учитываем успешность ответов
-    success_rates = {}
-    for resp in available_responses:
-        stats = response_stats[resp]
-        if stats["total_uses"] > 0:
-            success_rate = stats["positive_reactions"] / stats["total_uses"]
-            # Бонус для ответов, которые хорошо работают с конкретным пользователем
-            if user_id and user_id in stats["user_reactions"]:
-                user_stats = stats["user_reactions"][user_id]
-                if user_stats["positive"] + user_stats["negative"] > 0:
-                    user_success = user_stats["positive"] / (user_stats["positive"] + user_stats["negative"])
-                    success_rate = (success_rate + user_success) / 2
-            success_rates[resp] = success_rate
-    
-    # Выбираем ответ с учетом статистики и успешности
-    weights = []
-    for resp in available_responses:
-        weight = 1.0
-        # Бонус за редкое использование
-        if usage_stats[resp] == min_uses:
-            weight *= 1.5
-        # Бонус за успешность
-        if resp in success_rates:
-            weight *= (1 + success_rates[resp])
-        weights.append(weight)
-    
-    return random.choices(available_responses, weights=weights, k=1)[0]
+    # Таблица строится один раз на набор ответов и сбрасывается при изменении их статистики
+    key = tuple(responses)
+    sampler = RESPONSE_SAMPLERS.get(key, lambda: _build_response_sampler(responses), tags=set(key))
+    # Бонус за редкость считается по ответам без последнего, как и раньше
+    usage = [response_stats[resp]["total_uses"] for resp in sampler.items]
+    corrections = min_bonus_corrections(sampler, usage, last_answer, RARITY_BONUS)
+    if user_id:
+        _user_corrections(sampler, user_id, corrections)
+    # Последний ответ исключается выбором с отказом, без пересборки таблицы
+    return sampler.sample(exclude=last_answer, corrections=corrections)
 
 def analyze_phrase(text: str, chat_id: int, user_id: int):
     """Анализирует фразу на предмет потенциального нового триггера"""
-    # Разбиваем текст на слова и фразы
-    words = text.lower().split()
-    phrases = []
-    
-    # Собираем фразы из 2-4 слов
-    for i in range(len(words)):
-        for j in range(2, min(5, len(words) - i + 1)):
-            phrase = " ".join(words[i:i+j])
-            if len(phrase) > 5:  # игнорируем слишком короткие фразы
-                phrases.append(phrase)
-    
-    # Обновляем статистику для каждой фразы
-    for phrase in phrases:
-        stats = phrase_stats[phrase]
-        stats["count"] += 1
-        stats["last_used"] = datetime.now()
-        stats["context"].append(text)
-        if len(stats["context"]) > 5:  # храним только последние 5 контекстов
-            stats["context"].pop(0)
+    # Фразы из 2-4 слов; контекстов на фразу хранится не больше 5
+    phrase_stats.update(phrase_ngrams(text), context=text)
 
 def check_for_new_triggers():
     """Проверяет статистику фраз и добавляет новые триггеры"""
     new_triggers = []
-    current_time = datetime.now()
+    current_time = time.time()
     
-    for phrase, stats in phrase_stats.items():
+    # Смотрим только самые частые фразы, а не всю статистику
+    for stats in phrase_stats.top(NEW_TRIGGER_CANDIDATES, min_count=NEW_TRIGGER_MIN_COUNT):
         # Проверяем условия для нового триггера:
-        # 1. Фраза использовалась достаточно часто
-        # 2. Фраза не слишком длинная
-        # 3. Фраза не похожа на существующие триггеры
-        if (stats["count"] >= 3 and  # минимум 3 использования
-            len(phrase) < 50 and     # не слишком длинная
-            not any(phrase in t for t in PRIORITY_TRIGGERS.keys())):  # не похожа на существующие
-            
-            # Проверяем, не устарела ли фраза
-            if (current_time - stats["last_used"]).days < 7:  # активна в последнюю неделю
-                new_triggers.append(phrase)
+        # 1. Фраза не слишком длинная
+        # 2. Фраза не похожа на существующие триггеры
+        # 3. Фраза активна в последнюю неделю
+        if (len(stats.phrase) < 50 and
+            not any(stats.phrase in t for t in PRIORITY_TRIGGERS.keys()) and
+            current_time - stats.last_used < 7 * 24 * 3600):
+            new_triggers.append(stats.phrase)
     
     # Добавляем новые триггеры в PRIORITY_TRIGGERS
     for trigger in new_triggers:
         # Создаем ответы на основе контекста использования
-        contexts = phrase_stats[trigger]["context"]
+        contexts = phrase_stats.get(trigger).contexts
         responses = []
         for context in contexts:
             # Ищем подходящие ответы из существующих
@@ -363,6 +402,12 @@ def check_for_new_triggers():
         
         # Добавляем новый триггер с низким приоритетом
         PRIORITY_TRIGGERS[trigger] = responses[:5]  # берем первые 5 подходящих ответов
+    
+    # Снимок статистики переживает рестарт
+    try:
+        phrase_stats.save(PHRASE_SKETCH_PATH)
+    except Exception as e:
+        logger.warning(f"Could not save phrase sketch snapshot: {e}")
 
 def get_persona_answer(text: str, last_topic: str = None) -> Optional[str]:
     text_lower = text.lower()
@@ -587,6 +632,9 @@ async def sisu_explicit_handler(msg: Message):
     # Add message to memory
     add_to_memory(msg.chat.id, text)
 
+    # Класс в очереди запросов к YandexGPT: прямое обращение, суперадмин — вне очереди
+    priority = llm_priority(bool(msg.from_user) and is_superadmin(msg.from_user.id), explicit=True)
+
     # Handle specific voice commands
     response_text = None
     voice_action = None
@@ -606,7 +654,7 @@ async def sisu_explicit_handler(msg: Message):
     # Motivation command
     if any(keyword in text.lower() for keyword in ["мотивацию", "мотивация дня", "скажи мотивацию"]):
         motivation_prompt = SISU_PROMPTS.get("motivation", "Придумай короткую мотивационную фразу.")
-        response_text = await generate_sisu_reply(prompt=f"{motivation_prompt}{mood_prompt_addition}")
+        response_text = await generate_sisu_reply(prompt=f"{motivation_prompt}{mood_prompt_addition}", priority=priority)
         voice_action = "record_voice"
     
     # Poem command
@@ -615,14 +663,14 @@ async def sisu_explicit_handler(msg: Message):
         if not topic:
             topic = "жизни"
         poem_prompt = SISU_PROMPTS.get("poem", "Сочини короткое стихотворение.").format(topic=topic)
-        response_text = await generate_sisu_reply(prompt=poem_prompt)
+        response_text = await generate_sisu_reply(prompt=poem_prompt, priority=priority)
         voice_action = "record_voice"
 
     # Anecdote command
     elif "прочитай анекдот" in text.lower() or "расскажи анекдот" in text.lower():
         topic = text.lower().replace("прочитай анекдот", "").replace("расскажи анекдот", "").strip()
         anecdote_prompt = SISU_PROMPTS.get("anecdote", "Расскажи короткий анекдот.").format(topic=topic)
-        response_text = await generate_sisu_reply(prompt=anecdote_prompt)
+        response_text = await generate_sisu_reply(prompt=anecdote_prompt, priority=priority)
         
         # Для анекдотов используем игривый голос
         try:
@@ -657,7 +705,7 @@ async def sisu_explicit_handler(msg: Message):
             topic = "жизни"
         
         song_prompt = SISU_PROMPTS.get("song", "Придумай короткие слова для песни.").format(topic=topic)
-        response_text = await generate_sisu_reply(prompt=song_prompt)
+        response_text = await generate_sisu_reply(prompt=song_prompt, priority=priority)
         voice_action = "record_voice"
         
         # Для песен используем более эмоциональный голос
@@ -797,15 +845,16 @@ async def sisu_explicit_handler(msg: Message):
 ВАЖНО: Понимай контекст! Если спрашивают про токены, криптовалюту, блокчейн - отвечай по теме!
 {mood_prompt_addition}"""
             
+            # Ответ приходит потоком: первое предложение сразу, остальное — правками сообщения
             async with ChatActionSender(bot=msg.bot, chat_id=msg.chat.id, action="typing"):
-                response_text = await generate_sisu_reply(
+                response_text = await stream_reply(msg, stream_sisu_reply(
                     prompt=f"{character_prompt}\n\nСообщение: {text}", 
                     recent_messages=recent_messages, 
-                    user_style=user_style
-                )
+                    user_style=user_style,
+                    priority=priority
+                ))
             
             if response_text and response_text.strip():
-                await msg.answer(response_text)
                 logger.info(f"Sent AI response: {response_text}")
                 return
                 
@@ -836,9 +885,7 @@ async def sisu_explicit_handler(msg: Message):
         recent_messages = get_recent_messages(msg.chat.id)
         user_style = get_user_style(msg.from_user.id) if msg.from_user else "neutral"
         async with ChatActionSender(bot=msg.bot, chat_id=msg.chat.id, action="typing"):
-            response_text = await generate_sisu_reply(prompt=f"{text}{mood_prompt_addition}", recent_messages=recent_messages, user_style=user_style)
-        
-        await msg.answer(response_text) # Send as text
+            response_text = await stream_reply(msg, stream_sisu_reply(prompt=f"{text}{mood_prompt_addition}", recent_messages=recent_messages, user_style=user_style, priority=priority))
 
     except Exception as e:
         logger.error(f"Failed to generate AI response in explicit handler: {e}", exc_info=True)
@@ -952,7 +999,7 @@ async def generate_motivation_phrase() -> str:
     """Generate a motivational phrase using AI"""
     try:
         prompt = "Придумай короткую мотивационную фразу (не более 2-3 предложений) в стиле дракона Сису. Фраза должна быть энергичной и вдохновляющей."
-        response = await generate_sisu_reply(prompt=prompt)
+        response = await generate_sisu_reply(prompt=prompt, priority=PRIORITY_RANDOM)
         return response.strip()
     except Exception as e:
         logger.error(f"Failed to generate motivation phrase: {e}")
@@ -977,7 +1024,7 @@ async def ai_dialog_handler(msg: Message, state: FSMContext):
     current_state = await state.get_state()
     
     # Проверка AI лимитов
-    can_use, reason = ai_limits_service.can_use_ai(msg.from_user.id)
+    can_use, reason = await ai_limits_service.can_use_ai_async(msg.from_user.id)
     if not can_use:
         await msg.answer(reason)
         return
@@ -1004,7 +1051,7 @@ async def ai_dialog_handler(msg: Message, state: FSMContext):
         return
 
     # Проверка AI лимитов ТОЛЬКО после проверки кнопок
-    can_use, reason = ai_limits_service.can_use_ai(msg.from_user.id)
+    can_use, reason = await ai_limits_service.can_use_ai_async(msg.from_user.id)
     if not can_use:
         # Используем мега-загадник вместо стандартного сообщения
         from sisu_bot.bot.services.mega_fallback_service import mega_fallback_service
@@ -1047,9 +1094,10 @@ async def ai_dialog_handler(msg: Message, state: FSMContext):
             elif chat_mood < 0: # Плохое настроение
                 mood_prompt_addition = " Отвечай с немного ироничным или отстраненным настроением. "
 
-            sisu_reply_text = await generate_sisu_reply(prompt=f"{msg.text}{mood_prompt_addition}")
-            # Send general AI dialog reply as text
-            await msg.answer(sisu_reply_text)
+            # Send general AI dialog reply as text (потоком, с правками сообщения)
+            # Личка — выше случайных реплик в группах, которые первыми уступают место в очереди
+            priority = llm_priority(is_superadmin(msg.from_user.id), private=msg.chat.type == "private")
+            sisu_reply_text = await stream_reply(msg, stream_sisu_reply(prompt=f"{msg.text}{mood_prompt_addition}", priority=priority))
             
             # Регистрируем использование AI
             ai_limits_service.record_ai_usage(msg.from_user.id)
@@ -6,8 +6,6 @@ from aiogram.filters import Command
 import logging
 import os
 import sys
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 from sisu_bot.bot.db.models import User
 from sisu_bot.core.config import DB_PATH
 from sisu_bot.bot.db.init_db import Session
@@ -4,8 +4,7 @@ from aiogram.filters import Command
 from sisu_bot.bot.services.user_service import update_user_info, get_user
 from sisu_bot.bot.services import points_service
 import logging
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from app.infrastructure.db.engine import get_engine, get_sessionmaker
 from sisu_bot.bot.db.models import User
 from sisu_bot.core.config import DB_PATH, REQUIRED_SUBSCRIPTIONS, SUBSCRIPTION_GREETING, SUBSCRIPTION_DENY
 from sisu_bot.bot.config import is_superadmin
@@ -17,8 +16,8 @@ router = Router()
 
 # Унифицированный путь к БД
 # DB_PATH = Path(__file__).parent.parent.parent.parent / 'data' / 'bot.sqlite3'
-engine = create_engine(f'sqlite:///{DB_PATH}')
-Session = sessionmaker(bind=engine)
+engine = get_engine(f'sqlite:///{DB_PATH}')
+Session = get_sessionmaker(f'sqlite:///{DB_PATH}')
 
 REQUIRED_CHANNELS = [
     {'title': 'Канал SISU', 'url': 'https://t.me/SisuDatuTon'},
@@ -71,7 +70,7 @@ async def start_handler(msg: Message):
         ref_id = int(args[3:])  # Убираем "ref" из начала и конвертируем в int
         
         # Проверяем на фрод
-        can_refer, reason = antifraud_service.check_referral_fraud(
+        can_refer, reason = await antifraud_service.check_referral_fraud_async(
             user_id, ref_id, 
             username=msg.from_user.username,
             first_name=msg.from_user.first_name
@@ -3,20 +3,37 @@ from aiogram.types import Message
 import asyncio
 import random
 import re
+from pathlib import Path
 
 from sisu_bot.bot.utils import load_json_safe, save_json_safe
 from sisu_bot.core.config import DATA_DIR
-try:
-    from fuzzywuzzy import fuzz
-except ImportError:
-    from rapidfuzz import fuzz
+from sisu_bot.bot.services.fuzzy_trigger_index import FuzzyTriggerIndex
 
 router = Router()
 
-TRIGGER_MAP = load_json_safe(DATA_DIR / 'static' / 'triggers.json', {})
+def _load_trigger_map():
+    """triggers.json — либо готовая карта, либо список категорий с файлами триггеров"""
+    data = load_json_safe(DATA_DIR / 'static' / 'triggers.json', {})
+    if isinstance(data, dict):
+        return data
+    trigger_map = {}
+    for category in data:
+        # Пути в файле абсолютные с машины разработчика, берем только имя файла
+        category_data = load_json_safe(DATA_DIR / 'static' / Path(category["file"]).name, {})
+        trigger_map[category["name"]] = {
+            "triggers": [t.lower() for t in category_data.get("triggers", [])],
+            "responses": category_data.get("responses", []),
+            "priority": category.get("priority", 0),
+        }
+    return trigger_map
+
+TRIGGER_MAP = _load_trigger_map()
 PHRASES = load_json_safe(DATA_DIR / 'static' / 'phrases.json', {})
 EXCUSES = load_json_safe(DATA_DIR / 'static' / 'excuses.json', {}).get("excuses", [])
 
+# Триггеры для нечеткого поиска собираются один раз и обновляются вместе с TRIGGER_MAP
+FUZZY_TRIGGERS = FuzzyTriggerIndex(TRIGGER_MAP, score_cutoff=75)
+
 user_preferences = {}
 last_answers = {}
 sisu_mood = {}
@@ -55,16 +72,9 @@ async def message_handler(msg: Message):
 
     # --- Fuzzy поиск ---
     if not phrase:
-        best_score = 0
-        best_name = None
-        for name, trig in TRIGGER_MAP.items():
-            for t in trig.get("triggers", []):
-                score = fuzz.partial_ratio(text_lower, t)
-                if score > best_score:
-                    best_score = score
-                    best_name = name
-        if best_score >= 75 and best_name:
-            phrase = get_trigger_response(best_name, text_lower, msg.chat.id, mood)
+        match = FUZZY_TRIGGERS.match(text_lower)
+        if match:
+            phrase = get_trigger_response(match.name, text_lower, msg.chat.id, mood)
 
     # --- Fallback: excuses или шутка ---
     if not phrase:
@@ -3,6 +3,7 @@ from aiogram.dispatcher.middlewares.base import BaseMiddleware
 from aiogram.types import Message
 import logging
 from sisu_bot.bot.services.message_service import message_service
+from sisu_bot.bot.services.message_ingest_service import message_ingest
 from sisu_bot.bot.config import is_superadmin, is_any_admin
 
 logger = logging.getLogger(__name__)
@@ -17,13 +18,13 @@ class MessageLoggingMiddleware(BaseMiddleware):
         event: Message,
         data: Dict[str, Any]
     ) -> Any:
-        # Сохраняем сообщение перед обработкой
-        await self._log_message(event)
+        # Ставим сообщение в очередь на запись (без ожидания БД)
+        self._log_message(event)
         
         # Продолжаем обработку
         return await handler(event, data)
     
-    async def _log_message(self, message: Message):
+    def _log_message(self, message: Message):
         """Логирует сообщение пользователя"""
         try:
             # Пропускаем сообщения от ботов
@@ -51,16 +52,16 @@ class MessageLoggingMiddleware(BaseMiddleware):
             elif message.animation:
                 message_type = 'animation'
             
-            # Сохраняем сообщение
-            success = message_service.save_message(
+            # Команды и спам отсекаются здесь же, в очередь идут только готовые строки
+            row = message_service.build_message_row(
                 user_id=message.from_user.id,
                 chat_id=message.chat.id,
                 message_text=message_text,
                 message_type=message_type
             )
             
-            if success:
-                logger.debug(f"Logged message from user {message.from_user.id} in chat {message.chat.id}")
+            if row is not None and message_ingest.submit(row):
+                logger.debug(f"Queued message from user {message.from_user.id} in chat {message.chat.id}")
             
         except Exception as e:
             logger.error(f"Error logging message: {e}")
@@ -8,15 +8,18 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 from sisu_bot.bot.services.user_service import get_user
 from sisu_bot.core.config import DB_PATH
-from sqlalchemy import create_engine, func
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import func
+from app.infrastructure.db.engine import get_engine, get_sessionmaker, get_async_sessionmaker
+from app.infrastructure.db.repositories.users import UserRepository
 from sisu_bot.bot.db.models import User
 import logging
 
 logger = logging.getLogger(__name__)
 
-engine = create_engine(f'sqlite:///{DB_PATH}')
-Session = sessionmaker(bind=engine)
+engine = get_engine(f'sqlite:///{DB_PATH}')
+Session = get_sessionmaker(f'sqlite:///{DB_PATH}')
+# Та же таблица users через AsyncSession — для вызовов из обработчиков
+user_repository = UserRepository(get_async_sessionmaker(f'sqlite:///{DB_PATH}'))
 
 class AntiFraudService:
     def __init__(self):
@@ -39,66 +42,76 @@ class AntiFraudService:
         if user_id == ref_id:
             return False, "Нельзя рефералить самого себя"
         
-        # 2. Проверка времени регистрации
         session = Session()
         try:
             user = session.query(User).filter(User.id == user_id).first()
             ref_user = session.query(User).filter(User.id == ref_id).first()
-            
-            if not user or not ref_user:
-                return False, "Пользователь не найден"
-            
-            # Проверяем, что реферал не слишком новый
-            if hasattr(ref_user, 'created_at') and ref_user.created_at:
-                ref_age = datetime.utcnow() - ref_user.created_at
-                if ref_age < timedelta(hours=1):
-                    return False, "Реферал слишком новый (меньше 1 часа)"
-            
-            # 3. Проверка лимита рефералов
-            if ref_user.referrals >= 50:  # Максимум 50 рефералов
-                return False, "Достигнут лимит рефералов"
-            
-            # 4. Проверка частоты рефералов
-            current_time = time.time()
-            if ref_id not in self.referral_attempts:
-                self.referral_attempts[ref_id] = []
-            
-            # Очищаем старые попытки (оставляем только за последний час)
-            self.referral_attempts[ref_id] = [
-                ts for ts in self.referral_attempts[ref_id] 
-                if current_time - ts < 3600
-            ]
-            
-            if len(self.referral_attempts[ref_id]) >= 10:  # Максимум 10 попыток в час
-                return False, "Слишком много попыток рефералов в час"
-            
-            # 5. Проверка подозрительных паттернов
-            if self._is_suspicious_pattern(user_id, ref_id, session):
-                return False, "Подозрительный паттерн активности"
-            
-            # 6. Проверка устройства
-            if username and first_name:
-                fingerprint = self.generate_device_fingerprint(user_id, username, first_name)
-                if fingerprint in self.device_fingerprints:
-                    existing_users = self.device_fingerprints[fingerprint]
-                    if len(existing_users) >= 3:  # Максимум 3 аккаунта с одного устройства
-                        return False, "Слишком много аккаунтов с одного устройства"
-                    self.device_fingerprints[fingerprint].append(user_id)
-                else:
-                    self.device_fingerprints[fingerprint] = [user_id]
-            
-            # Добавляем попытку
-            self.referral_attempts[ref_id].append(current_time)
-            
-            return True, "OK"
-            
+            return self._evaluate_referral(user_id, ref_id, user, ref_user, username, first_name)
         finally:
             session.close()
     
-    def _is_suspicious_pattern(self, user_id: int, ref_id: int, session) -> bool:
+    async def check_referral_fraud_async(self, user_id: int, ref_id: int, username: str = None, first_name: str = None) -> Tuple[bool, str]:
+        """Асинхронная версия check_referral_fraud для обработчиков"""
+        if user_id == ref_id:
+            return False, "Нельзя рефералить самого себя"
+        
+        user = await user_repository.get(user_id)
+        ref_user = await user_repository.get(ref_id)
+        return self._evaluate_referral(user_id, ref_id, user, ref_user, username, first_name)
+    
+    def _evaluate_referral(self, user_id: int, ref_id: int, user, ref_user, username: str = None, first_name: str = None) -> Tuple[bool, str]:
+        """Проверки реферала по уже загруженным пользователям (без обращений к БД)"""
+        # 2. Проверка времени регистрации
+        if not user or not ref_user:
+            return False, "Пользователь не найден"
+        
+        # Проверяем, что реферал не слишком новый
+        if hasattr(ref_user, 'created_at') and ref_user.created_at:
+            ref_age = datetime.utcnow() - ref_user.created_at
+            if ref_age < timedelta(hours=1):
+                return False, "Реферал слишком новый (меньше 1 часа)"
+        
+        # 3. Проверка лимита рефералов
+        if ref_user.referrals >= 50:  # Максимум 50 рефералов
+            return False, "Достигнут лимит рефералов"
+        
+        # 4. Проверка частоты рефералов
+        current_time = time.time()
+        if ref_id not in self.referral_attempts:
+            self.referral_attempts[ref_id] = []
+        
+        # Очищаем старые попытки (оставляем только за последний час)
+        self.referral_attempts[ref_id] = [
+            ts for ts in self.referral_attempts[ref_id] 
+            if current_time - ts < 3600
+        ]
+        
+        if len(self.referral_attempts[ref_id]) >= 10:  # Максимум 10 попыток в час
+            return False, "Слишком много попыток рефералов в час"
+        
+        # 5. Проверка подозрительных паттернов
+        if self._is_suspicious_pattern(ref_user):
+            return False, "Подозрительный паттерн активности"
+        
+        # 6. Проверка устройства
+        if username and first_name:
+            fingerprint = self.generate_device_fingerprint(user_id, username, first_name)
+            if fingerprint in self.device_fingerprints:
+                existing_users = self.device_fingerprints[fingerprint]
+                if len(existing_users) >= 3:  # Максимум 3 аккаунта с одного устройства
+                    return False, "Слишком много аккаунтов с одного устройства"
+                self.device_fingerprints[fingerprint].append(user_id)
+            else:
+                self.device_fingerprints[fingerprint] = [user_id]
+        
+        # Добавляем попытку
+        self.referral_attempts[ref_id].append(current_time)
+        
+        return True, "OK"
+    
+    def _is_suspicious_pattern(self, ref_user) -> bool:
         """Проверяет подозрительные паттерны"""
         # Проверяем, что у реферала есть активность
-        ref_user = session.query(User).filter(User.id == ref_id).first()
         if not ref_user:
             return True
         
@@ -119,28 +132,34 @@ class AntiFraudService:
         session = Session()
         try:
             user = session.query(User).filter(User.id == user_id).first()
-            if not user:
-                return False, "Пользователь не найден"
-            
-            # Проверяем минимальное время активности
-            if hasattr(user, 'created_at') and user.created_at:
-                user_age = datetime.utcnow() - user.created_at
-                if user_age < timedelta(hours=2):  # Минимум 2 часа активности
-                    return False, "Пользователь слишком новый для активации"
-            
-            # Проверяем минимальное количество сообщений
-            if user.message_count < 10:  # Увеличиваем с 5 до 10
-                return False, "Недостаточно сообщений для активации"
-            
-            # Проверяем, что был чек-ин
-            if not user.last_checkin:
-                return False, "Необходим чек-ин для активации"
-            
-            return True, "OK"
-            
+            return self._evaluate_activation(user)
         finally:
             session.close()
     
+    async def check_activation_fraud_async(self, user_id: int) -> Tuple[bool, str]:
+        """Асинхронная версия check_activation_fraud для обработчиков"""
+        return self._evaluate_activation(await user_repository.get(user_id))
+    
+    def _evaluate_activation(self, user) -> Tuple[bool, str]:
+        if not user:
+            return False, "Пользователь не найден"
+        
+        # Проверяем минимальное время активности
+        if hasattr(user, 'created_at') and user.created_at:
+            user_age = datetime.utcnow() - user.created_at
+            if user_age < timedelta(hours=2):  # Минимум 2 часа активности
+                return False, "Пользователь слишком новый для активации"
+        
+        # Проверяем минимальное количество сообщений
+        if user.message_count < 10:  # Увеличиваем с 5 до 10
+            return False, "Недостаточно сообщений для активации"
+        
+        # Проверяем, что был чек-ин
+        if not user.last_checkin:
+            return False, "Необходим чек-ин для активации"
+        
+        return True, "OK"
+    
     def mark_suspicious(self, user_id: int, reason: str):
         """Помечает пользователя как подозрительного"""
         self.suspicious_users[user_id] = {
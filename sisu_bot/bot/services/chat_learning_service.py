@@ -6,6 +6,9 @@ from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
 from collections import defaultdict, Counter
 from sisu_bot.core.config import DATA_DIR
+from sisu_bot.bot.services.state_store import state_store
+from sisu_bot.bot.services.message_features import MessageFeatures, extract_features
+from sisu_bot.bot.services.style_counters import ensure_counter, new_style_counters
 
 logger = logging.getLogger(__name__)
 
@@ -15,22 +18,7 @@ class ChatLearningService:
     def __init__(self):
         self.data_dir = DATA_DIR
         self.learning_file = self.data_dir / 'chat_learning_data.json'
-        self.learning_data = self._load_learning_data()
-        
-        # Паттерны для анализа
-        self.patterns = {
-            'emoji': r'[😀-🙏🌀-🗿]',
-            'caps': r'[A-ZА-Я]{3,}',
-            'punctuation': r'[!?]{2,}',
-            'numbers': r'\d+',
-            'crypto': r'\b(тон|ton|токен|крипта|блокчейн|дефи|нфт|памп|дамп|холд|hodl|moon|луна)\b',
-            'memes': r'\b(кек|лол|рофл|ахаха|хаха|хех|омг|вау|ого|пельмень|кот|холодильник|трактор)\b',
-            'english': r'\b[a-zA-Z]+\b',
-            'repeated': r'(.)\1{2,}',
-            'questions': r'\b(что|как|почему|зачем|когда|где|кто|какой|какая|какие)\b',
-            'exclamations': r'[!]{1,3}',
-            'questions_mark': r'[?]{1,3}'
-        }
+        self.learning_data = state_store.attach(self.learning_file, self._load_learning_data())
         
     def _load_learning_data(self) -> Dict[str, Any]:
         """Загружает данные обучения"""
@@ -51,31 +39,18 @@ class ChatLearningService:
             return {"chat_styles": {}, "learned_phrases": {}, "user_patterns": {}, "absurd_templates": [], "learning_stats": {}}
     
     def _save_learning_data(self):
-        """Сохраняет данные обучения"""
-        try:
-            with open(self.learning_file, 'w', encoding='utf-8') as f:
-                json.dump(self.learning_data, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            logger.error(f"Error saving learning data: {e}")
+        """Помечает данные обучения для отложенного сохранения"""
+        state_store.mark_dirty(self.learning_file)
     
-    def analyze_chat_message(self, message: str, chat_id: int, user_id: int) -> Dict[str, Any]:
+    def analyze_chat_message(self, message: str, chat_id: int, user_id: int,
+                             features: Optional[MessageFeatures] = None) -> Dict[str, Any]:
         """Анализирует сообщение в чате для обучения"""
+        features = features or extract_features(message)
         analysis = {
             'chat_id': chat_id,
             'user_id': user_id,
             'timestamp': datetime.now().isoformat(),
-            'length': len(message),
-            'word_count': len(message.split()),
-            'emoji_count': len(re.findall(self.patterns['emoji'], message)),
-            'caps_words': len(re.findall(self.patterns['caps'], message)),
-            'punctuation_intensity': len(re.findall(self.patterns['punctuation'], message)),
-            'crypto_terms': len(re.findall(self.patterns['crypto'], message.lower())),
-            'meme_words': len(re.findall(self.patterns['memes'], message.lower())),
-            'english_words': len(re.findall(self.patterns['english'], message)),
-            'repeated_chars': len(re.findall(self.patterns['repeated'], message)),
-            'question_words': len(re.findall(self.patterns['questions'], message.lower())),
-            'exclamations': len(re.findall(self.patterns['exclamations'], message)),
-            'questions': len(re.findall(self.patterns['questions_mark'], message))
+            **features.as_analysis()
         }
         
         # Определяем стиль сообщения
@@ -102,17 +77,17 @@ class ChatLearningService:
         else:
             return 'normal'
     
-    def learn_from_message(self, message: str, chat_id: int, user_id: int):
+    def learn_from_message(self, message: str, chat_id: int, user_id: int,
+                           features: Optional[MessageFeatures] = None):
         """Обучается на основе сообщения"""
-        analysis = self.analyze_chat_message(message, chat_id, user_id)
+        features = features or extract_features(message)
+        analysis = self.analyze_chat_message(message, chat_id, user_id, features)
         
         # Инициализируем данные чата
         if chat_id not in self.learning_data["chat_styles"]:
             self.learning_data["chat_styles"][chat_id] = {
                 "style_patterns": defaultdict(int),
-                "common_words": defaultdict(int),
-                "emoji_usage": defaultdict(int),
-                "punctuation_style": defaultdict(int),
+                **new_style_counters(),
                 "message_count": 0,
                 "active_users": [],
                 "last_updated": datetime.now().isoformat()
@@ -126,25 +101,19 @@ class ChatLearningService:
         # Обновляем паттерны стиля
         chat_style["style_patterns"][analysis['style_type']] += 1
         
-        # Извлекаем слова и эмодзи
-        words = re.findall(r'\b\w+\b', message.lower())
-        emojis = re.findall(self.patterns['emoji'], message)
-        punctuation = re.findall(r'[!?]{1,3}', message)
-        
-        for word in words:
+        # Слова, эмодзи и пунктуация уже извлечены при разборе
+        common_words = ensure_counter(chat_style, "common_words")
+        for word in features.words:
             if len(word) > 2:  # Игнорируем короткие слова
-                chat_style["common_words"][word] += 1
-        
-        for emoji in emojis:
-            chat_style["emoji_usage"][emoji] += 1
+                common_words.add(word)
         
-        for punct in punctuation:
-            chat_style["punctuation_style"][punct] += 1
+        emoji_usage = ensure_counter(chat_style, "emoji_usage")
+        for emoji in features.emojis:
+            emoji_usage.add(emoji)
         
-        # Ограничиваем размер данных
-        if len(chat_style["common_words"]) > 1000:
-            sorted_words = sorted(chat_style["common_words"].items(), key=lambda x: x[1], reverse=True)
-            chat_style["common_words"] = dict(sorted_words[:500])
+        punctuation_style = ensure_counter(chat_style, "punctuation_style")
+        for punct in features.punctuation:
+            punctuation_style.add(punct)
         
         # Сохраняем абсурдные фразы для обучения
         if analysis['style_type'] == 'meme' and analysis['meme_words'] > 0:
@@ -187,9 +156,9 @@ class ChatLearningService:
         dominant_style = max(style_patterns.items(), key=lambda x: x[1])[0] if style_patterns else "normal"
         
         # Получаем топ слова и эмодзи
-        top_words = dict(sorted(chat_style["common_words"].items(), key=lambda x: x[1], reverse=True)[:20])
-        top_emojis = dict(sorted(chat_style["emoji_usage"].items(), key=lambda x: x[1], reverse=True)[:10])
-        top_punctuation = dict(sorted(chat_style["punctuation_style"].items(), key=lambda x: x[1], reverse=True)[:5])
+        top_words = ensure_counter(chat_style, "common_words").top()
+        top_emojis = ensure_counter(chat_style, "emoji_usage").top()
+        top_punctuation = ensure_counter(chat_style, "punctuation_style").top()
         
         return {
             "dominant_style": dominant_style,
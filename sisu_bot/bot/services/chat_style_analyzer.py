@@ -1,11 +1,13 @@
 import json
 import logging
-import re
 from pathlib import Path
 from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
 from collections import defaultdict, Counter
 from sisu_bot.core.config import DATA_DIR
+from sisu_bot.bot.services.state_store import state_store
+from sisu_bot.bot.services.message_features import MessageFeatures, extract_features
+from sisu_bot.bot.services.style_counters import ensure_counter, new_style_counters
 
 logger = logging.getLogger(__name__)
 
@@ -15,22 +17,7 @@ class ChatStyleAnalyzer:
     def __init__(self):
         self.data_dir = DATA_DIR
         self.style_file = self.data_dir / 'chat_style_data.json'
-        self.style_data = self._load_style_data()
-        
-        # Паттерны для анализа стиля
-        self.style_patterns = {
-            'emoji_usage': r'[😀-🙏🌀-🗿]',
-            'caps_usage': r'[A-ZА-Я]{3,}',
-            'punctuation': r'[!?]{2,}',
-            'numbers': r'\d+',
-            'crypto_terms': r'\b(тон|ton|токен|крипта|блокчейн|дефи|нфт|памп|дамп|холд|hodl|moon|луна)\b',
-            'memes': r'\b(кек|лол|рофл|ахаха|хаха|хех|омг|вау|ого|деген|дегенский|дегенчик|дегенка|дегенство)\b',
-            'english_words': r'\b[a-zA-Z]+\b',
-            'repeated_chars': r'(.)\1{2,}',
-            'question_words': r'\b(что|как|почему|зачем|когда|где|кто|какой|какая|какие)\b',
-            'exclamations': r'[!]{1,3}',
-            'questions': r'[?]{1,3}'
-        }
+        self.style_data = state_store.attach(self.style_file, self._load_style_data())
         
     def _load_style_data(self) -> Dict[str, Any]:
         """Загружает данные стиля чата"""
@@ -51,29 +38,14 @@ class ChatStyleAnalyzer:
             return {"chat_styles": {}, "common_patterns": {}, "meme_database": {}, "anger_triggers": {}, "style_history": []}
     
     def _save_style_data(self):
-        """Сохраняет данные стиля"""
-        try:
-            with open(self.style_file, 'w', encoding='utf-8') as f:
-                json.dump(self.style_data, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            logger.error(f"Error saving style data: {e}")
+        """Помечает данные стиля для отложенного сохранения"""
+        state_store.mark_dirty(self.style_file)
     
-    def analyze_message_style(self, message: str, chat_id: int) -> Dict[str, Any]:
+    def analyze_message_style(self, message: str, chat_id: int,
+                              features: Optional[MessageFeatures] = None) -> Dict[str, Any]:
         """Анализирует стиль сообщения"""
-        style_analysis = {
-            'emoji_count': len(re.findall(self.style_patterns['emoji_usage'], message)),
-            'caps_words': len(re.findall(self.style_patterns['caps_usage'], message)),
-            'punctuation_intensity': len(re.findall(self.style_patterns['punctuation'], message)),
-            'crypto_terms': len(re.findall(self.style_patterns['crypto_terms'], message.lower())),
-            'meme_words': len(re.findall(self.style_patterns['memes'], message.lower())),
-            'english_words': len(re.findall(self.style_patterns['english_words'], message)),
-            'repeated_chars': len(re.findall(self.style_patterns['repeated_chars'], message)),
-            'question_words': len(re.findall(self.style_patterns['question_words'], message.lower())),
-            'exclamations': len(re.findall(self.style_patterns['exclamations'], message)),
-            'questions': len(re.findall(self.style_patterns['questions'], message)),
-            'length': len(message),
-            'word_count': len(message.split())
-        }
+        features = features or extract_features(message)
+        style_analysis = features.as_analysis()
         
         # Определяем общий стиль сообщения
         style_analysis['style_type'] = self._determine_style_type(style_analysis)
@@ -97,17 +69,17 @@ class ChatStyleAnalyzer:
         else:
             return 'normal'
     
-    def update_chat_style(self, message: str, chat_id: int, user_id: int):
+    def update_chat_style(self, message: str, chat_id: int, user_id: int,
+                          features: Optional[MessageFeatures] = None):
         """Обновляет стиль чата на основе сообщения"""
-        analysis = self.analyze_message_style(message, chat_id)
+        features = features or extract_features(message)
+        analysis = self.analyze_message_style(message, chat_id, features)
         
         # Инициализируем стиль чата
         if chat_id not in self.style_data["chat_styles"]:
             self.style_data["chat_styles"][chat_id] = {
                 "style_patterns": defaultdict(int),
-                "common_words": defaultdict(int),
-                "emoji_usage": defaultdict(int),
-                "punctuation_style": defaultdict(int),
+                **new_style_counters(),
                 "last_updated": datetime.now().isoformat(),
                 "message_count": 0,
                 "active_users": []
@@ -121,26 +93,19 @@ class ChatStyleAnalyzer:
         # Обновляем паттерны стиля
         chat_style["style_patterns"][analysis['style_type']] += 1
         
-        # Извлекаем слова и эмодзи
-        words = re.findall(r'\b\w+\b', message.lower())
-        emojis = re.findall(self.style_patterns['emoji_usage'], message)
-        punctuation = re.findall(r'[!?]{1,3}', message)
-        
-        for word in words:
+        # Слова, эмодзи и пунктуация уже извлечены при разборе
+        common_words = ensure_counter(chat_style, "common_words")
+        for word in features.words:
             if len(word) > 2:  # Игнорируем короткие слова
-                chat_style["common_words"][word] += 1
-        
-        for emoji in emojis:
-            chat_style["emoji_usage"][emoji] += 1
+                common_words.add(word)
         
-        for punct in punctuation:
-            chat_style["punctuation_style"][punct] += 1
+        emoji_usage = ensure_counter(chat_style, "emoji_usage")
+        for emoji in features.emojis:
+            emoji_usage.add(emoji)
         
-        # Ограничиваем размер данных
-        if len(chat_style["common_words"]) > 1000:
-            # Оставляем только самые частые слова
-            sorted_words = sorted(chat_style["common_words"].items(), key=lambda x: x[1], reverse=True)
-            chat_style["common_words"] = dict(sorted_words[:500])
+        punctuation_style = ensure_counter(chat_style, "punctuation_style")
+        for punct in features.punctuation:
+            punctuation_style.add(punct)
         
         self._save_style_data()
     
@@ -156,9 +121,9 @@ class ChatStyleAnalyzer:
         dominant_style = max(style_patterns.items(), key=lambda x: x[1])[0] if style_patterns else "normal"
         
         # Получаем топ слова и эмодзи
-        top_words = dict(sorted(chat_style["common_words"].items(), key=lambda x: x[1], reverse=True)[:20])
-        top_emojis = dict(sorted(chat_style["emoji_usage"].items(), key=lambda x: x[1], reverse=True)[:10])
-        top_punctuation = dict(sorted(chat_style["punctuation_style"].items(), key=lambda x: x[1], reverse=True)[:5])
+        top_words = ensure_counter(chat_style, "common_words").top()
+        top_emojis = ensure_counter(chat_style, "emoji_usage").top()
+        top_punctuation = ensure_counter(chat_style, "punctuation_style").top()
         
         return {
             "dominant_style": dominant_style,
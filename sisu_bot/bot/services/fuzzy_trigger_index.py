@@ -0,0 +1,86 @@
+"""
+Нечеткий поиск триггеров пакетной функцией rapidfuzz.
+
+Строки всех категорий TRIGGER_MAP один раз собираются в плоский список
+вариантов с обратными ссылками на категорию. Поиск — один вызов
+process.extractOne с score_cutoff: варианты, которые уже не могут набрать
+порог или обогнать найденный лучший результат, отбрасываются внутри
+rapidfuzz без возврата в Python. Список пересобирается, когда меняется
+состав TRIGGER_MAP.
+"""
+import logging
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+try:
+    from rapidfuzz import fuzz, process
+    FUZZY_AVAILABLE = True
+except ImportError:
+    FUZZY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class FuzzyTriggerMatch(NamedTuple):
+    name: str
+    trigger: str
+    score: float
+
+
+class FuzzyTriggerIndex:
+    """Плоский список триггеров для process.extractOne(partial_ratio)"""
+
+    def __init__(self, trigger_map: Dict[str, Dict[str, Any]], score_cutoff: float = 75):
+        self.trigger_map = trigger_map
+        self.score_cutoff = score_cutoff
+        self._choices: List[str] = []
+        self._names: List[str] = []
+        self._signature: Optional[Tuple] = None
+        if not FUZZY_AVAILABLE:
+            logger.warning("rapidfuzz is not installed, fuzzy trigger matching is disabled")
+
+    def _current_signature(self) -> Tuple:
+        # O(число категорий): пересборка при замене категории или изменении числа триггеров
+        return tuple(
+            (name, id(trig), len(trig.get("triggers", [])))
+            for name, trig in self.trigger_map.items()
+        )
+
+    def refresh(self, force: bool = False) -> bool:
+        """Пересобирает список вариантов, если TRIGGER_MAP изменился"""
+        signature = self._current_signature()
+        if not force and signature == self._signature:
+            return False
+        choices, names, seen = [], [], set()
+        for name, trig in self.trigger_map.items():
+            for trigger in trig.get("triggers", []):
+                trigger = trigger.lower()
+                # Одинаковые строки: побеждает первая категория, как в прежнем цикле
+                if trigger in seen:
+                    continue
+                seen.add(trigger)
+                choices.append(trigger)
+                names.append(name)
+        self._choices, self._names, self._signature = choices, names, signature
+        return True
+
+    def match(self, text: str) -> Optional[FuzzyTriggerMatch]:
+        """Лучший триггер с partial_ratio >= score_cutoff или None"""
+        if not FUZZY_AVAILABLE:
+            return None
+        self.refresh()
+        if not self._choices:
+            return None
+        result = process.extractOne(
+            text,
+            self._choices,
+            scorer=fuzz.partial_ratio,
+            score_cutoff=self.score_cutoff,
+        )
+        if result is None:
+            return None
+        trigger, score, index = result
+        return FuzzyTriggerMatch(self._names[index], trigger, score)
+
+    def __len__(self) -> int:
+        self.refresh()
+        return len(self._choices)
@@ -9,6 +9,7 @@ from collections import defaultdict, deque
 from sisu_bot.core.config import DATA_DIR
 from sisu_bot.bot.services.chat_style_analyzer import chat_style_analyzer
 from sisu_bot.bot.services.chat_learning_service import chat_learning_service
+from sisu_bot.bot.services.message_features import MessageFeatures, extract_features
 
 logger = logging.getLogger(__name__)
 
@@ -485,13 +486,17 @@ class MemePersonaService:
         except Exception as e:
             logger.error(f"Error saving mood data: {e}")
     
-    def get_meme_response(self, user_message: str, user_id: int, chat_id: int) -> str:
+    def get_meme_response(self, user_message: str, user_id: int, chat_id: int,
+                          features: Optional[MessageFeatures] = None) -> str:
         """Получает мемный ответ без шаблонных фраз"""
+        # Признаки считаются один раз и переиспользуются обоими анализаторами
+        features = features or extract_features(user_message)
+        
         # Обучаемся на сообщении пользователя
-        chat_learning_service.learn_from_message(user_message, chat_id, user_id)
+        chat_learning_service.learn_from_message(user_message, chat_id, user_id, features)
         
         # Обновляем стиль чата
-        chat_style_analyzer.update_chat_style(user_message, chat_id, user_id)
+        chat_style_analyzer.update_chat_style(user_message, chat_id, user_id, features)
         
         # Проверяем триггеры злости
         anger_level = chat_style_analyzer.check_anger_triggers(user_message)
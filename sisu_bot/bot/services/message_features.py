@@ -0,0 +1,133 @@
+"""
+Признаки сообщения для анализаторов стиля и обучения.
+
+Текст разбирается одним проходом составного регулярного выражения на
+слова, серии знаков !? и эмодзи; счетчики словарей (крипта, мемы,
+вопросительные слова) считаются по предвычисленным множествам, а не
+отдельным findall на каждый паттерн. Результат — неизменяемый
+MessageFeatures: MemePersonaService.get_meme_response разбирает текст один
+раз и передает признаки в ChatLearningService и ChatStyleAnalyzer вместо
+повторного анализа того же текста.
+"""
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Tuple
+
+CRYPTO_TERMS = frozenset({
+    'тон', 'ton', 'токен', 'крипта', 'блокчейн', 'дефи', 'нфт',
+    'памп', 'дамп', 'холд', 'hodl', 'moon', 'луна',
+})
+MEME_WORDS = frozenset({
+    'кек', 'лол', 'рофл', 'ахаха', 'хаха', 'хех', 'омг', 'вау', 'ого',
+    'пельмень', 'кот', 'холодильник', 'трактор',
+    'деген', 'дегенский', 'дегенчик', 'дегенка', 'дегенство',
+})
+QUESTION_WORDS = frozenset({
+    'что', 'как', 'почему', 'зачем', 'когда', 'где', 'кто', 'какой', 'какая', 'какие',
+})
+
+EMOJI_PATTERN = r'[😀-🙏🌀-🗿]'
+_TOKEN_RE = re.compile(rf'(?P<word>\w+)|(?P<punct>[!?]+)|(?P<emoji>{EMOJI_PATTERN})')
+_CAPS_RE = re.compile(r'[A-ZА-Я]{3,}')
+_REPEATED_RE = re.compile(r'(.)\1{2,}')
+_SAME_CHAR_RUN_RE = re.compile(r'!+|\?+')
+
+
+def _is_english(token: str) -> bool:
+    return token.isascii() and token.isalpha()
+
+
+@dataclass(frozen=True)
+class MessageFeatures:
+    """Признаки одного сообщения (счетчики совпадают с прежними re.findall)"""
+    length: int
+    word_count: int
+    words: Tuple[str, ...]
+    emojis: Tuple[str, ...]
+    punctuation: Tuple[str, ...]
+    emoji_count: int
+    caps_words: int
+    punctuation_intensity: int
+    crypto_terms: int
+    meme_words: int
+    english_words: int
+    repeated_chars: int
+    question_words: int
+    exclamations: int
+    questions: int
+
+    @property
+    def english_ratio(self) -> float:
+        return self.english_words / self.word_count if self.word_count else 0.0
+
+    def as_analysis(self) -> Dict[str, Any]:
+        """Счетчики в формате словаря анализа сервисов стиля"""
+        return {
+            'length': self.length,
+            'word_count': self.word_count,
+            'emoji_count': self.emoji_count,
+            'caps_words': self.caps_words,
+            'punctuation_intensity': self.punctuation_intensity,
+            'crypto_terms': self.crypto_terms,
+            'meme_words': self.meme_words,
+            'english_words': self.english_words,
+            'repeated_chars': self.repeated_chars,
+            'question_words': self.question_words,
+            'exclamations': self.exclamations,
+            'questions': self.questions,
+        }
+
+
+def extract_features(text: str) -> MessageFeatures:
+    """Считает все признаки сообщения за один разбор текста"""
+    words, emojis, punctuation = [], [], []
+    caps = crypto = memes = english = question_words = 0
+    intensity = exclamations = questions = 0
+
+    for match in _TOKEN_RE.finditer(text):
+        kind = match.lastgroup
+        token = match.group()
+        if kind == 'word':
+            if _is_english(token):
+                english += 1
+            if not token.islower():
+                caps += len(_CAPS_RE.findall(token))
+            word = token.lower()
+            words.append(word)
+            if word in CRYPTO_TERMS:
+                crypto += 1
+            elif word in MEME_WORDS:
+                memes += 1
+            elif word in QUESTION_WORDS:
+                question_words += 1
+        elif kind == 'punct':
+            if len(token) >= 2:
+                intensity += 1
+            # Как [!?]{1,3}: серия режется на куски по три знака
+            punctuation.extend(token[i:i + 3] for i in range(0, len(token), 3))
+            for run in _SAME_CHAR_RUN_RE.findall(token):
+                chunks = -(-len(run) // 3)
+                if run[0] == '!':
+                    exclamations += chunks
+                else:
+                    questions += chunks
+        else:
+            emojis.append(token)
+
+    return MessageFeatures(
+        length=len(text),
+        word_count=len(text.split()),
+        words=tuple(words),
+        emojis=tuple(emojis),
+        punctuation=tuple(punctuation),
+        emoji_count=len(emojis),
+        caps_words=caps,
+        punctuation_intensity=intensity,
+        crypto_terms=crypto,
+        meme_words=memes,
+        english_words=english,
+        repeated_chars=len(_REPEATED_RE.findall(text)),
+        question_words=question_words,
+        exclamations=exclamations,
+        questions=questions,
+    )
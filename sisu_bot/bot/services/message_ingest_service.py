@@ -0,0 +1,222 @@
+"""
+Пакетная запись сообщений чатов в БД.
+
+MessageLoggingMiddleware только кладёт готовую строку в очередь и сразу
+передаёт сообщение обработчику. Фоновая задача забирает очередь
+микропакетами (до max_batch_size строк или не дольше max_delay секунд с
+момента появления первой строки) и пишет каждую пачку одним executemany и
+одним коммитом в пуле потоков БД. При переполнении очереди новые строки
+отбрасываются и учитываются в счётчике dropped.
+"""
+import asyncio
+import atexit
+import logging
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from app.infrastructure.db.engine import run_in_db_thread
+from sisu_bot.core.config import (
+    MESSAGE_INGEST_MAX_BATCH,
+    MESSAGE_INGEST_MAX_DELAY,
+    MESSAGE_INGEST_QUEUE_SIZE,
+)
+
+logger = logging.getLogger(__name__)
+
+Row = Dict[str, Any]
+BatchWriter = Callable[[List[Row]], int]
+
+
+def _default_writer() -> BatchWriter:
+    # Импорт при первом сбросе: модели сообщений нужны только писателю
+    from sisu_bot.bot.services.message_service import message_service
+    return message_service.save_messages_batch
+
+
+class MessageIngestQueue:
+    """Неблокирующая очередь сообщений с фоновой пакетной записью"""
+
+    def __init__(self, writer: Optional[BatchWriter] = None, max_batch_size: int = 200,
+                 max_delay: float = 0.5, max_queue_size: int = 10000):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_delay = max_delay
+        self.max_queue_size = max_queue_size
+
+        self._writer = writer
+        # (время постановки, строка)
+        self._pending: Deque[Tuple[float, Row]] = deque()
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._closing = False
+
+        self._stats = {
+            "enqueued": 0,
+            "dropped": 0,
+            "written": 0,
+            "batches": 0,
+            "write_errors": 0,
+            "failed_rows": 0,
+            "max_queue_depth": 0,
+            "last_batch_size": 0,
+            "last_write_ms": 0.0,
+            "max_write_ms": 0.0,
+            "total_write_ms": 0.0,
+            "max_lag_ms": 0.0,
+        }
+
+    # --- Приём сообщений ---
+
+    def submit(self, row: Row) -> bool:
+        """Ставит строку в очередь; False — очередь переполнена, строка отброшена"""
+        if len(self._pending) >= self.max_queue_size:
+            self._stats["dropped"] += 1
+            if self._stats["dropped"] % 1000 == 1:
+                logger.warning(f"Message ingest queue is full ({self.max_queue_size}), dropping messages")
+            return False
+
+        self._pending.append((time.monotonic(), row))
+        self._stats["enqueued"] += 1
+        depth = len(self._pending)
+        if depth > self._stats["max_queue_depth"]:
+            self._stats["max_queue_depth"] = depth
+
+        self._ensure_started()
+        # Будим писателя на первой строке (старт таймера задержки) и на полной пачке
+        if self._wakeup is not None and (depth == 1 or depth >= self.max_batch_size):
+            self._wakeup.set()
+        return True
+
+    # --- Запись ---
+
+    def _take_batch(self) -> List[Tuple[float, Row]]:
+        size = min(len(self._pending), self.max_batch_size)
+        return [self._pending.popleft() for _ in range(size)]
+
+    def _get_writer(self) -> BatchWriter:
+        if self._writer is None:
+            self._writer = _default_writer()
+        return self._writer
+
+    def _record_batch(self, batch: List[Tuple[float, Row]], written: int, elapsed_ms: float) -> None:
+        self._stats["batches"] += 1
+        self._stats["written"] += written
+        self._stats["last_batch_size"] = len(batch)
+        self._stats["last_write_ms"] = elapsed_ms
+        self._stats["total_write_ms"] += elapsed_ms
+        self._stats["max_write_ms"] = max(self._stats["max_write_ms"], elapsed_ms)
+        lag_ms = (time.monotonic() - batch[0][0]) * 1000
+        self._stats["max_lag_ms"] = max(self._stats["max_lag_ms"], lag_ms)
+
+    def _record_error(self, batch: List[Tuple[float, Row]], error: Exception) -> None:
+        self._stats["write_errors"] += 1
+        self._stats["failed_rows"] += len(batch)
+        logger.error(f"Message ingest: error writing batch of {len(batch)} rows: {error}")
+
+    async def _write_batch(self, batch: List[Tuple[float, Row]]) -> None:
+        started = time.perf_counter()
+        try:
+            written = await run_in_db_thread(self._get_writer(), [row for _, row in batch])
+        except Exception as e:
+            self._record_error(batch, e)
+            return
+        self._record_batch(batch, written, (time.perf_counter() - started) * 1000)
+
+    def flush(self) -> None:
+        """Синхронно записывает всё накопленное (скрипты, atexit)"""
+        while self._pending:
+            batch = self._take_batch()
+            started = time.perf_counter()
+            try:
+                written = self._get_writer()([row for _, row in batch])
+            except Exception as e:
+                self._record_error(batch, e)
+                continue
+            self._record_batch(batch, written, (time.perf_counter() - started) * 1000)
+
+    async def _writer_loop(self) -> None:
+        """Фоновая задача: собирает микропакеты и пишет их"""
+        while True:
+            if not self._pending:
+                if self._closing:
+                    return
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            # Ждём добора пачки, но не дольше max_delay от самой старой строки
+            if len(self._pending) < self.max_batch_size and not self._closing:
+                remaining = self._pending[0][0] + self.max_delay - time.monotonic()
+                if remaining > 0:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=remaining)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+            try:
+                await self._write_batch(self._take_batch())
+            except Exception as e:
+                logger.error(f"Message ingest: error in writer loop: {e}")
+
+    # --- Жизненный цикл ---
+
+    def _ensure_started(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # Вне event loop (скрипты, тесты) строки ждут flush()
+            return
+        self.start()
+
+    def start(self) -> None:
+        """Запускает фоновую запись в текущем event loop"""
+        if self._task is not None and not self._task.done():
+            return
+        self._closing = False
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._writer_loop())
+        logger.info(
+            f"Message ingest writer started (max_batch={self.max_batch_size}, "
+            f"max_delay={self.max_delay}s, queue_size={self.max_queue_size})"
+        )
+
+    async def stop(self) -> None:
+        """Дописывает очередь до конца и останавливает фоновую задачу"""
+        self._closing = True
+        if self._task is not None:
+            self._wakeup.set()
+            try:
+                await self._task
+            except Exception as e:
+                logger.error(f"Message ingest: writer stopped with error: {e}")
+            self._task = None
+        # Остатки (задача не запускалась или упала) пишем через пул потоков
+        while self._pending:
+            await self._write_batch(self._take_batch())
+        logger.info("Message ingest queue drained on shutdown")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Счётчики очереди: глубина, отброшенные, размеры и время записи пачек"""
+        stats = dict(self._stats)
+        batches = stats["batches"]
+        stats["queue_depth"] = len(self._pending)
+        stats["avg_batch_size"] = stats["written"] / batches if batches else 0.0
+        stats["avg_write_ms"] = stats["total_write_ms"] / batches if batches else 0.0
+        return stats
+
+
+# Глобальный экземпляр очереди
+message_ingest = MessageIngestQueue(
+    max_batch_size=MESSAGE_INGEST_MAX_BATCH,
+    max_delay=MESSAGE_INGEST_MAX_DELAY,
+    max_queue_size=MESSAGE_INGEST_QUEUE_SIZE,
+)
+
+# Страховка для скриптов, которые не вызывают stop()
+atexit.register(message_ingest.flush)
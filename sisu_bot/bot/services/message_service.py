@@ -2,15 +2,16 @@ import logging
 import re
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine, func, and_, or_
+from app.infrastructure.db.engine import get_engine, get_sessionmaker, run_in_db_thread
+from sqlalchemy import func, and_, or_, insert, select
 from sisu_bot.bot.db.models import Message, User
+from app.infrastructure.db.repositories.phrase_counts import PhraseCountRepository, day_bucket
 from sisu_bot.core.config import DB_PATH
 
 logger = logging.getLogger(__name__)
 
-engine = create_engine(f'sqlite:///{DB_PATH}')
-Session = sessionmaker(bind=engine)
+engine = get_engine(f'sqlite:///{DB_PATH}')
+Session = get_sessionmaker(f'sqlite:///{DB_PATH}')
 
 
 class MessageService:
@@ -42,6 +43,14 @@ class MessageService:
     def __init__(self):
         self.command_regex = re.compile('|'.join(self.COMMAND_PATTERNS), re.IGNORECASE)
         self.spam_regexes = [re.compile(pattern, re.IGNORECASE) for pattern in self.SPAM_PATTERNS]
+        # Суточные счетчики фраз обновляются вместе с записью сообщений
+        self.phrase_counts = PhraseCountRepository(Session)
+        self._phrase_schema_ready = False
+    
+    def _ensure_phrase_schema(self):
+        if not self._phrase_schema_ready:
+            self.phrase_counts.ensure_schema()
+            self._phrase_schema_ready = True
     
     def is_command(self, text: str) -> bool:
         """Проверяет, является ли сообщение командой"""
@@ -97,6 +106,12 @@ class MessageService:
                 )
                 
                 session.add(message)
+                self._ensure_phrase_schema()
+                self.phrase_counts.add_messages(session, [{
+                    'user_id': user_id,
+                    'message_text': message_text,
+                    'timestamp': message.timestamp,
+                }])
                 session.commit()
                 
                 logger.debug(f"Saved message from user {user_id} in chat {chat_id}")
@@ -106,6 +121,33 @@ class MessageService:
             logger.error(f"Error saving message: {e}")
             return False
     
+    def build_message_row(self, user_id: int, chat_id: int, message_text: str,
+                          message_type: str = 'text') -> Optional[Dict[str, Any]]:
+        """Готовит строку для пакетной вставки; None — если сообщение не сохраняется"""
+        if self.is_command(message_text) or self.is_spam(message_text):
+            return None
+        return {
+            'user_id': user_id,
+            'chat_id': chat_id,
+            'message_text': message_text,
+            'message_type': message_type,
+            'timestamp': datetime.utcnow(),
+            'is_command': False,
+            'is_spam': False,
+            'processed_for_learning': False,
+        }
+    
+    def save_messages_batch(self, rows: List[Dict[str, Any]]) -> int:
+        """Вставляет пачку сообщений одним executemany и одним коммитом"""
+        if not rows:
+            return 0
+        self._ensure_phrase_schema()
+        with Session() as session:
+            session.execute(insert(Message), rows)
+            self.phrase_counts.add_messages(session, rows)
+            session.commit()
+        return len(rows)
+    
     def get_unprocessed_messages(self, limit: int = 100) -> List[Message]:
         """Получает необработанные сообщения для обучения"""
         try:
@@ -138,39 +180,56 @@ class MessageService:
             return False
     
     def get_popular_phrases(self, days: int = 7, min_count: int = 3) -> List[Dict[str, Any]]:
-        """Получает популярные фразы за последние N дней"""
+        """
+        Получает популярные фразы за последние N дней (сумма суточных счетчиков).
+
+        Сутки границы окна учитываются целиком, поэтому окно — от N до N+1 суток.
+        """
         try:
             cutoff_date = datetime.utcnow() - timedelta(days=days)
-            
+            self._ensure_phrase_schema()
+            return self.phrase_counts.top_phrases(day_bucket(cutoff_date), min_count=min_count, limit=50)
+        except Exception as e:
+            logger.error(f"Error getting popular phrases: {e}")
+            return []
+    
+    def backfill_phrase_counts(self, batch_size: int = 5000) -> Dict[str, int]:
+        """Пересобирает суточные счетчики фраз по существующим строкам messages"""
+        self._ensure_phrase_schema()
+        with Session() as session:
+            # Граница и очистка в одной транзакции: новые сообщения посчитает запись
+            max_id = session.execute(select(func.max(Message.id))).scalar() or 0
+            self.phrase_counts.clear(session)
+            session.commit()
+        
+        last_id = 0
+        scanned = 0
+        while last_id < max_id:
             with Session() as session:
-                # Группируем по тексту сообщения и считаем количество
-                phrases = session.query(
-                    Message.message_text,
-                    func.count(Message.id).label('count'),
-                    func.count(func.distinct(Message.user_id)).label('unique_users')
-                ).filter(
-                    and_(
-                        Message.timestamp >= cutoff_date,
+                rows = session.execute(
+                    select(Message.id, Message.user_id, Message.message_text, Message.timestamp)
+                    .where(
+                        Message.id > last_id,
+                        Message.id <= max_id,
                         Message.is_spam == False,
                         Message.is_command == False,
-                        Message.message_text.isnot(None),
-                        func.length(Message.message_text) >= 5  # Минимум 5 символов
+                        Message.message_text.isnot(None)
                     )
-                ).group_by(Message.message_text).having(
-                    func.count(Message.id) >= min_count
-                ).order_by(func.count(Message.id).desc()).limit(50).all()
-                
-                return [
-                    {
-                        'text': phrase.message_text,
-                        'count': phrase.count,
-                        'unique_users': phrase.unique_users
-                    }
-                    for phrase in phrases
-                ]
-        except Exception as e:
-            logger.error(f"Error getting popular phrases: {e}")
-            return []
+                    .order_by(Message.id)
+                    .limit(batch_size)
+                ).all()
+                if not rows:
+                    break
+                self.phrase_counts.add_messages(session, [row._mapping for row in rows])
+                session.commit()
+            last_id = rows[-1].id
+            scanned += len(rows)
+            logger.info(f"Phrase counts backfill: {scanned} messages (up to id {last_id})")
+        
+        return {'messages': scanned, 'max_id': max_id}
+    
+    async def get_popular_phrases_async(self, days: int = 7, min_count: int = 3) -> List[Dict[str, Any]]:
+        return await run_in_db_thread(self.get_popular_phrases, days, min_count)
     
     def get_user_message_stats(self, user_id: int, days: int = 30) -> Dict[str, Any]:
         """Получает статистику сообщений пользователя"""
@@ -207,6 +266,9 @@ class MessageService:
                 'last_message': None
             }
     
+    async def get_user_message_stats_async(self, user_id: int, days: int = 30) -> Dict[str, Any]:
+        return await run_in_db_thread(self.get_user_message_stats, user_id, days)
+    
     def cleanup_old_messages(self, days: int = 90) -> int:
         """Удаляет старые сообщения для экономии места"""
         try:
@@ -217,9 +279,12 @@ class MessageService:
                     Message.timestamp < cutoff_date
                 ).delete()
                 session.commit()
-                
-                logger.info(f"Cleaned up {deleted_count} old messages")
-                return deleted_count
+            
+            self._ensure_phrase_schema()
+            self.phrase_counts.prune(day_bucket(cutoff_date))
+            
+            logger.info(f"Cleaned up {deleted_count} old messages")
+            return deleted_count
         except Exception as e:
             logger.error(f"Error cleaning up old messages: {e}")
             return 0
@@ -5,16 +5,16 @@ import json
 import time
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text
+from sqlalchemy import Column, Integer, String, DateTime, Text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from app.infrastructure.db.engine import get_engine, get_sessionmaker
 from sisu_bot.core.config import DB_PATH
 import logging
 
 logger = logging.getLogger(__name__)
 
-engine = create_engine(f'sqlite:///{DB_PATH}')
-Session = sessionmaker(bind=engine)
+engine = get_engine(f'sqlite:///{DB_PATH}')
+Session = get_sessionmaker(f'sqlite:///{DB_PATH}')
 Base = declarative_base()
 
 class PersistentData(Base):
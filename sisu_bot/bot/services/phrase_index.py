@@ -0,0 +1,127 @@
+"""
+Инвертированный индекс слов для поиска похожих фраз (сходство Жаккара по словам).
+
+Фразы разбиты на области (фразы пользователя, популярные фразы); у каждой
+области свой словарь слово -> множество фраз. Поиск не перебирает все фразы:
+если сходство Жаккара не ниже порога t, общих слов не меньше t * |запрос|,
+значит у кандидата есть хотя бы одно из (|запрос| - ceil(t * |запрос|) + 1)
+самых редких слов запроса. Просматриваются только эти списки, а кандидаты
+проверяются точным подсчетом сходства. Документ индекса (фраза -> слова)
+хранится рядом с файлом памяти, списки слов строятся из него при загрузке.
+"""
+import math
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+INDEX_VERSION = 1
+
+
+def phrase_words(phrase: str) -> FrozenSet[str]:
+    """Множество слов фразы (как в PhraseMemoryService._calculate_similarity)"""
+    return frozenset(phrase.lower().split())
+
+
+def jaccard(words1: FrozenSet[str], words2: FrozenSet[str]) -> float:
+    if not words1 or not words2:
+        return 0.0
+    intersection = len(words1 & words2)
+    return intersection / (len(words1) + len(words2) - intersection)
+
+
+class PhraseIndex:
+    """Инвертированный индекс фраз по областям с инкрементальным обновлением"""
+
+    def __init__(self, document: Optional[Dict] = None):
+        if not document or document.get("version") != INDEX_VERSION:
+            document = {"version": INDEX_VERSION, "entries": {}}
+        # Сохраняемая часть: scope -> {phrase: [words]}
+        self.document = document
+        self._words: Dict[str, Dict[str, FrozenSet[str]]] = {}
+        self._postings: Dict[str, Dict[str, Set[str]]] = {}
+        for scope, entries in document["entries"].items():
+            for phrase, words in entries.items():
+                self._index(scope, phrase, frozenset(words))
+
+    # --- Изменение ---
+
+    def _index(self, scope: str, phrase: str, words: FrozenSet[str]) -> None:
+        self._words.setdefault(scope, {})[phrase] = words
+        postings = self._postings.setdefault(scope, {})
+        for word in words:
+            postings.setdefault(word, set()).add(phrase)
+
+    def add(self, scope: str, phrase: str) -> bool:
+        """Добавляет фразу; False — она уже в индексе"""
+        if phrase in self._words.get(scope, {}):
+            return False
+        words = phrase_words(phrase)
+        if not words:
+            return False
+        self._index(scope, phrase, words)
+        self.document["entries"].setdefault(scope, {})[phrase] = sorted(words)
+        return True
+
+    def remove(self, scope: str, phrase: str) -> bool:
+        """Удаляет фразу из индекса; False — ее там не было"""
+        words = self._words.get(scope, {}).pop(phrase, None)
+        if words is None:
+            return False
+        postings = self._postings[scope]
+        for word in words:
+            bucket = postings.get(word)
+            if bucket is not None:
+                bucket.discard(phrase)
+                if not bucket:
+                    del postings[word]
+        entries = self.document["entries"].get(scope, {})
+        entries.pop(phrase, None)
+        if not self._words[scope]:
+            del self._words[scope]
+            del self._postings[scope]
+            self.document["entries"].pop(scope, None)
+        return True
+
+    def retain(self, scope: str, phrases: Iterable[str]) -> int:
+        """Оставляет в области только указанные фразы; возвращает число удаленных"""
+        keep = set(phrases)
+        removed = [phrase for phrase in self._words.get(scope, {}) if phrase not in keep]
+        for phrase in removed:
+            self.remove(scope, phrase)
+        return len(removed)
+
+    # --- Поиск ---
+
+    def search(self, scope: str, phrase: str, threshold: float = 0.3,
+               limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Фразы области со сходством строго больше threshold, по убыванию сходства"""
+        query = phrase_words(phrase)
+        postings = self._postings.get(scope)
+        if not query or not postings:
+            return []
+
+        # Префиксный фильтр: достаточно самых редких слов запроса
+        min_overlap = max(1, math.ceil(threshold * len(query)))
+        probe = sorted(query, key=lambda word: len(postings.get(word, ())))
+        probe = probe[:len(query) - min_overlap + 1]
+
+        candidates: Set[str] = set()
+        for word in probe:
+            candidates.update(postings.get(word, ()))
+
+        words = self._words[scope]
+        hits = []
+        for candidate in candidates:
+            similarity = jaccard(query, words[candidate])
+            if similarity > threshold:
+                hits.append((candidate, similarity))
+        hits.sort(key=lambda hit: (-hit[1], hit[0]))
+        return hits[:limit] if limit is not None else hits
+
+    # --- Служебное ---
+
+    def phrases(self, scope: str) -> List[str]:
+        return list(self._words.get(scope, {}))
+
+    def size(self, scope: Optional[str] = None) -> int:
+        if scope is not None:
+            return len(self._words.get(scope, {}))
+        return sum(len(entries) for entries in self._words.values())
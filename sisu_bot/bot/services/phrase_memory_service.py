@@ -7,6 +7,11 @@ from datetime import datetime, timedelta
 from collections import defaultdict, Counter
 from sisu_bot.core.config import DATA_DIR
 from sisu_bot.bot.services.enhanced_persona_service import enhanced_persona_service
+from sisu_bot.bot.services.state_store import state_store
+from sisu_bot.bot.services.phrase_index import PhraseIndex
+
+POPULAR_SCOPE = "popular"
+SIMILARITY_THRESHOLD = 0.3
 
 logger = logging.getLogger(__name__)
 
@@ -17,15 +22,22 @@ class PhraseMemoryService:
         self.data_dir = DATA_DIR
         self.memory_file = self.data_dir / 'phrase_memory.json'
         self.improvisation_file = self.data_dir / 'improvisation_patterns.json'
+        self.index_file = self.data_dir / 'phrase_memory_index.json'
         
-        # Загружаем данные
-        self.memory_data = self._load_memory_data()
-        self.improvisation_patterns = self._load_improvisation_patterns()
+        # Загружаем данные (документы живут в памяти, запись идет через state_store)
+        self.memory_data = state_store.attach(self.memory_file, self._load_memory_data())
+        self.improvisation_patterns = state_store.attach(self.improvisation_file, self._load_improvisation_patterns())
         
         # Кэш для быстрого доступа
         self.phrase_cache = defaultdict(list)
         self._build_cache()
         
+        # Индекс слов для find_similar_phrases, обновляется инкрементально
+        self.phrase_index, rebuilt = self._load_phrase_index()
+        state_store.attach(self.index_file, self.phrase_index.document)
+        if rebuilt:
+            self._save_phrase_index()
+        
     def _load_memory_data(self) -> Dict[str, Any]:
         """Загружает данные памяти"""
         try:
@@ -98,26 +110,58 @@ class PhraseMemoryService:
     
     def _build_cache(self):
         """Строит кэш для быстрого доступа"""
+        self.phrase_cache.clear()
         for user_id, phrases in self.memory_data["user_phrases"].items():
             for phrase_data in phrases:
                 phrase = phrase_data["phrase"].lower()
                 self.phrase_cache[user_id].append(phrase)
     
-    def _save_memory_data(self):
-        """Сохраняет данные памяти"""
+    def _user_scope(self, user_id) -> str:
+        # После загрузки JSON ключи пользователей — строки
+        return f"user:{user_id}"
+    
+    def _load_phrase_index(self) -> Tuple[PhraseIndex, bool]:
+        """Загружает индекс фраз; при расхождении с памятью строит заново (второй элемент — True)"""
+        document = None
         try:
-            with open(self.memory_file, 'w', encoding='utf-8') as f:
-                json.dump(self.memory_data, f, ensure_ascii=False, indent=2)
+            if self.index_file.exists():
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    document = json.load(f)
         except Exception as e:
-            logger.error(f"Error saving memory data: {e}")
+            logger.error(f"Error loading phrase index: {e}")
+        
+        index = PhraseIndex(document)
+        if self._index_matches_memory(index):
+            return index, False
+        
+        index = PhraseIndex()
+        for user_id, phrases in self.memory_data["user_phrases"].items():
+            for phrase_data in phrases:
+                index.add(self._user_scope(user_id), phrase_data["phrase"])
+        for phrase in self.memory_data["popular_phrases"]:
+            index.add(POPULAR_SCOPE, phrase)
+        logger.info(f"Phrase index rebuilt: {index.size()} phrases")
+        return index, True
+    
+    def _index_matches_memory(self, index: PhraseIndex) -> bool:
+        if index.size(POPULAR_SCOPE) != len(self.memory_data["popular_phrases"]):
+            return False
+        for user_id, phrases in self.memory_data["user_phrases"].items():
+            if index.size(self._user_scope(user_id)) != len({p["phrase"] for p in phrases}):
+                return False
+        return True
+    
+    def _save_phrase_index(self):
+        """Помечает индекс фраз для отложенного сохранения"""
+        state_store.mark_dirty(self.index_file)
+    
+    def _save_memory_data(self):
+        """Помечает данные памяти для отложенного сохранения"""
+        state_store.mark_dirty(self.memory_file)
     
     def _save_improvisation_patterns(self):
-        """Сохраняет паттерны импровизации"""
-        try:
-            with open(self.improvisation_file, 'w', encoding='utf-8') as f:
-                json.dump(self.improvisation_patterns, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            logger.error(f"Error saving improvisation patterns: {e}")
+        """Помечает паттерны импровизации для отложенного сохранения"""
+        state_store.mark_dirty(self.improvisation_file)
     
     def remember_phrase(self, phrase: str, user_id: int, context: str = None) -> bool:
         """Запоминает фразу пользователя"""
@@ -149,6 +193,8 @@ class PhraseMemoryService:
                 "context": context
             }
             self.memory_data["user_phrases"][user_id].append(phrase_data)
+            self.phrase_cache[user_id].append(phrase_clean.lower())
+            self.phrase_index.add(self._user_scope(user_id), phrase_clean)
             
             # Ограничиваем количество фраз на пользователя
             if len(self.memory_data["user_phrases"][user_id]) > 100:
@@ -157,15 +203,16 @@ class PhraseMemoryService:
                     self.memory_data["user_phrases"][user_id],
                     key=lambda x: x["timestamp"]
                 )[-100:]
+                kept = self.memory_data["user_phrases"][user_id]
+                self.phrase_cache[user_id] = [p["phrase"].lower() for p in kept]
+                self.phrase_index.retain(self._user_scope(user_id), [p["phrase"] for p in kept])
         
         # Обновляем популярные фразы
         self._update_popular_phrases(phrase_clean)
         
-        # Обновляем кэш
-        self._build_cache()
-        
         # Сохраняем данные
         self._save_memory_data()
+        self._save_phrase_index()
         
         logger.info(f"Remembered phrase for user {user_id}: {phrase_clean[:50]}...")
         return True
@@ -180,28 +227,23 @@ class PhraseMemoryService:
                 "first_seen": datetime.now().isoformat(),
                 "last_seen": datetime.now().isoformat()
             }
+            self.phrase_index.add(POPULAR_SCOPE, phrase_lower)
         else:
             self.memory_data["popular_phrases"][phrase_lower]["count"] += 1
             self.memory_data["popular_phrases"][phrase_lower]["last_seen"] = datetime.now().isoformat()
     
     def find_similar_phrases(self, phrase: str, user_id: int = None, limit: int = 5) -> List[str]:
-        """Находит похожие фразы"""
-        phrase_lower = phrase.lower()
+        """Находит похожие фразы (по индексу слов, без перебора всей памяти)"""
         similar_phrases = []
         
         # Ищем среди фраз пользователя
-        if user_id and user_id in self.memory_data["user_phrases"]:
-            for phrase_data in self.memory_data["user_phrases"][user_id]:
-                stored_phrase = phrase_data["phrase"].lower()
-                similarity = self._calculate_similarity(phrase_lower, stored_phrase)
-                if similarity > 0.3:  # Порог схожести
-                    similar_phrases.append((phrase_data["phrase"], similarity))
+        if user_id:
+            similar_phrases.extend(
+                self.phrase_index.search(self._user_scope(user_id), phrase, SIMILARITY_THRESHOLD, limit)
+            )
         
         # Ищем среди популярных фраз
-        for popular_phrase, data in self.memory_data["popular_phrases"].items():
-            similarity = self._calculate_similarity(phrase_lower, popular_phrase)
-            if similarity > 0.3:
-                similar_phrases.append((popular_phrase, similarity))
+        similar_phrases.extend(self.phrase_index.search(POPULAR_SCOPE, phrase, SIMILARITY_THRESHOLD, limit))
         
         # Сортируем по схожести и возвращаем топ
         similar_phrases.sort(key=lambda x: x[1], reverse=True)
@@ -339,14 +381,19 @@ class PhraseMemoryService:
                 if datetime.fromisoformat(phrase["timestamp"]) > cutoff_time
             ]
             cleaned_count += original_count - len(self.memory_data["user_phrases"][user_id])
+            kept = self.memory_data["user_phrases"][user_id]
+            self.phrase_index.retain(self._user_scope(user_id), [p["phrase"] for p in kept])
         
         # Очищаем старые популярные фразы
         for phrase, data in list(self.memory_data["popular_phrases"].items()):
             if datetime.fromisoformat(data["last_seen"]) < cutoff_time:
                 del self.memory_data["popular_phrases"][phrase]
+                self.phrase_index.remove(POPULAR_SCOPE, phrase)
                 cleaned_count += 1
         
+        self._build_cache()
         self._save_memory_data()
+        self._save_phrase_index()
         logger.info(f"Cleaned up {cleaned_count} old phrases")
         return cleaned_count
 
@@ -0,0 +1,236 @@
+"""
+Write-behind хранилище JSON-документов для сервисов обучения.
+
+Сервисы держат свои документы в памяти и после изменения только помечают их
+"грязными". Фоновая задача сбрасывает накопленные изменения на диск по
+интервалу или по порогу количества изменений, поэтому серия сообщений в чате
+превращается в одну атомарную запись файла (temp-файл + rename).
+"""
+import asyncio
+import atexit
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from sisu_bot.core.config import STATE_STORE_FLUSH_INTERVAL, STATE_STORE_MAX_DIRTY_OPS
+
+logger = logging.getLogger(__name__)
+
+PathLike = Union[str, Path]
+
+
+class _Document:
+    """Документ, зарегистрированный в хранилище"""
+
+    __slots__ = ("path", "data", "dirty_ops")
+
+    def __init__(self, path: Path, data: Any):
+        self.path = path
+        self.data = data
+        self.dirty_ops = 0
+
+
+class JsonStateStore:
+    """Хранилище JSON-документов с отложенной (coalescing) записью на диск"""
+
+    def __init__(self, flush_interval: float = 5.0, max_dirty_ops: int = 200):
+        self.flush_interval = flush_interval
+        self.max_dirty_ops = max_dirty_ops
+
+        self._documents: Dict[Path, _Document] = {}
+        # Запись файлов может идти из пула потоков, поэтому защищаем её блокировкой
+        self._write_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+        self._stats = {
+            "flush_count": 0,
+            "flush_errors": 0,
+            "documents_written": 0,
+            "bytes_written": 0,
+            "marks": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+        }
+
+    # --- Регистрация документов ---
+
+    def attach(self, path: PathLike, data: Any) -> Any:
+        """Регистрирует документ и возвращает те же данные для работы с ними в памяти"""
+        path = Path(path)
+        self._documents[path] = _Document(path, data)
+        return data
+
+    def get(self, path: PathLike) -> Any:
+        """Возвращает данные зарегистрированного документа"""
+        document = self._documents.get(Path(path))
+        return document.data if document else None
+
+    def mark_dirty(self, path: PathLike) -> None:
+        """Помечает документ изменённым; запись произойдёт в фоне"""
+        document = self._documents.get(Path(path))
+        if document is None:
+            logger.warning(f"State store: document {path} is not attached")
+            return
+
+        document.dirty_ops += 1
+        self._stats["marks"] += 1
+
+        if document.dirty_ops >= self.max_dirty_ops:
+            if self._is_running_in_loop():
+                # Будим фоновую задачу, чтобы не ждать конца интервала
+                self._wakeup.set()
+            else:
+                # Без фоновой задачи (скрипты, тесты) пишем сразу
+                self.flush(path)
+
+    def is_dirty(self, path: PathLike) -> bool:
+        """Проверяет, есть ли у документа несохранённые изменения"""
+        document = self._documents.get(Path(path))
+        return bool(document and document.dirty_ops)
+
+    # --- Сброс на диск ---
+
+    def _collect_dirty(self, path: Optional[PathLike] = None) -> List[tuple]:
+        """Сериализует грязные документы и снимает с них флаг изменений"""
+        if path is not None:
+            document = self._documents.get(Path(path))
+            documents = [document] if document else []
+        else:
+            documents = list(self._documents.values())
+
+        payloads = []
+        for document in documents:
+            if not document.dirty_ops:
+                continue
+            try:
+                payload = json.dumps(document.data, ensure_ascii=False).encode("utf-8")
+            except Exception as e:
+                logger.error(f"State store: error serializing {document.path}: {e}")
+                self._stats["flush_errors"] += 1
+                continue
+            document.dirty_ops = 0
+            payloads.append((document, payload))
+        return payloads
+
+    def _write_atomic(self, path: Path, payload: bytes) -> None:
+        """Атомарно записывает файл через временный файл и rename"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_name, path)
+        except Exception:
+            try:
+                os.unlink(tmp_name)
+            except OSError:
+                pass
+            raise
+
+    def _write_payloads(self, payloads: List[tuple]) -> None:
+        """Пишет подготовленные документы на диск и обновляет счётчики"""
+        if not payloads:
+            return
+
+        with self._write_lock:
+            started = time.perf_counter()
+            for document, payload in payloads:
+                try:
+                    self._write_atomic(document.path, payload)
+                    self._stats["documents_written"] += 1
+                    self._stats["bytes_written"] += len(payload)
+                except Exception as e:
+                    # Возвращаем флаг, чтобы повторить запись при следующем сбросе
+                    document.dirty_ops += 1
+                    self._stats["flush_errors"] += 1
+                    logger.error(f"State store: error writing {document.path}: {e}")
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self._stats["flush_count"] += 1
+            self._stats["last_flush_ms"] = elapsed_ms
+            self._stats["total_flush_ms"] += elapsed_ms
+            self._stats["max_flush_ms"] = max(self._stats["max_flush_ms"], elapsed_ms)
+
+    def flush(self, path: Optional[PathLike] = None) -> None:
+        """Синхронно сбрасывает изменения (одного документа или всех)"""
+        self._write_payloads(self._collect_dirty(path))
+
+    async def flush_async(self, path: Optional[PathLike] = None) -> None:
+        """Сбрасывает изменения, вынося дисковый ввод-вывод из event loop"""
+        # Сериализация идёт в потоке цикла, пока данные никто не меняет
+        payloads = self._collect_dirty(path)
+        if payloads:
+            await asyncio.to_thread(self._write_payloads, payloads)
+
+    # --- Жизненный цикл ---
+
+    def _is_running_in_loop(self) -> bool:
+        if self._task is None or self._task.done():
+            return False
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    async def _flush_loop(self) -> None:
+        """Фоновая задача периодического сброса"""
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush_async()
+            except Exception as e:
+                logger.error(f"State store: error in flush loop: {e}")
+
+    def start(self) -> None:
+        """Запускает фоновый сброс в текущем event loop"""
+        if self._task is not None and not self._task.done():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._flush_loop())
+        logger.info(f"State store flusher started (interval={self.flush_interval}s, max_dirty_ops={self.max_dirty_ops})")
+
+    async def stop(self) -> None:
+        """Останавливает фоновую задачу и гарантированно сбрасывает всё на диск"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush_async()
+        logger.info("State store flushed on shutdown")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает счётчики записи: количество сбросов, байты, задержки"""
+        stats = dict(self._stats)
+        flush_count = stats["flush_count"]
+        stats["avg_flush_ms"] = stats["total_flush_ms"] / flush_count if flush_count else 0.0
+        stats["documents"] = len(self._documents)
+        stats["dirty_documents"] = sum(1 for d in self._documents.values() if d.dirty_ops)
+        return stats
+
+
+# Глобальный экземпляр хранилища
+state_store = JsonStateStore(
+    flush_interval=STATE_STORE_FLUSH_INTERVAL,
+    max_dirty_ops=STATE_STORE_MAX_DIRTY_OPS,
+)
+
+# Страховка для скриптов, которые не вызывают stop()
+atexit.register(state_store.flush)
@@ -0,0 +1,109 @@
+"""
+Ограниченные счетчики слов, эмодзи и пунктуации для стиля чата.
+
+TopKCounter — обычный dict ключ -> количество (сериализуется в JSON как
+есть), который вдобавок держит текущий топ-k ключей в куче минимумов.
+Приращение стоит O(log k) амортизированно: ключ попадает в топ, только
+если обогнал минимум кучи, а устаревшие записи кучи отбрасываются
+лениво. Отсортированный топ кэшируется до следующего изменения состава,
+так что get_chat_style не сортирует счетчики целиком. Хвост редких
+ключей обрезается до половины capacity при переполнении.
+"""
+import heapq
+from operator import itemgetter
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# Поле стиля чата -> (размер топа, предел числа ключей)
+STYLE_COUNTERS = {
+    "common_words": (20, 1000),
+    "emoji_usage": (10, 200),
+    "punctuation_style": (5, 50),
+}
+
+
+class TopKCounter(dict):
+    """Счетчик с поддерживаемым топом k ключей"""
+
+    __slots__ = ("k", "capacity", "_members", "_heap", "_view")
+
+    def __init__(self, k: int, capacity: int, counts: Optional[Dict[str, int]] = None):
+        super().__init__(counts or {})
+        self.k = k
+        self.capacity = max(capacity, k)
+        self._members: Set[str] = set()
+        self._heap: List[Tuple[int, str]] = []
+        self._view: Optional[Dict[str, int]] = None
+        if len(self) > self.capacity:
+            self._prune()
+        else:
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        top = heapq.nlargest(self.k, self.items(), key=itemgetter(1))
+        self._members = {key for key, _ in top}
+        self._heap = [(count, key) for key, count in top]
+        heapq.heapify(self._heap)
+        self._view = None
+
+    def _peek_min(self) -> Tuple[int, str]:
+        heap = self._heap
+        # Запись актуальна, если ключ все еще в топе и его счетчик не менялся
+        while heap and (heap[0][1] not in self._members or self.get(heap[0][1]) != heap[0][0]):
+            heapq.heappop(heap)
+        return heap[0]
+
+    def _prune(self) -> None:
+        keep = heapq.nlargest(self.capacity // 2 or 1, self.items(), key=itemgetter(1))
+        self.clear()
+        self.update(keep)
+        self._rebuild()
+
+    def add(self, key: str, amount: int = 1) -> None:
+        count = self.get(key, 0) + amount
+        self[key] = count
+
+        if key in self._members:
+            heapq.heappush(self._heap, (count, key))
+            self._view = None
+        elif len(self._members) < self.k:
+            self._members.add(key)
+            heapq.heappush(self._heap, (count, key))
+            self._view = None
+        else:
+            min_count, min_key = self._peek_min()
+            if count > min_count:
+                heapq.heappop(self._heap)
+                self._members.discard(min_key)
+                self._members.add(key)
+                heapq.heappush(self._heap, (count, key))
+                self._view = None
+
+        if len(self._heap) > 4 * self.k + 16:
+            self._heap = [(self[member], member) for member in self._members]
+            heapq.heapify(self._heap)
+        if len(self) > self.capacity:
+            self._prune()
+
+    def top(self) -> Dict[str, int]:
+        """Топ-k по убыванию количества (кэш до следующего изменения топа)"""
+        if self._view is None:
+            self._view = dict(sorted(
+                ((key, self[key]) for key in self._members),
+                key=itemgetter(1),
+                reverse=True,
+            ))
+        return self._view
+
+
+def ensure_counter(container: Dict[str, Any], field: str) -> TopKCounter:
+    """Возвращает счетчик поля стиля, превращая загруженный из JSON dict в TopKCounter"""
+    counter = container.get(field)
+    if not isinstance(counter, TopKCounter):
+        k, capacity = STYLE_COUNTERS[field]
+        counter = TopKCounter(k, capacity, counter)
+        container[field] = counter
+    return counter
+
+
+def new_style_counters() -> Dict[str, TopKCounter]:
+    return {field: TopKCounter(k, capacity) for field, (k, capacity) in STYLE_COUNTERS.items()}
@@ -1,65 +1,62 @@
-import json
-from pathlib import Path
-import time
-from typing import Dict, List, Optional
+"""
+Дневные лимиты TTS и текстовых запросов.
 
-from sisu_bot.core.config import DATA_DIR
-import logging
+Раньше использование хранилось списками таймстемпов в runtime/*.json, которые
+переписывались целиком; теперь счетчики живут в журнале квот (quota_usage).
+"""
+from typing import Dict, Optional
 
-TTS_USAGE_PATH = DATA_DIR / 'runtime' / 'tts_usage.json'
-TEXT_USAGE_PATH = DATA_DIR / 'runtime' / 'text_usage.json'
+from app.infrastructure.cache.quota import quota_ledger
+import logging
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+TTS_QUOTA = "tts"
+TEXT_QUOTA = "text"
+
+
 # --- Универсальные функции ---
-def load_usage(path) -> Dict[int, List[int]]:
-    if not path.exists():
-        return {}
-    try:
-        with open(path, encoding='utf-8') as f:
-            data = json.load(f)
-            # Ключи — строки, приводим к int
-            return {int(k): v for k, v in data.items()}
-    except Exception:
-        return {}
-
-def save_usage(path, usage: Dict[int, List[int]]):
-    with open(path, 'w', encoding='utf-8') as f:
-        # Ключи — строки для json
-        json.dump({str(k): v for k, v in usage.items()}, f, ensure_ascii=False)
-
-def get_usage(user_id: int, usage: Dict[int, List[int]], day: int) -> List[int]:
-    # Оставляем только usage за текущий день
-    return [ts for ts in usage.get(user_id, []) if ts // 86400 == day]
-
-def add_usage(user_id: int, usage: Dict[int, List[int]], day: int) -> None:
-    now = int(time.time())
-    usage.setdefault(user_id, [])
-    # Чистим старое
-    usage[user_id] = [ts for ts in usage[user_id] if ts // 86400 == day]
-    usage[user_id].append(now)
-
-def reset_usage(user_id: int, usage: Dict[int, List[int]]):
-    usage[user_id] = []
-
-def cleanup_old_usage(usage: Dict[int, List[int]], day: int):
-    # Удаляем usage не за сегодня
-    for uid in list(usage.keys()):
-        usage[uid] = [ts for ts in usage[uid] if ts // 86400 == day]
-        if not usage[uid]:
-            del usage[uid]
+def can_use(user_id: int, kind: str) -> bool:
+    allowed, _ = quota_ledger.check(user_id, kind)
+    return allowed
+
+async def can_use_async(user_id: int, kind: str) -> bool:
+    # Из обработчиков: уровень саппортера и счетчики читаются вне event loop
+    allowed, _ = await quota_ledger.check_async(user_id, kind)
+    return allowed
+
+def add_usage(user_id: int, kind: str) -> None:
+    quota_ledger.record(user_id, kind)
+
+def get_usage(user_id: int, kind: str) -> int:
+    # Использование за текущие сутки
+    return quota_ledger.get_used(user_id, kind, "day")
+
+def get_usage_info(user_id: int, kind: str) -> Dict[str, Dict[str, int]]:
+    return quota_ledger.get_usage(user_id, kind)
+
+def reset_usage(user_id: int, kind: Optional[str] = None):
+    quota_ledger.reset_user(user_id, kind)
+
+async def reset_usage_async(user_id: int, kind: Optional[str] = None):
+    await quota_ledger.reset_user_async(user_id, kind)
 
 # --- Для TTS ---
-def load_tts_usage():
-    return load_usage(TTS_USAGE_PATH)
+def can_use_tts(user_id: int) -> bool:
+    return can_use(user_id, TTS_QUOTA)
+
+async def can_use_tts_async(user_id: int) -> bool:
+    return await can_use_async(user_id, TTS_QUOTA)
 
-def save_tts_usage(usage):
-    save_usage(TTS_USAGE_PATH, usage)
+def add_tts_usage(user_id: int) -> None:
+    add_usage(user_id, TTS_QUOTA)
 
 # --- Для текстовых ---
-def load_text_usage():
-    return load_usage(TEXT_USAGE_PATH)
+def can_use_text(user_id: int) -> bool:
+    return can_use(user_id, TEXT_QUOTA)
+
+async def can_use_text_async(user_id: int) -> bool:
+    return await can_use_async(user_id, TEXT_QUOTA)
 
-def save_text_usage(usage):
-    save_usage(TEXT_USAGE_PATH, usage) 
\ No newline at end of file
+def add_text_usage(user_id: int) -> None:
+    add_usage(user_id, TEXT_QUOTA)
@@ -52,6 +52,15 @@ RATE_LIMIT_PER_HOUR = int(os.getenv('RATE_LIMIT_PER_HOUR', '1000'))
 # Кэширование
 CACHE_TTL = int(os.getenv('CACHE_TTL', '3600'))
 
+# Отложенная запись JSON-данных обучения (секунды / число изменений до сброса)
+STATE_STORE_FLUSH_INTERVAL = float(os.getenv('STATE_STORE_FLUSH_INTERVAL', '5'))
+STATE_STORE_MAX_DIRTY_OPS = int(os.getenv('STATE_STORE_MAX_DIRTY_OPS', '200'))
+
+# Пакетная запись сообщений чатов (строк в пачке / секунды ожидания / размер очереди)
+MESSAGE_INGEST_MAX_BATCH = int(os.getenv('MESSAGE_INGEST_MAX_BATCH', '200'))
+MESSAGE_INGEST_MAX_DELAY = float(os.getenv('MESSAGE_INGEST_MAX_DELAY', '0.5'))
+MESSAGE_INGEST_QUEUE_SIZE = int(os.getenv('MESSAGE_INGEST_QUEUE_SIZE', '10000'))
+
 # Logging
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
 LOG_FILE = os.getenv('LOG_FILE', 'bot.log')
@@ -206,6 +215,11 @@ class Config:
         self.RATE_LIMIT_PER_MINUTE = RATE_LIMIT_PER_MINUTE
         self.RATE_LIMIT_PER_HOUR = RATE_LIMIT_PER_HOUR
         self.CACHE_TTL = CACHE_TTL
+        self.STATE_STORE_FLUSH_INTERVAL = STATE_STORE_FLUSH_INTERVAL
+        self.STATE_STORE_MAX_DIRTY_OPS = STATE_STORE_MAX_DIRTY_OPS
+        self.MESSAGE_INGEST_MAX_BATCH = MESSAGE_INGEST_MAX_BATCH
+        self.MESSAGE_INGEST_MAX_DELAY = MESSAGE_INGEST_MAX_DELAY
+        self.MESSAGE_INGEST_QUEUE_SIZE = MESSAGE_INGEST_QUEUE_SIZE
         self.LOG_LEVEL = LOG_LEVEL
         self.LOG_FILE = LOG_FILE
         self.PHRASES_PATH = PHRASES_PATH
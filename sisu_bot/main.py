@@ -38,6 +38,21 @@ from sisu_bot.bot.middlewares.message_logging import MessageLoggingMiddleware
 from sisu_bot.bot.services.command_menu_service import setup_command_menus
 from sisu_bot.bot.services.chat_activity_service import chat_activity_service
 from sisu_bot.bot.services.meme_persona_service import meme_persona_service
+from sisu_bot.bot.services.state_store import state_store
+from sisu_bot.bot.services.message_ingest_service import message_ingest
+from app.infrastructure.cache.quota import quota_ledger
+from app.domain.services.triggers.stats import trigger_stats_store
+from app.infrastructure.http.client import http_client
+from app.infrastructure.cache.completions import completion_cache
+from app.infrastructure.cache.tts import tts_audio_cache
+from app.infrastructure.ai.voice_warmup import voice_warmup
+from app.infrastructure.cache.file_ids import file_id_registry
+from app.presentation.bot.middlewares.file_id_reuse import FileIdReuseMiddleware
+from app.infrastructure.ai.admission import llm_admission
+from app.infrastructure.ai.resilience import speechkit_guard, yandexgpt_guard
+from app.infrastructure.ai.streaming import completion_latency
+from sisu_bot.bot.services.yandexgpt_service import completion_flights
+from app.infrastructure.db.engine import get_pool_stats, dispose_engines, dispose_async_engines
 
 # Конфигурация
 from sisu_bot.core.config import config, SUPERADMIN_IDS
@@ -97,6 +112,8 @@ async def main():
     logger.info("Starting bot...")
     
     bot = Bot(token=TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+    # Повторные голосовые и медиа уходят по file_id без загрузки байтов
+    bot.session.middleware(FileIdReuseMiddleware())
     dp = Dispatcher(storage=MemoryStorage())
 
     # Регистрация middleware
@@ -168,6 +185,23 @@ async def main():
     silence_task = asyncio.create_task(silence_checker_task(bot))
     logger.info("Silence checker task started")
     
+    # Запускаем отложенную запись данных обучения
+    state_store.start()
+    
+    # Запускаем пакетную запись сообщений чатов
+    message_ingest.start()
+    
+    # Поднимаем счетчики квот из БД до первого запроса
+    await quota_ledger.start()
+    # Статистика триггеров пишется в БД по таймеру
+    await trigger_stats_store.start()
+    
+    # Поднимаем постоянную копию кэша ответов YandexGPT (если включена)
+    await completion_cache.start()
+    await tts_audio_cache.start()
+    await file_id_registry.start(bot.id)
+    await voice_warmup.start()
+    
     try:
         await dp.start_polling(bot)
     finally:
@@ -177,6 +211,43 @@ async def main():
             await silence_task
         except asyncio.CancelledError:
             logger.info("Silence checker task cancelled")
+        
+        # Дописываем очередь сообщений в БД
+        await message_ingest.stop()
+        logger.info(f"Message ingest stats: {message_ingest.get_stats()}")
+        
+        # Дописываем приращения квот
+        await quota_ledger.stop()
+        await trigger_stats_store.stop()
+        logger.info(f"Quota ledger stats: {quota_ledger.get_stats()}")
+        
+        # Сбрасываем на диск все несохраненные данные обучения
+        await state_store.stop()
+        logger.info(f"State store stats: {state_store.get_stats()}")
+        
+        # Дописываем кэш ответов YandexGPT
+        await completion_cache.stop()
+        logger.info(f"Completion cache stats: {completion_cache.get_stats()}")
+        await voice_warmup.stop()
+        logger.info(f"Voice warm-up stats: {voice_warmup.get_stats()}")
+        await tts_audio_cache.stop()
+        logger.info(f"TTS cache stats: {tts_audio_cache.get_stats()}")
+        await file_id_registry.stop()
+        logger.info(f"Telegram file_id reuse stats: {file_id_registry.get_stats()}")
+        logger.info(f"Completion stream latency: {completion_latency.get_stats()}")
+        logger.info(f"Completion single-flight stats: {completion_flights.get_stats()}")
+        logger.info(f"LLM admission stats: {llm_admission.get_stats()}")
+        logger.info(f"YandexGPT resilience stats: {yandexgpt_guard.get_stats()}")
+        logger.info(f"SpeechKit resilience stats: {speechkit_guard.get_stats()}")
+        
+        # Закрываем общий HTTP-клиент к API Яндекса
+        logger.info(f"HTTP client stats: {http_client.get_stats()}")
+        await http_client.close()
+        
+        # Закрываем общие пулы соединений с БД
+        logger.info(f"DB pool stats: {get_pool_stats()}")
+        await dispose_async_engines()
+        dispose_engines()
 
 if __name__ == "__main__":
     try:
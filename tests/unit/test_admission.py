@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+from app.infrastructure.ai.admission import (
+    PRIORITY_MENTION, PRIORITY_PRIVATE, PRIORITY_RANDOM, PRIORITY_SUPERADMIN,
+    AdmissionRejected, PriorityAdmission, llm_priority,
+)
+
+
+def test_llm_priority_classes():
+    assert llm_priority(True, explicit=False, private=False) == PRIORITY_SUPERADMIN
+    assert llm_priority(False, explicit=True, private=True) == PRIORITY_MENTION
+    assert llm_priority(False, private=True) == PRIORITY_PRIVATE
+    assert llm_priority(False) == PRIORITY_RANDOM
+
+
+def test_waiters_are_admitted_by_priority_then_fifo():
+    admission = PriorityAdmission(max_in_flight=1)
+    order = []
+
+    async def request(name, priority, hold):
+        async with admission.slot(priority, deadline=5):
+            order.append(name)
+            await hold.wait()
+
+    async def scenario():
+        holds = {name: asyncio.Event() for name in ("first", "random", "private", "mention1", "mention2", "admin")}
+        tasks = [asyncio.create_task(request("first", PRIORITY_MENTION, holds["first"]))]
+        await asyncio.sleep(0)
+        for name, priority in (("random", PRIORITY_RANDOM), ("private", PRIORITY_PRIVATE),
+                               ("mention1", PRIORITY_MENTION), ("mention2", PRIORITY_MENTION),
+                               ("admin", PRIORITY_SUPERADMIN)):
+            tasks.append(asyncio.create_task(request(name, priority, holds[name])))
+        await asyncio.sleep(0)
+        assert admission.get_stats()["queue_depth"] == 5
+        for event in holds.values():
+            event.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+    assert order == ["first", "admin", "mention1", "mention2", "private", "random"]
+    stats = admission.get_stats()
+    assert (stats["in_flight"], stats["queue_depth"]) == (0, 0)
+    assert stats["classes"]["mention"]["admitted"] == 3
+
+
+def test_deadline_drops_request_and_cancelled_waiter_frees_queue():
+    admission = PriorityAdmission(max_in_flight=1, deadlines={PRIORITY_RANDOM: 0.05})
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def holder():
+            async with admission.slot(PRIORITY_MENTION):
+                await release.wait()
+
+        busy = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected):
+            await admission.acquire(PRIORITY_RANDOM)
+
+        cancelled = asyncio.create_task(admission.acquire(PRIORITY_PRIVATE, deadline=5))
+        waiting = asyncio.create_task(admission.acquire(PRIORITY_RANDOM, deadline=5))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        release.set()
+        await busy
+        await waiting  # слот достался следующему живому ожидающему
+        admission.release()
+
+    asyncio.run(scenario())
+    stats = admission.get_stats()
+    random_stats = stats["classes"]["random"]
+    assert (random_stats["dropped"], random_stats["admitted"]) == (1, 1)
+    assert random_stats["drop_rate"] == 0.5
+    assert random_stats["wait_p95"] >= 0.05
+    assert stats["classes"]["private"]["cancelled"] == 1
+    assert stats["in_flight"] == 0
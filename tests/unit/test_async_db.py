@@ -0,0 +1,73 @@
+import asyncio
+import importlib
+import pytest
+from sqlalchemy import text
+from app.infrastructure.db.models import User, ChatPoints
+from app.infrastructure.db.repositories.users import UserRepository
+
+db_engine = importlib.import_module("app.infrastructure.db.engine")
+
+
+@pytest.fixture
+def db_url(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_engine, "_settings", db_engine.Settings(db_loop_guard=True))
+    db_engine.dispose_engines()
+    url = f"sqlite:///{tmp_path / 'bot.db'}"
+    sync_engine = db_engine.get_engine(url)
+    User.__table__.create(sync_engine)
+    ChatPoints.__table__.create(sync_engine)
+    yield url
+    asyncio.run(db_engine.dispose_async_engines())
+    db_engine.dispose_engines()
+
+
+def loop_thread_queries():
+    return sum(stats.get("loop_thread_queries", 0) for stats in db_engine.get_pool_stats().values())
+
+
+def test_repository_does_not_block_loop(db_url):
+    repository = UserRepository(db_engine.get_async_sessionmaker(db_url))
+
+    async def scenario():
+        await repository.sync_info(1, username="sisu", first_name="Сису")
+        await repository.add_points(1, 100, chat_id=-10, rank_func=lambda p, r: "hero")
+        await repository.add_points(2, 50, chat_id=-10)
+        assert await repository.increment_message_count(1) == 1
+
+        user = await repository.get(1)
+        assert (user.username, user.points, user.rank) == ("sisu", 100, "hero")
+        assert [u.id for u in await repository.get_top_by_points(10)] == [1, 2]
+        assert [u.id for _, u in await repository.get_top_by_chat(-10)] == [1, 2]
+
+        # Синхронный код через мост выполняется в пуле потоков
+        def count_users():
+            with db_engine.get_sessionmaker(db_url)() as session:
+                return session.execute(text("SELECT COUNT(*) FROM users")).scalar()
+        assert await db_engine.run_in_db_thread(count_users) == 2
+
+    asyncio.run(scenario())
+    assert loop_thread_queries() == 0
+
+
+def test_activate_referral(db_url):
+    repository = UserRepository(db_engine.get_async_sessionmaker(db_url))
+
+    async def scenario():
+        await repository.update_fields(10, referrals=4)
+        await repository.update_fields(11, pending_referral=10)
+        assert await repository.activate_referral(11, 10) == 5
+        # Повторная активация ничего не меняет
+        assert await repository.activate_referral(11, 10) is None
+        user = await repository.get(11)
+        assert (user.invited_by, user.pending_referral) == (10, None)
+
+    asyncio.run(scenario())
+
+
+def test_loop_guard_detects_sync_call(db_url):
+    async def blocking_call():
+        with db_engine.get_sessionmaker(db_url)() as session:
+            session.execute(text("SELECT 1"))
+
+    asyncio.run(blocking_call())
+    assert loop_thread_queries() == 1
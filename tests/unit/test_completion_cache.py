@@ -0,0 +1,99 @@
+import asyncio
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.infrastructure.cache.completions import CompletionCache, completion_key
+from app.infrastructure.db.repositories.completion_cache import CompletionCacheRepository
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(clock, **kwargs):
+    options = dict(ttl=60, max_entries=100, max_bytes=10_000, variants=2, serves_per_refresh=3,
+                   enabled=True, persist=False, clock=clock)
+    options.update(kwargs)
+    return CompletionCache(**options)
+
+
+@pytest.fixture
+def repository():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    repository = CompletionCacheRepository(sessionmaker(bind=engine))
+    repository.ensure_schema()
+    yield repository
+    engine.dispose()
+
+
+def test_key_normalizes_whitespace_and_case():
+    key = completion_key("Ты Сису", "neutral", ["привет"], "Мотивация  дня ")
+    assert key == completion_key("ты  сису", "neutral", ["Привет"], "мотивация дня")
+    assert key != completion_key("ты сису", "neutral", [], "мотивация дня")
+    assert key != completion_key("ты сису", "sarcastic", ["привет"], "мотивация дня")
+
+
+def test_variants_rotate_then_refresh():
+    clock = Clock()
+    cache = make_cache(clock)
+    replies = iter(["первый", "второй", "третий"])
+    calls = []
+
+    async def generate():
+        calls.append(1)
+        return next(replies)
+
+    async def scenario():
+        return [await cache.get_or_generate("k", generate) for _ in range(9)]
+
+    served = asyncio.run(scenario())
+    # Промах, 3 попадания, обновление, 3 попадания по кругу из двух вариантов, обновление
+    assert served == ["первый"] * 4 + ["второй", "первый", "второй", "первый", "третий"]
+    assert len(calls) == 3
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["refreshes"]) == (6, 1, 2)
+
+    clock.now += 61
+    assert cache.get("k") is None
+    assert cache.get_stats()["expired"] == 1
+
+
+def test_lru_limits_entries_and_bytes():
+    cache = make_cache(Clock(), max_entries=3, max_bytes=200)
+    for key in "abc":
+        cache.put(key, "ответ")
+    cache.get("a")
+    cache.put("d", "ответ")
+    assert cache.get("b") is None  # давно не использовался — вытеснен
+    assert cache.get("a") == "ответ"
+
+    cache.put("big", "x" * 180)
+    assert cache.get_stats()["bytes"] <= 200
+    assert cache.get_stats()["entries"] == 2
+    assert cache.get("a") == "ответ"
+
+
+def test_persistent_copy_survives_restart(repository):
+    clock = Clock()
+    cache = make_cache(clock, persist=True, repository=repository)
+    cache.put("greeting", "привет, смертный")
+    cache.put("greeting", "опять ты")
+    cache.put("old", "истеку")
+    clock.now += 30
+    cache.put("greeting", "снова ты")  # новый вариант продлевает запись
+    clock.now += 40
+
+    restarted = make_cache(clock, persist=True, repository=repository)
+    asyncio.run(restarted.start())
+    assert restarted.get_stats()["entries"] == 1
+    assert [restarted.get("greeting") for _ in range(2)] == ["опять ты", "снова ты"]
+
+    restarted.clear()
+    empty = make_cache(clock, persist=True, repository=repository)
+    asyncio.run(empty.start())
+    assert empty.get_stats()["entries"] == 0
@@ -0,0 +1,47 @@
+import importlib
+import pytest
+from sqlalchemy import text
+
+# Атрибут пакета app.infrastructure.db.engine перекрыт объектом движка из session.py
+db_engine = importlib.import_module("app.infrastructure.db.engine")
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    settings = db_engine.Settings(db_pool_stats=True)
+    monkeypatch.setattr(db_engine, "_settings", settings)
+    db_engine.dispose_engines()
+    yield db_engine
+    db_engine.dispose_engines()
+
+
+def test_same_engine_for_equivalent_urls(registry, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    first = registry.get_engine("sqlite:///bot.db")
+    second = registry.get_engine(f"sqlite:///{tmp_path / 'bot.db'}")
+    assert first is second
+    assert registry.get_sessionmaker("sqlite:///bot.db") is registry.get_sessionmaker(f"sqlite:///{tmp_path / 'bot.db'}")
+
+
+def test_sqlite_pragmas_applied(registry, tmp_path):
+    engine = registry.get_engine(f"sqlite:///{tmp_path / 'bot.db'}")
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar().lower() == "wal"
+        # NORMAL == 1
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+        assert conn.execute(text("PRAGMA cache_size")).scalar() == -65536
+
+
+def test_pool_stats(registry, tmp_path):
+    url = f"sqlite:///{tmp_path / 'bot.db'}"
+    Session = registry.get_sessionmaker(url)
+    for _ in range(3):
+        with Session() as session:
+            session.execute(text("SELECT 1"))
+
+    stats = next(iter(registry.get_pool_stats().values()))
+    assert stats["connects"] == 1
+    assert stats["checkouts"] == 3
+    assert stats["checked_out"] == 0
+    assert stats["size"] == 5
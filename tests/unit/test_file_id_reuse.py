@@ -0,0 +1,89 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import SendMessage, SendVoice
+from aiogram.types import BufferedInputFile
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.infrastructure.cache.file_ids import FileIdRegistry
+from app.infrastructure.db.repositories.file_ids import FileIdRepository
+from app.presentation.bot.middlewares.file_id_reuse import FileIdReuseMiddleware
+
+VOICE = b"OggS" + b"\x01" * 500
+BOT = SimpleNamespace(id=123456)
+
+
+class FakeTelegram:
+    """make_request: запоминает, что отправлено, и выдает новый file_id на каждую загрузку"""
+
+    def __init__(self, reject=None):
+        self.sent = []
+        self.reject = reject
+
+    async def __call__(self, bot, method):
+        voice = getattr(method, "voice", None)
+        self.sent.append(voice)
+        if isinstance(voice, str) and self.reject:
+            raise TelegramBadRequest(method=method, message=self.reject)
+        if isinstance(voice, BufferedInputFile):
+            return SimpleNamespace(voice=SimpleNamespace(file_id=f"upload-{len(self.sent)}"))
+        return SimpleNamespace(voice=SimpleNamespace(file_id=voice))
+
+
+@pytest.fixture
+def repository():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    yield FileIdRepository(sessionmaker(bind=engine))
+    engine.dispose()
+
+
+def send_voice():
+    return SendVoice(chat_id=1, voice=BufferedInputFile(VOICE, filename="fallback.ogg"))
+
+
+def test_second_send_uses_file_id_and_survives_restart(repository):
+    registry = FileIdRegistry(enabled=True, repository=repository)
+    middleware = FileIdReuseMiddleware(registry)
+    telegram = FakeTelegram()
+
+    async def scenario():
+        await middleware(telegram, BOT, send_voice())
+        await middleware(telegram, BOT, send_voice())
+        await middleware(telegram, BOT, SendMessage(chat_id=1, text="мимо реестра"))
+        await registry.stop()
+
+    asyncio.run(scenario())
+    assert isinstance(telegram.sent[0], BufferedInputFile)
+    assert telegram.sent[1] == "upload-1"
+    stats = registry.get_stats()
+    assert (stats["uploads"], stats["hits"], stats["bytes_saved"]) == (1, 1, len(VOICE))
+
+    restarted = FileIdRegistry(enabled=True, repository=repository)
+    telegram = FakeTelegram()
+    asyncio.run(FileIdReuseMiddleware(restarted)(telegram, BOT, send_voice()))
+    assert telegram.sent == ["upload-1"]
+    # file_id другого бота недействителен
+    asyncio.run(FileIdReuseMiddleware(restarted)(telegram, SimpleNamespace(id=42), send_voice()))
+    assert isinstance(telegram.sent[-1], BufferedInputFile)
+
+
+def test_rejected_file_id_falls_back_to_upload(repository):
+    registry = FileIdRegistry(enabled=True, repository=repository)
+    middleware = FileIdReuseMiddleware(registry)
+
+    async def scenario():
+        await middleware(FakeTelegram(), BOT, send_voice())
+        telegram = FakeTelegram(reject="Bad Request: wrong file identifier/HTTP URL specified")
+        result = await middleware(telegram, BOT, send_voice())
+        with pytest.raises(TelegramBadRequest):
+            await middleware(FakeTelegram(reject="Bad Request: chat not found"), BOT, send_voice())
+        await registry.stop()
+        return telegram, result
+
+    telegram, result = asyncio.run(scenario())
+    assert telegram.sent[0] == "upload-1" and isinstance(telegram.sent[1], BufferedInputFile)
+    assert registry.lookup(BOT.id, next(iter(registry._ids[BOT.id]))) == result.voice.file_id == "upload-2"
+    assert registry.get_stats()["rejected"] == 1
+    assert list(repository.load(BOT.id).values()) == [("upload-2", len(VOICE))]
@@ -0,0 +1,38 @@
+from rapidfuzz import fuzz
+from sisu_bot.bot.services.fuzzy_trigger_index import FuzzyTriggerIndex
+
+TRIGGER_MAP = {
+    "token": {"triggers": ["тонкоин", "Sisu Token"], "responses": ["TON!"]},
+    "moon": {"triggers": ["на луну", "памп"], "responses": ["🌕"]},
+}
+
+
+def loop_match(trigger_map, text):
+    best_score, best_name = 0, None
+    for name, trig in trigger_map.items():
+        for t in trig["triggers"]:
+            score = fuzz.partial_ratio(text, t.lower())
+            if score > best_score:
+                best_score, best_name = score, name
+    return best_name if best_score >= 75 else None
+
+
+def test_matches_previous_loop():
+    index = FuzzyTriggerIndex(TRIGGER_MAP)
+    for text in ["купил тонкаин вчера", "летим на лун", "sisu tokn в деле", "привет всем", ""]:
+        match = index.match(text)
+        assert (match.name if match else None) == loop_match(TRIGGER_MAP, text)
+    assert index.match("sisu token").trigger == "sisu token"
+
+
+def test_refreshes_when_trigger_map_changes():
+    trigger_map = {name: dict(trig) for name, trig in TRIGGER_MAP.items()}
+    index = FuzzyTriggerIndex(trigger_map)
+    assert index.match("нарисуй дракона") is None
+    assert not index.refresh()
+
+    trigger_map["draw"] = {"triggers": ["нарисуй"], "responses": ["🎨"]}
+    assert index.match("нарисуй дракона").name == "draw"
+    trigger_map["draw"]["triggers"].append("сделай арт")
+    assert index.match("сделай арт").name == "draw"
+    assert len(index) == 6
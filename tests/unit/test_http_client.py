@@ -0,0 +1,71 @@
+import asyncio
+import pytest
+from aiohttp import web
+from app.infrastructure.http.client import HttpClient
+
+
+async def start_server(handler):
+    app = web.Application()
+    app.router.add_route("*", "/", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/"
+
+
+def test_requests_reuse_pooled_connections():
+    async def handler(request):
+        return web.json_response({"ok": True})
+
+    client = HttpClient(limit_per_host=4)
+
+    async def scenario():
+        runner, url = await start_server(handler)
+        try:
+            for _ in range(10):
+                async with client.post(url, json={"x": 1}) as resp:
+                    assert (await resp.json()) == {"ok": True}
+            # Параллельные запросы ограничены пулом на хост
+            async def call():
+                async with client.get(url) as resp:
+                    await resp.read()
+            await asyncio.gather(*(call() for _ in range(20)))
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+    asyncio.run(scenario())
+    stats = client.get_stats()
+    assert stats["requests"] == 30
+    assert stats["sessions_created"] == 1
+    assert 1 <= stats["connections_created"] <= 4
+    assert stats["connections_reused"] == 30 - stats["connections_created"]
+    assert stats["reuse_ratio"] > 0.8
+    assert stats["open"] is False
+
+
+def test_read_timeout_and_reopen_after_close():
+    async def slow(request):
+        await asyncio.sleep(1)
+        return web.Response(text="late")
+
+    client = HttpClient(read_timeout=0.1)
+
+    async def scenario():
+        runner, url = await start_server(slow)
+        try:
+            with pytest.raises(asyncio.TimeoutError):
+                async with client.get(url) as resp:
+                    await resp.read()
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+    asyncio.run(scenario())
+    # После close() (и в новом event loop) сессия создается заново
+    asyncio.run(scenario())
+    stats = client.get_stats()
+    assert stats["sessions_created"] == 2
+    assert stats["errors"] == 2
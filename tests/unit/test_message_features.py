@@ -0,0 +1,68 @@
+import random
+import re
+import pytest
+from sisu_bot.bot.services import chat_learning_service as learning_module
+from sisu_bot.bot.services import chat_style_analyzer as style_module
+from sisu_bot.bot.services.message_features import extract_features
+
+# Прежние паттерны ChatLearningService / ChatStyleAnalyzer (мемы — объединение словарей)
+LEGACY_PATTERNS = {
+    'emoji_count': (r'[😀-🙏🌀-🗿]', False),
+    'caps_words': (r'[A-ZА-Я]{3,}', False),
+    'punctuation_intensity': (r'[!?]{2,}', False),
+    'crypto_terms': (r'\b(тон|ton|токен|крипта|блокчейн|дефи|нфт|памп|дамп|холд|hodl|moon|луна)\b', True),
+    'meme_words': (r'\b(кек|лол|рофл|ахаха|хаха|хех|омг|вау|ого|пельмень|кот|холодильник|трактор'
+                   r'|деген|дегенский|дегенчик|дегенка|дегенство)\b', True),
+    'english_words': (r'\b[a-zA-Z]+\b', False),
+    'repeated_chars': (r'(.)\1{2,}', False),
+    'question_words': (r'\b(что|как|почему|зачем|когда|где|кто|какой|какая|какие)\b', True),
+    'exclamations': (r'[!]{1,3}', False),
+    'questions': (r'[?]{1,3}', False),
+}
+
+
+def legacy_analysis(message):
+    analysis = {
+        name: len(re.findall(pattern, message.lower() if lower else message))
+        for name, (pattern, lower) in LEGACY_PATTERNS.items()
+    }
+    analysis['length'] = len(message)
+    analysis['word_count'] = len(message.split())
+    return analysis
+
+
+def test_counters_match_legacy_regexes():
+    rng = random.Random(11)
+    pieces = ["Сису", "ТОН", "ton", "MOON", "кек", "деген", "что", "как", "hello", "WAGMI", "абв123",
+              "!!", "?", "!?!", "!!!!!!!", "???!", "😀", "🚀", "🌕", "ааааа", "  ", ",", "x_y", "Ёжик", "кот"]
+    for _ in range(500):
+        message = "".join(rng.choice(pieces) + rng.choice(["", " "]) for _ in range(rng.randint(0, 15)))
+        assert extract_features(message).as_analysis() == legacy_analysis(message), message
+
+
+def test_tokens_match_legacy_extraction():
+    message = "ТОН на ЛУНУ!!! Кек 😀😀 что??? ok!?!?"
+    features = extract_features(message)
+    assert list(features.words) == re.findall(r'\b\w+\b', message.lower())
+    assert list(features.emojis) == re.findall(r'[😀-🙏🌀-🗿]', message)
+    assert list(features.punctuation) == re.findall(r'[!?]{1,3}', message)
+    assert features.english_ratio == pytest.approx(1 / 7)
+    with pytest.raises(AttributeError):
+        features.length = 0
+
+
+def test_services_reuse_features(tmp_path, monkeypatch):
+    monkeypatch.setattr(learning_module, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(style_module, "DATA_DIR", tmp_path)
+    learning = learning_module.ChatLearningService()
+    style = style_module.ChatStyleAnalyzer()
+
+    message = "Сису, деген пельмень атакует холодильник!!"
+    features = extract_features(message)
+    assert style.analyze_message_style(message, 1, features)['style_type'] == 'meme'
+    assert learning.analyze_chat_message(message, 1, 2)['meme_words'] == 3
+
+    learning.learn_from_message(message, 1, 2, features)
+    style.update_chat_style(message, 1, 2, features)
+    assert learning.learning_data["chat_styles"][1]["common_words"]["холодильник"] == 1
+    assert style.style_data["chat_styles"][1]["punctuation_style"]["!!"] == 1
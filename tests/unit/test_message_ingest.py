@@ -0,0 +1,87 @@
+import asyncio
+import threading
+from sisu_bot.bot.services.message_ingest_service import MessageIngestQueue
+
+
+class RecordingWriter:
+    def __init__(self, fail=False):
+        self.batches = []
+        self.threads = set()
+        self.fail = fail
+
+    def __call__(self, rows):
+        self.threads.add(threading.get_ident())
+        if self.fail:
+            raise RuntimeError("db is down")
+        self.batches.append(list(rows))
+        return len(rows)
+
+
+def row(i):
+    return {"user_id": i, "chat_id": -1, "message_text": f"message {i}"}
+
+
+def test_batches_by_size():
+    writer = RecordingWriter()
+    ingest = MessageIngestQueue(writer=writer, max_batch_size=10, max_delay=60)
+
+    async def scenario():
+        for i in range(25):
+            ingest.submit(row(i))
+        await asyncio.sleep(0.1)
+        # Две полные пачки ушли сразу, хвост ждёт max_delay
+        assert [len(b) for b in writer.batches] == [10, 10]
+        await ingest.stop()
+
+    asyncio.run(scenario())
+    assert [len(b) for b in writer.batches] == [10, 10, 5]
+    assert threading.get_ident() not in writer.threads
+    stats = ingest.get_stats()
+    assert stats["written"] == 25
+    assert stats["batches"] == 3
+    assert stats["queue_depth"] == 0
+
+
+def test_flushes_after_max_delay():
+    writer = RecordingWriter()
+    ingest = MessageIngestQueue(writer=writer, max_batch_size=100, max_delay=0.05)
+
+    async def scenario():
+        ingest.submit(row(1))
+        ingest.submit(row(2))
+        await asyncio.sleep(0.2)
+        assert writer.batches == [[row(1), row(2)]]
+        await ingest.stop()
+
+    asyncio.run(scenario())
+
+
+def test_drops_when_queue_full():
+    writer = RecordingWriter()
+    ingest = MessageIngestQueue(writer=writer, max_batch_size=100, max_queue_size=3)
+
+    # Вне event loop писатель не запускается, очередь только копится
+    results = [ingest.submit(row(i)) for i in range(5)]
+    assert results == [True, True, True, False, False]
+    stats = ingest.get_stats()
+    assert stats["queue_depth"] == 3
+    assert stats["dropped"] == 2
+
+    ingest.flush()
+    assert writer.batches == [[row(0), row(1), row(2)]]
+
+
+def test_write_errors_are_counted():
+    writer = RecordingWriter(fail=True)
+    ingest = MessageIngestQueue(writer=writer, max_batch_size=2, max_delay=0.01)
+
+    async def scenario():
+        for i in range(3):
+            ingest.submit(row(i))
+        await ingest.stop()
+
+    asyncio.run(scenario())
+    stats = ingest.get_stats()
+    assert stats["write_errors"] == 2
+    assert stats["failed_rows"] == 3
+    assert stats["queue_depth"] == 0
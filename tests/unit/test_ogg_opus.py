@@ -0,0 +1,102 @@
+import struct
+import pytest
+from app.shared.utils.ogg_opus import (
+    FLAG_BOS, FLAG_EOS, NO_GRANULE, OggPage, ogg_crc, opus_packet_samples, parse_pages, split_for_tts,
+    stitch_opus,
+)
+
+PRE_SKIP = 312
+FRAME = 960  # TOC 0xFC: CELT fullband 20 мс, один кадр
+
+
+def opus_stream(serial, packets, trim=0):
+    """ogg-opus как у SpeechKit: OpusHead, OpusTags, granule = декодированные
+    отсчеты, последний granule обрезан на trim отсчетов"""
+    head = b"OpusHead" + struct.pack("<BBHIhB", 1, 1, PRE_SKIP, 48000, 0, 0)
+    tags = b"OpusTags" + struct.pack("<I", 6) + b"Yandex" + struct.pack("<I", 0)
+    pages = [
+        OggPage(FLAG_BOS, 0, serial, 0, bytes([len(head)]), head),
+        OggPage(0, 0, serial, 1, bytes([len(tags)]), tags),
+    ]
+    granule = 0
+    for packet in packets:
+        granule += opus_packet_samples(packet)
+        if len(packet) > 255:
+            # Пакет продолжается на следующей странице (на первой granule = -1)
+            pages.append(OggPage(0, NO_GRANULE, serial, 0, b"\xff", packet[:255]))
+            packet = packet[255:]
+        pages.append(OggPage(0, granule, serial, 0, bytes([len(packet)]), packet))
+    pages[-1].granule -= trim
+    pages[-1].header_type |= FLAG_EOS
+    for sequence, page in enumerate(pages):
+        page.sequence = sequence
+    return b"".join(page.to_bytes() for page in pages)
+
+
+def test_ogg_crc_matches_reference():
+    assert ogg_crc(b"123456789") == 0x89A1897F
+    broken = bytearray(opus_stream(7, [b"\xfc" * 10]))
+    broken[-1] ^= 0xFF
+    with pytest.raises(ValueError):
+        parse_pages(bytes(broken))
+
+
+def test_stitched_stream_is_one_logical_opus_stream():
+    first = opus_stream(111, [b"\xfc1", b"\xfc2"])
+    second = opus_stream(222, [b"\xfc3", b"\xfc4", b"\xfc5"])
+
+    pages = parse_pages(stitch_opus([first, second]))
+    assert {page.serial for page in pages} == {111}
+    assert [page.sequence for page in pages] == list(range(len(pages)))
+    assert sum(page.body.startswith(b"OpusHead") for page in pages) == 1
+    assert sum(page.body.startswith(b"OpusTags") for page in pages) == 1
+    assert [bool(page.header_type & FLAG_BOS) for page in pages].count(True) == 1
+    assert pages[0].header_type & FLAG_BOS and pages[-1].header_type & FLAG_EOS
+    assert not any(page.header_type & FLAG_EOS for page in pages[:-1])
+    assert [page.body for page in pages if page.body.startswith(b"\xfc")] == [b"\xfc1", b"\xfc2", b"\xfc3", b"\xfc4", b"\xfc5"]
+
+    granules = [page.granule for page in pages if page.granule != NO_GRANULE]
+    assert granules == [0, 0, FRAME, 2 * FRAME, 3 * FRAME, 4 * FRAME, 5 * FRAME]
+
+    assert stitch_opus([first]) == first
+    with pytest.raises(ValueError):
+        stitch_opus([first, b"RIFF....WAVE"])
+
+
+def test_opus_packet_samples_from_toc():
+    assert opus_packet_samples(b"\xfc") == 960  # CELT 20 мс
+    assert opus_packet_samples(b"\x18") == 2880  # SILK 60 мс
+    assert opus_packet_samples(b"\x81") == 240  # CELT 2.5 мс, два кадра
+    assert opus_packet_samples(b"\x7b\x03") == 3 * 960  # Hybrid 20 мс, три кадра
+    with pytest.raises(ValueError):
+        opus_packet_samples(b"")
+
+
+def test_end_trimmed_chunks_keep_granules_continuous():
+    # Части как у SpeechKit: последний granule каждой обрезан, пакеты разной длины
+    first = opus_stream(1, [b"\xfc" * 300, b"\x18a", b"\xfcb"], trim=700)
+    second = opus_stream(2, [b"\x7b\x03c", b"\xfc" * 400], trim=500)
+
+    pages = parse_pages(stitch_opus([first, second]))
+    audio = pages[2:]
+    first_samples = FRAME + 2880 + FRAME
+    # Продолжение пакета на следующей странице — без granule
+    assert [page.granule for page in audio] == [
+        NO_GRANULE, FRAME, FRAME + 2880, first_samples,
+        first_samples + 3 * FRAME, NO_GRANULE, first_samples + 4 * FRAME - 500,
+    ]
+    # Обрезка первой части не попадает в середину потока
+    assert audio[3].granule == first_samples
+    assert not any(page.header_type & FLAG_EOS for page in pages[:-1])
+
+
+def test_split_for_tts_respects_sentences_and_limit():
+    poem = "Дракон летит над TON.\nЛуна светит ярко!\nМемы в чате, вайб в крови, Сису с нами навсегда?"
+    assert split_for_tts(poem, 500) == [poem]
+    chunks = split_for_tts(poem, 45)
+    # Длинная строка делится по запятым, короткие предложения собираются вместе
+    assert chunks == ["Дракон летит над TON. Луна светит ярко!",
+                      "Мемы в чате, вайб в крови,",
+                      "Сису с нами навсегда?"]
+    assert " ".join(chunks).split() == poem.split()
+    assert split_for_tts("   ", 10) == []
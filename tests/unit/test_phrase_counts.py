@@ -0,0 +1,82 @@
+import datetime
+import random
+from collections import defaultdict
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.infrastructure.db.repositories.phrase_counts import (
+    PhraseCountRepository,
+    day_bucket,
+    normalize_phrase,
+)
+
+NOW = datetime.datetime(2026, 10, 18, 12, 0)
+
+
+@pytest.fixture
+def repository():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    repository = PhraseCountRepository(sessionmaker(bind=engine))
+    repository.ensure_schema()
+    yield repository
+    engine.dispose()
+
+
+def ingest(repository, rows):
+    with repository.session_factory() as session:
+        repository.add_messages(session, rows)
+        session.commit()
+
+
+def group_by_scan(rows, since, min_count):
+    """Прежний GROUP BY по messages (с нормализацией текста)"""
+    counts, users = defaultdict(int), defaultdict(set)
+    for row in rows:
+        text = normalize_phrase(row["message_text"])
+        if row["timestamp"].date() >= since.date() and len(text) >= 5:
+            counts[text] += 1
+            users[text].add(row["user_id"])
+    return sorted(
+        ({"text": text, "count": count, "unique_users": len(users[text])}
+         for text, count in counts.items() if count >= min_count),
+        key=lambda item: (-item["count"], item["text"]),
+    )
+
+
+def test_day_buckets_match_group_by_scan(repository):
+    rng = random.Random(2)
+    phrases = ["Сису топ", "сису  ТОП", "тон на луну", "гм", "привет всем", "дракон вернулся"]
+    rows = [
+        {
+            "user_id": rng.randint(1, 6),
+            "message_text": rng.choice(phrases),
+            "timestamp": NOW - datetime.timedelta(hours=rng.randint(0, 24 * 20)),
+        }
+        for _ in range(600)
+    ]
+    # Пишем микропакетами, как очередь записи сообщений
+    for i in range(0, len(rows), 37):
+        ingest(repository, rows[i:i + 37])
+
+    since = NOW - datetime.timedelta(days=7)
+    result = repository.top_phrases(day_bucket(since), min_count=3)
+    # Потребители получают исходный текст одного из сообщений фразы, а не ключ
+    assert all(item["text"] in phrases for item in result)
+    normalized = [{**item, "text": normalize_phrase(item["text"])} for item in result]
+    assert sorted(normalized, key=lambda item: (-item["count"], item["text"])) == group_by_scan(rows, since, 3)
+    assert all(item["text"] != "гм" for item in result)
+
+
+def test_prune_and_clear(repository):
+    old = {"user_id": 1, "message_text": "старая фраза", "timestamp": NOW - datetime.timedelta(days=100)}
+    new = {"user_id": 2, "message_text": "новая фраза", "timestamp": NOW}
+    ingest(repository, [old, old, new])
+
+    assert repository.prune(day_bucket(NOW - datetime.timedelta(days=90))) == 1
+    assert [item["text"] for item in repository.top_phrases(0, min_count=1)] == ["новая фраза"]
+
+    with repository.session_factory() as session:
+        repository.clear(session)
+        session.commit()
+    assert repository.top_phrases(0, min_count=1) == []
@@ -0,0 +1,68 @@
+import json
+import random
+import pytest
+from sisu_bot.bot.services import phrase_memory_service as memory_module
+from sisu_bot.bot.services.phrase_index import PhraseIndex, jaccard, phrase_words
+from sisu_bot.bot.services.state_store import state_store
+
+
+def brute_force(phrases, query, threshold=0.3):
+    words = phrase_words(query)
+    hits = [(p, jaccard(words, phrase_words(p))) for p in phrases]
+    return sorted([h for h in hits if h[1] > threshold], key=lambda h: (-h[1], h[0]))
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setattr(memory_module, "DATA_DIR", tmp_path)
+    return memory_module.PhraseMemoryService()
+
+
+def test_search_matches_full_scan():
+    rng = random.Random(3)
+    vocabulary = ["сису", "тон", "дракон", "мем", "вайб", "луна", "памп", "я", "и", "ты", "топ", "крипта"]
+    phrases = {" ".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 6))) for _ in range(400)}
+    index = PhraseIndex()
+    for phrase in phrases:
+        index.add("popular", phrase)
+
+    for _ in range(200):
+        query = " ".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 6)))
+        assert index.search("popular", query) == brute_force(phrases, query)
+
+
+def test_remove_and_persisted_document():
+    index = PhraseIndex()
+    index.add("user:1", "Сису лучший дракон")
+    index.add("user:1", "тон на луну")
+    assert index.remove("user:1", "тон на луну")
+    assert not index.remove("user:1", "тон на луну")
+    assert index.search("user:1", "тон на луну") == []
+
+    restored = PhraseIndex(json.loads(json.dumps(index.document)))
+    assert restored.search("user:1", "сису дракон") == [("Сису лучший дракон", pytest.approx(2 / 3))]
+    assert restored.retain("user:1", []) == 1
+    assert restored.document["entries"] == {}
+
+
+def test_service_keeps_index_in_sync(service, tmp_path):
+    service.remember_phrase("Сису самый вайбовый дракон", 42)
+    service.remember_phrase("тон летит на луну", 7)
+
+    assert service.find_similar_phrases("вайбовый дракон сису", 42)[0] == "Сису самый вайбовый дракон"
+    # Популярные фразы видны всем пользователям
+    assert service.find_similar_phrases("тон летит", 42) == ["тон летит на луну"]
+
+    # Очистка убирает фразы и из индекса
+    for phrase_data in service.memory_data["user_phrases"][7]:
+        phrase_data["timestamp"] = "2000-01-01T00:00:00"
+    service.memory_data["popular_phrases"]["тон летит на луну"]["last_seen"] = "2000-01-01T00:00:00"
+    service.cleanup_old_data(days=30)
+    assert service.find_similar_phrases("тон летит", 7) == []
+
+    # Индекс пишется рядом с файлом памяти и подхватывается при рестарте
+    state_store.flush()
+    assert (tmp_path / "phrase_memory_index.json").exists()
+    restarted = memory_module.PhraseMemoryService()
+    assert restarted.phrase_index.size() == service.phrase_index.size()
+    assert restarted.find_similar_phrases("вайбовый дракон сису", 42)[0] == "Сису самый вайбовый дракон"
@@ -0,0 +1,82 @@
+import random
+from collections import Counter
+import pytest
+from app.shared.utils.phrase_sketch import PhraseSketch, phrase_ngrams
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_heavy_hitters_survive_bounded_memory():
+    rng = random.Random(5)
+    sketch = PhraseSketch(capacity=50, half_life=0)
+    stream = [f"хит {i}" for i in range(5) for _ in range(200)]
+    stream += [f"шум {rng.randrange(10_000)}" for _ in range(3000)]
+    rng.shuffle(stream)
+    for phrase in stream:
+        sketch.add(phrase)
+
+    assert len(sketch) == 50
+    exact = Counter(stream)
+    top = sketch.top(5)
+    assert sorted(stat.phrase for stat in top) == [f"хит {i}" for i in range(5)]
+    for stat in top:
+        # Space-Saving: count - error <= истинная частота <= count
+        assert stat.count - stat.error <= exact[stat.phrase] <= stat.count
+
+
+def test_top_ignores_phrases_seen_once_after_table_fills():
+    sketch = PhraseSketch(capacity=200, half_life=0)
+    for i in range(2000):
+        sketch.add(f"разовая фраза {i}")
+    for _ in range(5):
+        sketch.add("сису топ")
+
+    # Счетчики новых фраз почти целиком — погрешность от вытесненных
+    assert sketch.get("разовая фраза 1999").count >= 3
+    assert [stat.phrase for stat in sketch.top(100, min_count=3)] == ["сису топ"]
+
+
+def test_decay_and_contexts():
+    clock = FakeClock()
+    sketch = PhraseSketch(capacity=10, half_life=100, max_contexts=2, clock=clock)
+    for text in ("сису топ раз", "сису топ два", "сису топ три"):
+        sketch.add("сису топ", context=text)
+    assert sketch.get("сису топ").contexts == ("сису топ два", "сису топ три")
+
+    clock.now += 100
+    assert sketch.get("сису топ").count == pytest.approx(1.5)
+    sketch.add("новая фраза")
+    clock.now += 100
+    assert [stat.phrase for stat in sketch.top(2, min_count=0.6)] == ["сису топ"]
+
+    # Долгий простой сдвигает landmark без переполнения
+    clock.now += 100 * 200
+    sketch.add("сису топ")
+    assert sketch.get("сису топ").count == pytest.approx(1.0)
+
+
+def test_snapshot_roundtrip(tmp_path):
+    clock = FakeClock()
+    sketch = PhraseSketch(capacity=10, half_life=100, clock=clock)
+    sketch.update(phrase_ngrams("Сису лучший дракон на тоне"), context="ctx")
+    sketch.save(tmp_path / "sketch.json")
+
+    clock.now += 100
+    restored = PhraseSketch(capacity=10, half_life=100, clock=clock)
+    assert restored.load(tmp_path / "sketch.json")
+    assert restored.get("сису лучший").count == pytest.approx(0.5)
+    assert restored.get("сису лучший").contexts == ("ctx",)
+    assert len(restored) == len(sketch)
+    assert not PhraseSketch().load(tmp_path / "missing.json")
+
+
+def test_phrase_ngrams_matches_analyze_phrase():
+    assert phrase_ngrams("Сису лучший дракон") == ["сису лучший", "сису лучший дракон", "лучший дракон"]
+    assert phrase_ngrams("я и ты") == ["я и ты"]
+    assert phrase_ngrams("да ну") == []
@@ -0,0 +1,159 @@
+import asyncio
+import datetime
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.infrastructure.cache.quota import QuotaLedger
+from app.infrastructure.db.models import User, QuotaUsage
+from app.infrastructure.db.repositories.quota import QuotaRepository
+
+LIMITS = {
+    "ai": {"default": {"day": 5, "hour": 2}, "gold": {"day": 50, "hour": 20}},
+    "tts": {"default": {"day": 3}, "gold": {"day": 100}},
+}
+
+
+class FakeClock:
+    def __init__(self, now=1_000 * 86400.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def repository():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    User.__table__.create(engine)
+    repository = QuotaRepository(sessionmaker(bind=engine))
+    yield repository
+    engine.dispose()
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def make_ledger(repository, clock):
+    return QuotaLedger(repository=repository, limits=LIMITS, clock=clock)
+
+
+def test_check_and_rollover(repository, clock):
+    ledger = make_ledger(repository, clock)
+
+    ledger.record(1, "ai")
+    ledger.record(1, "ai")
+    assert ledger.check(1, "ai") == (False, "hour")
+    assert ledger.get_usage(1, "ai") == {"day": {"used": 2, "limit": 5}, "hour": {"used": 2, "limit": 2}}
+
+    # Новый час: часовой счетчик обнулился, дневной — нет
+    clock.now += 3600
+    assert ledger.check(1, "ai") == (True, None)
+    for _ in range(3):
+        ledger.record(1, "ai")
+        clock.now += 3600
+    assert ledger.check(1, "ai") == (False, "day")
+
+    # Новые сутки
+    clock.now += 86400
+    assert ledger.check(1, "ai") == (True, None)
+    # TTS считается только по дням
+    ledger.record(1, "tts")
+    assert ledger.get_used(1, "tts", "day") == 1
+    assert ledger.get_used(1, "tts", "hour") == 0
+
+
+def test_counters_survive_restart(repository, clock):
+    ledger = make_ledger(repository, clock)
+    for _ in range(3):
+        ledger.record(7, "tts")
+    ledger.record(8, "ai")
+
+    with repository.session_factory() as session:
+        rows = session.query(QuotaUsage).filter(QuotaUsage.user_id == 7).all()
+        # Одна строка на окно, приращения складываются атомарно
+        assert [(r.kind, r.period, r.used) for r in rows] == [("tts", "day", 3)]
+
+    restarted = make_ledger(repository, clock)
+    assert restarted.check(7, "tts") == (False, "day")
+    assert restarted.get_used(8, "ai", "hour") == 1
+
+    # Вчерашние строки вычищаются при загрузке
+    clock.now += 86400
+    make_ledger(repository, clock).get_used(7, "tts", "day")
+    with repository.session_factory() as session:
+        assert session.query(QuotaUsage).count() == 0
+
+    restarted.reset_user(7)
+    assert restarted.get_used(7, "tts", "day") == 0
+
+
+def test_supporter_tier_cache_and_invalidation(repository, clock):
+    ledger = make_ledger(repository, clock)
+    with repository.session_factory() as session:
+        session.add(User(id=5, is_supporter=False))
+        session.commit()
+
+    for _ in range(3):
+        ledger.record(5, "tts")
+    assert ledger.check(5, "tts") == (False, "day")
+    assert ledger.check(5, "tts") == (False, "day")
+    assert ledger.get_stats()["tier_lookups"] == 1
+
+    with repository.session_factory() as session:
+        user = session.get(User, 5)
+        user.is_supporter = True
+        user.supporter_tier = "gold"
+        user.supporter_until = datetime.datetime.utcnow() + datetime.timedelta(days=30)
+        session.commit()
+
+    # Без инвалидации действует закэшированный уровень
+    assert ledger.check(5, "tts") == (False, "day")
+    ledger.invalidate_tier(5)
+    assert ledger.check(5, "tts") == (True, None)
+    assert ledger.get_limits("tts", ledger.get_tier(5)) == {"day": 100}
+
+    # Истекшая подписка возвращает обычные лимиты
+    with repository.session_factory() as session:
+        session.get(User, 5).supporter_until = datetime.datetime.utcnow() - datetime.timedelta(days=1)
+        session.commit()
+    ledger.invalidate_tier()
+    assert ledger.get_tier(5) == "default"
+
+
+def test_async_records_are_written_off_loop(repository, clock):
+    ledger = make_ledger(repository, clock)
+
+    async def scenario():
+        await ledger.start()
+        assert await ledger.check_async(3, "ai") == (True, None)
+        for _ in range(4):
+            ledger.record(3, "ai")
+        assert await ledger.check_async(3, "ai") == (False, "hour")
+        await ledger.stop()
+
+    asyncio.run(scenario())
+    stats = ledger.get_stats()
+    assert stats["pending_rows"] == 0
+    assert stats["records"] == 4
+    with repository.session_factory() as session:
+        used = {r.period: r.used for r in session.query(QuotaUsage).filter(QuotaUsage.user_id == 3)}
+    assert used == {"day": 4, "hour": 4}
+
+
+def test_async_reset_removes_counters_and_rows(repository, clock):
+    ledger = make_ledger(repository, clock)
+
+    async def scenario():
+        await ledger.start()
+        for _ in range(3):
+            ledger.record(9, "tts")
+        await ledger.reset_user_async(9)
+        assert await ledger.check_async(9, "tts") == (True, None)
+        await ledger.stop()
+
+    asyncio.run(scenario())
+    with repository.session_factory() as session:
+        assert session.query(QuotaUsage).filter(QuotaUsage.user_id == 9).count() == 0
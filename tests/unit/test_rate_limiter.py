@@ -0,0 +1,62 @@
+import pytest
+from app.shared.utils.rate_limit import SlidingWindowLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_limit_and_sliding_window_estimate():
+    clock = FakeClock()
+    limiter = SlidingWindowLimiter([(60, 4), (3600, 100)], clock=clock)
+    assert [limiter.hit(1) for _ in range(4)] == [None] * 4
+    assert limiter.hit(1) == 60
+    # Другие пользователи считаются отдельно
+    assert limiter.hit(2) is None
+
+    # Секунда после начала следующего окна: 4 * 59/60 события из прошлого окна
+    clock.now = (clock.now // 60 + 1) * 60 + 1
+    assert limiter.hit(1) is None
+    assert limiter.hit(1) == 60
+    # Середина окна: 4 * 1/2 из прошлого + 1 в текущем
+    clock.now += 29
+    assert limiter.hit(1) is None
+    assert limiter.hit(1) == 60
+    stats = limiter.get_stats()
+    assert stats["allowed"] == 7 and stats["limited"] == 3 and stats["tracked"] == 2
+
+
+def test_longer_window_limits_after_minutes_reset():
+    clock = FakeClock()
+    limiter = SlidingWindowLimiter([(60, 2), (3600, 3)], clock=clock)
+    for _ in range(3):
+        assert limiter.hit("u") is None
+        clock.now += 120
+    assert limiter.hit("u") == 3600
+
+
+def test_sweep_evicts_idle_keys_and_keeps_table_dense():
+    clock = FakeClock()
+    limiter = SlidingWindowLimiter([(60, 2)], sweep_interval=30, clock=clock)
+    for user_id in range(5):
+        limiter.hit(user_id)
+    clock.now += 100
+    limiter.hit(3)
+    limiter.hit(3)
+    clock.now += 30
+    # Ключи 0, 1, 2, 4 молчат дольше двух окон; их строки удаляются попутно с проверкой
+    assert limiter.hit(3) == 60
+    assert len(limiter) == 1
+    assert limiter.get_stats()["evicted"] == 4
+    assert limiter.get_stats()["table_bytes"] <= 4 * limiter.stride * 8
+    # Новый пользователь получает чистую строку
+    assert limiter.hit(0) is None
+
+
+def test_requires_limits():
+    with pytest.raises(ValueError):
+        SlidingWindowLimiter([])
@@ -0,0 +1,119 @@
+import asyncio
+import pytest
+from app.infrastructure.ai.resilience import (
+    CLOSED, HALF_OPEN, OPEN, BudgetExceeded, CircuitBreaker, CircuitOpenError, ResilientCall,
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Upstream:
+    """Первая попытка отвечает через delays[0], вторая — через delays[1] и т.д."""
+
+    def __init__(self, *delays, fail_first=False):
+        self.delays = list(delays)
+        self.fail_first = fail_first
+        self.calls = 0
+        self.cancelled = 0
+
+    async def __call__(self):
+        attempt = self.calls
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delays[min(attempt, len(self.delays) - 1)])
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.fail_first and attempt == 0:
+            raise RuntimeError("502")
+        return f"attempt {attempt}"
+
+
+def test_breaker_opens_probes_half_open_and_closes():
+    clock = Clock()
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=10, clock=clock)
+    for _ in range(2):
+        breaker.acquire()
+        breaker.record_failure()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.acquire()
+
+    clock.now = 10
+    breaker.acquire()  # пробный вызов
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.acquire()  # второй вызов во время пробы
+    breaker.record_failure()
+    assert breaker.state == OPEN and breaker.get_stats()["retry_in"] == 10
+
+    clock.now = 20
+    breaker.acquire()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.get_stats()["opened"] == 2
+
+
+def test_budget_exceeded_and_open_circuit_short_circuit():
+    guard = ResilientCall("test", budget=0.05, hedge=False,
+                          breaker=CircuitBreaker("test", failure_threshold=1, recovery_timeout=60))
+    slow = Upstream(1.0)
+
+    async def scenario():
+        with pytest.raises(BudgetExceeded):
+            await guard.call(slow)
+        with pytest.raises(CircuitOpenError):
+            guard.raise_if_open()
+        with pytest.raises(CircuitOpenError):
+            await guard.call(slow)
+
+    asyncio.run(scenario())
+    assert (slow.calls, slow.cancelled) == (1, 1)
+    stats = guard.get_stats()
+    assert (stats["timeouts"], stats["failures"]) == (1, 1)
+    assert stats["breaker"]["state"] == OPEN
+
+
+def test_hedged_request_after_p95_and_retry_after_fast_failure():
+    guard = ResilientCall("test", budget=2.0, hedge_min_samples=3, hedge_min_delay=0.05)
+
+    async def scenario():
+        for _ in range(3):
+            await guard.call(Upstream(0.01))
+        stuck = Upstream(1.0, 0.01)
+        result = await guard.call(stuck)  # вторая попытка уходит через ~0.05 с и побеждает
+        flaky = Upstream(0.0, fail_first=True)
+        return stuck, result, flaky, await guard.call(flaky)
+
+    stuck, result, flaky, retried = asyncio.run(scenario())
+    assert result == "attempt 1" and stuck.cancelled == 1
+    assert retried == "attempt 1" and flaky.calls == 2
+    stats = guard.get_stats()
+    assert (stats["hedged"], stats["hedge_wins"], stats["failures"]) == (2, 2, 0)
+
+
+def test_stream_budget_applies_to_first_chunk():
+    guard = ResilientCall("test", budget=0.05, breaker=CircuitBreaker("test", failure_threshold=1))
+
+    def chunks(first_delay):
+        async def gen():
+            await asyncio.sleep(first_delay)
+            yield "Ну"
+            await asyncio.sleep(0.1)  # дальше бюджет не ограничивает
+            yield "Ну привет"
+        return gen
+
+    async def scenario():
+        received = [chunk async for chunk in guard.stream(chunks(0.0))]
+        with pytest.raises(BudgetExceeded):
+            [chunk async for chunk in guard.stream(chunks(1.0))]
+        return received
+
+    assert asyncio.run(scenario()) == ["Ну", "Ну привет"]
+    assert guard.get_stats()["breaker"]["state"] == OPEN
@@ -0,0 +1,91 @@
+import asyncio
+import pytest
+from app.shared.utils.single_flight import SingleFlight
+
+
+class Upstream:
+    def __init__(self, result="ответ", fail=False):
+        self.calls = 0
+        self.cancelled = 0
+        self.release = None
+        self.result = result
+        self.fail = fail
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.fail:
+            raise RuntimeError("api is down")
+        return self.result
+
+
+def test_concurrent_callers_share_one_call():
+    flights = SingleFlight()
+    upstream = Upstream()
+
+    async def scenario():
+        upstream.release = asyncio.Event()
+        callers = [asyncio.create_task(flights.do("k", upstream)) for _ in range(5)]
+        other = asyncio.create_task(flights.do("other", upstream))
+        await asyncio.sleep(0)
+        upstream.release.set()
+        results = await asyncio.gather(*callers, other)
+        # Следующий вызов после завершения — уже новый запрос
+        await flights.do("k", upstream)
+        return results
+
+    assert asyncio.run(scenario()) == ["ответ"] * 6
+    assert upstream.calls == 3
+    stats = flights.get_stats()
+    assert (stats["calls"], stats["upstream_calls"], stats["coalesced"]) == (7, 3, 4)
+    assert stats["in_flight"] == 0
+
+
+def test_cancelled_caller_does_not_cancel_others():
+    flights = SingleFlight()
+    upstream = Upstream()
+
+    async def scenario():
+        upstream.release = asyncio.Event()
+        first = asyncio.create_task(flights.do("k", upstream))
+        second = asyncio.create_task(flights.do("k", upstream))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        upstream.release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == "ответ"
+    assert (upstream.calls, upstream.cancelled) == (1, 0)
+    assert flights.get_stats()["cancelled_upstream"] == 0
+
+
+def test_all_callers_cancelled_cancels_upstream_and_errors_are_shared():
+    flights = SingleFlight()
+    upstream = Upstream()
+    failing = Upstream(fail=True)
+
+    async def scenario():
+        upstream.release = asyncio.Event()
+        callers = [asyncio.create_task(flights.do("k", upstream)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+
+        failing.release = asyncio.Event()
+        failing.release.set()
+        return await asyncio.gather(*(flights.do("f", failing) for _ in range(3)), return_exceptions=True)
+
+    errors = asyncio.run(scenario())
+    assert upstream.cancelled == 1
+    assert flights.get_stats()["cancelled_upstream"] == 1
+    assert failing.calls == 1
+    assert all(isinstance(error, RuntimeError) for error in errors)
@@ -0,0 +1,80 @@
+import asyncio
+import json
+import pytest
+from sisu_bot.bot.services.state_store import JsonStateStore
+
+
+@pytest.fixture
+def store():
+    return JsonStateStore(flush_interval=0.05, max_dirty_ops=1000)
+
+
+def test_mark_dirty_coalesces_writes(store, tmp_path):
+    path = tmp_path / "doc.json"
+    data = store.attach(path, {"count": 0})
+
+    for _ in range(50):
+        data["count"] += 1
+        store.mark_dirty(path)
+
+    # Без сброса файл ещё не записан
+    assert not path.exists()
+    assert store.is_dirty(path)
+
+    store.flush()
+    assert json.loads(path.read_text(encoding="utf-8")) == {"count": 50}
+    assert not store.is_dirty(path)
+
+    stats = store.get_stats()
+    assert stats["documents_written"] == 1
+    assert stats["bytes_written"] == path.stat().st_size
+
+
+def test_flush_skips_clean_documents(store, tmp_path):
+    path = tmp_path / "doc.json"
+    store.attach(path, {"a": 1})
+    store.flush()
+    assert not path.exists()
+    assert store.get_stats()["documents_written"] == 0
+
+
+def test_threshold_flushes_without_loop(tmp_path):
+    store = JsonStateStore(flush_interval=60, max_dirty_ops=3)
+    path = tmp_path / "doc.json"
+    data = store.attach(path, {"items": []})
+
+    for i in range(3):
+        data["items"].append(i)
+        store.mark_dirty(path)
+
+    assert json.loads(path.read_text(encoding="utf-8")) == {"items": [0, 1, 2]}
+
+
+def test_atomic_write_leaves_no_temp_files(store, tmp_path):
+    path = tmp_path / "doc.json"
+    store.attach(path, {"text": "Сису"})
+    store.mark_dirty(path)
+    store.flush()
+    assert [p.name for p in tmp_path.iterdir()] == ["doc.json"]
+    assert json.loads(path.read_text(encoding="utf-8")) == {"text": "Сису"}
+
+
+def test_background_flush_and_stop(store, tmp_path):
+    path = tmp_path / "doc.json"
+    data = store.attach(path, {"count": 0})
+
+    async def scenario():
+        store.start()
+        data["count"] = 1
+        store.mark_dirty(path)
+        await asyncio.sleep(0.2)
+        assert json.loads(path.read_text(encoding="utf-8")) == {"count": 1}
+
+        # Изменения, сделанные перед остановкой, должны попасть на диск
+        data["count"] = 2
+        store.mark_dirty(path)
+        await store.stop()
+
+    asyncio.run(scenario())
+    assert json.loads(path.read_text(encoding="utf-8")) == {"count": 2}
+    assert store.get_stats()["flush_count"] >= 2
@@ -0,0 +1,109 @@
+import asyncio
+import importlib
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+import pytest
+from aiohttp import web
+from app.infrastructure.ai.streaming import LatencyTracker, ProgressiveReply, stream_reply
+from app.infrastructure.http.client import HttpClient
+from scripts.mock_yandexgpt_server import COMPLETION_PATH, REQUESTS, create_app
+
+REPLY = "Ну привет, смертный. Сису на связи и уже скучает! А ты зачем пришел?"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def fake_message():
+    sent = SimpleNamespace(edit_text=AsyncMock())
+    return SimpleNamespace(answer=AsyncMock(return_value=sent)), sent
+
+
+@pytest.fixture
+def yandexgpt(monkeypatch):
+    monkeypatch.setenv("YANDEXGPT_API_KEY", "test-key")
+    module = importlib.import_module("sisu_bot.bot.services.yandexgpt_service")
+    monkeypatch.setattr(module, "YANDEXGPT_FOLDER_ID", "test-folder")
+    tracker = LatencyTracker()
+    monkeypatch.setattr(module, "completion_latency", tracker)
+    monkeypatch.setattr("app.infrastructure.ai.streaming.completion_latency", tracker)
+    return module, tracker
+
+
+def test_stream_from_mock_server(yandexgpt):
+    module, tracker = yandexgpt
+
+    async def scenario():
+        app = create_app([REPLY], first_delay=0.2, chunk_delay=0.05)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}{COMPLETION_PATH}"
+        client = HttpClient()
+        try:
+            snapshots = [text async for text in module.stream_sisu_reply(
+                "привет", http_client=client, api_url=url, use_cache=False)]
+        finally:
+            await client.close()
+            await runner.cleanup()
+        return snapshots, app[REQUESTS]
+
+    snapshots, requests = asyncio.run(scenario())
+    assert requests[0]["completionOptions"]["stream"] is True
+    assert len(snapshots) > 3
+    assert all(later.startswith(earlier) for earlier, later in zip(snapshots, snapshots[1:]))
+    assert snapshots[-1] == REPLY
+
+    stats = tracker.get_stats()
+    assert stats["count"] == 1
+    assert 0.2 <= stats["ttfb"]["max"] < stats["total"]["max"]
+
+
+def test_progressive_reply_waits_for_sentence_and_throttles_edits():
+    msg, sent = fake_message()
+    clock = Clock()
+    reply = ProgressiveReply(msg, edit_interval=1.0, clock=clock)
+
+    async def scenario():
+        await reply.update("Ну привет")
+        assert not msg.answer.called  # нет границы предложения
+        await reply.update("Ну привет, смертный. Сису")
+        msg.answer.assert_awaited_once_with("Ну привет, смертный. Сису")
+
+        clock.now = 0.5
+        await reply.update("Ну привет, смертный. Сису на связи")
+        assert not sent.edit_text.called  # слишком рано для правки
+        clock.now = 1.2
+        await reply.update("Ну привет, смертный. Сису на связи и уже")
+        sent.edit_text.assert_awaited_once_with("Ну привет, смертный. Сису на связи и уже")
+
+        clock.now = 5.0
+        await reply.finish(REPLY)
+        assert sent.edit_text.await_args.args == (REPLY,)
+
+    asyncio.run(scenario())
+    assert reply.edits == 2
+
+
+def test_stream_reply_keeps_partial_text_on_error():
+    msg, sent = fake_message()
+
+    async def broken():
+        yield "Первое предложение. Второе"
+        raise RuntimeError("connection reset")
+
+    async def empty_then_broken():
+        raise RuntimeError("connection refused")
+        yield  # pragma: no cover
+
+    assert asyncio.run(stream_reply(msg, broken(), edit_interval=0)) == "Первое предложение. Второе"
+    msg.answer.assert_awaited_once()
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(stream_reply(msg, empty_then_broken(), edit_interval=0))
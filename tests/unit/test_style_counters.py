@@ -0,0 +1,53 @@
+import json
+import random
+from collections import Counter
+from sisu_bot.bot.services import chat_style_analyzer as style_module
+from sisu_bot.bot.services.style_counters import TopKCounter, ensure_counter
+
+
+def test_top_matches_full_sort():
+    rng = random.Random(4)
+    counter = TopKCounter(k=5, capacity=10_000)
+    exact = Counter()
+    for _ in range(5000):
+        key = f"w{int(rng.paretovariate(1.2)) % 300}"
+        counter.add(key)
+        exact[key] += 1
+        top = counter.top()
+        assert len(top) == min(5, len(exact))
+        # Счетчики топа не меньше k-го значения полной сортировки
+        kth = sorted(exact.values(), reverse=True)[len(top) - 1]
+        assert all(exact[key] == count and count >= kth for key, count in top.items())
+        assert list(top.values()) == sorted(top.values(), reverse=True)
+    assert len(counter._heap) <= 4 * counter.k + 16
+
+
+def test_capacity_prunes_tail_and_json_roundtrip():
+    counter = TopKCounter(k=3, capacity=10)
+    for i in range(3):
+        for _ in range(10):
+            counter.add(f"hot{i}")
+    for i in range(20):
+        counter.add(f"cold{i}")
+    assert len(counter) <= 10
+    assert set(counter.top()) == {"hot0", "hot1", "hot2"}
+
+    document = {"common_words": json.loads(json.dumps(counter))}
+    restored = ensure_counter(document, "common_words")
+    assert isinstance(restored, TopKCounter)
+    assert dict(restored) == dict(counter)
+    assert set(list(restored.top())[:3]) == {"hot0", "hot1", "hot2"}
+    assert ensure_counter(document, "common_words") is restored
+
+
+def test_chat_style_uses_counters(tmp_path, monkeypatch):
+    monkeypatch.setattr(style_module, "DATA_DIR", tmp_path)
+    analyzer = style_module.ChatStyleAnalyzer()
+    for _ in range(3):
+        analyzer.update_chat_style("сису лучший дракон 🌕 !!!", 1, 2)
+    analyzer.update_chat_style("сису снова тут 😀 ?", 1, 3)
+
+    style = analyzer.get_chat_style(1)
+    assert list(style["top_words"].items())[0] == ("сису", 4)
+    assert style["top_emojis"] == {"🌕": 3, "😀": 1}
+    assert style["top_punctuation"] == {"!!!": 3, "?": 1}
@@ -0,0 +1,55 @@
+import random
+from app.shared.utils.trigger_matcher import TriggerEntry, TriggerMatcher, naive_search
+
+
+def test_overlapping_patterns_use_suffix_links():
+    matcher = TriggerMatcher([
+        TriggerEntry("he", 10, "he"),
+        TriggerEntry("she", 20, "she"),
+        TriggerEntry("hers", 30, "hers"),
+        TriggerEntry("his", 5, "his"),
+    ])
+    assert matcher.search("ushers").entry.payload == "hers"
+    hit = matcher.search("she sells")
+    assert (hit.entry.payload, hit.start, hit.end) == ("she", 0, 3)
+    assert matcher.search("this").entry.payload == "his"
+    assert matcher.search("nothing to see") is None
+
+
+def test_priority_then_insertion_order():
+    entries = [
+        TriggerEntry("тон", 85, "token"),
+        TriggerEntry("ton", 85, "token-en"),
+        TriggerEntry("нарисуй", 100, "draw"),
+        TriggerEntry("тон", 40, "positive"),
+    ]
+    matcher = TriggerMatcher(entries)
+    assert matcher.search("тон и нфт").entry.payload == "token"
+    assert matcher.search("ton тон").entry.payload == "token"
+    assert matcher.search("нарисуй и тон").entry.payload == "draw"
+
+
+def test_whole_word_entries():
+    matcher = TriggerMatcher([
+        TriggerEntry("да", 0, "learned", True),
+        TriggerEntry("привет сису", 0, "greeting", True),
+    ])
+    assert matcher.search("когда будет") is None
+    assert matcher.search("ну да, конечно").entry.payload == "learned"
+    assert matcher.search("привет сису!").entry.payload == "greeting"
+    assert matcher.search("привет сисуня") is None
+
+
+def test_matches_naive_loop_on_random_data():
+    rng = random.Random(7)
+    alphabet = "абвгд"
+    entries = [
+        TriggerEntry("".join(rng.choice(alphabet) for _ in range(rng.randint(1, 5))), rng.choice([40, 60, 85, 100]), i)
+        for i in range(300)
+    ]
+    matcher = TriggerMatcher(entries)
+    for _ in range(500):
+        text = "".join(rng.choice(alphabet + " ") for _ in range(rng.randint(0, 40)))
+        expected = naive_search(entries, text)
+        hit = matcher.search(text)
+        assert (hit.entry if hit else None) == expected
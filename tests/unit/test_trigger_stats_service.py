@@ -1,66 +1,94 @@
+import asyncio
+import threading
 import pytest
 import json
-import os
-from pathlib import Path
-from app.domain.services import trigger_stats_service
-import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.domain.services.triggers import stats as trigger_stats_service
+from app.infrastructure.db.repositories.trigger_stats import TriggerStatsRepository
 
-# Фикстура для временного файла статистики триггеров
+# Фикстура: отдельная in-memory БД и свежий буфер статистики на каждый тест
 @pytest.fixture(scope="function")
-def temp_trigger_stats_file(tmp_path):
-    old_path = trigger_stats_service.TRIGGER_STATS_FILE
-    temp_file = tmp_path / "trigger_stats.json"
-    trigger_stats_service.TRIGGER_STATS_FILE = str(temp_file) # os.path.join expects string
-    
-    if os.path.exists(temp_file):
-        os.remove(temp_file)
-    # Убедимся, что файл пуст в начале теста
-    with open(temp_file, 'w', encoding='utf-8') as f:
-        json.dump({}, f)
-
-    yield
-
-    # Восстанавливаем оригинальный путь и удаляем временный файл
-    trigger_stats_service.TRIGGER_STATS_FILE = old_path
-    if os.path.exists(temp_file):
-        os.remove(temp_file)
-
-def test_load_stats_empty(temp_trigger_stats_file):
-    stats = trigger_stats_service.load_stats()
-    assert stats == {}
-
-def test_save_stats(temp_trigger_stats_file):
-    test_data = {"test_trigger": {"count": 1, "answers": {"test_answer": 1}}}
-    trigger_stats_service.save_stats(test_data)
-
-    with open(trigger_stats_service.TRIGGER_STATS_FILE, 'r', encoding='utf-8') as f:
-        loaded_data = json.load(f)
-    assert loaded_data == test_data
-
-def test_log_trigger_usage(temp_trigger_stats_file):
+def temp_trigger_stats_db(tmp_path, monkeypatch):
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    repository = TriggerStatsRepository(sessionmaker(bind=engine))
+    repository.ensure_schema()
+    # Маленький буфер, чтобы тесты проходили и через сброс в БД, и через несброшенные приращения
+    store = trigger_stats_service.TriggerStatsService(repository=repository, flush_interval=3600, max_pending=3)
+    monkeypatch.setattr(trigger_stats_service, "trigger_stats_store", store)
+    monkeypatch.setattr(trigger_stats_service, "TRIGGER_STATS_FILE", tmp_path / "trigger_stats.json")
+    monkeypatch.setattr(trigger_stats_service, "DATA_DIR", tmp_path)
+
+    yield store
+
+    engine.dispose()
+
+def test_import_legacy_json(temp_trigger_stats_db):
+    legacy = {
+        "old_trigger": {
+            "count": 2,
+            "answers": {"old_answer": 3},
+            "users": {"1": 2},
+            "chats": {"5": 2},
+            "likes": {"old_answer": 1},
+            "dislikes": {}
+        }
+    }
+    with open(trigger_stats_service.TRIGGER_STATS_FILE, 'w', encoding='utf-8') as f:
+        json.dump(legacy, f)
+
+    stats = trigger_stats_service.get_trigger_stats("old_trigger")
+    assert stats["count"] == 2
+    assert stats["answers"]["old_answer"] == 3
+    assert stats["likes"]["old_answer"] == 1
+    # Файл переименовывается, повторного импорта не будет
+    assert not trigger_stats_service.TRIGGER_STATS_FILE.exists()
+
+def test_log_trigger_usage(temp_trigger_stats_db):
     trigger = "test_trigger"
     answer = "test_answer"
     user_id = 123
     chat_id = 456
-    
+
     trigger_stats_service.log_trigger_usage(trigger, answer, user_id, chat_id)
-    stats = trigger_stats_service.load_stats()
+    stats = trigger_stats_service.get_trigger_stats(trigger)
 
-    assert trigger in stats
-    assert stats[trigger]["count"] == 1
-    assert stats[trigger]["answers"][answer] == 2 # Изначально 1, потом +1
-    assert stats[trigger]["users"][str(user_id)] == 1
-    assert stats[trigger]["chats"][str(chat_id)] == 1
-    assert "last_used" in stats[trigger]
+    assert stats["count"] == 1
+    assert stats["answers"][answer] == 2 # Изначально 1, потом +1
+    assert stats["users"][str(user_id)] == 1
+    assert stats["chats"][str(chat_id)] == 1
+    assert stats["last_used"] is not None
 
     # Повторное использование
     trigger_stats_service.log_trigger_usage(trigger, answer, user_id, chat_id)
-    stats = trigger_stats_service.load_stats()
-    assert stats[trigger]["count"] == 2
-    assert stats[trigger]["answers"][answer] == 3
-    assert stats[trigger]["users"][str(user_id)] == 2
+    stats = trigger_stats_service.get_trigger_stats(trigger)
+    assert stats["count"] == 2
+    assert stats["answers"][answer] == 3
+    assert stats["users"][str(user_id)] == 2
+
+def test_increments_are_buffered_until_flush(temp_trigger_stats_db):
+    trigger_stats_service.log_trigger_usage("buffered", "ans", 1, 1)
+    assert temp_trigger_stats_db.repository.get_usage_rows("buffered") == []
+
+    # Веса уже учитывают несброшенный буфер
+    uses, _, _ = temp_trigger_stats_db.get_answer_stats("buffered")["ans"]
+    assert uses == 1
 
-def test_get_trigger_stats(temp_trigger_stats_file):
+    temp_trigger_stats_db.flush()
+    rows = temp_trigger_stats_db.repository.get_usage_rows("buffered")
+    assert [(r.user_id, r.chat_id, r.count) for r in rows] == [(1, 1, 1)]
+
+def test_upsert_keeps_one_row_per_user_and_chat(temp_trigger_stats_db):
+    for _ in range(7):
+        trigger_stats_service.log_trigger_usage("upsert", "ans", 1, 1)
+    temp_trigger_stats_db.flush()
+
+    rows = temp_trigger_stats_db.repository.get_usage_rows("upsert")
+    assert len(rows) == 1
+    assert rows[0].count == 7
+
+def test_get_trigger_stats(temp_trigger_stats_db):
     trigger = "test_trigger_get"
     answer = "test_answer_get"
     user_id = 789
@@ -75,10 +103,12 @@ def test_get_trigger_stats(temp_trigger_stats_file):
     non_existent_stats = trigger_stats_service.get_trigger_stats("non_existent_trigger")
     assert non_existent_stats is None
 
-def test_get_all_trigger_stats(temp_trigger_stats_file):
+    assert trigger_stats_service.get_trigger_stats() == {trigger: 1}
+
+def test_get_all_trigger_stats(temp_trigger_stats_db):
     trigger1 = "trig1"; answer1 = "ans1"; user1 = 1; chat1 = 1
     trigger2 = "trig2"; answer2 = "ans2"; user2 = 2; chat2 = 2
-    
+
     trigger_stats_service.log_trigger_usage(trigger1, answer1, user1, chat1)
     trigger_stats_service.log_trigger_usage(trigger2, answer2, user2, chat2)
 
@@ -87,7 +117,7 @@ def test_get_all_trigger_stats(temp_trigger_stats_file):
     assert trigger1 in all_stats
     assert trigger2 in all_stats
 
-def test_add_like_and_dislike(temp_trigger_stats_file):
+def test_add_like_and_dislike(temp_trigger_stats_db):
     trigger = "like_dislike_trigger"
     answer = "like_dislike_answer"
     user_id = 111
@@ -101,7 +131,16 @@ def test_add_like_and_dislike(temp_trigger_stats_file):
     assert likes == 1
     assert dislikes == 1
 
-def test_get_smart_answer(temp_trigger_stats_file):
+def test_answer_cache_invalidated_on_flush(temp_trigger_stats_db):
+    trigger_stats_service.log_trigger_usage("cached", "ans", 1, 1)
+    temp_trigger_stats_db.flush()
+    assert temp_trigger_stats_db.get_answer_stats("cached")["ans"][1] == 0
+
+    trigger_stats_service.add_like("cached", "ans")
+    temp_trigger_stats_db.flush()
+    assert temp_trigger_stats_db.get_answer_stats("cached")["ans"][1] == 1
+
+def test_get_smart_answer(temp_trigger_stats_db):
     trigger = "smart_trigger"
     answers = ["answer_A", "answer_B", "answer_C"]
     user_id = 333
@@ -120,18 +159,18 @@ def test_get_smart_answer(temp_trigger_stats_file):
     for _ in range(10):
         smart_answer = trigger_stats_service.get_smart_answer(trigger, answers)
         assert smart_answer in answers
-    
+
     # Проверим с last_answer
     smart_answer_filtered = trigger_stats_service.get_smart_answer(trigger, answers, last_answer="answer_A")
     assert smart_answer_filtered in ["answer_B", "answer_C"]
 
-def test_suggest_new_triggers(temp_trigger_stats_file):
+def test_suggest_new_triggers(temp_trigger_stats_db):
     # Создаем тестовые данные для триггеров
     trigger_stats_service.log_trigger_usage("trig_a", "ans1", 1, 1)
     trigger_stats_service.log_trigger_usage("trig_a", "ans1", 1, 1)
     trigger_stats_service.log_trigger_usage("trig_a", "ans1", 2, 2)
     trigger_stats_service.log_trigger_usage("trig_a", "ans1", 3, 3)
-    # trig_a: count=4, answers={'ans1':4}, users={1:2,2:1,3:1}, chats={1:2,2:1,3:1}
+    # trig_a: count=4, answers={'ans1'}, 3 пользователя
 
     trigger_stats_service.log_trigger_usage("trig_b", "ans_x", 1, 1)
     trigger_stats_service.log_trigger_usage("trig_b", "ans_y", 2, 2)
@@ -139,30 +178,24 @@ def test_suggest_new_triggers(temp_trigger_stats_file):
     trigger_stats_service.log_trigger_usage("trig_b", "ans_x", 4, 4)
     trigger_stats_service.log_trigger_usage("trig_b", "ans_y", 5, 5)
     trigger_stats_service.log_trigger_usage("trig_b", "ans_a", 6, 6)
-    # trig_b: count=6, answers={'ans_x':2, 'ans_y':2, 'ans_z':1, 'ans_a':1}, users={1:1,2:1,3:1,4:1,5:1,6:1}
+    # trig_b: count=6, 4 разных ответа — слишком много для предложенной логики (<=2)
 
     trigger_stats_service.log_trigger_usage("trig_c", "ans_q", 10, 10)
     trigger_stats_service.log_trigger_usage("trig_c", "ans_q", 11, 11)
     trigger_stats_service.log_trigger_usage("trig_c", "ans_p", 12, 12)
-    # trig_c: count=3, answers={'ans_q':2, 'ans_p':1}, users={10:1,11:1,12:1}
+    # trig_c: count=3, 2 ответа, 3 пользователя
 
     suggestions = trigger_stats_service.suggest_new_triggers(min_count=3, limit=5)
-    # Ожидаем trig_a, так как у него >=3 пользователей и <=2 ответа (хотя answers.keys() будет 1) 
-    # trig_b имеет слишком много ответов (4) для предложенной логики (<=2)
 
-    assert len(suggestions) == 1
-    assert suggestions[0][0] == "trig_a"
+    assert [s[0] for s in suggestions] == ["trig_a", "trig_c"]
     assert suggestions[0][1] == 4 # count
     assert suggestions[0][2] == 3 # users
 
-def test_auto_add_suggested_triggers(temp_trigger_stats_file, tmp_path):
-    # Мокируем LEARNING_PATH для этого теста
-    original_learning_path = trigger_stats_service.LEARNING_PATH
-    temp_learning_file = tmp_path / "learning_data_test.json"
-    trigger_stats_service.LEARNING_PATH = temp_learning_file
-    
+def test_auto_add_suggested_triggers(temp_trigger_stats_db, tmp_path):
+    learning_file = tmp_path / "learning_data.json"
+
     # Создаем пустой learning_data.json для начала
-    with open(temp_learning_file, 'w', encoding='utf-8') as f:
+    with open(learning_file, 'w', encoding='utf-8') as f:
         json.dump({"triggers": {}, "responses": {}}, f)
 
     trigger_stats_service.log_trigger_usage("trig_suggest", "resp_suggest", 1, 1)
@@ -174,15 +207,46 @@ def test_auto_add_suggested_triggers(temp_trigger_stats_file, tmp_path):
     added_triggers = trigger_stats_service.auto_add_suggested_triggers(min_count=5, min_users=3)
 
     assert "trig_suggest" in added_triggers
-    
-    with open(temp_learning_file, 'r', encoding='utf-8') as f:
+
+    with open(learning_file, 'r', encoding='utf-8') as f:
         learning_data = json.load(f)
-    assert "trig_suggest" in learning_data["triggers"]
-    assert learning_data["triggers"]["trig_suggest"] == ["resp_suggest", "resp_suggest"] # Из-за особенностей log_trigger_usage
+    assert learning_data["triggers"]["trig_suggest"] == ["resp_suggest"]
+
+
+def test_full_buffer_is_written_off_the_event_loop(temp_trigger_stats_db):
+    store = temp_trigger_stats_db
+    repository = store.repository
+    threads = []
+    apply_deltas = repository.apply_deltas
+
+    def recording_apply(usage, answers):
+        threads.append(threading.get_ident())
+        return apply_deltas(usage, answers)
+
+    repository.apply_deltas = recording_apply
+
+    async def scenario():
+        for _ in range(3):
+            store.log_usage("loop", "ans", 1, 1)
+        # Запись идет в фоне; до ее окончания веса учитывают буфер
+        assert store.get_answer_stats("loop")["ans"][0] == 3
+        await store.stop()
+
+    asyncio.run(scenario())
+    assert threads and threading.get_ident() not in threads
+    assert [r.count for r in repository.get_usage_rows("loop")] == [3]
+
+
+def test_timer_flushes_quiet_buffer(temp_trigger_stats_db):
+    store = temp_trigger_stats_db
+    store._writer.interval = 0.01
 
-    # Восстанавливаем оригинальный путь
-    trigger_stats_service.LEARNING_PATH = original_learning_path
-    if os.path.exists(temp_learning_file):
-        os.remove(temp_learning_file)
+    async def scenario():
+        await store.start()
+        store.log_usage("quiet", "ans", 1, 1)
+        await asyncio.sleep(0.2)
+        rows = store.repository.get_usage_rows("quiet")
+        await store.stop()
+        return rows
 
-# Добавьте другие тесты для функций trigger_stats_service здесь 
\ No newline at end of file
+    assert [r.count for r in asyncio.run(scenario())] == [1]
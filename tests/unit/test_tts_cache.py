@@ -0,0 +1,56 @@
+import asyncio
+from app.infrastructure.cache.tts import INDEX_NAME, TtsAudioCache, tts_cache_key
+
+OGG = b"OggS" + b"\x00" * 96
+
+
+def test_key_covers_all_synthesis_parameters():
+    base = tts_cache_key("Сису верит в тебя!", "marina", "good", 1.0)
+    assert base == tts_cache_key("Сису верит в тебя!", "marina", "good", 1)
+    assert len({
+        base,
+        tts_cache_key("Сису верит в тебя", "marina", "good", 1.0),
+        tts_cache_key("Сису верит в тебя!", "alena", "good", 1.0),
+        tts_cache_key("Сису верит в тебя!", "marina", "evil", 1.0),
+        tts_cache_key("Сису верит в тебя!", "marina", "good", 1.1),
+        tts_cache_key("Сису верит в тебя!", "marina", "good", 1.0, pitch=2),
+    }) == 6
+
+
+def test_roundtrip_and_lru_eviction_by_size(tmp_path):
+    cache = TtsAudioCache(directory=tmp_path, max_bytes=250, enabled=True)
+
+    async def scenario():
+        assert await cache.aget("a" * 32) is None
+        await cache.aput("a" * 32, OGG)
+        await cache.aput("b" * 32, OGG)
+        assert await cache.aget("a" * 32) == OGG  # "a" теперь свежее "b"
+        await cache.aput("c" * 32, OGG)
+
+    asyncio.run(scenario())
+    assert cache.get("b" * 32) is None
+    assert not (tmp_path / "bb" / f"{'b' * 32}.ogg").exists()
+    assert cache.get("a" * 32) == OGG and cache.get("c" * 32) == OGG
+    stats = cache.get_stats()
+    assert (stats["files"], stats["bytes"], stats["evictions"]) == (2, 200, 1)
+    assert not list(tmp_path.rglob("*.tmp"))
+
+
+def test_index_is_reloaded_and_rebuilt_from_files(tmp_path):
+    cache = TtsAudioCache(directory=tmp_path, max_bytes=10_000, enabled=True)
+    cache.put("a" * 32, OGG)
+    cache.put("b" * 32, OGG + b"!")
+
+    reloaded = TtsAudioCache(directory=tmp_path, max_bytes=10_000, enabled=True)
+    assert reloaded.get("b" * 32) == OGG + b"!"
+    assert reloaded.get_stats()["bytes"] == 201
+
+    # Файл пропал с диска — промах, запись уходит из индекса
+    (tmp_path / "aa" / f"{'a' * 32}.ogg").unlink()
+    assert reloaded.get("a" * 32) is None
+    assert reloaded.get_stats()["files"] == 1
+
+    (tmp_path / INDEX_NAME).write_text("{broken")
+    rescanned = TtsAudioCache(directory=tmp_path, max_bytes=10_000, enabled=True)
+    assert rescanned.get("b" * 32) == OGG + b"!"
+    assert rescanned.get_stats()["files"] == 1
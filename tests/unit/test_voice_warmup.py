@@ -0,0 +1,88 @@
+import asyncio
+from app.infrastructure.ai.resilience import CircuitOpenError
+from app.infrastructure.ai.voice_warmup import POOL_VOICE, VoiceWarmup
+from app.infrastructure.cache.tts import TtsAudioCache, tts_cache_key
+from app.shared.utils.ogg_opus import split_for_tts
+
+PHRASES = ["Ты сможешь!", "Драконы не сдаются!", "Вайб на месте!", "Сису верит в тебя!", "Ты сможешь!"]
+
+
+class FakeSpeechKit:
+    """Синтез как у synthesize_sisu_voice: результат попадает в дисковый кэш"""
+
+    def __init__(self, cache, fail_with=None, chunk_chars=1000):
+        self.cache = cache
+        self.chunk_chars = chunk_chars
+        self.fail_with = fail_with
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+
+    async def __call__(self, text, **params):
+        self.calls.append((text, params))
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(0.01)
+            if self.fail_with:
+                raise self.fail_with
+            chunks = split_for_tts(text, self.chunk_chars)
+            # Длинный текст кэшируется только по частям, как в _synthesize_chunked
+            for part in (chunks if len(chunks) > 1 else [text]):
+                await self.cache.aput(tts_cache_key(part, **params), f"OggS {part}".encode())
+            return f"OggS {text}".encode()
+        finally:
+            self.active -= 1
+
+
+def test_pools_are_rendered_once_with_bounded_concurrency(tmp_path):
+    cache = TtsAudioCache(directory=tmp_path, max_bytes=10_000, enabled=True)
+    speechkit = FakeSpeechKit(cache)
+    warmup = VoiceWarmup(concurrency=2, enabled=True, cache=cache, synthesize=speechkit, pools=lambda: PHRASES)
+
+    async def scenario():
+        first = await warmup.warm_pools()
+        second = await warmup.warm_pools()
+        await warmup.schedule(["Новая мотивация!"])
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first == {"rendered": 4, "cached": 0, "failed": 0}
+    assert second == {"rendered": 0, "cached": 4, "failed": 0}
+    assert speechkit.max_active == 2
+    assert all(params == POOL_VOICE for _, params in speechkit.calls)
+    assert len(speechkit.calls) == 5
+    assert cache.get(tts_cache_key("Новая мотивация!", **POOL_VOICE)) == "OggS Новая мотивация!".encode()
+
+
+def test_warmup_stops_when_speechkit_is_unavailable(tmp_path):
+    cache = TtsAudioCache(directory=tmp_path, max_bytes=10_000, enabled=True)
+    speechkit = FakeSpeechKit(cache, fail_with=CircuitOpenError("speechkit circuit is open"))
+    warmup = VoiceWarmup(concurrency=1, enabled=True, cache=cache, synthesize=speechkit, pools=lambda: PHRASES)
+
+    result = asyncio.run(warmup.warm_pools())
+    assert len(speechkit.calls) == 1
+    assert result == {"rendered": 0, "cached": 0, "failed": 1}
+    assert warmup.get_stats()["aborted"] == 1
+
+
+def test_long_phrases_cached_by_chunks_are_not_rendered_again(tmp_path):
+    cache = TtsAudioCache(directory=tmp_path, max_bytes=10_000, enabled=True)
+    speechkit = FakeSpeechKit(cache, chunk_chars=20)
+    poem = "Дракон летит над TON.\nЛуна светит ярко!\nСису с нами навсегда!"
+    warmup = VoiceWarmup(concurrency=2, enabled=True, cache=cache, chunk_chars=20, synthesize=speechkit,
+                         pools=lambda: [poem, "Ты сможешь!"])
+
+    async def scenario():
+        return await warmup.warm_pools(), await warmup.warm_pools()
+
+    first, second = asyncio.run(scenario())
+    assert first == {"rendered": 2, "cached": 0, "failed": 0}
+    assert second == {"rendered": 0, "cached": 2, "failed": 0}
+    assert cache.get(tts_cache_key(poem, **POOL_VOICE)) is None
+
+    # Часть вытеснена из кэша — фраза синтезируется снова
+    evicted = tts_cache_key("Луна светит ярко!", **POOL_VOICE)
+    cache._path(evicted).unlink()
+    assert cache.get(evicted) is None
+    assert asyncio.run(warmup.warm([poem])) == {"rendered": 1, "cached": 0, "failed": 0}
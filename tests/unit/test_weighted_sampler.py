@@ -0,0 +1,112 @@
+import random
+from collections import Counter
+import pytest
+from app.shared.utils.weighted_sampler import AliasSampler, RecentItems, SamplerCache, min_bonus_corrections
+
+DRAWS = 40_000
+
+
+def frequencies(draw):
+    counts = Counter(draw() for _ in range(DRAWS))
+    return {item: count / DRAWS for item, count in counts.items()}
+
+
+def expected(weights):
+    total = sum(weights.values())
+    return {item: weight / total for item, weight in weights.items() if weight > 0}
+
+
+def assert_close(actual, wanted):
+    assert set(actual) == set(wanted)
+    for item, probability in wanted.items():
+        assert actual[item] == pytest.approx(probability, abs=0.01)
+
+
+def test_alias_table_matches_weights():
+    rng = random.Random(1)
+    weights = {"a": 1.0, "b": 2.5, "c": 0.0, "d": 6.5}
+    sampler = AliasSampler(list(weights), list(weights.values()))
+    assert_close(frequencies(lambda: sampler.sample(rng=rng)), expected(weights))
+
+
+def test_exclude_and_corrections_without_rebuild():
+    rng = random.Random(2)
+    weights = {"a": 1.0, "b": 2.0, "c": 3.0, "d": 4.0}
+    sampler = AliasSampler(list(weights), list(weights.values()))
+
+    without_d = {k: v for k, v in weights.items() if k != "d"}
+    assert_close(frequencies(lambda: sampler.sample(exclude="d", rng=rng)), expected(without_d))
+
+    # +3 к "a", -1.5 к "c": итоговые веса 4, 2, 1.5, 4
+    corrections = {sampler.index_of("a"): 3.0, sampler.index_of("c"): -1.5}
+    corrected = {"a": 4.0, "b": 2.0, "c": 1.5, "d": 4.0}
+    assert_close(frequencies(lambda: sampler.sample(corrections=corrections, rng=rng)), expected(corrected))
+
+    corrected.pop("a")
+    assert_close(
+        frequencies(lambda: sampler.sample(exclude="a", corrections=corrections, rng=rng)),
+        expected(corrected),
+    )
+
+
+def baseline_weights(uses, exclude):
+    """Прежний get_smart_answer: бонус 1.5 самому редкому из ответов без последнего"""
+    available = {item: count for item, count in uses.items() if item != exclude}
+    lowest = min(available.values())
+    return {item: 1.5 if count == lowest else 1.0 for item, count in available.items()}
+
+
+def test_min_bonus_moves_to_rarest_remaining_item():
+    rng = random.Random(4)
+    for uses in ({"a": 0, "b": 1, "c": 2}, {"a": 0, "b": 0, "c": 2}):
+        full = baseline_weights(uses, exclude=None)
+        sampler = AliasSampler(list(full), list(full.values()))
+        corrections = min_bonus_corrections(sampler, list(uses.values()), "a", 1.5)
+        assert_close(
+            frequencies(lambda: sampler.sample(exclude="a", corrections=corrections, rng=rng)),
+            expected(baseline_weights(uses, exclude="a")),
+        )
+    # b — самый редкий после исключения a: 1.5 / (1.5 + 1.0)
+    assert expected(baseline_weights({"a": 0, "b": 1, "c": 2}, "a"))["b"] == pytest.approx(0.6)
+    assert min_bonus_corrections(sampler, [0, 0, 2], None, 1.5) == {}
+
+
+def test_degenerate_cases():
+    rng = random.Random(3)
+    single = AliasSampler(["only"], [1.0])
+    assert single.sample(exclude="only", rng=rng) == "only"
+
+    # Вся масса у исключенного ответа — равновероятный выбор среди остальных
+    skewed = AliasSampler(["a", "b", "c"], [5.0, 0.0, 0.0])
+    assert {skewed.sample(exclude="a", rng=rng) for _ in range(200)} == {"b", "c"}
+
+    with pytest.raises(ValueError):
+        AliasSampler([], [])
+
+
+def test_cache_invalidates_by_tag():
+    cache = SamplerCache(maxsize=2)
+    build = lambda: AliasSampler(["x", "y"], [1, 1])
+    first = cache.get(("t1", ("x", "y")), build, tags=("t1",))
+    assert cache.get(("t1", ("x", "y")), build, tags=("t1",)) is first
+    cache.invalidate("t1")
+    assert cache.get(("t1", ("x", "y")), build, tags=("t1",)) is not first
+    assert cache.builds == 2
+
+    cache.get("k2", build, tags=("t2",))
+    cache.get("k3", build, tags=("t3",))
+    assert len(cache) == 2
+    cache.invalidate("t1")  # уже вытеснен — без ошибок
+
+
+def test_recent_items_are_bounded():
+    recent = RecentItems(max_keys=2, max_items=3)
+    for item in "abcd":
+        recent.add(1, item)
+    recent.add(2, "x")
+    recent.add(1, "b")
+    recent.add(3, "y")
+    # Ключ 2 использовался давнее всех и вытеснен; у ключа 1 остались три последних элемента
+    assert recent.get(2) == ()
+    assert recent.get(1) == ("c", "d", "b")
+    assert len(recent) == 2
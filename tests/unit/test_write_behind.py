@@ -0,0 +1,58 @@
+import asyncio
+from app.infrastructure.cache.write_behind import WriteBehind
+
+
+class Buffer:
+    def __init__(self, fail=0):
+        self.pending = []
+        self.written = []
+        self.fail = fail
+
+    def flush(self):
+        if self.fail:
+            self.fail -= 1
+            return False
+        self.written.extend(self.pending)
+        self.pending = []
+        return True
+
+
+def test_schedule_flushes_in_background_and_stop_drains():
+    buffer = Buffer(fail=1)
+    writer = WriteBehind("test", buffer.flush, lambda: bool(buffer.pending))
+
+    async def scenario():
+        buffer.pending.append(1)
+        writer.schedule()
+        # Запись не выполняется в вызывающей корутине
+        assert buffer.written == []
+        await asyncio.sleep(0.05)
+        # Первая запись не удалась — фоновая задача остановилась, изменения ждут
+        assert buffer.pending == [1]
+        buffer.pending.append(2)
+        await writer.stop()
+
+    asyncio.run(scenario())
+    assert buffer.written == [1, 2]
+
+
+def test_timer_flushes_without_new_writes():
+    buffer = Buffer()
+    writer = WriteBehind("test", buffer.flush, lambda: bool(buffer.pending), interval=0.01)
+
+    async def scenario():
+        await writer.start()
+        buffer.pending.append("quiet")
+        await asyncio.sleep(0.1)
+        assert buffer.written == ["quiet"]
+        await writer.stop()
+
+    asyncio.run(scenario())
+
+
+def test_schedule_outside_event_loop_writes_immediately():
+    buffer = Buffer()
+    writer = WriteBehind("test", buffer.flush, lambda: bool(buffer.pending))
+    buffer.pending.append("script")
+    writer.schedule()
+    assert buffer.written == ["script"]